@@ -0,0 +1,407 @@
+"""
+ESP32 PC Controller Emulator
+
+Runs the ESP32 side of the system on a PC so the whole path
+(HTTP -> ESP32 route -> serial line -> pc_controller.py) can be exercised
+without hardware:
+
+- The HTTP route table is read from esp32_pc_controller.ino, so it always
+  matches the firmware (including /status with the getStatusJSON() fields).
+- The serial link is a pty pair; the companion opens the other end exactly
+  like a COM port and sees the same "@<millis>[/<ttl>][#<trace>]|COMMAND" frames.
+- Companion responses update pc_awake/display_on like handlePCResponse(), and
+  heartbeats (CLOCK_SYNC) are answered and keep pc_link up the same way.
+
+Requires Linux/macOS (pty). Usage:
+    python esp32_emulator.py                         # serve, print the pty path
+    python esp32_emulator.py --spawn-companion --load-test 200
+    python esp32_emulator.py --spawn-companion --load-test 500 --concurrency 8 \\
+        --route /playback/play-pause --route "/search/youtube?query=lofi beats"
+"""
+
+import argparse
+import bisect
+import collections
+import json
+import os
+import queue
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tty
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SKETCH_PATH = os.path.join(ROOT, 'esp32_pc_controller', 'esp32_pc_controller.ino')
+COMPANION_PATH = os.path.join(ROOT, 'windows_companion', 'pc_controller.py')
+
+DEVICE_NAME = 'esp32-pc-controller'
+# The firmware's PC_LINK_TIMEOUT (ms without a heartbeat before pc_link goes false)
+PC_LINK_TIMEOUT = 3500
+
+# kind: 'status' (getStatusJSON), 'command' (fixed or COMMAND:param), 'generic' (/command)
+# optional: the command is sent without the param when it is missing
+# escape: the param is typed text, escaped like the firmware's escapeText()
+Route = collections.namedtuple('Route', 'method path kind command param optional escape')
+
+_ROUTE_RE = re.compile(r'server\.on\("([^"]+)",\s*HTTP_(GET|POST),(.*?)\n  \}\);', re.S)
+_COMMAND_RE = re.compile(r'(?:executeCommand\(|String cmd = )"([A-Z0-9_]+)(:?)"')
+_PARAM_RE = re.compile(r'hasParam\("(\w+)", true\)')
+
+
+def load_routes(sketch_path=SKETCH_PATH):
+    """Parse the server.on(...) route table out of the firmware sketch"""
+    with open(sketch_path, encoding='utf-8') as sketch:
+        source = sketch.read()
+
+    routes = {}
+    for path, method, body in _ROUTE_RE.findall(source):
+        params = _PARAM_RE.findall(body)
+        match = _COMMAND_RE.search(body)
+        if 'getStatusJSON()' in body:
+            route = Route(method, path, 'status', None, None, False, False)
+        elif match:
+            command, takes_param = match.groups()
+            route = Route(method, path, 'command', command, params[0] if takes_param else None,
+                          'Missing' not in body, 'escapeText(' in body)
+        elif 'cmd' in params:
+            route = Route(method, path, 'generic', None, 'cmd', False, False)
+        else:
+            continue
+        routes[(method, path)] = route
+    return routes
+
+
+def escape_text(text):
+    """The firmware's escapeText(): typed text on one serial line"""
+    return text.replace('\\', '\\\\').replace('\r', '').replace('\n', '\\n').replace('\t', '\\t')
+
+
+_TRACE_RE = re.compile(r'[0-9a-fA-F,]{1,40}$')
+
+
+def valid_trace(trace):
+    """The firmware's validTrace(): hex trace id, optionally ',<epoch ms>'"""
+    return bool(trace) and _TRACE_RE.match(trace) is not None
+
+
+class EmulatedESP32:
+    """Firmware state plus the serial side of the link (pty master)"""
+
+    def __init__(self, routes):
+        self.routes = routes
+        self.started = time.monotonic()
+        self.pc_awake = False
+        self.pc_link = None  # Unknown until the first heartbeat, like the firmware
+        self.last_heartbeat = 0
+        self.display_on = False
+        self.last_command = "None"
+        self.last_command_time = 0
+        self.responses = queue.Queue()  # (monotonic_ns, line) of every companion response
+
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)  # No echo or newline translation, like a real UART
+        self.port_name = os.ttyname(self._slave)
+        self._write_lock = threading.Lock()
+        self._reader = threading.Thread(target=self._read_serial, name='serial-reader', daemon=True)
+        self._reader.start()
+
+    def millis(self):
+        return int((time.monotonic() - self.started) * 1000)
+
+    def _write_line(self, line):
+        with self._write_lock:
+            os.write(self._master, f"{line}\r\n".encode('utf-8'))  # Serial.println() ends lines with CRLF
+
+    def execute_command(self, command, ttl_ms=0, trace=None):
+        """Mirror of executeTracedCommand(): frame the command and send it to the PC"""
+        frame = f"@{self.millis()}"
+        if ttl_ms > 0:
+            frame += f"/{ttl_ms}"
+        if valid_trace(trace):
+            frame += f"#{trace}"
+        self._write_line(f"{frame}|{command}")
+        self.last_command = command
+        self.last_command_time = self.millis()
+
+    def handle_pc_response(self, response):
+        """Mirror of handlePCResponse()"""
+        if response.startswith("CLOCK_SYNC:"):
+            self._write_line(f"CLOCK:{response[11:]},{self.millis()}")
+            self.last_heartbeat = self.millis()
+            if not self.pc_link:
+                self.pc_link = True
+                self.pc_awake = True
+            return
+        if response.startswith("STATUS:"):
+            if response.startswith("STATUS:PC_AWAKE"):
+                self.pc_awake = True
+            elif response.startswith("STATUS:PC_ASLEEP"):
+                self.pc_awake = False
+            if response.startswith("STATUS:DISPLAY_ON"):
+                self.display_on = True
+            elif response.startswith("STATUS:DISPLAY_OFF"):
+                self.display_on = False
+
+    def check_link(self):
+        """Mirror of the heartbeat timeout in loop()"""
+        if self.pc_link and self.millis() - self.last_heartbeat > PC_LINK_TIMEOUT:
+            self.pc_link = False
+            self.pc_awake = False
+
+    def status(self):
+        """Same fields as getStatusJSON()"""
+        self.check_link()
+        return {
+            'device': DEVICE_NAME,
+            'ip': '127.0.0.1',
+            'mac': '00:00:00:00:00:00',
+            'uptime': self.millis() // 1000,
+            'wifi_rssi': -50,
+            'pc_awake': self.pc_awake,
+            'pc_link': self.pc_link,
+            'display_on': self.display_on,
+            'last_command': self.last_command,
+            'last_command_time': self.last_command_time // 1000,
+        }
+
+    def _read_serial(self):
+        buffer = b''
+        while True:
+            try:
+                chunk = os.read(self._master, 4096)
+            except OSError:
+                return  # pty closed
+            if not chunk:
+                return
+            buffer += chunk
+            while b'\n' in buffer:
+                line, buffer = buffer.split(b'\n', 1)
+                response = line.decode('utf-8', errors='ignore').strip()
+                if response.startswith("CLOCK_SYNC:"):
+                    self.handle_pc_response(response)  # Heartbeat - not a response
+                elif response:
+                    self.handle_pc_response(response)
+                    self.responses.put((time.monotonic_ns(), response))
+
+
+def make_handler(esp32):
+    """HTTP handler class bound to an emulator instance"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _send_json(self, code, payload):
+            body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _handle(self, method):
+            path = urlsplit(self.path).path
+            route = esp32.routes.get((method, path))
+            length = int(self.headers.get('Content-Length') or 0)
+            form = dict(parse_qsl(self.rfile.read(length).decode('utf-8'))) if length else {}
+            if route is None:
+                body = b'Not found'
+                self.send_response(404)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+
+            if route.kind == 'status':
+                self._send_json(200, esp32.status())
+                return
+            if route.param and route.param not in form and not route.optional:
+                self._send_json(400, {'status': 'error', 'message': f"Missing {route.param} parameter"})
+                return
+
+            if route.kind == 'generic':
+                command = form['cmd']
+                esp32.execute_command(command, int(form.get('ttl') or 0), form.get('trace'))
+            else:
+                command = route.command
+                if route.param in form:
+                    param = form[route.param]
+                    command += ':' + (escape_text(param) if route.escape else param)
+                esp32.execute_command(command)
+            response = {'status': 'ok', 'command': command.split(':', 1)[0]}
+            if route.param in ('url', 'level'):
+                response[route.param] = form[route.param]
+            self._send_json(200, response)
+
+        def do_GET(self):
+            self._handle('GET')
+
+        def do_POST(self):
+            self._handle('POST')
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def spawn_companion(esp32, keylog):
+    """Start pc_controller.py on the pty (fake backend on non-Windows hosts)"""
+    env = dict(os.environ, PC_CONTROLLER_FAKE_KEYLOG=keylog)
+    process = subprocess.Popen([sys.executable, COMPANION_PATH, '--port', esp32.port_name],
+                               env=env, stdout=subprocess.DEVNULL,
+                               cwd=os.path.dirname(COMPANION_PATH))
+    # The companion waits 2s after opening the port - poll until it answers
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        esp32.execute_command('METRICS')
+        try:
+            while True:
+                _, line = esp32.responses.get(timeout=0.5)
+                if line.startswith('STATUS:METRICS'):
+                    return process
+        except queue.Empty:
+            continue
+    process.kill()
+    raise RuntimeError("companion did not answer on the serial link")
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(len(samples) * q))]
+    return (f"p50 {pick(0.50):7.1f} ms  p95 {pick(0.95):7.1f} ms  "
+            f"p99 {pick(0.99):7.1f} ms  max {samples[-1]:7.1f} ms")
+
+
+def run_load_test(esp32, http_port, routes, requests, concurrency, keylog):
+    """Fire requests at the emulator and measure HTTP-to-keystroke latency and throughput"""
+    targets = []
+    for route in routes:
+        split = urlsplit(route)
+        targets.append((f"http://127.0.0.1:{http_port}{split.path}",
+                        urlencode(parse_qsl(split.query)).encode('ascii')))
+
+    sent = []  # (monotonic_ns before the HTTP request, http status)
+    sent_lock = threading.Lock()
+    counter = iter(range(requests))
+    counter_lock = threading.Lock()
+
+    def worker():
+        while True:
+            with counter_lock:
+                index = next(counter, None)
+            if index is None:
+                return
+            url, body = targets[index % len(targets)]
+            started = time.monotonic_ns()
+            try:
+                with urllib.request.urlopen(url, data=body, timeout=10) as response:
+                    code = response.status
+            except urllib.error.HTTPError as e:
+                code = e.code
+            with sent_lock:
+                sent.append((started, code))
+            if concurrency == 1:
+                # One command in flight at a time so keystrokes map to requests
+                esp32_wait_for_response(esp32, collected)
+
+    collected = []
+    began = time.monotonic_ns()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    while len(collected) < len(sent):
+        if not esp32_wait_for_response(esp32, collected, timeout=10):
+            break
+    elapsed = (time.monotonic_ns() - began) / 1e9
+
+    ok = [line for _, line in collected if line.startswith('STATUS:')]
+    errors = [line for _, line in collected if line.startswith('ERROR:')]
+    print(f"Requests:   {len(sent)} over {elapsed:.2f}s with concurrency {concurrency}")
+    print(f"Responses:  {len(ok)} ok, {len(errors)} errors, {len(sent) - len(collected)} missing")
+    print(f"Throughput: {len(collected) / elapsed:.1f} commands/s")
+    reasons = collections.Counter(line.split(' - ', 1)[-1] for line in errors)
+    for reason, count in reasons.most_common():
+        print(f"  {count:5d} x {reason}")
+
+    sent.sort()
+    completions = sorted(t for t, _ in collected)
+    response_latency = [(done - start) / 1e6 for (start, _), done in zip(sent, completions)]
+    if response_latency:
+        print(f"HTTP -> response:  {_percentiles(response_latency)}")
+
+    with open(keylog) as log:
+        keys = sorted(int(line.split()[0]) for line in log if line.strip())
+    key_latency = []
+    for (start, _), done in zip(sent, completions):
+        # Only keystrokes injected before the response belong to this request
+        index = bisect.bisect_left(keys, start)
+        if index < len(keys) and keys[index] <= done:
+            key_latency.append((keys[index] - start) / 1e6)
+    if key_latency and concurrency == 1:
+        print(f"HTTP -> keystroke: {_percentiles(key_latency)}")
+
+
+def esp32_wait_for_response(esp32, collected, timeout=10):
+    """Move the next companion response into collected; False on timeout"""
+    try:
+        collected.append(esp32.responses.get(timeout=timeout))
+        return True
+    except queue.Empty:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ESP32 PC Controller emulator')
+    parser.add_argument('--http-port', type=int, default=8080, help='HTTP port (default: 8080)')
+    parser.add_argument('--sketch', default=SKETCH_PATH, help='Firmware sketch to read routes from')
+    parser.add_argument('--spawn-companion', action='store_true',
+                        help='Start pc_controller.py on the emulated serial port')
+    parser.add_argument('--load-test', type=int, default=0, metavar='N',
+                        help='Send N requests, print latency/throughput and exit')
+    parser.add_argument('--concurrency', type=int, default=1, help='Parallel HTTP clients (default: 1)')
+    parser.add_argument('--route', action='append',
+                        help='Route for the load test, query string becomes the form body '
+                             '(default: /playback/play-pause, may be repeated)')
+    args = parser.parse_args()
+
+    routes = load_routes(args.sketch)
+    esp32 = EmulatedESP32(routes)
+    server = ThreadingHTTPServer(('127.0.0.1', args.http_port), make_handler(esp32))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Emulating {DEVICE_NAME}: {len(routes)} routes on http://127.0.0.1:{args.http_port}")
+    print(f"Serial port for the companion: {esp32.port_name}")
+
+    companion = None
+    keylog = os.path.join(tempfile.mkdtemp(prefix='esp32-emulator-'), 'keys.log')
+    open(keylog, 'w').close()
+    try:
+        if args.spawn_companion:
+            companion = spawn_companion(esp32, keylog)
+            print(f"Companion running (pid {companion.pid})")
+        if args.load_test:
+            run_load_test(esp32, args.http_port, args.route or ['/playback/play-pause'],
+                          args.load_test, max(1, args.concurrency), keylog)
+            return
+        while True:
+            _, line = esp32.responses.get()
+            print(f"PC Response: {line}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        if companion is not None:
+            companion.terminate()
+            companion.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -45,6 +45,9 @@
  * - PLAYBACK_JUMP_TO_END: Jump to video end
  * - PLAYBACK_NEXT_VIDEO: Next video in playlist
  * - PLAYBACK_PREVIOUS_VIDEO: Previous video in playlist
+ * - PLAYBACK_RATE: Set the playback speed (0.25-4, needs the companion's DevTools backend)
+ * - PLAYBACK_VOLUME_SET: Set the video player's own volume (0-100)
+ * - PLAYBACK_STATE: Report position, play state, speed and volume of the video
  * - FULLSCREEN_ENTER: Enter fullscreen mode
  * - FULLSCREEN_EXIT: Exit fullscreen mode
  * - FULLSCREEN_TOGGLE: Toggle fullscreen mode
@@ -60,6 +63,7 @@
  * - VOLUME_SET: Set volume to specific level (25, 50, 75, 100)
  * - BROWSER_TAB_MUTE: Mute browser tab
  * - BROWSER_TAB_UNMUTE: Unmute browser tab
+ * - BROWSER_VOLUME_SET: Set the browser's own volume in the mixer (0-100)
  * - SYSTEM_MUTE_ALL: Mute all system audio
  * - SYSTEM_AUDIO_RESTORE: Restore system audio
  * - CAPTIONS_TOGGLE_ON: Toggle captions on
@@ -91,12 +95,26 @@ const int WOL_PIN = 2;  // GPIO pin for WOL signal (optional)
 // Create AsyncWebServer object on port 80
 AsyncWebServer server(80);
 
+// Persistent connection for the Home Assistant integration: commands in,
+// acknowledgements and state changes pushed out (see handleWsCommand)
+AsyncWebSocket ws("/ws");
+
 // Status tracking
 bool pcAwake = false;
 bool displayOn = false;
 String lastCommand = "None";
 unsigned long lastCommandTime = 0;
 
+// Link health: the companion sends a heartbeat (CLOCK_SYNC) every second.
+// Without one for this long the PC is reported unreachable (pc_link false).
+// Until the first heartbeat pc_link is null (unknown) - a companion started
+// with --heartbeat 0, or one too old to send heartbeats, never marks the
+// entities unavailable
+const unsigned long PC_LINK_TIMEOUT = 3500;
+bool pcLink = false;
+bool heartbeatSeen = false;
+unsigned long lastHeartbeat = 0;
+
 void setup() {
   Serial.begin(SERIAL_BAUD);
   
@@ -132,6 +150,9 @@ void loop() {
     connectToWiFi();
   }
   
+  // Drop WebSocket clients that went away
+  ws.cleanupClients();
+  
   // Check for responses from PC
   if (Serial.available()) {
     String response = Serial.readStringUntil('\n');
@@ -139,6 +160,14 @@ void loop() {
     handlePCResponse(response);
   }
   
+  // Companion gone (process died, PC asleep, cable pulled) - tell Home Assistant
+  if (pcLink && millis() - lastHeartbeat > PC_LINK_TIMEOUT) {
+    pcLink = false;
+    pcAwake = false;
+    Serial.println("PC link lost");
+    ws.textAll(getStateMessage());
+  }
+  
   delay(10);
 }
 
@@ -166,6 +195,9 @@ void connectToWiFi() {
 }
 
 void setupWebServer() {
+  ws.onEvent(onWsEvent);
+  server.addHandler(&ws);
+  
   // Root endpoint - Device info
   server.on("/", HTTP_GET, [](AsyncWebServerRequest *request) {
     String json = getStatusJSON();
@@ -372,6 +404,34 @@ void setupWebServer() {
     request->send(200, "application/json", "{\"status\":\"ok\",\"command\":\"PLAYBACK_PREVIOUS_VIDEO\"}");
   });
   
+  server.on("/playback/rate", HTTP_POST, [](AsyncWebServerRequest *request) {
+    if (request->hasParam("rate", true)) {
+      String rate = request->getParam("rate", true)->value();
+      String cmd = "PLAYBACK_RATE:" + rate;
+      executeCommand(cmd);
+      request->send(200, "application/json", "{\"status\":\"ok\",\"command\":\"PLAYBACK_RATE\",\"rate\":\"" + rate + "\"}");
+    } else {
+      request->send(400, "application/json", "{\"status\":\"error\",\"message\":\"Missing rate parameter\"}");
+    }
+  });
+  
+  server.on("/playback/volume-set", HTTP_POST, [](AsyncWebServerRequest *request) {
+    if (request->hasParam("level", true)) {
+      String level = request->getParam("level", true)->value();
+      String cmd = "PLAYBACK_VOLUME_SET:" + level;
+      executeCommand(cmd);
+      request->send(200, "application/json", "{\"status\":\"ok\",\"command\":\"PLAYBACK_VOLUME_SET\",\"level\":\"" + level + "\"}");
+    } else {
+      request->send(400, "application/json", "{\"status\":\"error\",\"message\":\"Missing level parameter\"}");
+    }
+  });
+  
+  // The answer (STATUS:PLAYBACK_STATE paused, 12.0s/300.0s, ...) is pushed to the integration
+  server.on("/playback/state", HTTP_POST, [](AsyncWebServerRequest *request) {
+    executeCommand("PLAYBACK_STATE");
+    request->send(200, "application/json", "{\"status\":\"ok\",\"command\":\"PLAYBACK_STATE\"}");
+  });
+  
   // Fullscreen & View Mode endpoints
   server.on("/fullscreen/enter", HTTP_POST, [](AsyncWebServerRequest *request) {
     executeCommand("FULLSCREEN_ENTER");
@@ -455,6 +515,17 @@ void setupWebServer() {
     request->send(200, "application/json", "{\"status\":\"ok\",\"command\":\"BROWSER_TAB_UNMUTE\"}");
   });
   
+  server.on("/audio/browser-volume-set", HTTP_POST, [](AsyncWebServerRequest *request) {
+    if (request->hasParam("level", true)) {
+      String level = request->getParam("level", true)->value();
+      String cmd = "BROWSER_VOLUME_SET:" + level;
+      executeCommand(cmd);
+      request->send(200, "application/json", "{\"status\":\"ok\",\"command\":\"BROWSER_VOLUME_SET\",\"level\":\"" + level + "\"}");
+    } else {
+      request->send(400, "application/json", "{\"status\":\"error\",\"message\":\"Missing level parameter\"}");
+    }
+  });
+  
   server.on("/audio/system-mute-all", HTTP_POST, [](AsyncWebServerRequest *request) {
     executeCommand("SYSTEM_MUTE_ALL");
     request->send(200, "application/json", "{\"status\":\"ok\",\"command\":\"SYSTEM_MUTE_ALL\"}");
@@ -573,11 +644,36 @@ void setupWebServer() {
     }
   });
   
+  server.on("/search/netflix", HTTP_POST, [](AsyncWebServerRequest *request) {
+    if (request->hasParam("query", true)) {
+      String query = request->getParam("query", true)->value();
+      executeCommand("SEARCH_NETFLIX:" + query);
+      request->send(200, "application/json", "{\"status\":\"ok\",\"command\":\"SEARCH_NETFLIX\"}");
+    } else {
+      request->send(400, "application/json", "{\"status\":\"error\",\"message\":\"Missing query parameter\"}");
+    }
+  });
+  
+  // Optional query - typed into the site's search box after it is focused
   server.on("/search/current-site", HTTP_POST, [](AsyncWebServerRequest *request) {
-    executeCommand("SEARCH_CURRENT_SITE");
+    if (request->hasParam("query", true)) {
+      executeCommand("SEARCH_CURRENT_SITE:" + escapeText(request->getParam("query", true)->value()));
+    } else {
+      executeCommand("SEARCH_CURRENT_SITE");
+    }
     request->send(200, "application/json", "{\"status\":\"ok\",\"command\":\"SEARCH_CURRENT_SITE\"}");
   });
   
+  // Type text into the focused window (any Unicode; newlines and tabs are sent escaped)
+  server.on("/type", HTTP_POST, [](AsyncWebServerRequest *request) {
+    if (request->hasParam("text", true)) {
+      executeCommand("TYPE_TEXT:" + escapeText(request->getParam("text", true)->value()));
+      request->send(200, "application/json", "{\"status\":\"ok\",\"command\":\"TYPE_TEXT\"}");
+    } else {
+      request->send(400, "application/json", "{\"status\":\"error\",\"message\":\"Missing text parameter\"}");
+    }
+  });
+  
   server.on("/content/youtube-trending", HTTP_POST, [](AsyncWebServerRequest *request) {
     executeCommand("OPEN_YOUTUBE_TRENDING");
     request->send(200, "application/json", "{\"status\":\"ok\",\"command\":\"OPEN_YOUTUBE_TRENDING\"}");
@@ -687,11 +783,32 @@ void setupWebServer() {
     request->send(200, "application/json", "{\"status\":\"ok\",\"command\":\"SMART_EMERGENCY_MUTE\"}");
   });
   
+  // Scene endpoint - the companion runs the whole sequence (see windows_companion/scenes.py)
+  server.on("/scene", HTTP_POST, [](AsyncWebServerRequest *request) {
+    if (request->hasParam("name", true)) {
+      String name = request->getParam("name", true)->value();
+      executeCommand("SCENE:" + name);
+      request->send(200, "application/json", "{\"status\":\"ok\",\"command\":\"SCENE\",\"name\":\"" + name + "\"}");
+    } else {
+      request->send(400, "application/json", "{\"status\":\"error\",\"message\":\"Missing name parameter\"}");
+    }
+  });
+  
   // Generic command endpoint
   server.on("/command", HTTP_POST, [](AsyncWebServerRequest *request) {
     if (request->hasParam("cmd", true)) {
       String cmd = request->getParam("cmd", true)->value();
-      executeCommand(cmd);
+      // Optional freshness window in milliseconds (0 = companion default)
+      unsigned long ttl = 0;
+      if (request->hasParam("ttl", true)) {
+        ttl = request->getParam("ttl", true)->value().toInt();
+      }
+      // Optional trace context "<trace_id>[,<sent_ms>]" (see windows_companion/tracing.py)
+      String trace = "";
+      if (request->hasParam("trace", true)) {
+        trace = request->getParam("trace", true)->value();
+      }
+      executeTracedCommand(cmd, ttl, trace);
       request->send(200, "application/json", "{\"status\":\"ok\",\"command\":\"" + cmd + "\"}");
     } else {
       request->send(400, "application/json", "{\"status\":\"error\",\"message\":\"Missing cmd parameter\"}");
@@ -700,7 +817,61 @@ void setupWebServer() {
 }
 
 void executeCommand(String command) {
-  Serial.println(command);  // Send command to PC via serial
+  executeCommandWithTTL(command, 0);
+}
+
+// Typed text travels on one serial line: escape backslash, newline and tab
+// (the companion undoes this), drop carriage returns
+String escapeText(const String &text) {
+  String escaped;
+  escaped.reserve(text.length() + 8);
+  for (unsigned int i = 0; i < text.length(); i++) {
+    char c = text[i];
+    if (c == '\\') {
+      escaped += "\\\\";
+    } else if (c == '\n') {
+      escaped += "\\n";
+    } else if (c == '\t') {
+      escaped += "\\t";
+    } else if (c != '\r') {
+      escaped += c;
+    }
+  }
+  return escaped;
+}
+
+// Trace context from Home Assistant: hex trace id, optionally ",<epoch ms>" -
+// anything else could break the frame and is left out
+bool validTrace(const String &trace) {
+  if (trace.length() == 0 || trace.length() > 40) {
+    return false;
+  }
+  for (unsigned int i = 0; i < trace.length(); i++) {
+    char c = trace[i];
+    if (!isxdigit(c) && c != ',') {
+      return false;
+    }
+  }
+  return true;
+}
+
+void executeCommandWithTTL(String command, unsigned long ttlMs) {
+  executeTracedCommand(command, ttlMs, "");
+}
+
+void executeTracedCommand(String command, unsigned long ttlMs, String trace) {
+  // Frame: @<millis>[/<ttl_ms>][#<trace_id>[,<sent_ms>]]|COMMAND[:param]
+  // The timestamp lets the companion drop commands that sat in a backlog and
+  // place this hop on the command's trace
+  String frame = "@" + String(millis());
+  if (ttlMs > 0) {
+    frame += "/" + String(ttlMs);
+  }
+  if (validTrace(trace)) {
+    frame += "#" + trace;
+  }
+  frame += "|" + command;
+  Serial.println(frame);  // Send command to PC via serial
   lastCommand = command;
   lastCommandTime = millis();
   
@@ -708,39 +879,139 @@ void executeCommand(String command) {
   Serial.println(command);
 }
 
+void onWsEvent(AsyncWebSocket *socket, AsyncWebSocketClient *client, AwsEventType type,
+               void *arg, uint8_t *data, size_t len) {
+  if (type == WS_EVT_CONNECT) {
+    client->text(getStateMessage());
+  } else if (type == WS_EVT_DATA) {
+    AwsFrameInfo *info = (AwsFrameInfo*)arg;
+    // Commands are text messages that arrive in a single frame and TCP segment -
+    // the integration keeps them under MAX_MESSAGE (1400 bytes, client.py)
+    if (info->final && info->index == 0 && info->len == len && info->opcode == WS_TEXT) {
+      handleWsCommand(client, data, len);
+    }
+  }
+}
+
+// Message: {"id":7,"cmd":"SEARCH_YOUTUBE:lofi","ttl":5000,"trace":"9f2c41d07a3be815,1760870400123"}
+//          (ttl and trace optional)
+// Reply:   {"type":"ack","id":7,"status":"ok","command":"SEARCH_YOUTUBE:lofi"}
+// Pointer: {"ptr":[dx,dy,wheel]} / {"click":"left"} - streamed at up to 120 Hz,
+//          forwarded as bare PTR lines (no timestamp, no ack)
+void handleWsCommand(AsyncWebSocketClient *client, uint8_t *data, size_t len) {
+  // Sized from the message: strings are copied into the pool, and TYPE_TEXT can be long
+  DynamicJsonDocument message(JSON_OBJECT_SIZE(4) + JSON_ARRAY_SIZE(3) + len + 16);
+  DeserializationError error = deserializeJson(message, data, len);
+  if (!error && message.containsKey("ptr")) {
+    JsonArray delta = message["ptr"].as<JsonArray>();
+    Serial.printf("PTR:%d,%d,%d\n", (int)(delta[0] | 0), (int)(delta[1] | 0), (int)(delta[2] | 0));
+    return;
+  }
+  if (!error && message.containsKey("click")) {
+    Serial.print("PTR_CLICK:");
+    Serial.println(message["click"].as<const char*>());
+    return;
+  }
+  DynamicJsonDocument reply(JSON_OBJECT_SIZE(5) + len + 16);
+  reply["type"] = "ack";
+  reply["id"] = message["id"] | 0;
+  if (error || !message.containsKey("cmd")) {
+    reply["status"] = "error";
+    reply["message"] = "Missing cmd";
+  } else {
+    String cmd = message["cmd"].as<String>();
+    executeTracedCommand(cmd, message["ttl"] | 0UL, message["trace"] | "");
+    reply["status"] = "ok";
+    reply["command"] = cmd;
+  }
+  String output;
+  serializeJson(reply, output);
+  client->text(output);
+}
+
 void handlePCResponse(String response) {
+  // Heartbeat from the companion: answer with millis() at once (CLOCK:<seq>,<millis>,
+  // also its clock probe for tracing) - not a response, so it isn't logged or pushed
+  if (response.startsWith("CLOCK_SYNC:")) {
+    Serial.println("CLOCK:" + response.substring(11) + "," + String(millis()));
+    lastHeartbeat = millis();
+    heartbeatSeen = true;
+    if (!pcLink) {
+      // The companion only runs while the PC is awake
+      pcLink = true;
+      pcAwake = true;
+      ws.textAll(getStateMessage());
+    }
+    return;
+  }
+  
   Serial.print("PC Response: ");
   Serial.println(response);
+  bool wasAwake = pcAwake;
+  bool wasDisplayOn = displayOn;
   
-  // Parse status updates from PC
+  // Parse status updates from PC - only lines that start with the state, so
+  // e.g. "STATUS:SCHEDULE set, timer 2 in 10m: DISPLAY_OFF" changes nothing
   if (response.startsWith("STATUS:")) {
     // Handle status updates
-    if (response.indexOf("PC_AWAKE") >= 0) {
+    if (response.startsWith("STATUS:PC_AWAKE")) {
       pcAwake = true;
-    } else if (response.indexOf("PC_ASLEEP") >= 0) {
+    } else if (response.startsWith("STATUS:PC_ASLEEP")) {
       pcAwake = false;
     }
     
-    if (response.indexOf("DISPLAY_ON") >= 0) {
+    if (response.startsWith("STATUS:DISPLAY_ON")) {
       displayOn = true;
-    } else if (response.indexOf("DISPLAY_OFF") >= 0) {
+    } else if (response.startsWith("STATUS:DISPLAY_OFF")) {
       displayOn = false;
     }
   }
+  
+  // Push to the Home Assistant integration instead of waiting for a poll
+  if (ws.count() > 0) {
+    // Sized from the line - METRICS, SCHEDULE_LIST and ALL_WINDOWS replies outgrow a fixed pool
+    DynamicJsonDocument doc(JSON_OBJECT_SIZE(2) + response.length() + 1);
+    doc["type"] = "pc";
+    doc["line"] = response;
+    String output;
+    serializeJson(doc, output);
+    ws.textAll(output);
+    if (pcAwake != wasAwake || displayOn != wasDisplayOn) {
+      ws.textAll(getStateMessage());
+    }
+  }
 }
 
-String getStatusJSON() {
-  StaticJsonDocument<512> doc;
-  
+void fillStatus(JsonDocument &doc) {
   doc["device"] = DEVICE_NAME;
   doc["ip"] = WiFi.localIP().toString();
   doc["mac"] = WiFi.macAddress();
   doc["uptime"] = millis() / 1000;
   doc["wifi_rssi"] = WiFi.RSSI();
   doc["pc_awake"] = pcAwake;
+  if (heartbeatSeen) {
+    doc["pc_link"] = pcLink;
+  } else {
+    doc["pc_link"] = nullptr;
+  }
   doc["display_on"] = displayOn;
   doc["last_command"] = lastCommand;
   doc["last_command_time"] = lastCommandTime / 1000;
+}
+
+String getStatusJSON() {
+  StaticJsonDocument<512> doc;
+  fillStatus(doc);
+  
+  String output;
+  serializeJson(doc, output);
+  return output;
+}
+
+String getStateMessage() {
+  StaticJsonDocument<512> doc;
+  doc["type"] = "state";
+  fillStatus(doc);
   
   String output;
   serializeJson(doc, output);
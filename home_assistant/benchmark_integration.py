@@ -0,0 +1,148 @@
+"""
+Command latency: rest_command vs the pc_controller integration
+
+Runs a mock ESP32 controller locally and sends the same commands three ways:
+
+- rest:       what rest_command does - resolve the host name and open a new
+              HTTP connection for every command (ESPAsyncWebServer closes it
+              after each response)
+- pooled:     HTTP with the address resolved once and keep-alive requested;
+              the controller still closes every connection
+- websocket:  the integration's ControllerClient - one persistent WebSocket,
+              commands acknowledged over it
+
+mDNS lookups of esp32-pc-controller.local typically take tens of milliseconds
+on a home network and nothing on localhost; --resolve-ms adds that cost to
+every lookup.
+
+    python benchmark_integration.py
+    python benchmark_integration.py --count 500 --resolve-ms 20
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+import aiohttp
+from aiohttp import web
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'custom_components', 'pc_controller'))
+from client import ControllerClient  # noqa: E402
+
+
+def mock_controller():
+    """aiohttp app answering like the ESP32 firmware: POST /<command>, GET /status, /ws"""
+    state = {'type': 'state', 'device': 'mock', 'pc_awake': True, 'display_on': True,
+             'last_command': '', 'last_command_time': 0}
+
+    async def command(request):
+        state['last_command'] = request.match_info['command'].upper()
+        body = json.dumps({'status': 'ok', 'command': state['last_command']})
+        return web.Response(text=body, content_type='application/json', headers={'Connection': 'close'})
+
+    async def status(request):
+        return web.json_response({k: v for k, v in state.items() if k != 'type'},
+                                 headers={'Connection': 'close'})
+
+    async def websocket(request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        await ws.send_str(json.dumps(state))
+        async for message in ws:
+            if message.type != aiohttp.WSMsgType.TEXT:
+                continue
+            data = json.loads(message.data)
+            state['last_command'] = data['cmd']
+            await ws.send_str(json.dumps({'type': 'ack', 'id': data['id'], 'status': 'ok',
+                                          'command': data['cmd']}))
+        return ws
+
+    app = web.Application()
+    app.router.add_get('/ws', websocket)
+    app.router.add_get('/status', status)
+    app.router.add_post('/{command}', command)
+    return app
+
+
+def make_resolver(delay):
+    async def resolve(host):
+        if delay:
+            await asyncio.sleep(delay)
+        return '127.0.0.1'
+    return resolve
+
+
+async def run_rest(port, commands, resolve):
+    timings = []
+    for command in commands:
+        started = time.perf_counter()
+        address = await resolve('esp32-pc-controller.local')
+        async with aiohttp.ClientSession() as session:
+            async with session.post(f"http://{address}:{port}/{command.lower()}") as response:
+                await response.read()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+async def run_pooled(port, commands, resolve):
+    timings = []
+    address = await resolve('esp32-pc-controller.local')
+    async with aiohttp.ClientSession() as session:
+        for command in commands:
+            started = time.perf_counter()
+            async with session.post(f"http://{address}:{port}/{command.lower()}") as response:
+                await response.read()
+            timings.append(time.perf_counter() - started)
+    return timings
+
+
+async def run_websocket(port, commands, resolve):
+    timings = []
+    async with aiohttp.ClientSession() as session:
+        client = ControllerClient(session, 'esp32-pc-controller.local', port, resolve=resolve)
+        task = asyncio.create_task(client.run())
+        for command in commands:
+            started = time.perf_counter()
+            await client.send(command)
+            timings.append(time.perf_counter() - started)
+        await client.close()
+        await task
+    return timings
+
+
+def report(name, timings, total):
+    ms = sorted(t * 1000 for t in timings)
+    p95 = ms[min(int(len(ms) * 0.95), len(ms) - 1)]
+    print(f"{name:<10} mean {statistics.mean(ms):7.2f} ms  p50 {statistics.median(ms):7.2f} ms  "
+          f"p95 {p95:7.2f} ms  {len(ms) / total:8.0f} cmd/s")
+
+
+async def main(args):
+    runner = web.AppRunner(mock_controller())
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', args.port)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    resolve = make_resolver(args.resolve_ms / 1000)
+    commands = ['PLAYBACK_PLAY_PAUSE', 'VOLUME_UP', 'PLAYBACK_SEEK_FORWARD_SMALL'] * (args.count // 3 + 1)
+    commands = commands[:args.count]
+    print(f"{args.count} commands, {args.resolve_ms:g} ms per host lookup")
+    try:
+        for name, run in (('rest', run_rest), ('pooled', run_pooled), ('websocket', run_websocket)):
+            started = time.perf_counter()
+            timings = await run(port, commands, resolve)
+            report(name, timings, time.perf_counter() - started)
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare rest_command and integration latency')
+    parser.add_argument('--count', type=int, default=300, help='Commands per method (default: 300)')
+    parser.add_argument('--resolve-ms', type=float, default=0, help='Simulated host lookup time (default: 0)')
+    parser.add_argument('--port', type=int, default=0, help='Mock controller port (default: any free port)')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,113 @@
+"""
+PC Controller integration
+
+Talks to the ESP32 PC Controller over one persistent WebSocket (client.py)
+instead of a rest_command per action. configuration.yaml:
+
+    pc_controller:
+      host: esp32-pc-controller.local
+
+Every controller command becomes a service (pc_controller.playback_play_pause,
+pc_controller.search_youtube with `query`, ...), plus pc_controller.send_command
+for anything else. A media_player and PC / display switches follow the state
+the controller pushes.
+"""
+
+import logging
+
+import voluptuous as vol
+
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP, Platform
+from homeassistant.core import HomeAssistant, ServiceCall
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.discovery import async_load_platform
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.typing import ConfigType
+
+from .client import ControllerClient, ControllerError, escape_text
+from .const import (
+    COMMANDS,
+    CONF_HOST,
+    CONF_PORT,
+    DEFAULT_HOST,
+    DEFAULT_PORT,
+    DOMAIN,
+    OPTIONAL_PARAM_COMMANDS,
+    PARAM_COMMANDS,
+    SIGNAL_STATE,
+    TEXT_COMMANDS,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+PLATFORMS = (Platform.MEDIA_PLAYER, Platform.SWITCH)
+
+CONFIG_SCHEMA = vol.Schema(
+    {
+        DOMAIN: vol.Schema(
+            {
+                vol.Optional(CONF_HOST, default=DEFAULT_HOST): cv.string,
+                vol.Optional(CONF_PORT, default=DEFAULT_PORT): cv.port,
+            }
+        )
+    },
+    extra=vol.ALLOW_EXTRA,
+)
+
+SEND_COMMAND_SCHEMA = vol.Schema(
+    {
+        vol.Required("command"): cv.string,
+        vol.Optional("param"): cv.string,
+        vol.Optional("ttl"): vol.All(vol.Coerce(int), vol.Range(min=0)),
+    }
+)
+
+
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Connect to the controller and register its services and entities"""
+    conf = config[DOMAIN]
+    client = ControllerClient(async_get_clientsession(hass), conf[CONF_HOST], conf[CONF_PORT])
+    hass.data[DOMAIN] = client
+    client.add_listener(lambda message: async_dispatcher_send(hass, SIGNAL_STATE, message))
+    hass.async_create_background_task(client.run(), f"{DOMAIN} connection")
+
+    async def close(event):
+        await client.close()
+
+    hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, close)
+
+    async def send(command, param=None, ttl=None):
+        try:
+            await client.send(command, param, ttl)
+        except ControllerError as err:
+            raise HomeAssistantError(f"{command} failed: {err}") from err
+
+    async def handle_send_command(call: ServiceCall) -> None:
+        await send(call.data["command"].upper(), call.data.get("param"), call.data.get("ttl"))
+
+    hass.services.async_register(DOMAIN, "send_command", handle_send_command, schema=SEND_COMMAND_SCHEMA)
+
+    def register(command, field=None, required=True):
+        async def handle(call: ServiceCall) -> None:
+            param = call.data.get(field) if field else None
+            if param and command in TEXT_COMMANDS:
+                param = escape_text(param)
+            await send(command, param, call.data.get("ttl"))
+
+        schema = {vol.Optional("ttl"): vol.All(vol.Coerce(int), vol.Range(min=0))}
+        if field:
+            schema[(vol.Required if required else vol.Optional)(field)] = cv.string
+        hass.services.async_register(DOMAIN, command.lower(), handle, schema=vol.Schema(schema))
+
+    for command in COMMANDS:
+        register(command)
+    for command, field in PARAM_COMMANDS.items():
+        register(command, field)
+    for command, field in OPTIONAL_PARAM_COMMANDS.items():
+        register(command, field, required=False)
+
+    for platform in PLATFORMS:
+        hass.async_create_task(async_load_platform(hass, platform, DOMAIN, {}, config))
+    return True
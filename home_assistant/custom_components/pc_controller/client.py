@@ -0,0 +1,183 @@
+"""
+Persistent connection to the ESP32 PC Controller
+
+One WebSocket (/ws on the ESP32) carries every command and the state the
+controller pushes, instead of an mDNS lookup and a new TCP connection per
+rest_command call. The host name is resolved once and the address reused
+until a connection fails. This module only needs aiohttp, so it can be used
+and benchmarked outside Home Assistant.
+
+Protocol (JSON text messages):
+    -> {"id": 7, "cmd": "SEARCH_YOUTUBE:lofi", "ttl": 5000, "trace": "9f2c41d07a3be815,1760870400123"}
+    <- {"type": "ack", "id": 7, "status": "ok", "command": "SEARCH_YOUTUBE:lofi"}
+    <- {"type": "state", "pc_awake": true, "display_on": false, ...}
+    <- {"type": "pc", "line": "STATUS:PLAYBACK_PLAY_PAUSE executed (YouTube)"}
+
+Listeners also get {"type": "connection", "connected": bool} locally when the
+WebSocket opens or drops.
+
+Every command carries trace context - a random id and the send time in epoch
+milliseconds - which the ESP32 forwards to the companion, so a laggy command
+can be followed to the keystroke (pc_controller.py --trace, trace_view.py).
+The id is logged at debug level with the acknowledgement time.
+"""
+
+import asyncio
+import json
+import logging
+import secrets
+import socket
+import time
+
+import aiohttp
+
+_LOGGER = logging.getLogger(__name__)
+
+# Seconds to wait for a command acknowledgement
+ACK_TIMEOUT = 5.0
+# Reconnect backoff (seconds), doubled per failed attempt
+RECONNECT_MIN = 1.0
+RECONNECT_MAX = 30.0
+# WebSocket ping interval (seconds) - detects a controller that dropped off the network
+HEARTBEAT = 30.0
+# Longest command message in bytes - the ESP32 only takes messages that arrive in one TCP segment
+MAX_MESSAGE = 1400
+
+
+def escape_text(text):
+    """Escape typed text (TYPE_TEXT, SEARCH_CURRENT_SITE) so it stays on one serial line"""
+    return text.replace('\\', '\\\\').replace('\r', '').replace('\n', '\\n').replace('\t', '\\t')
+
+
+class ControllerError(Exception):
+    """The controller could not be reached or rejected a command"""
+
+
+class ControllerClient:
+    """Keeps one WebSocket to the controller open and sends commands over it"""
+
+    def __init__(self, session, host, port=80, resolve=None):
+        self.session = session
+        self.host = host
+        self.port = port
+        self.state = {}  # Last state pushed by the controller
+        self.connected = False
+        self._resolve = resolve or self._getaddrinfo
+        self._address = None  # Cached resolved address
+        self._ws = None
+        self._next_id = 0
+        self._pending = {}  # id -> Future of the acknowledgement
+        self._listeners = []
+        self._connected_event = asyncio.Event()
+        self._closing = False
+
+    def add_listener(self, callback):
+        """Call callback(message) for every pushed and connection message; returns a remover"""
+        self._listeners.append(callback)
+        return lambda: self._listeners.remove(callback)
+
+    async def _getaddrinfo(self, host):
+        loop = asyncio.get_running_loop()
+        infos = await loop.getaddrinfo(host, self.port, type=socket.SOCK_STREAM)
+        return infos[0][4][0]
+
+    async def _connect(self):
+        if self._address is None:
+            self._address = await self._resolve(self.host)
+        host = f"[{self._address}]" if ':' in self._address else self._address
+        self._ws = await self.session.ws_connect(f"http://{host}:{self.port}/ws", heartbeat=HEARTBEAT)
+        self.connected = True
+        self._connected_event.set()
+        _LOGGER.debug("Connected to %s (%s)", self.host, self._address)
+        self._notify({'type': 'connection', 'connected': True})
+
+    async def run(self):
+        """Connect and read messages until close(), reconnecting with backoff"""
+        delay = RECONNECT_MIN
+        while not self._closing:
+            try:
+                await self._connect()
+                delay = RECONNECT_MIN
+                async for message in self._ws:
+                    if message.type == aiohttp.WSMsgType.TEXT:
+                        self._handle(message.data)
+                    elif message.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                        break
+            except (aiohttp.ClientError, OSError, asyncio.TimeoutError) as err:
+                _LOGGER.debug("Connection to %s failed: %s", self.host, err)
+                self._address = None  # The controller may have a new address
+            finally:
+                self._disconnected()
+            if self._closing:
+                break
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX)
+
+    def _notify(self, message):
+        for listener in list(self._listeners):
+            listener(message)
+
+    def _disconnected(self):
+        was_connected = self.connected
+        self.connected = False
+        self._connected_event.clear()
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ControllerError("connection lost"))
+        self._pending.clear()
+        if was_connected:
+            self._notify({'type': 'connection', 'connected': False})
+
+    def _handle(self, data):
+        try:
+            message = json.loads(data)
+        except ValueError:
+            return
+        kind = message.get('type')
+        if kind == 'ack':
+            future = self._pending.pop(message.get('id'), None)
+            if future is not None and not future.done():
+                future.set_result(message)
+            return
+        if kind == 'state':
+            self.state = message
+        self._notify(message)
+
+    async def send(self, command, param=None, ttl=None, timeout=ACK_TIMEOUT):
+        """Send a command and wait for the controller's acknowledgement (which gets the trace id)"""
+        try:
+            await asyncio.wait_for(self._connected_event.wait(), timeout)
+        except asyncio.TimeoutError:
+            raise ControllerError(f"not connected to {self.host}") from None
+        self._next_id += 1
+        message_id = self._next_id
+        message = {'id': message_id, 'cmd': f"{command}:{param}" if param is not None else command}
+        if ttl:
+            message['ttl'] = int(ttl)
+        trace_id = secrets.token_hex(8)
+        sent = time.time()
+        message['trace'] = f"{trace_id},{int(sent * 1000)}"
+        data = json.dumps(message)
+        if len(data.encode('utf-8')) > MAX_MESSAGE:
+            raise ControllerError(f"{command} too long for the controller ({MAX_MESSAGE} bytes per message)")
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message_id] = future
+        try:
+            await self._ws.send_str(data)
+            reply = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise ControllerError(f"{command} not acknowledged") from None
+        except (aiohttp.ClientError, ConnectionResetError) as err:
+            raise ControllerError(str(err)) from err
+        finally:
+            self._pending.pop(message_id, None)
+        _LOGGER.debug("%s acknowledged in %.1f ms (trace %s)", command, (time.time() - sent) * 1000, trace_id)
+        if reply.get('status') != 'ok':
+            raise ControllerError(reply.get('message', f"{command} rejected"))
+        reply['trace'] = trace_id
+        return reply
+
+    async def close(self):
+        self._closing = True
+        if self._ws is not None:
+            await self._ws.close()
@@ -0,0 +1,66 @@
+"""Constants for the PC Controller integration"""
+
+DOMAIN = "pc_controller"
+
+CONF_HOST = "host"
+CONF_PORT = "port"
+DEFAULT_HOST = "esp32-pc-controller.local"
+DEFAULT_PORT = 80
+
+# Dispatcher signal sent when the controller pushes new state
+SIGNAL_STATE = f"{DOMAIN}_state"
+
+# Commands without a parameter - each is registered as pc_controller.<command in lowercase>
+COMMANDS = (
+    'PC_WAKE', 'PC_SLEEP', 'DISPLAY_ON', 'DISPLAY_OFF', 'BROWSER_FOCUS', 'BROWSER_MOVE_TV',
+    'BROWSER_MAXIMIZE', 'BROWSER_MINIMIZE', 'BROWSER_CLOSE', 'BROWSER_RESTORE',
+    'BROWSER_OPEN_CHROME', 'BROWSER_OPEN_FIREFOX', 'BROWSER_OPEN_EDGE', 'BROWSER_NEW_TAB',
+    'BROWSER_CLOSE_TAB', 'BROWSER_NEXT_TAB', 'BROWSER_PREV_TAB', 'BROWSER_RELOAD',
+    'BROWSER_HARD_RELOAD', 'BROWSER_HOME', 'BROWSER_OPEN_YOUTUBE', 'BROWSER_OPEN_HULU',
+    'PLAYBACK_PLAY', 'PLAYBACK_PAUSE', 'PLAYBACK_PLAY_PAUSE', 'PLAYBACK_STOP', 'PLAYBACK_RESTART',
+    'PLAYBACK_SEEK_FORWARD_SMALL', 'PLAYBACK_SEEK_BACKWARD_SMALL', 'PLAYBACK_SEEK_FORWARD_LARGE',
+    'PLAYBACK_SEEK_BACKWARD_LARGE', 'PLAYBACK_JUMP_TO_BEGINNING', 'PLAYBACK_JUMP_TO_END',
+    'PLAYBACK_NEXT_VIDEO', 'PLAYBACK_PREVIOUS_VIDEO', 'PLAYBACK_STATE', 'FULLSCREEN_ENTER', 'FULLSCREEN_EXIT',
+    'FULLSCREEN_TOGGLE', 'THEATER_MODE', 'THEATER_MODE_EXIT', 'PICTURE_IN_PICTURE_ENTER',
+    'PICTURE_IN_PICTURE_EXIT', 'VOLUME_UP', 'VOLUME_DOWN', 'MUTE_AUDIO', 'UNMUTE_AUDIO',
+    'TOGGLE_MUTE', 'BROWSER_TAB_MUTE', 'BROWSER_TAB_UNMUTE', 'SYSTEM_MUTE_ALL',
+    'SYSTEM_AUDIO_RESTORE', 'CAPTIONS_TOGGLE_ON', 'CAPTIONS_TOGGLE_OFF', 'CAPTIONS_CYCLE_LANGUAGE',
+    'CAPTIONS_SIZE_INCREASE', 'CAPTIONS_SIZE_DECREASE', 'NAV_SELECT_ELEMENT', 'NAV_BACK',
+    'NAV_FORWARD', 'NAV_EXIT_MENU', 'NAV_SCROLL_UP', 'NAV_SCROLL_DOWN', 'NAV_PAGE_UP',
+    'NAV_PAGE_DOWN', 'NAV_FOCUS_SEARCH', 'NAV_CLEAR_SEARCH', 'NAV_SUBMIT_SEARCH',
+    'NAV_TAB_FORWARD', 'OPEN_YOUTUBE_TRENDING', 'OPEN_YOUTUBE_SUBSCRIPTIONS',
+    'OPEN_HULU_WATCHLIST', 'OPEN_YOUTUBE_HISTORY', 'OPEN_NETFLIX_HOME', 'YOUTUBE_LIKE',
+    'YOUTUBE_DISLIKE', 'YOUTUBE_SUBSCRIBE', 'SKIP_BUTTON_ACTION', 'BROWSER_MOVE_MONITOR_1', 'BROWSER_MOVE_MONITOR_2', 'FOCUS_ASSIST_ENABLE',
+    'FOCUS_ASSIST_DISABLE', 'PREVENT_SLEEP', 'ALLOW_SLEEP', 'SMART_SHOW_SOMETHING',
+    'SMART_CONTINUE_LAST', 'SMART_FIND_ELSE', 'SMART_THATS_ENOUGH', 'SMART_KILL_PLAYBACK',
+    'SMART_EMERGENCY_MUTE', 'LAYOUT_LIST', 'SCHEDULE_LIST',
+)
+
+# Commands that take a parameter -> service field name
+PARAM_COMMANDS = {
+    'BROWSER_OPEN_URL': 'url',
+    'VOLUME_SET': 'level',
+    'BROWSER_VOLUME_SET': 'level',
+    'PLAYBACK_RATE': 'rate',
+    'PLAYBACK_VOLUME_SET': 'level',
+    'SEARCH_YOUTUBE': 'query',
+    'SEARCH_HULU': 'query',
+    'SEARCH_NETFLIX': 'query',
+    'SCENE': 'name',
+    'TYPE_TEXT': 'text',
+    'SCHEDULE': 'timer',
+    'SCHEDULE_EVERY': 'timer',
+    'SCHEDULE_CANCEL': 'timer',
+    'LAYOUT': 'name',
+    'LAYOUT_SAVE': 'name',
+    'LAYOUT_DELETE': 'name',
+    'ALL_WINDOWS': 'command',
+}
+
+# Commands whose parameter may be left out -> service field name
+OPTIONAL_PARAM_COMMANDS = {
+    'SEARCH_CURRENT_SITE': 'query',
+}
+
+# Commands whose parameter is typed text - newlines and tabs are escaped for the serial line
+TEXT_COMMANDS = ('TYPE_TEXT', 'SEARCH_CURRENT_SITE')
@@ -0,0 +1,139 @@
+"""The PC's browser as a media player, following the state the controller pushes"""
+
+from homeassistant.components.media_player import (
+    MediaPlayerEntity,
+    MediaPlayerEntityFeature,
+    MediaPlayerState,
+)
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.typing import ConfigType, DiscoveryInfoType
+
+from .const import DOMAIN, SIGNAL_STATE
+
+SUPPORTED_FEATURES = (
+    MediaPlayerEntityFeature.PLAY
+    | MediaPlayerEntityFeature.PAUSE
+    | MediaPlayerEntityFeature.STOP
+    | MediaPlayerEntityFeature.NEXT_TRACK
+    | MediaPlayerEntityFeature.PREVIOUS_TRACK
+    | MediaPlayerEntityFeature.VOLUME_STEP
+    | MediaPlayerEntityFeature.VOLUME_SET
+    | MediaPlayerEntityFeature.VOLUME_MUTE
+    | MediaPlayerEntityFeature.TURN_ON
+    | MediaPlayerEntityFeature.TURN_OFF
+)
+
+
+async def async_setup_platform(
+    hass: HomeAssistant,
+    config: ConfigType,
+    async_add_entities: AddEntitiesCallback,
+    discovery_info: DiscoveryInfoType | None = None,
+) -> None:
+    if discovery_info is None:
+        return
+    async_add_entities([PCControllerMediaPlayer(hass.data[DOMAIN])])
+
+
+class PCControllerMediaPlayer(MediaPlayerEntity):
+    """Playback keys for the browser; on/off follows the PC and its display"""
+
+    _attr_should_poll = False
+    _attr_name = "PC Browser"
+    _attr_unique_id = f"{DOMAIN}_media_player"
+    _attr_supported_features = SUPPORTED_FEATURES
+
+    def __init__(self, client):
+        self._client = client
+        self._playing = None  # Last play/pause sent, or reported by the companion's DevTools backend
+        self._muted = None  # Last mute/unmute sent
+
+    async def async_added_to_hass(self) -> None:
+        self.async_on_remove(async_dispatcher_connect(self.hass, SIGNAL_STATE, self._pushed))
+
+    @callback
+    def _pushed(self, message):
+        line = (message.get("line") or "") if message.get("type") == "pc" else ""
+        # With CDP the companion reports the video itself: "STATUS:PLAYBACK_STATE paused, 12.0s/300.0s"
+        # or "STATUS:PLAYBACK_PAUSE executed via CDP (paused, ...)"
+        if line.startswith("STATUS:PLAYBACK_"):
+            if line.startswith("STATUS:PLAYBACK_STATE "):
+                video = line[len("STATUS:PLAYBACK_STATE "):]
+            else:
+                video = line.partition(" via CDP (")[2]
+            if video.startswith(("playing", "paused")):
+                self._playing = video.startswith("playing")
+        self.async_write_ha_state()
+
+    @property
+    def available(self) -> bool:
+        # The companion stopped answering heartbeats - nothing can reach the browser
+        # (None: no heartbeat seen yet, e.g. --heartbeat 0 - not a reason to give up)
+        if self._client.state.get("pc_link") is False:
+            return False
+        return self._client.connected
+
+    @property
+    def state(self) -> MediaPlayerState | None:
+        state = self._client.state
+        if not state.get("pc_awake"):
+            return MediaPlayerState.OFF
+        if not state.get("display_on"):
+            return MediaPlayerState.IDLE
+        if self._playing is None:
+            return MediaPlayerState.ON
+        return MediaPlayerState.PLAYING if self._playing else MediaPlayerState.PAUSED
+
+    @property
+    def is_volume_muted(self) -> bool | None:
+        return self._muted
+
+    @property
+    def extra_state_attributes(self):
+        return {"last_command": self._client.state.get("last_command")}
+
+    async def _send(self, command, playing=None):
+        await self._client.send(command)
+        if playing is not None:
+            self._playing = playing
+            self.async_write_ha_state()
+
+    async def async_media_play(self) -> None:
+        await self._send("PLAYBACK_PLAY", True)
+
+    async def async_media_pause(self) -> None:
+        await self._send("PLAYBACK_PAUSE", False)
+
+    async def async_media_stop(self) -> None:
+        await self._send("PLAYBACK_STOP", False)
+
+    async def async_media_next_track(self) -> None:
+        await self._send("PLAYBACK_NEXT_VIDEO")
+
+    async def async_media_previous_track(self) -> None:
+        await self._send("PLAYBACK_PREVIOUS_VIDEO")
+
+    async def async_volume_up(self) -> None:
+        await self._send("VOLUME_UP")
+
+    async def async_volume_down(self) -> None:
+        await self._send("VOLUME_DOWN")
+
+    async def async_set_volume_level(self, volume: float) -> None:
+        await self._client.send("PLAYBACK_VOLUME_SET", str(round(volume * 100)))
+
+    async def async_mute_volume(self, mute: bool) -> None:
+        # MUTE_AUDIO and UNMUTE_AUDIO both press the Windows mute key, which toggles;
+        # the tab commands set the state through DevTools or the browser's audio sessions
+        await self._client.send("BROWSER_TAB_MUTE" if mute else "BROWSER_TAB_UNMUTE")
+        self._muted = mute
+        self.async_write_ha_state()
+
+    async def async_turn_on(self) -> None:
+        await self._send("PC_WAKE")
+        await self._send("DISPLAY_ON")
+
+    async def async_turn_off(self) -> None:
+        await self._send("DISPLAY_OFF", False)
@@ -0,0 +1,68 @@
+"""PC power and display switches, following the state the controller pushes"""
+
+from homeassistant.components.switch import SwitchEntity
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.typing import ConfigType, DiscoveryInfoType
+
+from .const import DOMAIN, SIGNAL_STATE
+
+# key in the pushed state, name, icon, command to turn on, command to turn off,
+# whether it needs the companion (pc_link) - the PC switch can still wake the PC
+SWITCHES = (
+    ("pc_awake", "PC", "mdi:desktop-tower", "PC_WAKE", "PC_SLEEP", False),
+    ("display_on", "PC Display", "mdi:monitor", "DISPLAY_ON", "DISPLAY_OFF", True),
+)
+
+
+async def async_setup_platform(
+    hass: HomeAssistant,
+    config: ConfigType,
+    async_add_entities: AddEntitiesCallback,
+    discovery_info: DiscoveryInfoType | None = None,
+) -> None:
+    if discovery_info is None:
+        return
+    client = hass.data[DOMAIN]
+    async_add_entities(PCControllerSwitch(client, *switch) for switch in SWITCHES)
+
+
+class PCControllerSwitch(SwitchEntity):
+    """A controller state that can be switched with a pair of commands"""
+
+    _attr_should_poll = False
+
+    def __init__(self, client, key, name, icon, on_command, off_command, needs_link):
+        self._client = client
+        self._key = key
+        self._needs_link = needs_link
+        self._on_command = on_command
+        self._off_command = off_command
+        self._attr_name = name
+        self._attr_icon = icon
+        self._attr_unique_id = f"{DOMAIN}_{key}"
+
+    async def async_added_to_hass(self) -> None:
+        self.async_on_remove(async_dispatcher_connect(self.hass, SIGNAL_STATE, self._pushed))
+
+    @callback
+    def _pushed(self, message):
+        if message.get("type") in ("state", "connection"):
+            self.async_write_ha_state()
+
+    @property
+    def available(self) -> bool:
+        if self._needs_link and self._client.state.get("pc_link") is False:
+            return False
+        return self._client.connected
+
+    @property
+    def is_on(self) -> bool | None:
+        return self._client.state.get(self._key)
+
+    async def async_turn_on(self, **kwargs) -> None:
+        await self._client.send(self._on_command)
+
+    async def async_turn_off(self, **kwargs) -> None:
+        await self._client.send(self._off_command)
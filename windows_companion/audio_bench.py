@@ -0,0 +1,127 @@
+"""
+Audio session control check on the fake mixer
+
+Drives AudioSessionManager against fake_backend's FakeAudioMixer (a fresh
+mixer per check) and checks the session state after each step:
+
+- mute_all() then restore() unmutes only the sessions mute_all() muted - a
+  session the user had muted stays muted
+- a mute and volume set for a process without a session are applied when its
+  session is created later
+- after an output device change (a device with new sessions for the same
+  processes), the next command enumerates again and the mute and volume set
+  earlier are applied to the new sessions
+
+Then times set_mute and set_volume on N sessions: the sessions are enumerated
+once, every later command works on the cache. Exits with 1 on any mismatch or
+when a timed command enumerated again.
+
+    python audio_bench.py                          # 200 sessions, 1000 commands
+    python audio_bench.py --sessions 2000 --commands 10000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+os.environ['PC_CONTROLLER_FAKE_BACKEND'] = '1'  # Fake mixer and process names
+
+from audio_sessions import AudioSessionManager  # noqa: E402 - needs the environment above
+from fake_backend import FakeAudioMixer, FakeAudioSession, desktop  # noqa: E402
+
+# Pids of the fake processes (desktop.processes: 4101 chrome.exe, 4300 Spotify.exe)
+CHROME, SPOTIFY, EDGE = 4101, 4300, 4600
+# First pid of the timed sessions
+BENCH_PID = 20000
+
+
+def check_restore(failures):
+    """restore() leaves a session muted before mute_all() muted"""
+    mixer = FakeAudioMixer()
+    manager = AudioSessionManager(mixer)
+    mixer.session(SPOTIFY).muted = True  # Muted by the user in the mixer
+    muted = manager.mute_all()
+    everything = all(session.muted for session in mixer.active)
+    unmuted = manager.restore()
+    ok = (muted == 2 and everything and unmuted == 2 and mixer.session(SPOTIFY).muted
+          and not mixer.session(CHROME).muted and not mixer.session(0).muted)
+    report(failures, 'mute_all/restore', ok,
+           f"{muted} muted, {unmuted} unmuted, Spotify {'muted' if mixer.session(SPOTIFY).muted else 'unmuted'}")
+
+
+def check_pending(failures):
+    """A mute and volume for a process without a session wait for its session"""
+    mixer = FakeAudioMixer()
+    manager = AudioSessionManager(mixer)
+    desktop.processes[EDGE] = 'msedge.exe'
+    changed = manager.set_mute('msedge.exe', True) + manager.set_volume('msedge.exe', 0.4)
+    session = mixer.start_session(EDGE)
+    ok = changed == 0 and session.muted and session.volume == 0.4 and manager.created == 1
+    report(failures, 'pending mute', ok,
+           f"{changed} changed at once, new session {'muted' if session.muted else 'unmuted'} at {session.volume:g}")
+
+
+def check_device_change(failures):
+    """A device change re-enumerates on the next command and re-applies the settings"""
+    mixer = FakeAudioMixer()
+    manager = AudioSessionManager(mixer)
+    manager.set_mute('chrome.exe', True)
+    manager.set_volume('spotify.exe', 0.3)
+    chrome, spotify = mixer.add_device([CHROME, SPOTIFY])  # HDMI plugged in
+    waiting = not chrome.muted and spotify.volume == 1.0  # Only flagged until the next command
+    manager.set_mute('notepad.exe', False)
+    ok = (waiting and chrome.muted and spotify.volume == 0.3 and not spotify.muted
+          and manager.enumerations == 2 and manager.device_changes == 1)
+    report(failures, 'device change', ok,
+           f"new Chrome session {'muted' if chrome.muted else 'unmuted'}, new Spotify session at "
+           f"{spotify.volume:g}, {manager.enumerations} enumerations")
+
+
+def report(failures, name, ok, detail):
+    print(f"{'ok  ' if ok else 'FAIL'} {name:<18} {detail}")
+    if not ok:
+        failures.append(f"{name}: {detail}")
+
+
+def bench(failures, sessions, commands, processes=10):
+    """Time set_mute/set_volume on `sessions` sessions spread over `processes` executables"""
+    mixer = FakeAudioMixer()
+    for index in range(sessions):
+        desktop.processes[BENCH_PID + index] = f"app{index % processes}.exe"
+        mixer.active.append(FakeAudioSession(BENCH_PID + index))
+    manager = AudioSessionManager(mixer)
+    manager.start()
+    started = time.perf_counter()
+    for index in range(commands):
+        name = f"app{index % processes}.exe"
+        if index % 2:
+            manager.set_volume(name, (index % 100) / 100)
+        else:
+            manager.set_mute(name, bool(index % 4))
+    elapsed = time.perf_counter() - started
+    print(f"\n{sessions} sessions, {commands} commands: {elapsed / commands * 1e6:.1f} us per command, "
+          f"{manager.enumerations} enumeration(s)")
+    if manager.enumerations != 1:
+        failures.append(f"timed commands enumerated {manager.enumerations} times")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Audio session control check on the fake mixer')
+    parser.add_argument('--sessions', type=int, default=200, help='Sessions in the timed run (default: 200)')
+    parser.add_argument('--commands', type=int, default=1000, help='Commands in the timed run (default: 1000)')
+    args = parser.parse_args()
+
+    failures = []
+    check_restore(failures)
+    check_pending(failures)
+    check_device_change(failures)
+    bench(failures, args.sessions, args.commands)
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,345 @@
+"""
+Per-application audio sessions
+
+BROWSER_TAB_MUTE used to press M in the page (a focus round trip, and only on
+sites that map M to mute) and SYSTEM_MUTE_ALL pressed the global mute key,
+which toggles and silences every application. Windows keeps an audio session
+per process on each output device - the mixer's per-app sliders - with its own
+volume and mute. AudioSessionManager sets those directly:
+
+- Sessions of every active output device are enumerated once, on first use,
+  and cached by pid together with the process name. Covering all devices, not
+  just the default one, keeps a browser muted when its audio moves to another
+  device (speakers to HDMI) - Windows gives it a session there too.
+- When the default output device changes or a device comes or goes, the
+  cache is dropped and the next command enumerates again, applying the mute
+  and volume asked for earlier to the sessions found.
+- A session-created notification adds new sessions to the cache as they
+  appear, so the cache never needs to be enumerated again. Mute and volume
+  requested for a process that has no session yet (a browser that hasn't
+  played anything) are applied when its session is created.
+- A process is addressed by executable name, which covers every session of a
+  multi-process browser - Chrome and Edge play audio from a separate audio
+  service process, not the one that owns the window.
+- mute_all() mutes every session (not a toggle) and restore() unmutes the
+  ones it muted, leaving sessions the user had muted alone.
+
+The manager only talks to a backend with two methods, so it runs on Linux on
+the fake mixer of fake_backend.py:
+
+    backend.sessions()                -> sessions of the active output devices
+    backend.watch(callback)           -> callback(session) for every new session
+    backend.watch_devices(callback)   -> callback() when the output devices change
+
+sessions() is called again after a device change, and watch() then replaces
+the subscriptions of the devices enumerated before.
+
+A session has pid, expired(), get_volume()/set_volume(0.0-1.0) and
+get_mute()/set_mute(bool). WasapiAudioBackend implements this with pycaw
+(pip install pycaw); without it the commands keep using keys.
+"""
+
+import os
+import sys
+import threading
+
+try:
+    if os.environ.get('PC_CONTROLLER_FAKE_BACKEND'):
+        raise ImportError("fake backend requested")
+    import psutil
+except ImportError:
+    from fake_backend import psutil
+
+try:
+    # Multithreaded apartment: sessions are used from the command worker and
+    # notifications arrive on COM's own threads (must be set before comtypes loads)
+    sys.coinit_flags = 0
+    from ctypes import POINTER, cast
+    from comtypes import CLSCTX_ALL, CoCreateInstance
+    from pycaw.callbacks import AudioSessionNotification
+    from pycaw.constants import CLSID_MMDeviceEnumerator
+    from pycaw.pycaw import (IAudioSessionControl2, IAudioSessionManager2, IMMDeviceEnumerator,
+                             ISimpleAudioVolume)
+except ImportError:  # Session control unavailable - the audio commands keep using keys
+    AudioSessionNotification = None
+
+try:
+    from pycaw.callbacks import MMNotificationClient
+except ImportError:  # Older pycaw - sessions stay on the devices found at the first enumeration
+    MMNotificationClient = None
+
+# EDataFlow of output devices, DEVICE_STATE of a usable device
+E_RENDER = 0
+DEVICE_STATE_ACTIVE = 0x1
+# AudioSessionState of a session whose process ended or whose stream closed for good
+AUDIO_SESSION_STATE_EXPIRED = 2
+
+# Name given to sessions that belong to no process (Windows system sounds)
+SYSTEM_SOUNDS = 'system sounds'
+
+
+class WasapiSession:
+    """One WASAPI audio session (IAudioSessionControl2 + ISimpleAudioVolume)"""
+
+    __slots__ = ('pid', '_control', '_volume')
+
+    def __init__(self, control):
+        self._control = control.QueryInterface(IAudioSessionControl2)
+        self._volume = self._control.QueryInterface(ISimpleAudioVolume)
+        self.pid = self._control.GetProcessId()
+
+    def expired(self):
+        return self._control.GetState() == AUDIO_SESSION_STATE_EXPIRED
+
+    def get_volume(self):
+        return self._volume.GetMasterVolume()
+
+    def set_volume(self, level):
+        self._volume.SetMasterVolume(level, None)
+
+    def get_mute(self):
+        return bool(self._volume.GetMute())
+
+    def set_mute(self, muted):
+        self._volume.SetMute(int(muted), None)
+
+
+if AudioSessionNotification is not None:
+    class _SessionCreated(AudioSessionNotification):
+        """IAudioSessionNotification that hands new sessions to a callback"""
+
+        def __init__(self, callback):
+            super().__init__()
+            self._callback = callback
+
+        def on_session_created(self, new_session):
+            self._callback(WasapiSession(new_session))
+
+
+if MMNotificationClient is not None:
+    class _DevicesChanged(MMNotificationClient):
+        """IMMNotificationClient that reports output device changes to a callback"""
+
+        def __init__(self, callback):
+            super().__init__()
+            self._callback = callback
+
+        def on_default_device_changed(self, flow, flow_id, role, role_id, default_device_id):
+            if flow_id == E_RENDER:
+                self._callback()
+
+        def on_device_added(self, added_device_id):
+            self._callback()
+
+        def on_device_removed(self, removed_device_id):
+            self._callback()
+
+        def on_device_state_changed(self, device_id, new_state, new_state_id):
+            self._callback()
+
+
+class WasapiAudioBackend:
+    """Sessions of the active output devices through IAudioSessionManager2"""
+
+    def __init__(self):
+        if AudioSessionNotification is None:
+            raise RuntimeError("audio session control needs pycaw")
+        self._enumerator = CoCreateInstance(CLSID_MMDeviceEnumerator, IMMDeviceEnumerator, CLSCTX_ALL)
+        self._managers = []  # IAudioSessionManager2 per active output device, from the last sessions()
+        self._registered = []  # (manager, notification) subscribed by watch()
+        self._devices_client = None
+
+    def _open_managers(self):
+        devices = self._enumerator.EnumAudioEndpoints(E_RENDER, DEVICE_STATE_ACTIVE)
+        managers = []
+        for index in range(devices.GetCount()):
+            interface = devices.Item(index).Activate(IAudioSessionManager2._iid_, CLSCTX_ALL, None)
+            managers.append(cast(interface, POINTER(IAudioSessionManager2)))
+        return managers
+
+    def sessions(self):
+        self._managers = self._open_managers()
+        found = []
+        for manager in self._managers:
+            sessions = manager.GetSessionEnumerator()
+            found.extend(WasapiSession(sessions.GetSession(index)) for index in range(sessions.GetCount()))
+        return found
+
+    def watch(self, callback):
+        for manager, notification in self._registered:
+            try:
+                manager.UnregisterSessionNotification(notification)
+            except Exception:  # COMError - the device is gone
+                pass
+        # Only delivered after GetSessionEnumerator has been called once (sessions() does)
+        self._registered = []
+        for manager in self._managers:
+            notification = _SessionCreated(callback)
+            manager.RegisterSessionNotification(notification)
+            self._registered.append((manager, notification))
+
+    def watch_devices(self, callback):
+        if MMNotificationClient is None:
+            return
+        self._devices_client = _DevicesChanged(callback)
+        self._enumerator.RegisterEndpointNotificationCallback(self._devices_client)
+
+
+def open_backend(fake=False):
+    """The fake mixer, WASAPI, or None when sessions can't be controlled"""
+    if fake:
+        from fake_backend import audio_mixer
+        return audio_mixer
+    if AudioSessionNotification is None:
+        return None
+    return WasapiAudioBackend()
+
+
+def _process_name(pid):
+    if pid == 0:
+        return SYSTEM_SOUNDS
+    try:
+        return psutil.Process(pid).name().lower()
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return None
+
+
+class AudioSessionManager:
+    """Volume and mute per process, on sessions enumerated once and kept current by events"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._sessions = None  # pid -> [session], None until the first enumeration
+        self._names = {}  # pid -> lowercase executable name
+        self._wanted = {}  # executable name -> (muted, volume) for sessions created later
+        self._muted_all = []  # Sessions mute_all() muted, for restore()
+        self._stale = False  # Output devices changed since the last enumeration
+        self.enumerations = 0
+        self.created = 0  # Sessions added by notifications
+        self.device_changes = 0
+
+    def start(self):
+        """Enumerate the sessions and subscribe to new ones (again after a device change)"""
+        with self._lock:
+            if self._sessions is not None and not self._stale:
+                return
+            first = self._sessions is None
+            self._stale = False
+            self._sessions = {}
+            for session in self.backend.sessions():
+                self._add(session)
+            self.enumerations += 1
+            wanted = [(session, self._wanted.get(self._names.get(pid)))
+                      for pid, sessions in self._sessions.items() for session in sessions]
+        self.backend.watch(self._on_created)
+        if first:
+            self.backend.watch_devices(self._on_devices_changed)
+        else:
+            for session, settings in wanted:
+                if settings is not None:
+                    _apply(session, *settings)
+
+    def _on_devices_changed(self):
+        # COM notification thread - only flag it, the next command enumerates
+        with self._lock:
+            self._stale = True
+            self.device_changes += 1
+
+    def _add(self, session):
+        if session.pid not in self._names:
+            name = _process_name(session.pid)
+            if name is None:
+                return  # Process already gone
+            self._names[session.pid] = name
+        self._sessions.setdefault(session.pid, []).append(session)
+
+    def _on_created(self, session):
+        with self._lock:
+            self._add(session)
+            self.created += 1
+            wanted = self._wanted.get(self._names.get(session.pid))
+        if wanted is not None:
+            _apply(session, *wanted)
+
+    def _live(self, name=None):
+        """Cached sessions of a process (all sessions for None), dropping expired ones"""
+        self.start()
+        with self._lock:
+            found = []
+            for pid in list(self._sessions):
+                if name is not None and self._names.get(pid) != name:
+                    continue
+                live = [session for session in self._sessions[pid] if not _expired(session)]
+                if live:
+                    self._sessions[pid] = live
+                    found.extend(live)
+                else:
+                    # Process ended - forget the pid too, it may be reused by another program
+                    del self._sessions[pid]
+                    self._names.pop(pid, None)
+            return found
+
+    def _set(self, name, muted=None, volume=None):
+        name = name.lower()
+        with self._lock:
+            # New sessions start with the mute/volume Windows remembers for the app -
+            # only a mute or volume set here is imposed on them, an unmute isn't
+            old_muted, old_volume = self._wanted.get(name, (None, None))
+            self._wanted[name] = (old_muted if muted is None else (True if muted else None),
+                                  old_volume if volume is None else volume)
+        return sum(_apply(session, muted, volume) for session in self._live(name))
+
+    def set_mute(self, name, muted):
+        """Mute or unmute every session of an executable; returns the sessions changed"""
+        return self._set(name, muted=muted)
+
+    def set_volume(self, name, level):
+        """Set the volume (0.0-1.0) of every session of an executable; returns the sessions changed"""
+        return self._set(name, volume=min(max(level, 0.0), 1.0))
+
+    def mute_all(self):
+        """Mute every session; returns how many were muted"""
+        muted = [session for session in self._live() if not _get_mute(session)]
+        muted = [session for session in muted if _apply(session, True, None)]
+        with self._lock:
+            self._muted_all.extend(muted)
+        return len(muted)
+
+    def restore(self):
+        """Unmute the sessions mute_all() muted; returns how many were unmuted"""
+        with self._lock:
+            muted, self._muted_all = self._muted_all, []
+        return sum(_apply(session, False, None) for session in muted if not _expired(session))
+
+    def describe(self):
+        with self._lock:
+            sessions = sum(len(found) for found in (self._sessions or {}).values())
+        return (f"sessions:{sessions},enumerations:{self.enumerations},created:{self.created},"
+                f"device_changes:{self.device_changes}")
+
+
+def _expired(session):
+    try:
+        return session.expired()
+    except Exception:  # COMError - the device or the session is gone
+        return True
+
+
+def _get_mute(session):
+    try:
+        return session.get_mute()
+    except Exception:
+        return True  # Unusable - leave it out
+
+
+def _apply(session, muted, volume):
+    """Set a session's mute/volume (None = leave); returns whether it worked"""
+    try:
+        if volume is not None:
+            session.set_volume(volume)
+        if muted is not None:
+            session.set_mute(muted)
+    except Exception:
+        return False
+    return True
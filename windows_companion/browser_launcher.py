@@ -0,0 +1,281 @@
+"""
+Browser launcher service
+
+Resolves browser executables (and the default browser's open command) once and
+caches them, so launching a browser or opening a URL does not repeat registry
+lookups and PATH searches on every command. URLs are handed to an already
+running browser whenever possible:
+
+1. Through the DevTools endpoint (browser started with --remote-debugging-port),
+   which opens a tab in-process without spawning anything.
+2. Through the cached default browser command - Chrome, Edge and Firefox pass
+   the URL to their running instance over their own IPC and exit immediately.
+3. Through webbrowser as a last resort.
+
+Run this file directly to benchmark open-URL latency against a stand-in executable:
+    python browser_launcher.py --benchmark 50
+"""
+
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import time
+import urllib.request
+import webbrowser
+from urllib.parse import quote
+
+try:
+    import winreg
+except ImportError:  # Not on Windows - only the PATH lookup is available
+    winreg = None
+
+# Install locations relative to Program Files / LocalAppData
+BROWSER_INSTALL_PATHS = {
+    'chrome.exe': r'Google\Chrome\Application\chrome.exe',
+    'firefox.exe': r'Mozilla Firefox\firefox.exe',
+    'msedge.exe': r'Microsoft\Edge\Application\msedge.exe',
+    'brave.exe': r'BraveSoftware\Brave-Browser\Application\brave.exe',
+}
+
+# Order and arguments used by restore_session()
+RESTORE_SESSION_ARGS = [
+    ('chrome.exe', 'Chrome', ['--restore-last-session']),
+    ('firefox.exe', 'Firefox', ['-restore']),
+    ('msedge.exe', 'Edge', ['--restore-last-session']),
+]
+
+# Windows process creation flags - start browsers detached from our console
+DETACHED_PROCESS = 0x00000008
+CREATE_NEW_PROCESS_GROUP = 0x00000200
+
+
+def _read_registry_value(root, key, name=''):
+    if winreg is None:
+        return None
+    try:
+        with winreg.OpenKey(root, key) as handle:
+            return winreg.QueryValueEx(handle, name)[0]
+    except OSError:
+        return None
+
+
+class BrowserLauncher:
+    """Starts browsers and opens URLs using cached executable paths"""
+
+    def __init__(self, cdp_port=None, cdp_host='127.0.0.1', timeout=2.0):
+        self.cdp_port = cdp_port
+        self.cdp_host = cdp_host
+        self.timeout = timeout
+        self._paths = {}  # Executable name -> absolute path (None = not installed)
+        self._default_command = None  # Default browser open command, split into args
+        self._default_resolved = False
+
+    def _lookup(self, executable):
+        """Find an executable: App Paths registry key, install dirs, then PATH"""
+        if winreg is not None:
+            app_path_key = rf"SOFTWARE\Microsoft\Windows\CurrentVersion\App Paths\{executable}"
+            for root in (winreg.HKEY_CURRENT_USER, winreg.HKEY_LOCAL_MACHINE):
+                path = _read_registry_value(root, app_path_key)
+                if path and os.path.isfile(path.strip('"')):
+                    return path.strip('"')
+
+        relative = BROWSER_INSTALL_PATHS.get(executable)
+        if relative:
+            for base_var in ('ProgramFiles', 'ProgramFiles(x86)', 'LOCALAPPDATA'):
+                base = os.environ.get(base_var)
+                if base and os.path.isfile(os.path.join(base, relative)):
+                    return os.path.join(base, relative)
+
+        return shutil.which(executable)
+
+    def resolve(self, executable):
+        """Absolute path of a browser executable (cached, None if not installed)"""
+        if executable not in self._paths:
+            self._paths[executable] = self._lookup(executable)
+        return self._paths[executable]
+
+    def forget(self, executable=None):
+        """Drop cached paths (after installing or removing a browser)"""
+        if executable is None:
+            self._paths.clear()
+            self._default_resolved = False
+        else:
+            self._paths.pop(executable, None)
+
+    def _spawn(self, args):
+        kwargs = {'stdin': subprocess.DEVNULL, 'stdout': subprocess.DEVNULL,
+                  'stderr': subprocess.DEVNULL, 'close_fds': True}
+        if sys.platform == 'win32':
+            kwargs['creationflags'] = DETACHED_PROCESS | CREATE_NEW_PROCESS_GROUP
+        return subprocess.Popen(args, **kwargs)
+
+    def launch(self, executable, *args):
+        """Start a browser by executable name; raises FileNotFoundError if not installed"""
+        path = self.resolve(executable)
+        if path is None:
+            raise FileNotFoundError(executable)
+        try:
+            self._spawn([path, *args])
+        except FileNotFoundError:
+            # Browser was uninstalled since we cached it
+            self.forget(executable)
+            raise
+        return path
+
+    def restore_session(self):
+        """Restore the last session of the first installed browser; returns its label"""
+        for executable, label, args in RESTORE_SESSION_ARGS:
+            if self.resolve(executable) is None:
+                continue
+            try:
+                self.launch(executable, *args)
+                return label
+            except FileNotFoundError:
+                continue
+        return None
+
+    def default_browser_command(self):
+        """The default browser's open command as an argument list with a %1 placeholder"""
+        if not self._default_resolved and winreg is not None:
+            self._default_resolved = True
+            self._default_command = None
+            prog_id = _read_registry_value(
+                winreg.HKEY_CURRENT_USER,
+                r"Software\Microsoft\Windows\Shell\Associations\UrlAssociations\https\UserChoice",
+                'ProgId')
+            command = None
+            if prog_id:
+                command = _read_registry_value(winreg.HKEY_CLASSES_ROOT, rf"{prog_id}\shell\open\command")
+            if command:
+                args = [arg.strip('"') for arg in shlex.split(command, posix=False)]
+                if args and os.path.isfile(args[0]):
+                    self._default_command = args
+        return self._default_command
+
+    def _open_via_devtools(self, url):
+        """Open a tab in the running browser through its DevTools endpoint"""
+        base = f"http://{self.cdp_host}:{self.cdp_port}"
+        request = urllib.request.Request(f"{base}/json/new?{quote(url, safe='')}", method='PUT')
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            target = json.loads(response.read().decode('utf-8'))
+        if target.get('id'):
+            with urllib.request.urlopen(f"{base}/json/activate/{target['id']}", timeout=self.timeout):
+                pass
+
+    def _activate_open_tab(self, url):
+        """Switch to a tab that already shows exactly this URL; returns True if found"""
+        base = f"http://{self.cdp_host}:{self.cdp_port}"
+        with urllib.request.urlopen(f"{base}/json/list", timeout=self.timeout) as response:
+            targets = json.loads(response.read().decode('utf-8'))
+        wanted = url.rstrip('/')
+        for target in targets:
+            if target.get('type') == 'page' and target.get('url', '').rstrip('/') == wanted:
+                with urllib.request.urlopen(f"{base}/json/activate/{target['id']}", timeout=self.timeout):
+                    pass
+                return True
+        return False
+
+    def open_url(self, url, reuse_tab=True):
+        """Open a URL, reusing a running browser when possible; returns the route used.
+
+        With a DevTools endpoint, a tab already showing the exact URL is brought
+        to the front instead of opening a duplicate (unless reuse_tab is False).
+        """
+        if self.cdp_port:
+            try:
+                if reuse_tab and self._activate_open_tab(url):
+                    return 'existing-tab'
+                self._open_via_devtools(url)
+                return 'devtools'
+            except (OSError, ValueError):
+                pass  # Browser not started with remote debugging - try the next route
+
+        command = self.default_browser_command()
+        if command:
+            args = [url if arg == '%1' else arg.replace('%1', url) for arg in command]
+            if '%1' not in ' '.join(command):
+                args.append(url)
+            try:
+                self._spawn(args)
+                return 'default-browser'
+            except OSError:
+                self._default_resolved = False
+
+        if not webbrowser.open(url):
+            raise OSError("no browser available to open URL")
+        return 'webbrowser'
+
+
+class _RecordingLauncher(BrowserLauncher):
+    """Launcher that keeps the spawned processes so the benchmark can reap them"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.spawned = []
+
+    def _spawn(self, args):
+        process = super()._spawn(args)
+        self.spawned.append(process)
+        return process
+
+
+def _benchmark(iterations, cdp_port=None):
+    """Compare open-URL latency of an uncached lookup + spawn against the cached launcher"""
+    stand_in = os.path.basename(sys.executable)
+    url = "https://www.youtube.com/results?search_query=benchmark"
+    spawned = []
+
+    def report(label, samples):
+        samples.sort()
+        mean = sum(samples) / len(samples)
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        print(f"{label:<26} mean {mean * 1000:7.2f} ms   p95 {p95 * 1000:7.2f} ms")
+
+    # Uncached: resolve the executable on every open, as the old Popen/webbrowser path did
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        launcher = _RecordingLauncher()
+        launcher._spawn([launcher.resolve(stand_in), '-c', 'pass', url])
+        samples.append(time.perf_counter() - start)
+        spawned.extend(launcher.spawned)
+    report("uncached lookup + spawn", samples)
+
+    # Cached: path resolved once, the stand-in "browser" just receives the URL
+    launcher = _RecordingLauncher()
+    launcher._default_command = [launcher.resolve(stand_in), '-c', 'pass', '%1']
+    launcher._default_resolved = True
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        launcher.open_url(url)
+        samples.append(time.perf_counter() - start)
+    spawned.extend(launcher.spawned)
+    report("cached default-browser", samples)
+
+    if cdp_port:
+        launcher = BrowserLauncher(cdp_port=cdp_port)
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            launcher._open_via_devtools(url)
+            samples.append(time.perf_counter() - start)
+        report("devtools (no spawn)", samples)
+
+    for process in spawned:
+        process.wait()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Browser launcher benchmark')
+    parser.add_argument('--benchmark', type=int, default=20, metavar='N',
+                        help='Number of URL opens per variant (default: 20)')
+    parser.add_argument('--cdp-port', type=int, default=None,
+                        help='Also time opening tabs through a DevTools endpoint on this port')
+    args = parser.parse_args()
+    _benchmark(args.benchmark, args.cdp_port)
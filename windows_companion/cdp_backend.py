@@ -0,0 +1,400 @@
+"""
+Chrome DevTools Protocol media backend
+
+Drives the <video> element of the active browser tab directly over a persistent
+DevTools WebSocket instead of focusing the window and injecting hotkeys. The
+browser has to be started with remote debugging enabled, e.g.:
+
+    chrome.exe --remote-debugging-port=9222
+    msedge.exe --remote-debugging-port=9222
+
+Only the standard library is used, so no extra requirements are needed.
+"""
+
+import base64
+import json
+import os
+import socket
+import struct
+import threading
+import time
+import urllib.request
+from urllib.parse import urlparse
+
+
+class CDPError(Exception):
+    """Raised when the DevTools endpoint or the page cannot carry out an action"""
+
+
+class CDPConnection:
+    """Minimal blocking WebSocket client speaking the DevTools JSON protocol"""
+
+    def __init__(self, ws_url, timeout=2.0):
+        self.ws_url = ws_url
+        self.timeout = timeout
+        self._sock = None
+        self._next_id = 0
+
+    @property
+    def connected(self):
+        return self._sock is not None
+
+    def connect(self):
+        url = urlparse(self.ws_url)
+        try:
+            sock = socket.create_connection((url.hostname, url.port or 80), timeout=self.timeout)
+        except OSError as e:
+            raise CDPError(f"cannot connect to {self.ws_url}: {e}")
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        key = base64.b64encode(os.urandom(16)).decode('ascii')
+        request = (f"GET {url.path or '/'} HTTP/1.1\r\n"
+                   f"Host: {url.hostname}:{url.port or 80}\r\n"
+                   "Upgrade: websocket\r\n"
+                   "Connection: Upgrade\r\n"
+                   f"Sec-WebSocket-Key: {key}\r\n"
+                   "Sec-WebSocket-Version: 13\r\n\r\n")
+        try:
+            sock.sendall(request.encode('ascii'))
+            response = b''
+            while b'\r\n\r\n' not in response:
+                chunk = sock.recv(1024)
+                if not chunk:
+                    raise CDPError("connection closed during handshake")
+                response += chunk
+        except OSError as e:
+            sock.close()
+            raise CDPError(f"handshake failed: {e}")
+        status_line = response.split(b'\r\n', 1)[0]
+        if b' 101 ' not in status_line + b' ':
+            sock.close()
+            raise CDPError(f"handshake rejected: {status_line.decode('latin-1')}")
+        self._sock = sock
+
+    def close(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            finally:
+                self._sock = None
+
+    def abort(self):
+        """Close from another thread - shutdown wakes a call() blocked in recv"""
+        sock = self._sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self.close()
+
+    def _recv_exact(self, count):
+        data = b''
+        while len(data) < count:
+            chunk = self._sock.recv(count - len(data))
+            if not chunk:
+                raise CDPError("connection closed")
+            data += chunk
+        return data
+
+    def _send_frame(self, opcode, payload):
+        header = bytes([0x80 | opcode])
+        length = len(payload)
+        if length < 126:
+            header += bytes([0x80 | length])
+        elif length < 1 << 16:
+            header += bytes([0x80 | 126]) + struct.pack('!H', length)
+        else:
+            header += bytes([0x80 | 127]) + struct.pack('!Q', length)
+        # Client frames must be masked (RFC 6455 section 5.3)
+        mask = os.urandom(4)
+        masked = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        self._sock.sendall(header + mask + masked)
+
+    def _recv_message(self):
+        """Read one complete (possibly fragmented) text message"""
+        message = b''
+        while True:
+            first, second = self._recv_exact(2)
+            opcode = first & 0x0F
+            length = second & 0x7F
+            if length == 126:
+                length = struct.unpack('!H', self._recv_exact(2))[0]
+            elif length == 127:
+                length = struct.unpack('!Q', self._recv_exact(8))[0]
+            mask = self._recv_exact(4) if second & 0x80 else None
+            payload = self._recv_exact(length)
+            if mask:
+                payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+
+            if opcode == 0x8:  # Close
+                raise CDPError("connection closed by browser")
+            if opcode == 0x9:  # Ping
+                self._send_frame(0xA, payload)
+                continue
+            if opcode == 0xA:  # Pong
+                continue
+            message += payload
+            if first & 0x80:  # FIN
+                return message.decode('utf-8')
+
+    def call(self, method, params=None):
+        """Send a DevTools command and wait for its result (events are skipped)"""
+        if self._sock is None:
+            self.connect()
+        self._next_id += 1
+        message_id = self._next_id
+        request = json.dumps({'id': message_id, 'method': method, 'params': params or {}})
+        try:
+            self._send_frame(0x1, request.encode('utf-8'))
+            while True:
+                response = json.loads(self._recv_message())
+                if response.get('id') == message_id:
+                    break
+        except (OSError, ValueError) as e:
+            self.close()
+            raise CDPError(f"{method} failed: {e}")
+        except CDPError:
+            self.close()
+            raise
+
+        if 'error' in response:
+            raise CDPError(f"{method} failed: {response['error'].get('message')}")
+        return response.get('result', {})
+
+
+# Picks the largest <video> on the page, applies an action to it and returns its state
+_VIDEO_SCRIPT = """(async () => {
+  const videos = [...document.querySelectorAll('video')];
+  if (!videos.length) { throw new Error('no <video> element'); }
+  videos.sort((a, b) => b.clientWidth * b.clientHeight - a.clientWidth * a.clientHeight);
+  const v = videos[0];
+  const click = (selector) => {
+    const el = document.querySelector(selector);
+    if (!el) { throw new Error('element not found: ' + selector); }
+    el.click();
+  };
+  %s
+  const tracks = [...v.textTracks];
+  const captionsButton = document.querySelector('.ytp-subtitles-button');
+  return {
+    paused: v.paused,
+    currentTime: v.currentTime,
+    duration: v.duration,
+    playbackRate: v.playbackRate,
+    volume: v.volume,
+    muted: v.muted,
+    fullscreen: !!document.fullscreenElement,
+    captions: tracks.some(t => t.mode === 'showing') ||
+              (!!captionsButton && captionsButton.getAttribute('aria-pressed') === 'true'),
+  };
+})()"""
+
+# JavaScript for each logical action (%s placeholders are filled with JSON values)
+_ACTIONS = {
+    'play': "await v.play();",
+    'pause': "v.pause();",
+    'toggle': "if (v.paused) { await v.play(); } else { v.pause(); }",
+    'stop': "v.pause(); if (document.fullscreenElement) { await document.exitFullscreen(); }",
+    'seek': "v.currentTime = Math.max(0, Math.min(v.duration || Infinity, v.currentTime + %s));",
+    'seek_to': "v.currentTime = Math.max(0, Math.min(v.duration || Infinity, %s));",
+    'seek_end': "if (isFinite(v.duration)) { v.currentTime = v.duration; }",
+    'rate': "v.playbackRate = %s;",
+    'volume': "v.volume = Math.max(0, Math.min(1, %s));",
+    'mute': "v.muted = %s;",
+    'captions': """
+  const show = %s;
+  if (v.textTracks.length > 0) {
+    let shown = false;
+    for (const t of v.textTracks) {
+      const caption = t.kind === 'captions' || t.kind === 'subtitles';
+      t.mode = show && caption && !shown ? 'showing' : 'disabled';
+      shown = shown || t.mode === 'showing';
+    }
+  } else {
+    const button = document.querySelector('.ytp-subtitles-button');
+    if (!button) { throw new Error('no caption tracks'); }
+    if ((button.getAttribute('aria-pressed') === 'true') !== show) { button.click(); }
+  }""",
+    'fullscreen': """
+  const wanted = %s;
+  const enter = wanted === null ? !document.fullscreenElement : wanted;
+  if (enter && !document.fullscreenElement) {
+    await (v.closest('.html5-video-player') || v).requestFullscreen();
+  } else if (!enter && document.fullscreenElement) {
+    await document.exitFullscreen();
+  }""",
+    'theater': "click('.ytp-size-button');",
+    'next_video': "click('.ytp-next-button');",
+    'previous_video': "click('.ytp-prev-button');",
+    'like': "click('like-button-view-model button, #segmented-like-button button');",
+    'dislike': "click('dislike-button-view-model button, #segmented-dislike-button button');",
+    'subscribe': "click('#subscribe-button button, ytd-subscribe-button-renderer button');",
+}
+
+
+class CDPMediaBackend:
+    """Pooled, persistent DevTools connections used to control the active tab's video"""
+
+    def __init__(self, host='127.0.0.1', port=9222, timeout=2.0, target_ttl=1.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.target_ttl = target_ttl  # How long the active-tab lookup is reused
+        self._connections = {}  # Target id -> CDPConnection
+        self._target = None
+        self._target_checked = 0.0
+
+    def _fetch_json(self, path):
+        url = f"http://{self.host}:{self.port}{path}"
+        try:
+            with urllib.request.urlopen(url, timeout=self.timeout) as response:
+                return json.loads(response.read().decode('utf-8'))
+        except (OSError, ValueError) as e:
+            raise CDPError(f"DevTools endpoint unavailable at {url}: {e}")
+
+    def pages(self):
+        """Every debuggable page target, most recently active first"""
+        pages = [t for t in self._fetch_json('/json/list')
+                 if t.get('type') == 'page' and t.get('webSocketDebuggerUrl')]
+        # Drop connections to tabs that no longer exist
+        live = {t['id'] for t in pages}
+        for target_id in list(self._connections):
+            if target_id not in live:
+                self._connections.pop(target_id).close()
+        return pages
+
+    def active_target(self):
+        """The most recently active page target (DevTools lists those first)"""
+        now = time.monotonic()
+        if self._target is None or now - self._target_checked > self.target_ttl:
+            pages = self.pages()
+            if not pages:
+                raise CDPError("no debuggable page open")
+            self._target = pages[0]
+            self._target_checked = now
+        return self._target
+
+    def _connection(self, target):
+        connection = self._connections.get(target['id'])
+        if connection is None:
+            connection = CDPConnection(target['webSocketDebuggerUrl'], timeout=self.timeout)
+            self._connections[target['id']] = connection
+        return connection
+
+    def _drop(self, target, connection):
+        """Close a tab's connection and take it out of the pool (if it is still the pooled one)"""
+        if self._connections.get(target['id']) is connection:
+            del self._connections[target['id']]
+        connection.abort()
+
+    @staticmethod
+    def _value(result):
+        if 'exceptionDetails' in result:
+            details = result['exceptionDetails']
+            message = details.get('exception', {}).get('description') or details.get('text')
+            raise CDPError(message)
+        return result.get('result', {}).get('value')
+
+    def evaluate(self, expression):
+        """Evaluate JavaScript in the active tab and return its value"""
+        target = self.active_target()
+        connection = self._connection(target)
+        params = {'expression': expression, 'awaitPromise': True,
+                  'returnByValue': True, 'userGesture': True}
+        try:
+            result = connection.call('Runtime.evaluate', params)
+        except CDPError:
+            # Stale socket (tab navigated/closed) - rediscover and retry once
+            self._drop(target, connection)
+            self._target = None
+            target = self.active_target()
+            result = self._connection(target).call('Runtime.evaluate', params)
+        return self._value(result)
+
+    @staticmethod
+    def _script(action, args):
+        if action not in _ACTIONS:
+            raise CDPError(f"unknown action {action}")
+        values = tuple(json.dumps(arg) for arg in args)
+        snippet = _ACTIONS[action]
+        return _VIDEO_SCRIPT % (snippet % values if values else snippet)
+
+    def perform(self, action, *args):
+        """Run a logical media action and return the video's resulting state"""
+        return self.evaluate(self._script(action, args))
+
+    def perform_all(self, action, *args, title=None):
+        """Run a media action in every page (whose title contains title) at once.
+
+        Each page has its own connection, so the pages are driven from one
+        thread each and the action takes about one round trip however many
+        pages there are. Returns [(page title, state or CDPError)].
+
+        A connection whose call failed, or whose thread is still waiting at the
+        deadline, is closed and dropped from the pool - a straggler left
+        reading the pooled socket would swallow the next call's reply."""
+        expression = self._script(action, args)
+        pages = [page for page in self.pages()
+                 if title is None or title.lower() in page.get('title', '').lower()]
+        params = {'expression': expression, 'awaitPromise': True,
+                  'returnByValue': True, 'userGesture': True}
+        connections = [self._connection(page) for page in pages]
+        results = [CDPError(f"no answer within {self.timeout:g}s")] * len(pages)
+        broken = [False] * len(pages)  # The connection failed (not just the script)
+
+        def run(index):
+            try:
+                result = connections[index].call('Runtime.evaluate', params)
+            except CDPError as e:
+                broken[index] = True
+                results[index] = e
+                return
+            try:
+                results[index] = self._value(result)
+            except CDPError as e:
+                results[index] = e
+
+        threads = [threading.Thread(target=run, args=(index,), name='cdp-fan-out', daemon=True)
+                   for index in range(len(pages))]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + self.timeout
+        for thread in threads:
+            thread.join(max(deadline - time.monotonic(), 0))
+        outcome = [(page.get('title', ''), result) for page, result in zip(pages, results)]
+        for page, connection, thread, failed in zip(pages, connections, threads, broken):
+            if failed or thread.is_alive():
+                self._drop(page, connection)
+        return outcome
+
+    def state(self):
+        """Read back the current playback state without changing anything"""
+        return self.evaluate(_VIDEO_SCRIPT % "")
+
+    def close(self):
+        for connection in self._connections.values():
+            connection.close()
+        self._connections.clear()
+
+
+def describe_state(state):
+    """Short human readable form of a playback state for status responses"""
+    if not state:
+        return "no video"
+    position = f"{state.get('currentTime') or 0:.1f}s"
+    duration = state.get('duration')
+    if isinstance(duration, (int, float)) and duration > 0:
+        position += f"/{duration:.1f}s"
+    parts = ['paused' if state.get('paused') else 'playing', position]
+    if state.get('playbackRate', 1) != 1:
+        parts.append(f"{state['playbackRate']}x")
+    if state.get('muted'):
+        parts.append('muted')
+    elif state.get('volume', 1) != 1:
+        parts.append(f"volume {round(state['volume'] * 100)}%")
+    if state.get('captions'):
+        parts.append('captions')
+    if state.get('fullscreen'):
+        parts.append('fullscreen')
+    return ', '.join(parts)
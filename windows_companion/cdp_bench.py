@@ -0,0 +1,327 @@
+"""
+DevTools backend test against a mock browser
+
+Serves a mock DevTools endpoint on localhost - /json/list and one WebSocket
+per tab, speaking the same Runtime.evaluate protocol as Chrome - whose tabs
+hold a simulated <video> the media scripts act on. Drives the companion's
+media commands through PCController with the CDP backend (fake Windows
+backend for the key fallbacks) and checks the video state after each one:
+play/pause, seeks, PLAYBACK_RATE, PLAYBACK_VOLUME_SET, mute, captions and the
+PLAYBACK_STATE read-back, a tab without a video, a connection the browser
+dropped, ALL_WINDOWS over several tabs at once, and a tab that answers after
+the ALL_WINDOWS deadline (the next call must get its own reply). Then times
+state read round trips. Exits with 1 on any mismatch.
+
+    python cdp_bench.py                             # 500 timed round trips
+    python cdp_bench.py --round-trips 5000 --delay 20
+"""
+
+import argparse
+import base64
+import contextlib
+import hashlib
+import io
+import json
+import os
+import re
+import statistics
+import struct
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+os.environ['PC_CONTROLLER_FAKE_BACKEND'] = '1'  # Key fallbacks go to the fake desktop
+
+from cdp_backend import _ACTIONS, _VIDEO_SCRIPT, CDPMediaBackend, describe_state  # noqa: E402
+from fan_out import FanOutRunner  # noqa: E402 - needs the environment above
+from pc_controller import PCController  # noqa: E402
+
+# RFC 6455 handshake constant
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+_PREFIX, _SUFFIX = _VIDEO_SCRIPT.split('%s')
+# Action body -> (action, args); %s in the snippets stands for a JSON value
+_ACTION_PATTERNS = [(action, re.compile(re.escape(snippet).replace('%s', '(.+?)') + r'\Z', re.S))
+                    for action, snippet in _ACTIONS.items()]
+
+
+class MockVideo:
+    """The <video> of a mock tab, changed the way the action scripts change a real one"""
+
+    def __init__(self, duration=600.0):
+        self.paused = False
+        self.current_time = 30.0
+        self.duration = duration
+        self.rate = 1.0
+        self.volume = 1.0
+        self.muted = False
+        self.captions = False
+        self.fullscreen = False
+
+    def apply(self, action, args):
+        clamp = lambda value: max(0.0, min(self.duration, value))  # noqa: E731
+        if action in ('play', 'pause'):
+            self.paused = action == 'pause'
+        elif action == 'toggle':
+            self.paused = not self.paused
+        elif action == 'stop':
+            self.paused, self.fullscreen = True, False
+        elif action == 'seek':
+            self.current_time = clamp(self.current_time + args[0])
+        elif action == 'seek_to':
+            self.current_time = clamp(args[0])
+        elif action == 'seek_end':
+            self.current_time = self.duration
+        elif action == 'rate':
+            self.rate = args[0]
+        elif action == 'volume':
+            self.volume = max(0.0, min(1.0, args[0]))
+        elif action == 'mute':
+            self.muted = args[0]
+        elif action == 'captions':
+            self.captions = args[0]
+        elif action == 'fullscreen':
+            self.fullscreen = not self.fullscreen if args[0] is None else args[0]
+        else:
+            raise ValueError(f"element not found for {action}")  # Site buttons aren't simulated
+
+    def state(self):
+        return {'paused': self.paused, 'currentTime': self.current_time, 'duration': self.duration,
+                'playbackRate': self.rate, 'volume': self.volume, 'muted': self.muted,
+                'fullscreen': self.fullscreen, 'captions': self.captions}
+
+
+class MockTab:
+    def __init__(self, target_id, title, video=None):
+        self.id = target_id
+        self.title = title
+        self.video = video
+        self.evaluations = 0
+        self.drop_next = False  # Close the socket instead of answering the next message
+        self.delay = None  # Seconds evaluations take in this tab (None = the server's delay)
+
+
+class MockDevTools(ThreadingHTTPServer):
+    """DevTools HTTP + WebSocket endpoint for a list of MockTabs (first = most recently active)"""
+
+    daemon_threads = True
+
+    def __init__(self, tabs, delay=0.0):
+        super().__init__(('127.0.0.1', 0), _DevToolsHandler)
+        self.tabs = tabs
+        self.delay = delay  # Seconds each evaluation takes in the "page"
+        self.connections = 0
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def tab(self, target_id):
+        return next((tab for tab in self.tabs if tab.id == target_id), None)
+
+    def evaluate(self, tab, expression):
+        """Runtime.evaluate result for an action script run in tab"""
+        tab.evaluations += 1
+        delay = self.delay if tab.delay is None else tab.delay
+        if delay:
+            time.sleep(delay)
+        if not (expression.startswith(_PREFIX) and expression.endswith(_SUFFIX)):
+            return _exception('SyntaxError: unexpected expression')
+        body = expression[len(_PREFIX):len(expression) - len(_SUFFIX)]
+        if tab.video is None:
+            return _exception('Error: no <video> element')
+        if body:
+            for action, pattern in _ACTION_PATTERNS:
+                match = pattern.match(body)
+                if match:
+                    try:
+                        tab.video.apply(action, [json.loads(value) for value in match.groups()])
+                    except ValueError as e:
+                        return _exception(f"Error: {e}")
+                    break
+            else:
+                return _exception('SyntaxError: unknown action script')
+        return {'result': {'type': 'object', 'value': tab.video.state()}}
+
+
+def _exception(description):
+    return {'result': {'type': 'object'}, 'exceptionDetails': {'text': 'Uncaught',
+                                                             'exception': {'description': description}}}
+
+
+class _DevToolsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        if self.path == '/json/list':
+            body = json.dumps([{'id': tab.id, 'type': 'page', 'title': tab.title, 'url': 'https://example.com/',
+                                'webSocketDebuggerUrl': f"ws://127.0.0.1:{server.port}/devtools/page/{tab.id}"}
+                               for tab in server.tabs]).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        tab = server.tab(self.path.rpartition('/')[2]) if self.path.startswith('/devtools/page/') else None
+        key = self.headers.get('Sec-WebSocket-Key')
+        if tab is None or key is None:
+            self.send_error(404)
+            return
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode('ascii')).digest()).decode('ascii')
+        self.send_response(101)
+        self.send_header('Upgrade', 'websocket')
+        self.send_header('Connection', 'Upgrade')
+        self.send_header('Sec-WebSocket-Accept', accept)
+        self.end_headers()
+        self.wfile.flush()
+        server.connections += 1
+        self.close_connection = True
+        while True:
+            message = self._recv()
+            if message is None or tab.drop_next:
+                tab.drop_next = False
+                return  # Socket closed - like a tab that navigated away
+            request = json.loads(message)
+            result = server.evaluate(tab, request['params']['expression'])
+            self._send(json.dumps({'id': request['id'], 'result': result}).encode('utf-8'))
+
+    def _recv(self):
+        header = self.rfile.read(2)
+        if len(header) < 2 or header[0] & 0x0F == 0x8:
+            return None
+        length = header[1] & 0x7F
+        if length == 126:
+            length = struct.unpack('!H', self.rfile.read(2))[0]
+        elif length == 127:
+            length = struct.unpack('!Q', self.rfile.read(8))[0]
+        mask = self.rfile.read(4)
+        payload = self.rfile.read(length)
+        return bytes(b ^ mask[i % 4] for i, b in enumerate(payload)).decode('utf-8')
+
+    def _send(self, payload):
+        length = len(payload)
+        if length < 126:
+            header = bytes([0x81, length])
+        elif length < 1 << 16:
+            header = bytes([0x81, 126]) + struct.pack('!H', length)
+        else:
+            header = bytes([0x81, 127]) + struct.pack('!Q', length)
+        self.wfile.write(header + payload)
+        self.wfile.flush()
+
+
+def run(handler, *args):
+    """Call a command handler with its console output swallowed"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return handler(*args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='DevTools backend test against a mock browser')
+    parser.add_argument('--round-trips', type=int, default=500, help='Timed state reads (default: 500)')
+    parser.add_argument('--delay', type=float, default=10.0,
+                        help='Milliseconds each evaluation takes for the ALL_WINDOWS check (default: 10)')
+    args = parser.parse_args()
+
+    video = MockVideo()
+    tabs = [MockTab('A1', 'Lofi beats - YouTube', video), MockTab('B2', 'Inbox - Mail'),
+            MockTab('C3', 'Netflix', MockVideo(duration=3000.0))]
+    server = MockDevTools(tabs)
+    threading.Thread(target=server.serve_forever, name='devtools', daemon=True).start()
+    controller = PCController()
+    # Tabs are reordered below - look the active one up on every command
+    backend = controller.media_backend = CDPMediaBackend(port=server.port, target_ttl=0.0)
+    failures = []
+
+    def check(name, result, expect_in, **state):
+        actual = video.state()
+        wrong = {key: (actual[key], value) for key, value in state.items() if actual[key] != value}
+        ok = expect_in in (result or '') and not wrong
+        print(f"{'ok  ' if ok else 'FAIL'} {name:<22} {result}")
+        if not ok:
+            failures.append(f"{name}: {result!r}" + (f", state (got, wanted) {wrong}" if wrong else ''))
+
+    check('PLAYBACK_PAUSE', run(controller.playback_pause), 'via CDP (paused', paused=True)
+    check('PLAYBACK_PLAY', run(controller.playback_play), 'via CDP (playing', paused=False)
+    check('PLAYBACK_PLAY_PAUSE', run(controller.playback_play_pause), 'via CDP', paused=True)
+    check('SEEK_FORWARD_SMALL', run(controller.playback_seek_forward_small), 'via CDP', currentTime=35.0)
+    check('SEEK_BACKWARD_LARGE', run(controller.playback_seek_backward_large), 'via CDP', currentTime=25.0)
+    check('PLAYBACK_RESTART', run(controller.playback_restart), 'via CDP', currentTime=0.0)
+    check('PLAYBACK_JUMP_TO_END', run(controller.playback_jump_to_end), 'via CDP', currentTime=600.0)
+    check('PLAYBACK_RATE 1.5', run(controller.playback_rate, 1.5), '1.5x', playbackRate=1.5)
+    check('PLAYBACK_RATE 9', run(controller.playback_rate, 9.0), 'failed', playbackRate=1.5)
+    check('PLAYBACK_VOLUME_SET 40', run(controller.playback_volume_set, 40), 'volume 40%', volume=0.4)
+    check('BROWSER_TAB_MUTE', run(controller.browser_tab_mute), 'muted', muted=True)
+    check('BROWSER_TAB_UNMUTE', run(controller.browser_tab_unmute), 'via CDP', muted=False)
+    check('CAPTIONS_TOGGLE_ON', run(controller.captions_toggle_on), 'captions', captions=True)
+    check('PLAYBACK_STATE', run(controller.playback_state),
+          'PLAYBACK_STATE paused, 600.0s/600.0s, 1.5x, volume 40%, captions', paused=True)
+
+    # The browser dropped the connection (tab navigated) - one reconnect and retry
+    connections = server.connections
+    tabs[0].drop_next = True
+    check('dropped connection', run(controller.playback_play), 'via CDP (playing', paused=False)
+    if server.connections != connections + 1:
+        failures.append(f"dropped connection: {server.connections - connections} reconnects, wanted 1")
+
+    # Active tab without a video - the command falls back to keys
+    tabs.insert(0, tabs.pop(1))
+    check('tab without video', run(controller.playback_pause), 'PLAY_PAUSE executed (', paused=False)
+    tabs.insert(1, tabs.pop(0))
+
+    # Every tab at once: one thread and connection per tab, so about one evaluation's time
+    server.delay = args.delay / 1000
+    runner = FanOutRunner(controller, {'PLAYBACK_PAUSE': controller.playback_pause}, {})
+    start = time.perf_counter()
+    result = run(runner.run, 'PLAYBACK_PAUSE')
+    elapsed = time.perf_counter() - start
+    check('ALL_WINDOWS', result, 'on 2/3 tabs', paused=True)
+    if not tabs[2].video.paused:
+        failures.append("ALL_WINDOWS: the Netflix tab kept playing")
+    if elapsed > 2.5 * server.delay + 0.05:
+        failures.append(f"ALL_WINDOWS: {elapsed * 1000:.0f} ms for 3 tabs of {args.delay:.0f} ms each")
+    print(f"ALL_WINDOWS over 3 tabs of {args.delay:.0f} ms each took {elapsed * 1000:.1f} ms")
+    server.delay = 0.0
+    backend.close()
+
+    # A tab that answers after the fan-out deadline: its connection is dropped, so
+    # the late reply can't be taken for the next call's
+    slow = CDPMediaBackend(port=server.port, timeout=0.2)
+    netflix = tabs[2]
+    netflix.delay = 0.5
+    late = dict(slow.perform_all('play', title='Netflix'))['Netflix']
+    evicted = netflix.id not in slow._connections
+    netflix.delay = None
+    again = dict(slow.perform_all('pause', title='Netflix'))['Netflix']
+    ok = evicted and 'no answer' in str(late) and isinstance(again, dict) and again['paused']
+    print(f"{'ok  ' if ok else 'FAIL'} {'late tab':<22} {late}, then {describe_state(again) if ok else again}")
+    if not ok:
+        failures.append(f"late tab: {late!r}, then {again!r}" + ('' if evicted else ", connection kept in the pool"))
+    slow.close()
+
+    timed = CDPMediaBackend(port=server.port)  # Tab lookup reused like the companion does
+
+    times = []
+    for _ in range(args.round_trips):
+        start = time.perf_counter()
+        timed.state()
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    if times:
+        print(f"State read round trip over {len(times)}: mean {statistics.mean(times):.3f} ms  "
+              f"p50 {times[len(times) // 2]:.3f} ms  p99 {times[int(len(times) * 0.99)]:.3f} ms  "
+              f"({server.connections} connections opened)")
+
+    timed.close()
+    server.shutdown()
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
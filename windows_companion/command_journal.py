@@ -0,0 +1,356 @@
+"""
+Command journal
+
+Append-only binary log of every command the executor handled: when it arrived,
+which command and parameter, how long it ran, the outcome and the browser
+window/process it acted on. Records are queued by the executor and written by
+a background thread, so journaling costs the command path one queue put.
+
+File format (little-endian), one file per rotation generation:
+
+    b'PCJ1'                                          file header
+    'D' id:u16 len:u16 utf-8                         define a name (command or process)
+    'R' time:f64 duration_us:u32 outcome:u8          command record
+        command:u16 hwnd:u64 process:u16 len:u16 utf-8 param
+
+Names are defined once per file, so a record is ~28 bytes plus its parameter.
+Typed text and search queries (TEXT_COMMANDS) are never written: their
+parameter is replaced by a BLAKE2 hash keyed per run and the length, e.g.
+"#3f9c1a2b4d5e6f70 (42 chars)" - repeats within a run still show, the text
+can't be recovered from the file. The companion logs them the same way
+(redact()), so console lines and journal records of one run match.
+When the file grows past max_bytes it is rotated like logging's
+RotatingFileHandler (journal.bin -> journal.bin.1 -> ...). A restart appends
+to the current file; a record a previous run cut off mid-write is truncated
+away first.
+
+Reading streams the files in chunks and never loads a journal into memory:
+
+    python command_journal.py journal.bin            # summary of all generations
+    python command_journal.py journal.bin --top 20 --hours
+"""
+
+import hashlib
+import heapq
+import os
+import queue
+import struct
+import threading
+import time
+from collections import namedtuple
+
+MAGIC = b'PCJ1'
+_DEFINE = struct.Struct('<cHH')
+_RECORD = struct.Struct('<cdIBHQHH')
+
+OUTCOMES = ('ok', 'failed', 'cancelled', 'dropped')
+OUTCOME_CODES = {name: code for code, name in enumerate(OUTCOMES)}
+
+# Records written per batch before the writer thread flushes
+WRITE_BATCH = 256
+# Longest parameter kept (bytes) - URLs and search queries are truncated beyond
+MAX_PARAM_BYTES = 1024
+# Bytes read per chunk when streaming
+READ_CHUNK = 1 << 20
+# Commands whose parameter is text the user typed or searched for - journaled as a hash
+TEXT_COMMANDS = frozenset({'TYPE_TEXT', 'SEARCH_CURRENT_SITE', 'SEARCH_YOUTUBE', 'SEARCH_HULU',
+                           'SEARCH_NETFLIX'})
+
+JournalRecord = namedtuple('JournalRecord', 'time duration command param outcome hwnd process')
+
+_TEXT_KEY = os.urandom(16)  # Hashes of typed text only compare within one run
+
+
+def redact(text):
+    """Keyed hash and length of typed or searched text - shows repeats, not the text"""
+    digest = hashlib.blake2b(text.encode('utf-8'), digest_size=8, key=_TEXT_KEY).hexdigest()
+    return f"#{digest} ({len(text)} chars)"
+
+
+class CommandJournal:
+    """Background writer for the binary command journal"""
+
+    def __init__(self, path, max_bytes=4 * 1024 * 1024, backups=5, flush_interval=1.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_interval = flush_interval
+        self.written = 0
+        self._queue = queue.SimpleQueue()
+        self._file = None
+        self._names = {}
+        self._thread = threading.Thread(target=self._run, name='command-journal', daemon=True)
+        self._thread.start()
+
+    def record(self, started, duration, command, param, outcome, hwnd=0, process=None):
+        """Queue one record (called on the command path - no I/O here)"""
+        self._queue.put((started, duration, command, param, OUTCOME_CODES[outcome], hwnd or 0, process))
+
+    def close(self, timeout=2.0):
+        """Write everything queued so far and close the file"""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    # Writer thread
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, 'wb')
+        self._file.write(MAGIC)
+        self._names = {}
+
+    def _shift(self):
+        """Move the current file to .1 (and older generations up by one)"""
+        for index in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def _rotate(self):
+        self._file.close()
+        self._shift()
+        self._open()
+
+    def _resume(self):
+        """Append to the journal a previous run left, cut back to its last complete record"""
+        names = {}
+        end = len(MAGIC)
+        try:
+            for kind, payload, end in _iter_raw(self.path):
+                if kind == b'D':
+                    names[payload[1]] = payload[0]
+        except ValueError:
+            self._shift()  # Not ours, or corrupt - keep it as a generation, start a new file
+            self._open()
+            return
+        self._file = open(self.path, 'r+b')
+        self._file.truncate(end)
+        self._file.seek(end)
+        self._names = names
+        if end >= self.max_bytes:
+            self._rotate()
+
+    def _name_id(self, name, out):
+        name_id = self._names.get(name)
+        if name_id is None:
+            name_id = self._names[name] = len(self._names) + 1  # 0 = none
+            encoded = name.encode('utf-8')[:0xFFFF]
+            out.append(_DEFINE.pack(b'D', name_id, len(encoded)))
+            out.append(encoded)
+        return name_id
+
+    def _encode(self, entry, out):
+        started, duration, command, param, outcome, hwnd, process = entry
+        command_id = self._name_id(command, out)
+        process_id = self._name_id(process, out) if process else 0
+        if param and command in TEXT_COMMANDS:
+            param = redact(param)
+        encoded = param.encode('utf-8')[:MAX_PARAM_BYTES] if param else b''
+        out.append(_RECORD.pack(b'R', started, min(int(duration * 1e6), 0xFFFFFFFF), outcome,
+                                command_id, hwnd & 0xFFFFFFFFFFFFFFFF, process_id, len(encoded)))
+        if encoded:
+            out.append(encoded)
+
+    def _run(self):
+        try:
+            if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+                self._resume()
+            else:
+                self._open()
+        except OSError as e:
+            print(f"Command journal disabled - can't open {self.path}: {e}")
+            return
+        while True:
+            try:
+                entry = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = [entry]
+            while entry is not None and len(batch) < WRITE_BATCH:
+                try:
+                    entry = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(entry)
+
+            out = []
+            for entry in batch:
+                if entry is not None:
+                    self._encode(entry, out)
+                    self.written += 1
+            try:
+                self._file.write(b''.join(out))
+                self._file.flush()
+                if self._file.tell() >= self.max_bytes:
+                    self._rotate()
+            except OSError as e:
+                print(f"Command journal write failed: {e}")
+            if batch[-1] is None:
+                self._file.close()
+                return
+
+
+def _iter_raw(path):
+    """Stream ('D', (id, name), end) and ('R', fields, end) entries from one file
+
+    end is the file offset just past the entry.
+    """
+    define_size = _DEFINE.size
+    record_size = _RECORD.size
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a command journal")
+        buffer = b''
+        base = len(MAGIC)  # File offset of buffer[0]
+        while True:
+            chunk = f.read(READ_CHUNK)
+            if not chunk:
+                return  # A truncated record at the end (crash mid-write) is ignored
+            buffer = buffer + chunk if buffer else chunk
+            view = memoryview(buffer)
+            offset = 0
+            end = len(buffer)
+            while offset < end:
+                kind = buffer[offset:offset + 1]
+                if kind == b'R':
+                    if offset + record_size > end:
+                        break
+                    fields = _RECORD.unpack_from(view, offset)
+                    param_end = offset + record_size + fields[7]
+                    if param_end > end:
+                        break
+                    yield b'R', (fields, bytes(view[offset + record_size:param_end])), base + param_end
+                    offset = param_end
+                elif kind == b'D':
+                    if offset + define_size > end:
+                        break
+                    _, name_id, length = _DEFINE.unpack_from(view, offset)
+                    name_end = offset + define_size + length
+                    if name_end > end:
+                        break
+                    yield b'D', (name_id, bytes(view[offset + define_size:name_end]).decode('utf-8', 'replace')), \
+                        base + name_end
+                    offset = name_end
+                else:
+                    raise ValueError(f"{path} is corrupt (unknown record type {kind!r})")
+            view.release()
+            base += offset
+            buffer = buffer[offset:]
+
+
+def journal_files(path):
+    """The journal and its rotated generations, oldest first"""
+    files = []
+    index = 1
+    while os.path.exists(f"{path}.{index}"):
+        files.append(f"{path}.{index}")
+        index += 1
+    files.reverse()
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def read_journal(path):
+    """Stream JournalRecords from a journal and all its rotated files, oldest first"""
+    for file_path in journal_files(path):
+        names = {0: None}
+        for kind, payload, _ in _iter_raw(file_path):
+            if kind == b'D':
+                names[payload[0]] = payload[1]
+                continue
+            fields, param = payload
+            _, started, duration_us, outcome, command_id, hwnd, process_id, _ = fields
+            yield JournalRecord(started, duration_us / 1e6, names.get(command_id),
+                                param.decode('utf-8', 'replace') if param else None,
+                                OUTCOMES[outcome], hwnd, names.get(process_id))
+
+
+class JournalSummary:
+    """Single-pass aggregates over a record stream (memory bounded by distinct commands/hours)"""
+
+    def __init__(self, top=10):
+        self.top = top
+        self.records = 0
+        self.first = None
+        self.last = None
+        self.per_command = {}  # command -> [count, total seconds, max seconds, failures]
+        self.per_hour = {}  # Hours since the epoch -> count
+        self.failures = {}  # (command, process, outcome) -> count
+        self._slowest = []  # Min-heap of (duration, time, command, param)
+
+    def add(self, record):
+        self.records += 1
+        if self.first is None:
+            self.first = record.time
+        self.last = record.time
+        stats = self.per_command.get(record.command)
+        if stats is None:
+            stats = self.per_command[record.command] = [0, 0.0, 0.0, 0]
+        stats[0] += 1
+        stats[1] += record.duration
+        if record.duration > stats[2]:
+            stats[2] = record.duration
+        hour = int(record.time // 3600)  # Formatted only when reporting
+        self.per_hour[hour] = self.per_hour.get(hour, 0) + 1
+        if record.outcome != 'ok':
+            stats[3] += 1
+            key = (record.command, record.process, record.outcome)
+            self.failures[key] = self.failures.get(key, 0) + 1
+        entry = (record.duration, record.time, record.command, record.param)
+        if len(self._slowest) < self.top:
+            heapq.heappush(self._slowest, entry)
+        elif entry > self._slowest[0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    def slowest(self):
+        return sorted(self._slowest, reverse=True)
+
+    def report(self, hours=False):
+        lines = [f"{self.records} records"]
+        if self.records:
+            lines[0] += (f" from {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.first))}"
+                         f" to {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.last))}")
+        lines.append("\nSlowest commands:")
+        for duration, started, command, param in self.slowest():
+            when = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(started))
+            lines.append(f"  {duration * 1000:9.1f} ms  {when}  {command}{':' + param if param else ''}")
+        lines.append("\nPer command:            count   mean ms    max ms  failures")
+        by_total = sorted(self.per_command.items(), key=lambda item: item[1][1], reverse=True)
+        for command, (count, total, longest, failed) in by_total:
+            lines.append(f"  {command:<20} {count:7d} {total / count * 1000:9.1f} {longest * 1000:9.1f} {failed:9d}")
+        lines.append("\nFailure hotspots:")
+        for (command, process, outcome), count in sorted(self.failures.items(), key=lambda item: -item[1])[:self.top]:
+            lines.append(f"  {count:7d}  {command} {outcome} ({process or 'no window'})")
+        if hours:
+            lines.append("\nCommands per hour:")
+            for hour, count in sorted(self.per_hour.items()):
+                lines.append(f"  {time.strftime('%Y-%m-%d %H:00', time.localtime(hour * 3600))}  {count:7d}")
+        return '\n'.join(lines)
+
+
+def summarize(path, top=10):
+    summary = JournalSummary(top)
+    for record in read_journal(path):
+        summary.add(record)
+    return summary
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Command journal reader')
+    parser.add_argument('journal', help='Journal file (rotated .1, .2, ... files are included)')
+    parser.add_argument('--top', type=int, default=10, help='Slowest commands / hotspots listed (default: 10)')
+    parser.add_argument('--hours', action='store_true', help='Also print commands per hour')
+    args = parser.parse_args()
+    started = time.perf_counter()
+    summary = summarize(args.journal, args.top)
+    print(summary.report(hours=args.hours))
+    print(f"\nRead in {time.perf_counter() - started:.2f}s")
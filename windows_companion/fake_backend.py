@@ -0,0 +1,422 @@
+"""
+Fake Windows backend
+
+Stands in for pywin32, ctypes.windll and psutil when the companion runs on a
+machine without them (a Linux box driving the ESP32 emulator, load and soak
+tests). It simulates a small desktop - a couple of monitors and browser
+windows - and records injected input instead of delivering it.
+
+Set PC_CONTROLLER_FAKE_KEYLOG=<path> to also append every key event as
+"<monotonic_ns> <vk> <flags>" lines, which the emulator load test uses to
+measure HTTP-to-keystroke latency.
+"""
+
+import collections
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+# Recent input events kept in memory (oldest are discarded)
+EVENT_HISTORY = 10000
+
+WS_CAPTION = 0x00C00000
+SW_SHOWNORMAL = 1
+VK_F11 = 0x7A
+
+
+class FakeWindow:
+    __slots__ = ('hwnd', 'title', 'process_name', 'pid', 'visible', 'iconic', 'rect',
+                 'show_cmd', 'style', 'restore_rect')
+
+    def __init__(self, hwnd, title, process_name, pid, rect=(0, 0, 1920, 1080)):
+        self.hwnd = hwnd
+        self.title = title
+        self.process_name = process_name
+        self.pid = pid
+        self.visible = True
+        self.iconic = False
+        self.rect = rect
+        self.show_cmd = SW_SHOWNORMAL
+        self.style = WS_CAPTION
+        self.restore_rect = None  # Rect before F11 fullscreen
+
+
+class FakeDesktop:
+    """Windows, monitors, focus and the input event log of the simulated session"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.windows = [
+            FakeWindow(0x1001, 'YouTube - Google Chrome', 'chrome.exe', 4100),
+            FakeWindow(0x1002, 'Notepad', 'notepad.exe', 4200),
+        ]
+        # Child windows per top-level window: (hwnd, class name)
+        self.children = {0x1001: [(0x1101, 'Chrome_RenderWidgetHostHWND')]}
+        self.monitors = [(0, 0, 1920, 1080), (1920, 0, 5760, 2160)]
+        # Processes without windows: pid -> executable name
+        self.processes = {4101: 'chrome.exe', 4300: 'Spotify.exe'}  # 4101: Chrome's audio service
+        self.foreground = None
+        self.batches = {}  # BeginDeferWindowPos handle -> deferred moves
+        self.next_batch = 0x3001
+        self.cursor = (960, 540)
+        self.events = collections.deque(maxlen=EVENT_HISTORY)
+        self.key_count = 0
+        self.typed = []  # UTF-16 code units typed (KEYEVENTF_UNICODE or WM_CHAR)
+        keylog = os.environ.get('PC_CONTROLLER_FAKE_KEYLOG')
+        self._keylog = open(keylog, 'a', buffering=1) if keylog else None
+
+    def window(self, hwnd):
+        for window in self.windows:
+            if window.hwnd == hwnd:
+                return window
+        return None
+
+    def record(self, kind, *args):
+        with self.lock:
+            self.events.append((time.monotonic_ns(), kind) + args)
+
+    def key(self, vk, flags):
+        now = time.monotonic_ns()
+        with self.lock:
+            self.key_count += 1
+            self.events.append((now, 'key', vk, flags))
+            if self._keylog is not None:
+                self._keylog.write(f"{now} {vk} {flags}\n")
+        if vk == VK_F11 and not flags & 0x0002:
+            self.toggle_fullscreen(self.window(self.foreground))
+
+    def char(self, unit, flags):
+        with self.lock:
+            self.events.append((time.monotonic_ns(), 'char', unit, flags))
+            if not flags & 0x0002:
+                self.typed.append(unit)
+
+    def typed_text(self):
+        units = b''.join(unit.to_bytes(2, 'little') for unit in self.typed)
+        return units.decode('utf-16-le', errors='replace')
+
+    def toggle_fullscreen(self, window):
+        """F11 in a browser: cover the window's monitor without a caption, or go back"""
+        if window is None:
+            return
+        if window.restore_rect is not None:
+            window.rect, window.restore_rect = window.restore_rect, None
+            window.style |= WS_CAPTION
+            return
+        center_x = (window.rect[0] + window.rect[2]) // 2
+        center_y = (window.rect[1] + window.rect[3]) // 2
+        for monitor in self.monitors:
+            if monitor[0] <= center_x < monitor[2] and monitor[1] <= center_y < monitor[3]:
+                window.restore_rect, window.rect = window.rect, monitor
+                window.style &= ~WS_CAPTION
+                return
+
+
+desktop = FakeDesktop()
+
+
+class _FakeDLL:
+    """Records calls to any function it is asked for and returns success"""
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, function):
+        if function.startswith('__'):
+            raise AttributeError(function)
+
+        def call(*args):
+            desktop.record(f"{self._name}.{function}", *args)
+            return 1
+        return call
+
+
+class _FakeUser32(_FakeDLL):
+    def keybd_event(self, vk, scan, flags, extra):
+        desktop.key(vk, flags)
+
+    def SendInput(self, count, inputs, size):
+        now = time.monotonic_ns()
+        left = min(monitor[0] for monitor in desktop.monitors)
+        top = min(monitor[1] for monitor in desktop.monitors)
+        right = max(monitor[2] for monitor in desktop.monitors)
+        bottom = max(monitor[3] for monitor in desktop.monitors)
+        for event in inputs[:count]:
+            if event.type == 0:  # INPUT_MOUSE - relative moves clamp to the virtual screen
+                mouse = event.union.mi
+                x = min(max(desktop.cursor[0] + mouse.dx, left), right - 1)
+                y = min(max(desktop.cursor[1] + mouse.dy, top), bottom - 1)
+                desktop.cursor = (x, y)
+                data = mouse.mouseData - (1 << 32) if mouse.mouseData >= 1 << 31 else mouse.mouseData
+                with desktop.lock:
+                    desktop.events.append((now, 'mouse', mouse.dx, mouse.dy, data, mouse.dwFlags))
+            elif event.type == 1:  # INPUT_KEYBOARD
+                key = event.union.ki
+                if key.dwFlags & 0x0004:  # KEYEVENTF_UNICODE
+                    desktop.char(key.wScan, key.dwFlags)
+                else:
+                    desktop.key(key.wVk, key.dwFlags)
+        return count
+
+    def BeginDeferWindowPos(self, count):
+        batch = desktop.next_batch
+        desktop.next_batch += 1
+        desktop.batches[batch] = []
+        return batch
+
+    def DeferWindowPos(self, batch, hwnd, insert_after, x, y, cx, cy, flags):
+        moves = desktop.batches.get(batch)
+        if moves is None or desktop.window(hwnd) is None:
+            desktop.batches.pop(batch, None)  # A failed DeferWindowPos frees the batch
+            return 0
+        moves.append((hwnd, insert_after, x, y, cx, cy, flags))
+        return batch
+
+    def EndDeferWindowPos(self, batch):
+        moves = desktop.batches.pop(batch, None)
+        if moves is None:
+            return 0
+        desktop.record('batch', len(moves))
+        for move in moves:
+            _set_window_pos(*move)
+        return 1
+
+
+windll = SimpleNamespace(user32=_FakeUser32('user32'), kernel32=_FakeDLL('kernel32'),
+                         powrprof=_FakeDLL('powrprof'), winmm=_FakeDLL('winmm'), dwmapi=_FakeDLL('dwmapi'))
+
+# Height of the taskbar at the bottom of every monitor (work area = monitor minus taskbar)
+TASKBAR_HEIGHT = 40
+
+
+def _enum_windows(callback, extra):
+    for window in list(desktop.windows):
+        if not callback(window.hwnd, extra):
+            break
+
+
+def _set_foreground(hwnd):
+    desktop.foreground = hwnd
+    desktop.record('focus', hwnd)
+
+
+def _show_window(hwnd, command):
+    window = desktop.window(hwnd)
+    if window is not None:
+        window.iconic = command == win32con.SW_MINIMIZE
+        window.show_cmd = SW_SHOWNORMAL if command == win32con.SW_RESTORE else command
+    desktop.record('show', hwnd, command)
+
+
+def _set_window_pos(hwnd, insert_after, x, y, cx, cy, flags):
+    window = desktop.window(hwnd)
+    if window is not None and not flags & 0x0001:  # SWP_NOSIZE (z-order only)
+        window.rect = (x, y, x + cx, y + cy)
+    desktop.record('move', hwnd, x, y, cx, cy)
+
+
+def _set_window_placement(hwnd, placement):
+    window = desktop.window(hwnd)
+    if window is None:
+        raise _Win32Error(1400, 'SetWindowPlacement', 'Invalid window handle.')
+    show_cmd, normal = placement[1], placement[4]
+    window.rect = tuple(normal)  # Workspace = screen coordinates with the taskbar at the bottom
+    window.iconic = show_cmd in (2, 6, 7)
+    window.show_cmd = {4: SW_SHOWNORMAL, 6: 2, 7: 2}.get(show_cmd, show_cmd)
+    desktop.record('placement', hwnd, show_cmd, *normal)
+
+
+def _monitor_info(handle):
+    rect = desktop.monitors[handle - 0x2000]
+    return {'Monitor': rect, 'Work': (rect[0], rect[1], rect[2], rect[3] - TASKBAR_HEIGHT),
+            'Flags': 1 if handle == 0x2000 else 0, 'Device': f"\\\\.\\DISPLAY{handle - 0x1fff}"}
+
+
+def _system_metrics(index):
+    if index == 80:  # SM_CMONITORS
+        return len(desktop.monitors)
+    left = min(monitor[0] for monitor in desktop.monitors)
+    top = min(monitor[1] for monitor in desktop.monitors)
+    right = max(monitor[2] for monitor in desktop.monitors)
+    bottom = max(monitor[3] for monitor in desktop.monitors)
+    # SM_XVIRTUALSCREEN, SM_YVIRTUALSCREEN, SM_CXVIRTUALSCREEN, SM_CYVIRTUALSCREEN
+    return {76: left, 77: top, 78: right - left, 79: bottom - top}.get(index, 0)
+
+
+def _post_message(hwnd, message, wparam, lparam):
+    if message == win32con.WM_CLOSE:
+        desktop.windows = [w for w in desktop.windows if w.hwnd != hwnd]
+    if message in (0x0100, 0x0101):  # WM_KEYDOWN / WM_KEYUP posted to a window
+        desktop.key(wparam, win32con.KEYEVENTF_KEYUP if message == 0x0101 else 0)
+        return
+    if message == 0x0102:  # WM_CHAR
+        desktop.char(wparam, 0)
+        return
+    desktop.record('post', hwnd, message, wparam, lparam)
+
+
+def _enum_child_windows(hwnd, callback, extra):
+    for child, _ in desktop.children.get(hwnd, ()):
+        if not callback(child, extra):
+            break
+
+
+def _child_class(hwnd):
+    for children in desktop.children.values():
+        for child, class_name in children:
+            if child == hwnd:
+                return class_name
+    return ''
+
+
+def _is_window(hwnd):
+    return bool(desktop.window(hwnd) or _child_class(hwnd))
+
+
+class _Win32Error(Exception):
+    """pywintypes.error - (winerror, funcname, strerror)"""
+
+
+win32gui = SimpleNamespace(
+    error=_Win32Error,
+    EnumWindows=_enum_windows,
+    IsWindow=_is_window,
+    IsWindowVisible=lambda hwnd: bool(_child_class(hwnd) or desktop.window(hwnd) and desktop.window(hwnd).visible),
+    EnumChildWindows=_enum_child_windows,
+    GetClassName=_child_class,
+    IsIconic=lambda hwnd: bool(desktop.window(hwnd) and desktop.window(hwnd).iconic),
+    GetWindowText=lambda hwnd: desktop.window(hwnd).title if desktop.window(hwnd) else '',
+    GetForegroundWindow=lambda: desktop.foreground or 0,
+    SetForegroundWindow=_set_foreground,
+    ShowWindow=_show_window,
+    SetWindowPos=_set_window_pos,
+    PostMessage=_post_message,
+    GetWindowRect=lambda hwnd: desktop.window(hwnd).rect,
+    GetWindowPlacement=lambda hwnd: (0, 2 if desktop.window(hwnd).iconic else desktop.window(hwnd).show_cmd,
+                                     (-1, -1), (-1, -1), desktop.window(hwnd).rect),
+    SetWindowPlacement=_set_window_placement,
+    GetWindowLong=lambda hwnd, index: desktop.window(hwnd).style if index == -16 else 0,
+)
+
+win32process = SimpleNamespace(
+    GetWindowThreadProcessId=lambda hwnd: (1, desktop.window(hwnd).pid if desktop.window(hwnd) else 0),
+)
+
+win32api = SimpleNamespace(
+    EnumDisplayMonitors=lambda hdc=None, clip=None: [(0x2000 + index, 0, rect)
+                                                     for index, rect in enumerate(desktop.monitors)],
+    GetMonitorInfo=_monitor_info,
+    GetSystemMetrics=_system_metrics,
+)
+
+win32con = SimpleNamespace(
+    KEYEVENTF_KEYUP=0x0002,
+    VK_TAB=0x09, VK_RETURN=0x0D, VK_SHIFT=0x10, VK_CONTROL=0x11, VK_MENU=0x12,
+    VK_ESCAPE=0x1B, VK_SPACE=0x20, VK_PRIOR=0x21, VK_NEXT=0x22, VK_END=0x23,
+    VK_HOME=0x24, VK_LEFT=0x25, VK_UP=0x26, VK_RIGHT=0x27, VK_DOWN=0x28,
+    VK_DELETE=0x2E, VK_F5=0x74, VK_F11=0x7A,
+    SW_MAXIMIZE=3, SW_MINIMIZE=6, SW_RESTORE=9,
+    HWND_TOP=0, SWP_SHOWWINDOW=0x0040, WM_CLOSE=0x0010,
+)
+
+
+class FakeAudioSession:
+    __slots__ = ('pid', 'volume', 'muted', 'ended')
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.volume = 1.0
+        self.muted = False
+        self.ended = False
+
+    def expired(self):
+        return self.ended
+
+    def get_volume(self):
+        return self.volume
+
+    def set_volume(self, level):
+        self.volume = level
+
+    def get_mute(self):
+        return self.muted
+
+    def set_mute(self, muted):
+        self.muted = muted
+
+
+class FakeAudioMixer:
+    """Per-process audio sessions of the simulated output devices (see audio_sessions.py)"""
+
+    def __init__(self):
+        # System sounds, Chrome's audio service, Spotify
+        self.active = [FakeAudioSession(0), FakeAudioSession(4101), FakeAudioSession(4300)]
+        self.enumerations = 0
+        self._watchers = []
+        self._device_watchers = []
+
+    def sessions(self):
+        self.enumerations += 1
+        return list(self.active)
+
+    def watch(self, callback):
+        self._watchers = [callback]  # Replaces the subscriptions of the last enumeration
+
+    def watch_devices(self, callback):
+        self._device_watchers.append(callback)
+
+    def add_device(self, pids):
+        """An output device appears and becomes the default (HDMI plugged in): the
+        processes get sessions on it, and only a device notification says so"""
+        sessions = [FakeAudioSession(pid) for pid in pids]
+        self.active.extend(sessions)
+        for callback in self._device_watchers:
+            callback()
+        return sessions
+
+    def start_session(self, pid):
+        """A process starts playing: new session, session-created notification"""
+        session = FakeAudioSession(pid)
+        self.active.append(session)
+        for callback in self._watchers:
+            callback(session)
+        return session
+
+    def end_session(self, pid):
+        for session in self.active:
+            if session.pid == pid:
+                session.ended = True
+        self.active = [session for session in self.active if not session.ended]
+
+    def session(self, pid):
+        return next((session for session in self.active if session.pid == pid), None)
+
+
+audio_mixer = FakeAudioMixer()
+
+
+class _ProcessError(Exception):
+    pass
+
+
+class _Process:
+    def __init__(self, pid):
+        for window in desktop.windows:
+            if window.pid == pid:
+                self.pid = pid
+                self._name = window.process_name
+                return
+        if pid in desktop.processes:
+            self.pid = pid
+            self._name = desktop.processes[pid]
+            return
+        raise psutil.NoSuchProcess(pid)
+
+    def name(self):
+        return self._name
+
+
+psutil = SimpleNamespace(Process=_Process,
+                         NoSuchProcess=type('NoSuchProcess', (_ProcessError,), {}),
+                         AccessDenied=type('AccessDenied', (_ProcessError,), {}))
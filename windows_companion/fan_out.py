@@ -0,0 +1,162 @@
+"""
+Fan-out commands - one command for every browser window
+
+Playback and tab audio commands act on the first browser window only, so
+"pause everything" meant sending PLAYBACK_PAUSE again and again and hoping
+focus moved on in between. ALL_WINDOWS runs one of them on every browser
+window, or on the ones a filter picks, and reports what happened in each:
+
+    ALL_WINDOWS:PLAYBACK_PAUSE
+    ALL_WINDOWS:BROWSER_TAB_MUTE,title=YouTube
+    ALL_WINDOWS:BROWSER_VOLUME_SET:30,process=chrome.exe
+    ALL_WINDOWS:PLAYBACK_PLAY_PAUSE,process=firefox.exe,title=Netflix
+
+process= matches the executable name (".exe" may be left out), title= a part
+of the window title; both ignore case, and title takes the rest of the line.
+
+The windows are reached with as little focus switching as possible:
+
+- Over CDP (--cdp-port) the action runs in every debuggable tab whose title
+  matches at once, one connection and thread per tab - explicit play/pause,
+  no focus at all (a process filter skips this - tabs can't be told apart by
+  process).
+- Tab mute and browser volume go to the audio sessions of each matching
+  browser process (not with a title filter - sessions belong to the process,
+  which may have windows the filter left out).
+- Otherwise keys are posted to the render widget of every Chromium window in
+  lockstep (whatever --key-delivery says - focusing each window in turn is
+  what fan-out is there to avoid): each step of the site's key sequence goes
+  to all windows, then one wait covers them all. Only windows that can't take
+  posted keys (Firefox), or whose sequence has a modifier chord (Shift+N), are
+  focused, one at a time, and the window that had the focus gets it back.
+- Keys that only toggle aren't sent: PLAYBACK_PLAY/PAUSE without CDP and
+  BROWSER_TAB_MUTE/UNMUTE without CDP or audio sessions would flip windows
+  that were already playing, paused or muted. Every window is reported "not
+  supported" instead.
+
+    STATUS:ALL_WINDOWS PLAYBACK_PLAY_PAUSE executed on 3/3 windows in 4ms (chrome.exe 'YouTube - Google C...': posted; ...)
+
+fan_out_bench.py compares the time against repeating the single command per
+window as the number of windows grows.
+"""
+
+import os
+import time
+
+try:
+    if os.environ.get('PC_CONTROLLER_FAKE_BACKEND'):
+        raise ImportError("fake backend requested")
+    import win32gui
+except ImportError:
+    from fake_backend import win32gui
+
+# Commands ALL_WINDOWS can fan out
+FAN_OUT_COMMANDS = (
+    'PLAYBACK_PLAY', 'PLAYBACK_PAUSE', 'PLAYBACK_PLAY_PAUSE', 'PLAYBACK_STOP', 'PLAYBACK_RESTART',
+    'PLAYBACK_SEEK_FORWARD_SMALL', 'PLAYBACK_SEEK_BACKWARD_SMALL', 'PLAYBACK_SEEK_FORWARD_LARGE',
+    'PLAYBACK_SEEK_BACKWARD_LARGE', 'PLAYBACK_JUMP_TO_BEGINNING', 'PLAYBACK_JUMP_TO_END',
+    'PLAYBACK_NEXT_VIDEO', 'PLAYBACK_PREVIOUS_VIDEO',
+    'BROWSER_TAB_MUTE', 'BROWSER_TAB_UNMUTE', 'BROWSER_VOLUME_SET',
+)
+# Characters of a window or tab title shown in the per-window outcomes
+TITLE_CHARS = 20
+
+
+def parse_fan_out(param):
+    """'COMMAND[:param][,process=<exe>][,title=<text>]' -> (command, param, process, title)"""
+    head, _, rest = (param or '').partition(',')
+    command, _, command_param = head.strip().partition(':')
+    process = title = None
+    while rest:
+        key, _, value = rest.partition('=')
+        key = key.strip().lower()
+        if key == 'title':
+            title = value.strip()  # May contain commas - takes the rest
+            break
+        if key != 'process':
+            raise ValueError(f"unknown filter {key!r} (use process= or title=)")
+        value, _, rest = value.partition(',')
+        process = value.strip()
+    if not command:
+        raise ValueError("missing command")
+    return command.upper(), command_param or None, process or None, title or None
+
+
+class FanOut:
+    """Browser windows one ALL_WINDOWS command acts on (PCController.fan_out while it runs)"""
+
+    __slots__ = ('windows', 'process', 'title', 'outcomes', 'focused')
+
+    def __init__(self, windows, process=None, title=None):
+        self.windows = windows  # [(hwnd, title, process name)] in z-order
+        self.process = process
+        self.title = title
+        self.outcomes = []  # (label, text, ok) - ok None for skipped (no video, not supported)
+        self.focused = 0  # Windows that had to be focused
+
+    @staticmethod
+    def label(kind, title):
+        """How a window or tab is named in the outcomes: <process or 'tab'> '<start of the title>'"""
+        return f"{kind} '{title if len(title) <= TITLE_CHARS else title[:TITLE_CHARS] + '...'}'"
+
+    def record(self, what, text, ok=True):
+        self.outcomes.append((what, text, ok))
+
+
+class FanOutRunner:
+    """Runs ALL_WINDOWS through the companion's command handlers"""
+
+    def __init__(self, controller, commands, param_commands):
+        self.controller = controller
+        self.commands = commands
+        self.param_commands = param_commands
+
+    def _matches(self, window, process, title):
+        name = window[2].lower()
+        if process is not None and name not in (process.lower(), f"{process.lower()}.exe"):
+            return False
+        return title is None or title.lower() in window[1].lower()
+
+    def run(self, param):
+        """Run a command on every matching browser window; returns the status message"""
+        try:
+            command, command_param, process, title = parse_fan_out(param)
+        except ValueError as e:
+            return f"ALL_WINDOWS failed - {e}"
+        if command not in FAN_OUT_COMMANDS:
+            return f"ALL_WINDOWS failed - {command} can't be fanned out (playback and tab audio commands can)"
+        handlers = self.param_commands if command_param is not None else self.commands
+        if command not in handlers:
+            return f"ALL_WINDOWS failed - {command} {'takes no' if command_param else 'needs a'} parameter"
+        if command == 'BROWSER_VOLUME_SET' and title is not None:
+            return "ALL_WINDOWS failed - BROWSER_VOLUME_SET is per browser process, filter by process="
+        controller = self.controller
+        windows = [window for window in controller.find_browser_windows()
+                   if self._matches(window, process, title)]
+        if not windows:
+            return "ALL_WINDOWS failed - no matching browser window"
+
+        foreground = win32gui.GetForegroundWindow()
+        fan_out = controller.fan_out = FanOut(windows, process, title)
+        start = time.perf_counter()
+        try:
+            if command_param is not None:
+                result = handlers[command](command_param)
+            else:
+                result = handlers[command]()
+        finally:
+            controller.fan_out = None
+            controller.release_key_target()
+            # Windows that were focused for keys (or a modifier chord) - hand the focus back once
+            if foreground and win32gui.IsWindow(foreground) and win32gui.GetForegroundWindow() != foreground:
+                win32gui.SetForegroundWindow(foreground)
+        elapsed = (time.perf_counter() - start) * 1000
+        if not fan_out.outcomes:
+            return f"ALL_WINDOWS {result}"
+        done = sum(1 for _, _, ok in fan_out.outcomes if ok)
+        unit = ('tabs' if ' via CDP' in str(result) else
+                'browser processes' if ' via audio sessions' in str(result) else 'windows')
+        details = '; '.join(f"{what}: {text}" for what, text, _ in fan_out.outcomes)
+        verb = 'executed on' if done else 'failed on all'
+        count = f"{done}/{len(fan_out.outcomes)}" if done else f"{len(fan_out.outcomes)}"
+        return f"ALL_WINDOWS {command} {verb} {count} {unit} in {elapsed:.0f}ms ({details})"
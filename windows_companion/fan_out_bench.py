@@ -0,0 +1,127 @@
+"""
+Fan-out time against the number of browser windows
+
+Opens N browser windows on the fake backend (Chromium windows with a render
+widget, --firefox of them without one) on YouTube, Netflix, Hulu and other
+pages, with another application in the foreground, and runs a command on all
+of them twice:
+
+- one by one, as before ALL_WINDOWS: each window brought to the top of the
+  z-order, then the single command (focus, settle, keys)
+- as ALL_WINDOWS:<command> (keys posted in lockstep, only the windows that
+  can't take them focused)
+
+Prints the time, focus switches and key events of both per window count.
+Exits with 1 when the fan-out misses a window, sends a different number of
+key events than the one-by-one run, or leaves the focus somewhere else.
+
+    python fan_out_bench.py                              # PLAYBACK_PLAY_PAUSE, 1 to 64 windows
+    python fan_out_bench.py --command PLAYBACK_STOP --firefox 0.25 --max-windows 16
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+os.environ['PC_CONTROLLER_FAKE_BACKEND'] = '1'  # Never press keys on the real desktop
+
+from fake_backend import FakeWindow, desktop  # noqa: E402 - needs the environment above
+from fan_out import FAN_OUT_COMMANDS, FanOutRunner  # noqa: E402
+from pc_controller import PCController  # noqa: E402
+
+# Window titles the browsers show, in turn
+PAGES = ('Lofi beats - YouTube - Google Chrome', 'Netflix - Google Chrome',
+         'Hulu | Watch - Google Chrome', 'Twitch - Google Chrome')
+# The application that has the focus while the commands run
+FOREGROUND = FakeWindow(0x4001, 'Document - Word', 'winword.exe', 4400)
+
+
+def open_windows(count, firefox):
+    """Replace the fake desktop's windows with count browser windows behind FOREGROUND"""
+    desktop.windows = [FOREGROUND]
+    desktop.children = {}
+    firefox_count = round(count * firefox)
+    for i in range(count):
+        hwnd = 0x5000 + i
+        if i < count - firefox_count:
+            title = f"{PAGES[i % len(PAGES)]} ({i + 1})"
+            desktop.windows.append(FakeWindow(hwnd, title, 'chrome.exe', 5000 + i))
+            desktop.children[hwnd] = [(0x6000 + i, 'Chrome_RenderWidgetHostHWND')]
+        else:
+            title = f"{PAGES[i % len(PAGES)].replace('Google Chrome', 'Mozilla Firefox')} ({i + 1})"
+            desktop.windows.append(FakeWindow(hwnd, title, 'firefox.exe', 5000 + i))
+    desktop.foreground = FOREGROUND.hwnd
+
+
+def measure(run):
+    """Run with the fake desktop's event log cleared; (seconds, focus switches, key events)"""
+    desktop.events.clear()
+    keys = desktop.key_count
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = run()
+    elapsed = time.perf_counter() - start
+    focus = sum(1 for event in desktop.events if event[1] == 'focus')
+    return elapsed, focus, desktop.key_count - keys, result
+
+
+def one_by_one(controller, command, param):
+    """The single command on every browser window, each brought to the top first"""
+    handler = getattr(controller, command.lower())
+    for window in [window for window in desktop.windows if window is not FOREGROUND]:
+        desktop.windows.remove(window)
+        desktop.windows.insert(0, window)
+        handler(*(() if param is None else (param,)))
+        controller.release_key_target()
+    desktop.foreground = FOREGROUND.hwnd  # As if the user clicked back into their window
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fan-out time against the number of browser windows')
+    parser.add_argument('--command', default='PLAYBACK_PLAY_PAUSE', choices=FAN_OUT_COMMANDS,
+                        help='Command to fan out (default: PLAYBACK_PLAY_PAUSE)')
+    parser.add_argument('--param', help='Its parameter, e.g. 30 for BROWSER_VOLUME_SET')
+    parser.add_argument('--max-windows', type=int, default=64, help='Largest window count (default: 64)')
+    parser.add_argument('--firefox', type=float, default=0.0,
+                        help="Share of windows that can't take posted keys (default: 0)")
+    args = parser.parse_args()
+
+    controller = PCController()
+    handlers = {args.command: getattr(controller, args.command.lower())}
+    if args.param is None:
+        runner = FanOutRunner(controller, handlers, {})
+        fan_out_param = args.command
+    else:
+        runner = FanOutRunner(controller, {}, {args.command: lambda param: handlers[args.command](int(param))})
+        fan_out_param = f"{args.command}:{args.param}"
+    param = None if args.param is None else int(args.param)
+
+    print(f"{args.command} on N browser windows ({args.firefox:.0%} without a render widget)")
+    print(f"{'windows':>7}  {'one by one':>11}  {'focus':>5}  {'fan-out':>9}  {'focus':>5}  {'speedup':>7}  keys")
+    failures = []
+    count = 1
+    while count <= args.max_windows:
+        open_windows(count, args.firefox)
+        single, single_focus, single_keys, _ = measure(lambda: one_by_one(controller, args.command, param))
+        open_windows(count, args.firefox)
+        fanned, fan_focus, fan_keys, result = measure(lambda: runner.run(fan_out_param))
+        print(f"{count:>7}  {single * 1000:>9.1f}ms  {single_focus:>5}  {fanned * 1000:>7.1f}ms  "
+              f"{fan_focus:>5}  {single / fanned:>6.1f}x  {fan_keys}")
+        if f"on {count}/{count} windows" not in result:
+            failures.append(f"{count} windows: {result}")
+        if fan_keys != single_keys:
+            failures.append(f"{count} windows: {fan_keys} key events fanned out, {single_keys} one by one")
+        if desktop.foreground != FOREGROUND.hwnd:
+            failures.append(f"{count} windows: focus left on {desktop.foreground:#x}")
+        count *= 2
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
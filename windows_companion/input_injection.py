@@ -0,0 +1,134 @@
+"""
+SendInput helpers
+
+keybd_event/mouse_event inject one event per call; SendInput takes an array of
+INPUT structures and inserts them into the input stream in one go, without
+other input interleaving. The structures are declared here once for every
+caller that batches input.
+"""
+
+import os
+from ctypes import Structure, Union, c_long, c_size_t, c_ulong, c_ushort, sizeof
+
+try:
+    if os.environ.get('PC_CONTROLLER_FAKE_BACKEND'):
+        raise ImportError("fake backend requested")
+    from ctypes import windll
+except ImportError:
+    from fake_backend import windll
+
+INPUT_MOUSE = 0
+INPUT_KEYBOARD = 1
+
+# MOUSEINPUT.dwFlags
+MOUSEEVENTF_MOVE = 0x0001
+MOUSEEVENTF_LEFTDOWN = 0x0002
+MOUSEEVENTF_LEFTUP = 0x0004
+MOUSEEVENTF_RIGHTDOWN = 0x0008
+MOUSEEVENTF_RIGHTUP = 0x0010
+MOUSEEVENTF_MIDDLEDOWN = 0x0020
+MOUSEEVENTF_MIDDLEUP = 0x0040
+MOUSEEVENTF_WHEEL = 0x0800
+MOUSEEVENTF_HWHEEL = 0x1000
+
+# One wheel notch
+WHEEL_DELTA = 120
+
+# KEYBDINPUT.dwFlags
+KEYEVENTF_KEYUP = 0x0002
+KEYEVENTF_UNICODE = 0x0004
+
+# Characters typed as keys - KEYEVENTF_UNICODE control characters don't act as Enter/Tab
+VK_TAB = 0x09
+VK_RETURN = 0x0D
+TEXT_KEYS = {'\n': VK_RETURN, '\t': VK_TAB}
+# Characters per SendInput call when typing (two INPUTs per UTF-16 code unit)
+TEXT_CHUNK = 64
+
+# Button name -> (down flag, up flag)
+MOUSE_BUTTONS = {
+    'left': (MOUSEEVENTF_LEFTDOWN, MOUSEEVENTF_LEFTUP),
+    'right': (MOUSEEVENTF_RIGHTDOWN, MOUSEEVENTF_RIGHTUP),
+    'middle': (MOUSEEVENTF_MIDDLEDOWN, MOUSEEVENTF_MIDDLEUP),
+}
+
+
+class MOUSEINPUT(Structure):
+    _fields_ = [('dx', c_long), ('dy', c_long), ('mouseData', c_ulong), ('dwFlags', c_ulong),
+                ('time', c_ulong), ('dwExtraInfo', c_size_t)]
+
+
+class KEYBDINPUT(Structure):
+    _fields_ = [('wVk', c_ushort), ('wScan', c_ushort), ('dwFlags', c_ulong),
+                ('time', c_ulong), ('dwExtraInfo', c_size_t)]
+
+
+class HARDWAREINPUT(Structure):
+    _fields_ = [('uMsg', c_ulong), ('wParamL', c_ushort), ('wParamH', c_ushort)]
+
+
+class _INPUTUNION(Union):
+    _fields_ = [('mi', MOUSEINPUT), ('ki', KEYBDINPUT), ('hi', HARDWAREINPUT)]
+
+
+class INPUT(Structure):
+    _fields_ = [('type', c_ulong), ('union', _INPUTUNION)]
+
+
+class POINT(Structure):
+    _fields_ = [('x', c_long), ('y', c_long)]
+
+
+def mouse_input(dx=0, dy=0, data=0, flags=MOUSEEVENTF_MOVE):
+    """A relative mouse INPUT (data: wheel amount for the wheel flags, may be negative)"""
+    event = INPUT(INPUT_MOUSE)
+    event.union.mi = MOUSEINPUT(dx, dy, data & 0xFFFFFFFF, flags, 0, 0)
+    return event
+
+
+def click_inputs(button='left'):
+    """Button down/up INPUTs clicking where the cursor is"""
+    down, up = MOUSE_BUTTONS[button]
+    return [mouse_input(flags=down), mouse_input(flags=up)]
+
+
+def key_input(vk=0, scan=0, flags=0):
+    event = INPUT(INPUT_KEYBOARD)
+    event.union.ki = KEYBDINPUT(vk, scan, flags, 0, 0)
+    return event
+
+
+def utf16_units(char):
+    """UTF-16 code units of a character (a surrogate pair outside the BMP)"""
+    encoded = char.encode('utf-16-le')
+    return [encoded[index] | encoded[index + 1] << 8 for index in range(0, len(encoded), 2)]
+
+
+def text_inputs(text):
+    """Key down/up INPUTs typing text: characters as KEYEVENTF_UNICODE code
+    units, newline and tab as keys"""
+    inputs = []
+    for char in text:
+        vk = TEXT_KEYS.get(char)
+        if vk is not None:
+            inputs.append(key_input(vk))
+            inputs.append(key_input(vk, 0, KEYEVENTF_KEYUP))
+            continue
+        for unit in utf16_units(char):
+            inputs.append(key_input(0, unit, KEYEVENTF_UNICODE))
+            inputs.append(key_input(0, unit, KEYEVENTF_UNICODE | KEYEVENTF_KEYUP))
+    return inputs
+
+
+def text_chunks(text, size=TEXT_CHUNK):
+    """Split text for typing in several SendInput calls (never inside a character)"""
+    text = text.replace('\r\n', '\n')
+    return [text[index:index + size] for index in range(0, len(text), size)]
+
+
+def send_inputs(inputs):
+    """Inject a list of INPUTs with one SendInput call; returns how many were inserted"""
+    if not inputs:
+        return 0
+    array = (INPUT * len(inputs))(*inputs)
+    return windll.user32.SendInput(len(inputs), array, sizeof(INPUT))
@@ -0,0 +1,197 @@
+"""
+Serial link heartbeat
+
+The companion used to only answer, so a dead companion or a wedged serial
+port went unnoticed on both ends until a command failed. Now it probes every
+serial link once a second with CLOCK_SYNC:<seq>, which the firmware answers
+at once with CLOCK:<seq>,<millis> (the round trips also keep the tracer's
+ESP32 clock offset current, see tracing.py):
+
+- The companion measures the round-trip time, jitter (RFC 3550's smoothed
+  mean deviation of consecutive round trips) and lost probes (unanswered
+  after PROBE_TIMEOUT). After DEAD_AFTER missed answers in a row from a link
+  that answered before, it reopens the serial port - a USB adapter that
+  re-enumerated or a wedged driver, and reopening also resets most ESP32
+  boards. A link is declared down at most (DEAD_AFTER + 1) * INTERVAL +
+  PROBE_TIMEOUT (5.5 s) after its last answer.
+- The ESP32 takes every probe as a sign of life. Without one for
+  PC_LINK_TIMEOUT it reports pc_link false (and the PC as not awake) to Home
+  Assistant, which marks the browser and display entities unavailable.
+
+Firmware that never answered is never reconnected - its link just reports
+no answers. LINK answers with the statistics of every link:
+
+    STATUS:LINK serial:COM3=up,rtt_ms:2.1,min_ms:1.8,jitter_ms:0.3,lost:0/120,reconnects:0
+"""
+
+import itertools
+import threading
+import time
+
+# Seconds between probes per link
+INTERVAL = 1.0
+# Seconds an answer may take before its probe counts as lost
+PROBE_TIMEOUT = 1.5
+# Missed answers in a row after which a link that used to answer is reconnected
+DEAD_AFTER = 3
+# While it stays silent the wait is doubled per reconnect, up to this many doublings
+MAX_BACKOFF = 4
+# Weight of a new round trip in the smoothed RTT (TCP's 1/8)
+RTT_GAIN = 0.125
+# Weight of a new deviation in the jitter (RFC 3550's 1/16)
+JITTER_GAIN = 1 / 16
+
+
+class LinkMonitor:
+    """Probe bookkeeping and statistics of one serial link"""
+
+    __slots__ = ('transport', 'state', 'sent', 'answered', 'lost', 'missed', 'reconnects',
+                 'rtt', 'min_rtt', 'jitter', 'last_rtt', 'last_answer', '_retries', '_seq', '_pending')
+
+    def __init__(self, transport):
+        self.transport = transport
+        self.state = 'unknown'  # 'up' once answered, 'down' after DEAD_AFTER misses
+        self.sent = 0
+        self.answered = 0
+        self.lost = 0
+        self.missed = 0  # Lost in a row
+        self.reconnects = 0
+        self.rtt = None  # Smoothed round trip, seconds
+        self.min_rtt = None
+        self.jitter = 0.0
+        self.last_rtt = None
+        self.last_answer = None  # perf_counter() of the last answer
+        self._retries = 0  # Reconnects since the last answer
+        self._seq = itertools.count(1)
+        self._pending = {}  # seq -> perf_counter() when sent
+
+    def expire(self, now):
+        """Count the probes that went unanswered for PROBE_TIMEOUT as lost"""
+        for seq, sent in list(self._pending.items()):
+            if now - sent > PROBE_TIMEOUT:
+                del self._pending[seq]
+                self.lost += 1
+                self.missed += 1
+
+    def probe(self, now):
+        """Next probe line"""
+        seq = next(self._seq)
+        self._pending[seq] = now
+        self.sent += 1
+        return f"CLOCK_SYNC:{seq}"
+
+    def answer(self, param, read_at):
+        """Take a CLOCK:<seq>,<millis> answer; returns (sent, millis) or None if it isn't one of ours"""
+        try:
+            seq, millis = (int(value) for value in param.split(','))
+        except (AttributeError, ValueError):
+            return None
+        sent = self._pending.pop(seq, None)
+        if sent is None:
+            return None  # Timed out already, or from before a reconnect
+        rtt = read_at - sent
+        if self.last_rtt is not None:
+            self.jitter += (abs(rtt - self.last_rtt) - self.jitter) * JITTER_GAIN
+        self.rtt = rtt if self.rtt is None else self.rtt + (rtt - self.rtt) * RTT_GAIN
+        self.min_rtt = rtt if self.min_rtt is None else min(self.min_rtt, rtt)
+        self.last_rtt = rtt
+        self.last_answer = read_at
+        self.answered += 1
+        self.missed = 0
+        self._retries = 0
+        self.state = 'up'
+        return sent, millis
+
+    def dead(self):
+        """Whether the link answered before and has now missed DEAD_AFTER in a row
+        (twice as many after each reconnect that didn't bring it back)"""
+        return self.state != 'unknown' and self.missed >= DEAD_AFTER << min(self._retries, MAX_BACKOFF)
+
+    def reset(self):
+        """Forget probes in flight (the port is being reopened)"""
+        self._pending.clear()
+        self.missed = 0
+        self.last_rtt = None
+        self.state = 'down'
+        self.reconnects += 1
+        self._retries += 1
+
+    def describe(self):
+        if self.rtt is None:
+            return f"{self.state},lost:{self.lost}/{self.sent},reconnects:{self.reconnects}"
+        return (f"{self.state},rtt_ms:{self.rtt * 1000:.1f},min_ms:{self.min_rtt * 1000:.1f},"
+                f"jitter_ms:{self.jitter * 1000:.1f},lost:{self.lost}/{self.sent},"
+                f"reconnects:{self.reconnects}")
+
+
+class Heartbeat:
+    """Probes every serial link on its own thread and reopens links that went quiet.
+
+    on_sample(transport, sent, read_at, millis) gets every answered round trip
+    (for the tracer's clock offset)."""
+
+    def __init__(self, interval=INTERVAL, on_sample=None):
+        self.interval = interval
+        self.on_sample = on_sample
+        self.monitors = {}  # Transport name -> LinkMonitor
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, transport):
+        """Watch a serial transport (needs send(), connected and reconnect())"""
+        with self._lock:
+            self.monitors[transport.name] = LinkMonitor(transport)
+
+    def answer(self, transport, param, read_at):
+        """A CLOCK line arrived on a transport (called on the event loop thread)"""
+        with self._lock:
+            monitor = self.monitors.get(transport.name)
+            if monitor is None:
+                return
+            recovered = monitor.state == 'down'
+            result = monitor.answer(param, read_at)
+        if result is None:
+            return
+        if recovered:
+            print(f"Link {transport.name} answering again")
+        if self.on_sample is not None:
+            self.on_sample(transport, result[0], read_at, result[1])
+
+    def beat(self, now=None):
+        """Send a probe on every connected link, reconnecting the dead ones"""
+        now = time.perf_counter() if now is None else now
+        with self._lock:
+            monitors = list(self.monitors.values())
+        for monitor in monitors:
+            transport = monitor.transport
+            if not transport.connected:
+                continue  # Being reopened by its reader
+            with self._lock:
+                monitor.expire(now)
+                dead = monitor.dead()
+                if dead:
+                    monitor.reset()
+                else:
+                    line = monitor.probe(now)
+            if dead:
+                print(f"Link {transport.name} stopped answering ({DEAD_AFTER} heartbeats missed) - reconnecting")
+                transport.reconnect()
+                continue
+            transport.send(line)
+
+    def start(self):
+        if self._thread is None and self.monitors:
+            self._thread = threading.Thread(target=self._run, name='heartbeat', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.beat()
+
+    def describe(self):
+        with self._lock:
+            return ' '.join(f"{name}={monitor.describe()}" for name, monitor in self.monitors.items())
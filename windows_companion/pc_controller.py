@@ -9,27 +9,608 @@ Requirements:
 
 Usage:
     python pc_controller.py [--port COM3] [--baud 115200]
+    python pc_controller.py --port COM3 --port COM4 --tcp-port 8765
+    python pc_controller.py --scenes scenes.json
+    python pc_controller.py --timers timers.jsonl
+    python pc_controller.py --trace trace.json
+    python pc_controller.py --layouts layouts.json
 """
 
 import serial
+import atexit
+import contextlib
+import os
+import re
 import time
 import sys
-import subprocess
 import argparse
-import win32api
-import win32con
-import win32gui
-import win32process
-import psutil
-import webbrowser
-from ctypes import windll, Structure, c_uint, sizeof, byref
+import threading
+import queue
+from ctypes import Structure, c_uint, sizeof, byref
+try:
+    if os.environ.get('PC_CONTROLLER_FAKE_BACKEND'):
+        raise ImportError("fake backend requested")
+    import win32con
+    import win32gui
+    import win32process
+    import psutil
+    from ctypes import windll
+    FAKE_BACKEND = False
+except ImportError:
+    # Not on Windows - simulate the desktop and record input instead (see fake_backend.py)
+    from fake_backend import win32con, win32gui, win32process, psutil, windll
+    FAKE_BACKEND = True
+from cdp_backend import CDPError, CDPMediaBackend, describe_state
+from browser_launcher import BrowserLauncher
+from search_urls import build_search_url, provider_url
+from power_manager import PowerManager
+from profiling import CommandProfiler
+from transports import SerialTransport, TransportHub
+from command_journal import TEXT_COMMANDS, CommandJournal, read_journal, redact
+from predictor import CommandPredictor
+from site_profiles import match_profile
+from skip_detector import DEFAULT_TEMPLATES_DIR, GdiCapture, SkipDetector
+from scenes import SceneRunner, failed_result, load_scenes
+from pointer import POINTER_COMMANDS, PointerStream
+from input_injection import POINT, TEXT_KEYS, click_inputs, send_inputs, text_chunks, text_inputs, utf16_units
+from audio_sessions import AudioSessionManager, open_backend
+from scheduler import Scheduler, describe_commands, format_delay, parse_schedule
+from tracing import Tracer
+from link_health import Heartbeat
+from window_layouts import LayoutManager, MonitorTopology
+from fan_out import FanOutRunner
+
+# Default time a command may spend queued + executing before it is dropped
+DEFAULT_COMMAND_TIMEOUT = 5.0
+
+# Commands older than this (by their ESP32 send timestamp) are dropped at dequeue time
+DEFAULT_MAX_COMMAND_AGE = 3.0
+
+# Commands that set an absolute state - when several are queued only the newest runs
+COLLAPSIBLE_COMMANDS = {
+    'DISPLAY_ON', 'DISPLAY_OFF', 'VOLUME_SET', 'BROWSER_VOLUME_SET',
+    'PLAYBACK_RATE', 'PLAYBACK_VOLUME_SET',
+    'BROWSER_FOCUS', 'BROWSER_MOVE_TV', 'BROWSER_MAXIMIZE', 'BROWSER_MINIMIZE',
+    'BROWSER_MOVE_MONITOR_1', 'BROWSER_MOVE_MONITOR_2', 'LAYOUT',
+    'PREVENT_SLEEP', 'ALLOW_SLEEP', 'FOCUS_ASSIST_ENABLE', 'FOCUS_ASSIST_DISABLE',
+}
+
+# Timer commands, answered at once by the scheduler (see scheduler.py)
+SCHEDULE_COMMANDS = ('SCHEDULE', 'SCHEDULE_EVERY', 'SCHEDULE_CANCEL', 'SCHEDULE_LIST')
+# Where state is kept by default - next to this script, not in whatever directory it was started from
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_TIMERS_PATH = os.path.join(SCRIPT_DIR, 'timers.jsonl')
+DEFAULT_LAYOUTS_PATH = os.path.join(SCRIPT_DIR, 'layouts.json')
+DEFAULT_PROFILE_DIR = os.path.join(SCRIPT_DIR, 'profiles')
+
+# What a command name looks like - other serial lines are the firmware's log output
+COMMAND_NAME = re.compile(r'[A-Z][A-Z0-9_]*$')
+
+# Commands that still run while the PC is suspending/resuming - everything else is held
+HOLD_EXEMPT_COMMANDS = {'PC_SLEEP', 'PC_WAKE'}
+
+# Cached window process names before the cache is cleared
+PROCESS_NAME_CACHE_SIZE = 256
+# Cached (hwnd, title) -> site profile matches before the cache is cleared
+SITE_PROFILE_CACHE_SIZE = 256
+
+# How SKIP_BUTTON_ACTION finds the button: the site's keys, or by looking at the screen first
+SKIP_DETECTION_MODES = ('keys', 'vision')
+# How the mute commands reach the browser: its audio sessions (when pycaw is available), or hotkeys
+AUDIO_CONTROL_MODES = ('sessions', 'keys')
+
+# Lookups a command did (PCController.lookups), learned per command by the predictor
+LOOKUP_WINDOWS = 1
+LOOKUP_MONITORS = 2
+LOOKUP_FOCUS = 4
+# Idle time after a command before the predicted next command is warmed
+WARM_DELAY = 0.05
+# Seconds a warmed lookup stays usable
+WARM_TTL = 30.0
+# Time the focus is given to settle before keys are injected
+FOCUS_SETTLE = 0.1
+# Step span of an untraced command (see PCController._span)
+NO_SPAN = contextlib.nullcontext()
+
+# Key delivery modes: focus the browser and inject global input, or post key
+# messages to its render widget without touching focus
+KEY_DELIVERY_MODES = ('foreground', 'background')
+
+# Child window that handles keyboard input, per browser. Only Chromium browsers
+# process posted key messages - others always use foreground injection.
+RENDER_WIDGET_CLASSES = {
+    'chrome.exe': 'Chrome_RenderWidgetHostHWND',
+    'msedge.exe': 'Chrome_RenderWidgetHostHWND',
+    'brave.exe': 'Chrome_RenderWidgetHostHWND',
+}
+# Seconds before a browser window whose render widget wasn't found is looked at again
+RENDER_WIDGET_RETRY = 2.0
+
+WM_KEYDOWN = 0x0100
+WM_KEYUP = 0x0101
+WM_CHAR = 0x0102
+# Seconds for the find bar to open before the query is typed into it
+FIND_BAR_SETTLE = 0.05
+# Shift/Ctrl/Alt - the browser reads them from the keyboard state, which posted
+# messages don't change, so combinations need foreground injection
+MODIFIER_KEYS = {0x10, 0x11, 0x12}
+# Browser/volume/media keys are handled by the shell, not the focused window
+SYSTEM_KEYS = range(0xA6, 0xB8)
+# Navigation keys with the extended-key bit set in their lParam
+EXTENDED_KEYS = {0x21, 0x22, 0x23, 0x24, 0x25, 0x26, 0x27, 0x28, 0x2D, 0x2E}
+
+
+def parse_command_line(line):
+    """Split a serial line into (command, param, origin_ms, ttl, trace).
+
+    The ESP32 frames commands as "@<millis>[/<ttl_ms>][#<trace>]|COMMAND[:param]",
+    trace being the "<trace_id>[,<sent_ms>]" context from Home Assistant (see
+    tracing.py); bare "COMMAND[:param]" lines (typed by hand or from older
+    firmware) are accepted too and simply carry no origin timestamp.
+    """
+    origin_ms = None
+    ttl = None
+    trace = None
+    if line.startswith('@') and '|' in line:
+        header, line = line[1:].split('|', 1)
+        header, _, trace = header.partition('#')
+        stamp, _, ttl_ms = header.partition('/')
+        try:
+            origin_ms = int(stamp)
+            ttl = int(ttl_ms) / 1000.0 if ttl_ms else None
+        except ValueError:
+            origin_ms = None
+            ttl = None
+    
+    # Check if command has parameters (format: COMMAND:param)
+    parts = line.split(':', 1)
+    command = parts[0]
+    param = parts[1] if len(parts) > 1 else None
+    return command, param, origin_ms, ttl, trace or None
+
+
+def loggable_line(line, command, param):
+    """line as the console shows it: the text of TEXT_COMMANDS (also inside a
+    SCHEDULE) as a keyed hash or length, like the journal keeps it"""
+    if not param:
+        return line
+    if command in TEXT_COMMANDS:
+        return f"{command}:{redact(param)}"
+    if command in ('SCHEDULE', 'SCHEDULE_EVERY') and any(name in param for name in TEXT_COMMANDS):
+        try:
+            name, delay, commands = parse_schedule(param)
+        except ValueError:
+            return f"{command}:({len(param)} chars)"
+        named = f"{name}=" if name else ''
+        return f"{command}:{named}{format_delay(delay)},{describe_commands(commands, TEXT_COMMANDS)}"
+    return line
+
+
+def unescape_text(text):
+    """Undo the line-protocol escapes of typed text (TYPE_TEXT, SEARCH_CURRENT_SITE):
+    \\n newline, \\t tab, \\\\ backslash"""
+    if '\\' not in text:
+        return text
+    out = []
+    chars = iter(text)
+    for char in chars:
+        if char == '\\':
+            escaped = next(chars, '\\')
+            out.append({'n': '\n', 't': '\t'}.get(escaped, escaped))
+        else:
+            out.append(char)
+    return ''.join(out)
+
+
+class OriginClock:
+    """Maps ESP32 millis() timestamps onto the local monotonic clock.
+
+    The clocks are not synchronised, so the offset is estimated as the smallest
+    (local receive time - origin time) seen so far - the least delayed frame is
+    the best estimate of zero transit time. The estimate is allowed to creep up
+    by MAX_DRIFT to follow crystal drift, and a timestamp that goes backwards
+    (ESP32 reboot or millis() wrap) starts over.
+    """
+
+    MAX_DRIFT = 1e-4  # 100 ppm
+
+    __slots__ = ('offset', '_last_origin_ms', '_last_received_at')
+
+    def __init__(self):
+        self.offset = None
+        self._last_origin_ms = None
+        self._last_received_at = None
+
+    def observe(self, origin_ms, received_at):
+        if self._last_origin_ms is not None and origin_ms < self._last_origin_ms:
+            self.offset = None
+        offset = received_at - origin_ms / 1000.0
+        if self.offset is None:
+            self.offset = offset
+        else:
+            drift = (received_at - self._last_received_at) * self.MAX_DRIFT
+            self.offset = min(offset, self.offset + drift)
+        self._last_origin_ms = origin_ms
+        self._last_received_at = received_at
+
+    def age(self, origin_ms, now=None):
+        """Seconds since the ESP32 sent a frame stamped origin_ms"""
+        if self.offset is None:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        return now - (origin_ms / 1000.0 + self.offset)
+
+
+class CommandCancelled(Exception):
+    """Raised at a cancellation point once a command was cancelled or ran past its deadline"""
+
+
+class CommandContext:
+    """Cooperative execution context handed to each dispatched command.
+
+    Carries a deadline (time.monotonic() based) and a cancel token. The sleeps and
+    key injections in PCController are cancellation points: they call check(),
+    which raises CommandCancelled as soon as the command should stop.
+    """
+
+    __slots__ = ('command', 'param', 'origin_ms', 'ttl', 'received_at', 'deadline',
+                 'source', 'reply', 'trace', 'cancel_reason', '_cancel_event')
+
+    def __init__(self, command, param=None, timeout=DEFAULT_COMMAND_TIMEOUT, received_at=None,
+                 origin_ms=None, ttl=None, source=None, reply=None, trace=None):
+        self.command = command
+        self.param = param
+        self.source = source  # Transport name - each ESP32 has its own millis() clock
+        self.reply = reply  # send_line of the transport the command came from (None = default)
+        self.origin_ms = origin_ms  # ESP32 millis() when the command was sent
+        self.ttl = ttl  # Freshness window override from the sender (seconds)
+        self.trace = trace  # tracing.Trace when the command is traced
+        self.received_at = time.monotonic() if received_at is None else received_at
+        self.deadline = None if timeout is None else self.received_at + timeout
+        self.cancel_reason = None  # Set once cancelled
+        self._cancel_event = None  # Created by the first sleep() - most commands never sleep
+
+    def cancel(self, reason="cancelled"):
+        """Request cancellation; takes effect at the next cancellation point"""
+        if self.cancel_reason is None:
+            self.cancel_reason = reason or "cancelled"
+        event = self._cancel_event
+        if event is not None:
+            event.set()
+
+    @property
+    def cancelled(self):
+        return self.cancel_reason is not None
+
+    def remaining(self):
+        """Seconds left before the deadline (None if there is no deadline)"""
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+    def expired(self):
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def check(self):
+        """Cancellation point - raise CommandCancelled if the command should stop"""
+        if self.cancel_reason is not None:
+            raise CommandCancelled(self.cancel_reason)
+        if self.expired():
+            raise CommandCancelled("deadline exceeded")
+
+    def sleep(self, seconds):
+        """Sleep that wakes up early (and raises) on cancellation or deadline"""
+        self.check()
+        if self._cancel_event is None:
+            self._cancel_event = threading.Event()
+            if self.cancel_reason is not None:
+                self._cancel_event.set()  # cancel() ran before the event existed
+        remaining = self.remaining()
+        if remaining is not None and remaining < seconds:
+            # Will overrun the deadline - wait only until it, then fail the check
+            self._cancel_event.wait(max(remaining, 0))
+        else:
+            self._cancel_event.wait(seconds)
+        self.check()
+
 
 # Command handlers
 class PCController:
     def __init__(self):
         self.browser_process_names = ['chrome.exe', 'firefox.exe', 'msedge.exe', 'brave.exe']
         self.tv_monitor_index = 1  # Change this to your TV monitor index (0-based)
+        # Execution context of the command currently running (set by CommandExecutor)
+        self.context = None
+        # Optional CDPMediaBackend - drives the page's <video> directly instead of hotkeys
+        self.media_backend = None
+        # Starts browsers / opens URLs with executable paths resolved once
+        self.launcher = BrowserLauncher()
+        # Display/suspend without blocking, tracks real power state
+        self.power = PowerManager()
+        # Monitors and work areas, cached until the display configuration changes
+        self.topology = MonitorTopology()
+        self.power.on_display_change = self.topology.invalidate
+        # 'foreground' (focus + global keys) or 'background' (post to the render widget)
+        self.key_delivery = 'foreground'
+        self._render_widgets = {}  # Top-level hwnd -> render widget hwnd (0 = can't post)
+        self._render_widget_retry = {}  # Top-level hwnd -> monotonic() its widget is looked for again
+        self._key_target = None  # (top-level hwnd, render widget) while posting keys
+        # Lookup state reused by every command
+        self._browser_names_source = None
+        self._browser_names = frozenset()
+        self._process_names = {}  # (hwnd, pid) -> executable name
+        self._site_profiles = {}  # (hwnd, title) -> SiteProfile
+        # SkipDetector used by SKIP_BUTTON_ACTION before the key route (None = keys only)
+        self.skip_detector = None
+        # AudioSessionManager for per-app mute/volume (None = mute keys)
+        self.audio = None
+        # (hwnd, title, process) the last browser lookup resolved to - for the command journal
+        self.last_target = None
+        # FanOut while an ALL_WINDOWS command runs - handlers then act on all its windows (see fan_out.py)
+        self.fan_out = None
+        # Lookups done ahead of a predicted command (see prewarm)
+        self.lookups = 0  # LOOKUP_* flags used by the running command
+        self.warm_saved = 0.0  # Seconds of lookups and focus settling served from prewarm
+        self._warm_windows = None  # (expires, windows, seconds the lookup took)
+        self._warm_monitors = None  # (expires, monitors, seconds the lookup took)
+        self._warm_focus = None  # (expires, hwnd, monotonic time it was focused)
+    
+    def _span(self, name):
+        """Time a step of the running command when it is traced (see tracing.py)"""
+        context = self.context
+        if context is None or context.trace is None:
+            return NO_SPAN
+        return context.trace.span(name)
+    
+    def _sleep(self, seconds):
+        """Sleep between key presses - a cancellation point when a context is active"""
+        with self._span('sleep'):
+            if self.context is not None:
+                self.context.sleep(seconds)
+            else:
+                time.sleep(seconds)
+    
+    def _keybd_event(self, vk, flags=0):
+        """Inject a key event - a cancellation point when a context is active"""
+        if self.context is not None:
+            self.context.check()
+        with self._span('keys'):
+            if self._key_target is not None and vk not in SYSTEM_KEYS:
+                hwnd, widget = self._key_target
+                if vk not in MODIFIER_KEYS and self._post_key(widget, vk, flags):
+                    return
+                # Modifier combination or the widget is gone - focus and inject for the rest
+                self._key_target = None
+                if vk not in MODIFIER_KEYS:
+                    self._render_widgets.pop(hwnd, None)
+                win32gui.SetForegroundWindow(hwnd)
+                self._sleep(0.1)
+            windll.user32.keybd_event(vk, 0, flags, 0)
+    
+    def _post_key(self, widget, vk, flags):
+        """Post a key down/up message to a window; returns False if it failed"""
+        lparam = 1 | (windll.user32.MapVirtualKeyW(vk, 0) << 16)
+        if vk in EXTENDED_KEYS:
+            lparam |= 1 << 24
+        message = WM_KEYDOWN
+        if flags & win32con.KEYEVENTF_KEYUP:
+            message = WM_KEYUP
+            lparam |= 0xC0000000  # Previous state down, transition up
+        try:
+            win32gui.PostMessage(widget, message, vk, lparam)
+            return True
+        except Exception:
+            return False
+    
+    def _find_render_widget(self, hwnd):
+        """Visible keyboard-input child of a browser window.
+
+        0 if the browser can't take posted keys at all, None if its widget
+        can't be found right now (process not readable, tab still loading)."""
+        try:
+            _, pid = win32process.GetWindowThreadProcessId(hwnd)
+            class_name = RENDER_WIDGET_CLASSES.get(psutil.Process(pid).name().lower())
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return None
+        if class_name is None:
+            return 0
+        widgets = []
+        
+        def callback(child, found):
+            if win32gui.GetClassName(child) == class_name and win32gui.IsWindowVisible(child):
+                found.append(child)
+            return True
         
+        try:
+            win32gui.EnumChildWindows(hwnd, callback, widgets)
+        except Exception:
+            return None
+        # Every tab has a widget - only the one of the active tab is visible
+        return widgets[0] if widgets else None
+    
+    def _render_widget(self, hwnd):
+        """Render widget of a browser window, cached while it stays valid (0 = can't post now).
+
+        Only browsers without posted key support are remembered as 0; a widget
+        that wasn't found is looked for again after RENDER_WIDGET_RETRY."""
+        widget = self._render_widgets.get(hwnd)
+        if widget == 0:
+            return 0
+        if widget is not None and win32gui.IsWindow(widget) and win32gui.IsWindowVisible(widget):
+            return widget
+        now = time.monotonic()
+        if now < self._render_widget_retry.get(hwnd, 0.0):
+            return 0
+        if len(self._render_widgets) > 32:
+            self._render_widgets = {top: child for top, child in self._render_widgets.items()
+                                    if win32gui.IsWindow(top)}
+            self._render_widget_retry = {top: at for top, at in self._render_widget_retry.items()
+                                         if win32gui.IsWindow(top)}
+        widget = self._find_render_widget(hwnd)
+        if widget is None:
+            self._render_widgets.pop(hwnd, None)
+            self._render_widget_retry[hwnd] = now + RENDER_WIDGET_RETRY
+            return 0
+        self._render_widget_retry.pop(hwnd, None)
+        self._render_widgets[hwnd] = widget
+        return widget
+    
+    def _focus_for_keys(self, hwnd):
+        """Prepare to send keys to a browser window.
+
+        In background mode keys are posted to the window's render widget and focus
+        is left alone; otherwise (or when the browser can't take posted keys) the
+        window is brought to the front for global injection.
+        """
+        with self._span('focus'):
+            self._key_target = None
+            if self.key_delivery == 'background':
+                widget = self._render_widget(hwnd)
+                if widget:
+                    self._key_target = (hwnd, widget)
+                    return
+            self.lookups |= LOOKUP_FOCUS
+            warm, self._warm_focus = self._warm_focus, None
+            if warm is not None and warm[1] == hwnd and time.monotonic() < warm[0] \
+                    and win32gui.GetForegroundWindow() == hwnd:
+                # Focused while idle - only wait out whatever is left of the settle time
+                settled = time.monotonic() - warm[2]
+                self.warm_saved += min(settled, FOCUS_SETTLE)
+                if settled < FOCUS_SETTLE:
+                    self._sleep(FOCUS_SETTLE - settled)
+                return
+            win32gui.SetForegroundWindow(hwnd)
+            self._sleep(FOCUS_SETTLE)
+    
+    def release_key_target(self):
+        """Stop posting keys to the last browser window (called after each command)"""
+        self._key_target = None
+    
+    def _press(self, chord):
+        """Press a chord (virtual-key codes in order) and release it in reverse"""
+        for vk in chord:
+            self._keybd_event(vk)
+        for vk in reversed(chord):
+            self._keybd_event(vk, win32con.KEYEVENTF_KEYUP)
+    
+    def _type_text(self, text):
+        """Type text into the key target's focused field; returns the characters typed.
+
+        Each chunk is one SendInput call of KEYEVENTF_UNICODE events (WM_CHAR
+        messages when keys are posted to the render widget) and a cancellation
+        point. Fewer characters than given means input was blocked."""
+        typed = 0
+        for chunk in text_chunks(text):
+            if self.context is not None:
+                self.context.check()
+            with self._span('keys'):
+                if self._key_target is not None:
+                    widget = self._key_target[1]
+                    for char in chunk:
+                        if char in TEXT_KEYS:
+                            self._press((TEXT_KEYS[char],))
+                            continue
+                        for unit in utf16_units(char):
+                            win32gui.PostMessage(widget, WM_CHAR, unit, 1)
+                else:
+                    inputs = text_inputs(chunk)
+                    if send_inputs(inputs) != len(inputs):
+                        return typed  # UIPI - the foreground window runs elevated, or a secure desktop
+            typed += len(chunk)
+        return typed
+    
+    def _site_profile(self, hwnd, title):
+        """Site profile for a browser window, matched once per (hwnd, title)"""
+        key = (hwnd, title)
+        profile = self._site_profiles.get(key)
+        if profile is None:
+            if len(self._site_profiles) >= SITE_PROFILE_CACHE_SIZE:
+                self._site_profiles.clear()
+            profile = self._site_profiles[key] = match_profile(title)
+        return profile
+    
+    def _fan_out_keys(self, command, steps_for):
+        """Send key sequences to every fan-out window; steps_for(hwnd, title) -> (site, steps or None).
+
+        Keys are posted to the Chromium windows in lockstep - a step goes to all
+        of them, then one wait (the longest any of them asks for) covers them
+        all. Windows that can't take posted keys are focused one at a time, and
+        so is a window whose keys include a modifier chord (Shift+N) - modifiers
+        can't be posted, _keybd_event focuses the window for them."""
+        fan_out = self.fan_out
+        posted, focused = [], []
+        chorded = set()  # Posted windows that had to be focused for a modifier chord
+        for hwnd, title, name in fan_out.windows:
+            site, steps = steps_for(hwnd, title)
+            what = fan_out.label(name, title)
+            if steps is None:
+                fan_out.record(what, f"not supported on {site}", None)
+                continue
+            widget = self._render_widget(hwnd)
+            (posted if widget else focused).append((hwnd, widget, list(steps), what, site))
+        while any(target[2] for target in posted):
+            wait = 0.0
+            for hwnd, widget, steps, _, _ in posted:
+                while steps:
+                    step = steps.pop(0)
+                    if isinstance(step, float):
+                        wait = max(wait, step)
+                        break
+                    self._key_target = (hwnd, widget)
+                    self._press(step)
+                    if self._key_target is None:
+                        chorded.add(hwnd)
+            if wait:
+                self._sleep(wait)
+        for hwnd, _, _, what, site in posted:
+            if hwnd in chorded:
+                fan_out.focused += 1
+            fan_out.record(what, f"{'focused' if hwnd in chorded else 'posted'}{f' ({site})' if site else ''}")
+        for hwnd, _, steps, what, site in focused:
+            self._key_target = None
+            with self._span('focus'):
+                win32gui.SetForegroundWindow(hwnd)
+                self._sleep(FOCUS_SETTLE)
+            fan_out.focused += 1
+            for step in steps:
+                if isinstance(step, float):
+                    self._sleep(step)
+                else:
+                    self._press(step)
+            fan_out.record(what, f"focused{f' ({site})' if site else ''}")
+        return f"{command} executed"
+    
+    def _fan_out_unsupported(self, command, reason):
+        """Record every fan-out window as skipped - for key fallbacks that only
+        toggle, which would flip windows already in the wanted state"""
+        for _, title, name in self.fan_out.windows:
+            self.fan_out.record(self.fan_out.label(name, title), f"not supported ({reason})", None)
+        return f"{command} executed"
+    
+    def _site_action(self, command, action):
+        """Send the key sequence for a logical action on the site the browser shows"""
+        if self.fan_out is not None:
+            def steps_for(hwnd, title):
+                profile = self._site_profile(hwnd, title)
+                return profile.name, profile.actions.get(action)
+            return self._fan_out_keys(command, steps_for)
+        browser_windows = self.find_browser_windows()
+        if not browser_windows:
+            return f"{command} failed - no browser found"
+        hwnd, title, _ = browser_windows[0]
+        profile = self._site_profile(hwnd, title)
+        steps = profile.actions.get(action)
+        if steps is None:
+            return f"{command} failed - not supported on {profile.name}"
+        self._focus_for_keys(hwnd)
+        for step in steps:
+            if isinstance(step, float):
+                self._sleep(step)
+            else:
+                self._press(step)
+        return f"{command} executed ({profile.name})"
+    
     def wake_pc(self):
         """Wake the PC - typically done via WOL, but can also wake from sleep"""
         print("Executing: Wake PC")
@@ -41,14 +622,16 @@ class PCController:
     def sleep_pc(self):
         """Put the PC to sleep"""
         print("Executing: Sleep PC")
-        subprocess.run(['rundll32.exe', 'powrprof.dll,SetSuspendState', '0', '1', '0'])
+        # Suspends in the background - SetSuspendState only returns after resume
+        if not self.power.suspend():
+            return f"PC_SLEEP ignored (already {self.power.state})"
         return "PC_SLEEP executed"
     
     def display_on(self):
         """Turn the display on"""
         print("Executing: Display On")
-        # Send monitor on message
-        windll.user32.SendMessageW(0xFFFF, 0x0112, 0xF170, -1)
+        # Request monitor on (posted, never waits on other windows)
+        self.power.set_display(True)
         # Also move mouse to ensure wake
         windll.user32.SetCursorPos(100, 100)
         windll.user32.mouse_event(1, 0, 0, 0, 0)
@@ -57,49 +640,174 @@ class PCController:
     def display_off(self):
         """Turn the display off"""
         print("Executing: Display Off")
-        # Send monitor off message
-        windll.user32.SendMessageW(0xFFFF, 0x0112, 0xF170, 2)
+        self.power.set_display(False)
         return "DISPLAY_OFF executed"
     
-    def find_browser_windows(self):
-        """Find all browser windows"""
+    def _try_media_backend(self, command, action, *args):
+        """Run a media action through the CDP backend.
+
+        Returns the status message, or None when there is no backend or it could
+        not do the job - the caller then falls back to focus + hotkeys."""
+        if self.media_backend is None:
+            return None
+        if self.context is not None:
+            self.context.check()
+        if self.fan_out is not None:
+            return self._fan_out_media(command, action, *args)
+        try:
+            with self._span('cdp'):
+                state = self.media_backend.perform(action, *args)
+        except CDPError as e:
+            print(f"CDP backend unavailable for {command} ({e}) - using hotkeys")
+            return None
+        return f"{command} executed via CDP ({describe_state(state)})"
+    
+    def _fan_out_media(self, command, action, *args):
+        """_try_media_backend for ALL_WINDOWS - the action runs in every matching tab at once.
+
+        Tabs can't be matched to a browser process, so with a process filter the
+        windows get keys instead (None)."""
+        fan_out = self.fan_out
+        if fan_out.process is not None:
+            return None
+        try:
+            with self._span('cdp'):
+                results = self.media_backend.perform_all(action, *args, title=fan_out.title)
+        except CDPError as e:
+            print(f"CDP backend unavailable for {command} ({e}) - using hotkeys")
+            return None
+        for title, result in results:
+            what = fan_out.label('tab', title)
+            if not isinstance(result, CDPError):
+                fan_out.record(what, describe_state(result))
+            elif 'no <video>' in str(result):
+                fan_out.record(what, "no video", None)
+            else:
+                fan_out.record(what, f"failed ({result})", False)
+        return f"{command} executed via CDP"
+    
+    def _browser_audio(self, command, action):
+        """Run action(process_name) -> sessions changed on the browser's audio sessions.
+
+        Returns the status message, or None without session control or a browser."""
+        if self.audio is None:
+            return None
+        if self.fan_out is not None:
+            if self.fan_out.title is not None:
+                return None  # The process's sessions would reach windows the title filter left out
+            for name in dict.fromkeys(window[2] for window in self.fan_out.windows):
+                changed = action(name.lower())
+                self.fan_out.record(name, f"{changed} audio session{'s' if changed != 1 else ''}" if changed
+                                    else "not playing - applied when it starts")
+            return f"{command} executed via audio sessions"
+        browser_windows = self.find_browser_windows()
+        if not browser_windows:
+            return None
+        name = browser_windows[0][2]
+        changed = action(name.lower())
+        if not changed:
+            return f"{command} executed ({name} not playing - applied when it starts)"
+        return f"{command} executed ({name}, {changed} audio session{'s' if changed != 1 else ''})"
+    
+    def _process_name(self, hwnd, pid):
+        """Executable name of a window's process (None if it can't be read).
+
+        Cached per (hwnd, pid) - a window never changes process, while a pid
+        alone could be reused by an unrelated process."""
+        key = (hwnd, pid)
+        name = self._process_names.get(key)
+        if name is None:
+            try:
+                name = psutil.Process(pid).name()
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                return None
+            if len(self._process_names) >= PROCESS_NAME_CACHE_SIZE:
+                self._process_names.clear()
+            self._process_names[key] = name
+        return name
+    
+    def _collect_browser_window(self, hwnd, windows):
+        """EnumWindows callback (a bound method, so no closure is built per call)"""
+        if win32gui.IsWindowVisible(hwnd):
+            _, pid = win32process.GetWindowThreadProcessId(hwnd)
+            name = self._process_name(hwnd, pid)
+            if name is not None and name.lower() in self._browser_names:
+                title = win32gui.GetWindowText(hwnd)
+                if title:  # Only include windows with titles
+                    windows.append((hwnd, title, name))
+        return True
+    
+    def _enumerate_browser_windows(self):
+        if self._browser_names_source != self.browser_process_names:
+            # browser_process_names may be edited at runtime - rebuild the lookup set
+            self._browser_names_source = list(self.browser_process_names)
+            self._browser_names = frozenset(name.lower() for name in self.browser_process_names)
         browser_windows = []
-        
-        def callback(hwnd, windows):
-            if win32gui.IsWindowVisible(hwnd):
-                _, pid = win32process.GetWindowThreadProcessId(hwnd)
-                try:
-                    process = psutil.Process(pid)
-                    if process.name().lower() in [name.lower() for name in self.browser_process_names]:
-                        title = win32gui.GetWindowText(hwnd)
-                        if title:  # Only include windows with titles
-                            windows.append((hwnd, title, process.name()))
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    pass
+        win32gui.EnumWindows(self._collect_browser_window, browser_windows)
+        return browser_windows
+    
+    def _warm_windows_valid(self, windows):
+        """Whether a prewarmed window list still describes the desktop.
+
+        The windows must all exist, and a browser window that took the
+        foreground since (e.g. one just launched) must be one of them - the
+        list is in z-order and would otherwise point at the wrong window."""
+        if not all(win32gui.IsWindow(window[0]) for window in windows):
+            return False
+        foreground = win32gui.GetForegroundWindow()
+        if not foreground or any(window[0] == foreground for window in windows):
             return True
-        
-        win32gui.EnumWindows(callback, browser_windows)
+        _, pid = win32process.GetWindowThreadProcessId(foreground)
+        name = self._process_name(foreground, pid)
+        return name is None or name.lower() not in self._browser_names
+    
+    def find_browser_windows(self):
+        """Find all browser windows"""
+        self.lookups |= LOOKUP_WINDOWS
+        warm, self._warm_windows = self._warm_windows, None
+        if warm is not None and time.monotonic() < warm[0] and self._warm_windows_valid(warm[1]):
+            browser_windows = warm[1]
+            self.warm_saved += warm[2]
+        else:
+            with self._span('lookup'):
+                browser_windows = self._enumerate_browser_windows()
+        if browser_windows:
+            self.last_target = browser_windows[0]
         return browser_windows
     
     def get_monitor_info(self):
-        """Get information about all monitors (helper method to avoid code duplication)"""
-        monitors = []
-        
-        def monitor_enum_proc(hMonitor, hdcMonitor, lprcMonitor, dwData):
-            monitors.append({
-                'handle': hMonitor,
-                'left': lprcMonitor[0],
-                'top': lprcMonitor[1],
-                'right': lprcMonitor[2],
-                'bottom': lprcMonitor[3]
-            })
-            return True
-        
-        windll.user32.EnumDisplayMonitors(None, None, 
-            win32api.WINFUNCTYPE(win32con.BOOL, win32con.DWORD, win32con.DWORD, 
-                                 win32con.POINTER(win32con.RECT), win32con.LPARAM)(monitor_enum_proc), 0)
-        
-        return monitors
+        """Get information about all monitors (cached until the display configuration changes)"""
+        self.lookups |= LOOKUP_MONITORS
+        warm, self._warm_monitors = self._warm_monitors, None
+        if warm is not None and time.monotonic() < warm[0]:
+            self.warm_saved += warm[2]
+            return warm[1]
+        with self._span('monitors'):
+            return self.topology.monitors()
+    
+    def prewarm(self, needs):
+        """Do the lookups a predicted next command will need (LOOKUP_* flags), while idle.
+
+        Focus is only taken ahead when a browser window already has it, so a
+        prediction never pulls the user out of another application."""
+        now = time.monotonic()
+        if needs & (LOOKUP_WINDOWS | LOOKUP_FOCUS):
+            start = time.perf_counter()
+            windows = self._enumerate_browser_windows()
+            if windows:
+                self._warm_windows = (now + WARM_TTL, windows, time.perf_counter() - start)
+            if needs & LOOKUP_FOCUS and windows and self.key_delivery == 'foreground':
+                hwnd = windows[0][0]
+                foreground = win32gui.GetForegroundWindow()
+                if any(window[0] == foreground for window in windows):
+                    if foreground != hwnd:
+                        win32gui.SetForegroundWindow(hwnd)
+                    now = time.monotonic()
+                    self._warm_focus = (now + WARM_TTL, hwnd, now)
+        if needs & LOOKUP_MONITORS:
+            start = time.perf_counter()
+            monitors = self.topology.monitors()
+            self._warm_monitors = (time.monotonic() + WARM_TTL, monitors, time.perf_counter() - start)
     
     def browser_focus(self):
         """Focus the browser window"""
@@ -184,32 +892,19 @@ class PCController:
         """Restore last browser session"""
         print("Executing: Browser Restore Session")
         
-        # Try to find and launch the default browser
+        # First installed of Chrome, Firefox, Edge (paths cached by the launcher)
         # Chrome restore: chrome.exe --restore-last-session
         # Firefox: firefox.exe -restore
-        
-        try:
-            # Try Chrome first
-            subprocess.Popen(['chrome.exe', '--restore-last-session'])
-            return "BROWSER_RESTORE executed - Chrome"
-        except FileNotFoundError:
-            try:
-                # Try Firefox
-                subprocess.Popen(['firefox.exe', '-restore'])
-                return "BROWSER_RESTORE executed - Firefox"
-            except FileNotFoundError:
-                try:
-                    # Try Edge
-                    subprocess.Popen(['msedge.exe', '--restore-last-session'])
-                    return "BROWSER_RESTORE executed - Edge"
-                except FileNotFoundError:
-                    return "BROWSER_RESTORE failed - no browser found"
+        browser = self.launcher.restore_session()
+        if browser:
+            return f"BROWSER_RESTORE executed - {browser}"
+        return "BROWSER_RESTORE failed - no browser found"
     
     def browser_open_chrome(self):
         """Open Chrome browser"""
         print("Executing: Open Chrome")
         try:
-            subprocess.Popen(['chrome.exe'])
+            self.launcher.launch('chrome.exe')
             return "BROWSER_OPEN_CHROME executed"
         except FileNotFoundError:
             return "BROWSER_OPEN_CHROME failed - Chrome not found"
@@ -218,7 +913,7 @@ class PCController:
         """Open Firefox browser"""
         print("Executing: Open Firefox")
         try:
-            subprocess.Popen(['firefox.exe'])
+            self.launcher.launch('firefox.exe')
             return "BROWSER_OPEN_FIREFOX executed"
         except FileNotFoundError:
             return "BROWSER_OPEN_FIREFOX failed - Firefox not found"
@@ -227,7 +922,7 @@ class PCController:
         """Open Edge browser"""
         print("Executing: Open Edge")
         try:
-            subprocess.Popen(['msedge.exe'])
+            self.launcher.launch('msedge.exe')
             return "BROWSER_OPEN_EDGE executed"
         except FileNotFoundError:
             return "BROWSER_OPEN_EDGE failed - Edge not found"
@@ -240,13 +935,12 @@ class PCController:
         if browser_windows:
             hwnd = browser_windows[0][0]
             # Focus the browser first
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
+            self._focus_for_keys(hwnd)
             # Send Ctrl+T to open new tab
-            windll.user32.keybd_event(win32con.VK_CONTROL, 0, 0, 0)
-            windll.user32.keybd_event(ord('T'), 0, 0, 0)
-            windll.user32.keybd_event(ord('T'), 0, win32con.KEYEVENTF_KEYUP, 0)
-            windll.user32.keybd_event(win32con.VK_CONTROL, 0, win32con.KEYEVENTF_KEYUP, 0)
+            self._keybd_event(win32con.VK_CONTROL)
+            self._keybd_event(ord('T'))
+            self._keybd_event(ord('T'), win32con.KEYEVENTF_KEYUP)
+            self._keybd_event(win32con.VK_CONTROL, win32con.KEYEVENTF_KEYUP)
             return "BROWSER_NEW_TAB executed"
         else:
             return "BROWSER_NEW_TAB failed - no browser found"
@@ -259,13 +953,12 @@ class PCController:
         if browser_windows:
             hwnd = browser_windows[0][0]
             # Focus the browser first
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
+            self._focus_for_keys(hwnd)
             # Send Ctrl+W to close current tab
-            windll.user32.keybd_event(win32con.VK_CONTROL, 0, 0, 0)
-            windll.user32.keybd_event(ord('W'), 0, 0, 0)
-            windll.user32.keybd_event(ord('W'), 0, win32con.KEYEVENTF_KEYUP, 0)
-            windll.user32.keybd_event(win32con.VK_CONTROL, 0, win32con.KEYEVENTF_KEYUP, 0)
+            self._keybd_event(win32con.VK_CONTROL)
+            self._keybd_event(ord('W'))
+            self._keybd_event(ord('W'), win32con.KEYEVENTF_KEYUP)
+            self._keybd_event(win32con.VK_CONTROL, win32con.KEYEVENTF_KEYUP)
             return "BROWSER_CLOSE_TAB executed"
         else:
             return "BROWSER_CLOSE_TAB failed - no browser found"
@@ -278,13 +971,12 @@ class PCController:
         if browser_windows:
             hwnd = browser_windows[0][0]
             # Focus the browser first
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
+            self._focus_for_keys(hwnd)
             # Send Ctrl+Tab to switch to next tab
-            windll.user32.keybd_event(win32con.VK_CONTROL, 0, 0, 0)
-            windll.user32.keybd_event(win32con.VK_TAB, 0, 0, 0)
-            windll.user32.keybd_event(win32con.VK_TAB, 0, win32con.KEYEVENTF_KEYUP, 0)
-            windll.user32.keybd_event(win32con.VK_CONTROL, 0, win32con.KEYEVENTF_KEYUP, 0)
+            self._keybd_event(win32con.VK_CONTROL)
+            self._keybd_event(win32con.VK_TAB)
+            self._keybd_event(win32con.VK_TAB, win32con.KEYEVENTF_KEYUP)
+            self._keybd_event(win32con.VK_CONTROL, win32con.KEYEVENTF_KEYUP)
             return "BROWSER_NEXT_TAB executed"
         else:
             return "BROWSER_NEXT_TAB failed - no browser found"
@@ -297,15 +989,14 @@ class PCController:
         if browser_windows:
             hwnd = browser_windows[0][0]
             # Focus the browser first
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
+            self._focus_for_keys(hwnd)
             # Send Ctrl+Shift+Tab to switch to previous tab
-            windll.user32.keybd_event(win32con.VK_CONTROL, 0, 0, 0)
-            windll.user32.keybd_event(win32con.VK_SHIFT, 0, 0, 0)
-            windll.user32.keybd_event(win32con.VK_TAB, 0, 0, 0)
-            windll.user32.keybd_event(win32con.VK_TAB, 0, win32con.KEYEVENTF_KEYUP, 0)
-            windll.user32.keybd_event(win32con.VK_SHIFT, 0, win32con.KEYEVENTF_KEYUP, 0)
-            windll.user32.keybd_event(win32con.VK_CONTROL, 0, win32con.KEYEVENTF_KEYUP, 0)
+            self._keybd_event(win32con.VK_CONTROL)
+            self._keybd_event(win32con.VK_SHIFT)
+            self._keybd_event(win32con.VK_TAB)
+            self._keybd_event(win32con.VK_TAB, win32con.KEYEVENTF_KEYUP)
+            self._keybd_event(win32con.VK_SHIFT, win32con.KEYEVENTF_KEYUP)
+            self._keybd_event(win32con.VK_CONTROL, win32con.KEYEVENTF_KEYUP)
             return "BROWSER_PREV_TAB executed"
         else:
             return "BROWSER_PREV_TAB failed - no browser found"
@@ -318,11 +1009,10 @@ class PCController:
         if browser_windows:
             hwnd = browser_windows[0][0]
             # Focus the browser first
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
+            self._focus_for_keys(hwnd)
             # Send F5 to reload page
-            windll.user32.keybd_event(win32con.VK_F5, 0, 0, 0)
-            windll.user32.keybd_event(win32con.VK_F5, 0, win32con.KEYEVENTF_KEYUP, 0)
+            self._keybd_event(win32con.VK_F5)
+            self._keybd_event(win32con.VK_F5, win32con.KEYEVENTF_KEYUP)
             return "BROWSER_RELOAD executed"
         else:
             return "BROWSER_RELOAD failed - no browser found"
@@ -335,13 +1025,12 @@ class PCController:
         if browser_windows:
             hwnd = browser_windows[0][0]
             # Focus the browser first
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
+            self._focus_for_keys(hwnd)
             # Send Ctrl+F5 or Ctrl+Shift+R for hard reload
-            windll.user32.keybd_event(win32con.VK_CONTROL, 0, 0, 0)
-            windll.user32.keybd_event(win32con.VK_F5, 0, 0, 0)
-            windll.user32.keybd_event(win32con.VK_F5, 0, win32con.KEYEVENTF_KEYUP, 0)
-            windll.user32.keybd_event(win32con.VK_CONTROL, 0, win32con.KEYEVENTF_KEYUP, 0)
+            self._keybd_event(win32con.VK_CONTROL)
+            self._keybd_event(win32con.VK_F5)
+            self._keybd_event(win32con.VK_F5, win32con.KEYEVENTF_KEYUP)
+            self._keybd_event(win32con.VK_CONTROL, win32con.KEYEVENTF_KEYUP)
             return "BROWSER_HARD_RELOAD executed"
         else:
             return "BROWSER_HARD_RELOAD failed - no browser found"
@@ -354,80 +1043,89 @@ class PCController:
         if browser_windows:
             hwnd = browser_windows[0][0]
             # Focus the browser first
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
+            self._focus_for_keys(hwnd)
             # Send Alt+Home to go to home page
-            windll.user32.keybd_event(win32con.VK_MENU, 0, 0, 0)  # Alt key
-            windll.user32.keybd_event(win32con.VK_HOME, 0, 0, 0)
-            windll.user32.keybd_event(win32con.VK_HOME, 0, win32con.KEYEVENTF_KEYUP, 0)
-            windll.user32.keybd_event(win32con.VK_MENU, 0, win32con.KEYEVENTF_KEYUP, 0)
+            self._keybd_event(win32con.VK_MENU)  # Alt key
+            self._keybd_event(win32con.VK_HOME)
+            self._keybd_event(win32con.VK_HOME, win32con.KEYEVENTF_KEYUP)
+            self._keybd_event(win32con.VK_MENU, win32con.KEYEVENTF_KEYUP)
             return "BROWSER_HOME executed"
         else:
             return "BROWSER_HOME failed - no browser found"
     
-    def browser_open_url(self, url):
-        """Open a specific URL in the default browser"""
-        print(f"Executing: Open URL: {url}")
+    def browser_open_url(self, url, shown=None):
+        """Open a specific URL in the default browser (logged and reported as `shown` if given)"""
+        shown = shown or url
+        print(f"Executing: Open URL: {shown}")
         try:
-            webbrowser.open(url)
-            return f"BROWSER_OPEN_URL executed: {url}"
+            route = self.launcher.open_url(url)
+            if route == 'existing-tab':
+                return f"BROWSER_OPEN_URL executed (already open): {shown}"
+            return f"BROWSER_OPEN_URL executed: {shown}"
         except Exception as e:
             return f"BROWSER_OPEN_URL failed: {str(e)}"
     
     def browser_open_youtube(self):
         """Open YouTube in the default browser"""
         print("Executing: Open YouTube")
-        return self.browser_open_url("https://www.youtube.com")
+        return self.browser_open_url(provider_url('youtube'))
     
     def browser_open_hulu(self):
         """Open Hulu in the default browser"""
         print("Executing: Open Hulu")
-        return self.browser_open_url("https://www.hulu.com")
+        return self.browser_open_url(provider_url('hulu'))
     
     # Playback Control Methods (Universal - works on YouTube, Netflix, Hulu, Prime Video, etc.)
     
     def playback_play_pause(self):
-        """Toggle play/pause in video player"""
+        """Toggle play/pause in video player (Space on every site)"""
         print("Executing: Playback Play/Pause Toggle")
-        browser_windows = self.find_browser_windows()
-        
-        if browser_windows:
-            hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
-            # Send spacebar to toggle play/pause (universal across all video platforms)
-            windll.user32.keybd_event(win32con.VK_SPACE, 0, 0, 0)
-            windll.user32.keybd_event(win32con.VK_SPACE, 0, win32con.KEYEVENTF_KEYUP, 0)
-            return "PLAYBACK_PLAY_PAUSE executed"
-        else:
-            return "PLAYBACK_PLAY_PAUSE failed - no browser found"
+        result = self._try_media_backend("PLAYBACK_PLAY_PAUSE", 'toggle')
+        if result:
+            return result
+        return self._site_action("PLAYBACK_PLAY_PAUSE", 'play_pause')
     
     def playback_play(self):
-        """Play video (same as play/pause toggle)"""
+        """Play video (explicit play over CDP, play/pause toggle with hotkeys)"""
         print("Executing: Playback Play")
+        result = self._try_media_backend("PLAYBACK_PLAY", 'play')
+        if result:
+            return result
+        if self.fan_out is not None:
+            return self._fan_out_unsupported("PLAYBACK_PLAY", "keys only toggle - needs --cdp-port")
         return self.playback_play_pause()
     
     def playback_pause(self):
-        """Pause video (same as play/pause toggle)"""
+        """Pause video (explicit pause over CDP, play/pause toggle with hotkeys)"""
         print("Executing: Playback Pause")
+        result = self._try_media_backend("PLAYBACK_PAUSE", 'pause')
+        if result:
+            return result
+        if self.fan_out is not None:
+            return self._fan_out_unsupported("PLAYBACK_PAUSE", "keys only toggle - needs --cdp-port")
         return self.playback_play_pause()
     
     def playback_stop(self):
         """Stop video (pause and exit fullscreen)"""
         print("Executing: Playback Stop")
+        result = self._try_media_backend("PLAYBACK_STOP", 'stop')
+        if result:
+            return result
+        if self.fan_out is not None:
+            steps = ((win32con.VK_SPACE,), 0.2, (win32con.VK_ESCAPE,))
+            return self._fan_out_keys("PLAYBACK_STOP", lambda hwnd, title: ('', steps))
         browser_windows = self.find_browser_windows()
         
         if browser_windows:
             hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
+            self._focus_for_keys(hwnd)
             # First pause with spacebar
-            windll.user32.keybd_event(win32con.VK_SPACE, 0, 0, 0)
-            windll.user32.keybd_event(win32con.VK_SPACE, 0, win32con.KEYEVENTF_KEYUP, 0)
-            time.sleep(0.2)
+            self._keybd_event(win32con.VK_SPACE)
+            self._keybd_event(win32con.VK_SPACE, win32con.KEYEVENTF_KEYUP)
+            self._sleep(0.2)
             # Then exit fullscreen with Escape
-            windll.user32.keybd_event(win32con.VK_ESCAPE, 0, 0, 0)
-            windll.user32.keybd_event(win32con.VK_ESCAPE, 0, win32con.KEYEVENTF_KEYUP, 0)
+            self._keybd_event(win32con.VK_ESCAPE)
+            self._keybd_event(win32con.VK_ESCAPE, win32con.KEYEVENTF_KEYUP)
             return "PLAYBACK_STOP executed"
         else:
             return "PLAYBACK_STOP failed - no browser found"
@@ -435,165 +1133,123 @@ class PCController:
     def playback_restart(self):
         """Restart video from beginning"""
         print("Executing: Playback Restart")
-        browser_windows = self.find_browser_windows()
-        
-        if browser_windows:
-            hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
-            # Press Home key to jump to beginning
-            windll.user32.keybd_event(win32con.VK_HOME, 0, 0, 0)
-            windll.user32.keybd_event(win32con.VK_HOME, 0, win32con.KEYEVENTF_KEYUP, 0)
-            return "PLAYBACK_RESTART executed"
-        else:
-            return "PLAYBACK_RESTART failed - no browser found"
+        result = self._try_media_backend("PLAYBACK_RESTART", 'seek_to', 0)
+        if result:
+            return result
+        return self._site_action("PLAYBACK_RESTART", 'restart')
     
     def playback_seek_forward_small(self):
-        """Seek forward 5 seconds (Right arrow key)"""
+        """Seek forward 5 seconds (Right arrow - 10 seconds on Netflix/Hulu)"""
         print("Executing: Playback Seek Forward Small")
-        browser_windows = self.find_browser_windows()
-        
-        if browser_windows:
-            hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
-            # Right arrow for small forward seek
-            windll.user32.keybd_event(win32con.VK_RIGHT, 0, 0, 0)
-            windll.user32.keybd_event(win32con.VK_RIGHT, 0, win32con.KEYEVENTF_KEYUP, 0)
-            return "PLAYBACK_SEEK_FORWARD_SMALL executed"
-        else:
-            return "PLAYBACK_SEEK_FORWARD_SMALL failed - no browser found"
+        result = self._try_media_backend("PLAYBACK_SEEK_FORWARD_SMALL", 'seek', 5)
+        if result:
+            return result
+        return self._site_action("PLAYBACK_SEEK_FORWARD_SMALL", 'seek_forward_small')
     
     def playback_seek_backward_small(self):
-        """Seek backward 5 seconds (Left arrow key)"""
+        """Seek backward 5 seconds (Left arrow - 10 seconds on Netflix/Hulu)"""
         print("Executing: Playback Seek Backward Small")
-        browser_windows = self.find_browser_windows()
-        
-        if browser_windows:
-            hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
-            # Left arrow for small backward seek
-            windll.user32.keybd_event(win32con.VK_LEFT, 0, 0, 0)
-            windll.user32.keybd_event(win32con.VK_LEFT, 0, win32con.KEYEVENTF_KEYUP, 0)
-            return "PLAYBACK_SEEK_BACKWARD_SMALL executed"
-        else:
-            return "PLAYBACK_SEEK_BACKWARD_SMALL failed - no browser found"
+        result = self._try_media_backend("PLAYBACK_SEEK_BACKWARD_SMALL", 'seek', -5)
+        if result:
+            return result
+        return self._site_action("PLAYBACK_SEEK_BACKWARD_SMALL", 'seek_backward_small')
     
     def playback_seek_forward_large(self):
-        """Seek forward 10 seconds (L key on YouTube, Shift+Right on others)"""
+        """Seek forward 10 seconds (L key on YouTube, Right arrow on Netflix/Hulu)"""
         print("Executing: Playback Seek Forward Large")
-        browser_windows = self.find_browser_windows()
-        
-        if browser_windows:
-            hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
-            # Try L key (YouTube standard)
-            windll.user32.keybd_event(ord('L'), 0, 0, 0)
-            windll.user32.keybd_event(ord('L'), 0, win32con.KEYEVENTF_KEYUP, 0)
-            return "PLAYBACK_SEEK_FORWARD_LARGE executed"
-        else:
-            return "PLAYBACK_SEEK_FORWARD_LARGE failed - no browser found"
+        result = self._try_media_backend("PLAYBACK_SEEK_FORWARD_LARGE", 'seek', 10)
+        if result:
+            return result
+        return self._site_action("PLAYBACK_SEEK_FORWARD_LARGE", 'seek_forward_large')
     
     def playback_seek_backward_large(self):
-        """Seek backward 10 seconds (J key on YouTube, Shift+Left on others)"""
+        """Seek backward 10 seconds (J key on YouTube, Left arrow on Netflix/Hulu)"""
         print("Executing: Playback Seek Backward Large")
-        browser_windows = self.find_browser_windows()
-        
-        if browser_windows:
-            hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
-            # Try J key (YouTube standard)
-            windll.user32.keybd_event(ord('J'), 0, 0, 0)
-            windll.user32.keybd_event(ord('J'), 0, win32con.KEYEVENTF_KEYUP, 0)
-            return "PLAYBACK_SEEK_BACKWARD_LARGE executed"
-        else:
-            return "PLAYBACK_SEEK_BACKWARD_LARGE failed - no browser found"
+        result = self._try_media_backend("PLAYBACK_SEEK_BACKWARD_LARGE", 'seek', -10)
+        if result:
+            return result
+        return self._site_action("PLAYBACK_SEEK_BACKWARD_LARGE", 'seek_backward_large')
     
     def playback_jump_to_beginning(self):
         """Jump to the beginning of video"""
         print("Executing: Playback Jump to Beginning")
-        browser_windows = self.find_browser_windows()
-        
-        if browser_windows:
-            hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
-            # Home key to jump to beginning
-            windll.user32.keybd_event(win32con.VK_HOME, 0, 0, 0)
-            windll.user32.keybd_event(win32con.VK_HOME, 0, win32con.KEYEVENTF_KEYUP, 0)
-            return "PLAYBACK_JUMP_TO_BEGINNING executed"
-        else:
-            return "PLAYBACK_JUMP_TO_BEGINNING failed - no browser found"
+        result = self._try_media_backend("PLAYBACK_JUMP_TO_BEGINNING", 'seek_to', 0)
+        if result:
+            return result
+        return self._site_action("PLAYBACK_JUMP_TO_BEGINNING", 'restart')
     
     def playback_jump_to_end(self):
         """Jump to the end of video"""
         print("Executing: Playback Jump to End")
-        browser_windows = self.find_browser_windows()
-        
-        if browser_windows:
-            hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
-            # End key to jump to end
-            windll.user32.keybd_event(win32con.VK_END, 0, 0, 0)
-            windll.user32.keybd_event(win32con.VK_END, 0, win32con.KEYEVENTF_KEYUP, 0)
-            return "PLAYBACK_JUMP_TO_END executed"
-        else:
-            return "PLAYBACK_JUMP_TO_END failed - no browser found"
+        result = self._try_media_backend("PLAYBACK_JUMP_TO_END", 'seek_end')
+        if result:
+            return result
+        return self._site_action("PLAYBACK_JUMP_TO_END", 'jump_to_end')
     
     def playback_next_video(self):
         """Next video in playlist (Shift+N)"""
         print("Executing: Playback Next Video")
-        browser_windows = self.find_browser_windows()
-        
-        if browser_windows:
-            hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
-            # Shift+N for next video (YouTube standard)
-            windll.user32.keybd_event(win32con.VK_SHIFT, 0, 0, 0)
-            windll.user32.keybd_event(ord('N'), 0, 0, 0)
-            windll.user32.keybd_event(ord('N'), 0, win32con.KEYEVENTF_KEYUP, 0)
-            windll.user32.keybd_event(win32con.VK_SHIFT, 0, win32con.KEYEVENTF_KEYUP, 0)
-            return "PLAYBACK_NEXT_VIDEO executed"
-        else:
-            return "PLAYBACK_NEXT_VIDEO failed - no browser found"
+        result = self._try_media_backend("PLAYBACK_NEXT_VIDEO", 'next_video')
+        if result:
+            return result
+        return self._site_action("PLAYBACK_NEXT_VIDEO", 'next_video')
     
     def playback_previous_video(self):
         """Previous video in playlist (Shift+P)"""
         print("Executing: Playback Previous Video")
-        browser_windows = self.find_browser_windows()
-        
-        if browser_windows:
-            hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
-            # Shift+P for previous video (YouTube standard)
-            windll.user32.keybd_event(win32con.VK_SHIFT, 0, 0, 0)
-            windll.user32.keybd_event(ord('P'), 0, 0, 0)
-            windll.user32.keybd_event(ord('P'), 0, win32con.KEYEVENTF_KEYUP, 0)
-            windll.user32.keybd_event(win32con.VK_SHIFT, 0, win32con.KEYEVENTF_KEYUP, 0)
-            return "PLAYBACK_PREVIOUS_VIDEO executed"
-        else:
-            return "PLAYBACK_PREVIOUS_VIDEO failed - no browser found"
+        result = self._try_media_backend("PLAYBACK_PREVIOUS_VIDEO", 'previous_video')
+        if result:
+            return result
+        return self._site_action("PLAYBACK_PREVIOUS_VIDEO", 'previous_video')
+    
+    def playback_rate(self, rate):
+        """Set the video's playback speed (0.25-4x, needs CDP - sites only step it with keys)"""
+        print(f"Executing: Playback Rate {rate}x")
+        if not 0.25 <= rate <= 4:
+            return f"PLAYBACK_RATE failed - rate {rate} not in 0.25-4"
+        result = self._try_media_backend("PLAYBACK_RATE", 'rate', rate)
+        return result or "PLAYBACK_RATE failed - needs the DevTools backend (--cdp-port)"
+    
+    def playback_volume_set(self, level):
+        """Set the video player's own volume (0-100) over CDP, else the browser's in the mixer"""
+        print(f"Executing: Playback Volume Set to {level}%")
+        if not 0 <= level <= 100:
+            return f"PLAYBACK_VOLUME_SET failed - level {level} not in 0-100"
+        result = self._try_media_backend("PLAYBACK_VOLUME_SET", 'volume', level / 100)
+        if result:
+            return result
+        return self.browser_volume_set(level)
+    
+    def playback_state(self):
+        """Read back the video's state (position, paused, speed, volume) without changing it"""
+        print("Executing: Playback State")
+        if self.media_backend is None:
+            return "PLAYBACK_STATE failed - needs the DevTools backend (--cdp-port)"
+        if self.context is not None:
+            self.context.check()
+        try:
+            with self._span('cdp'):
+                state = self.media_backend.state()
+        except CDPError as e:
+            return f"PLAYBACK_STATE failed - {e}"
+        return f"PLAYBACK_STATE {describe_state(state)}"
     
     # Fullscreen & View Mode Controls
     
     def fullscreen_enter(self):
         """Enter fullscreen mode (F11)"""
         print("Executing: Fullscreen Enter")
+        result = self._try_media_backend("FULLSCREEN_ENTER", 'fullscreen', True)
+        if result:
+            return result
         browser_windows = self.find_browser_windows()
         
         if browser_windows:
             hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
+            self._focus_for_keys(hwnd)
             # F11 key to enter fullscreen
-            windll.user32.keybd_event(win32con.VK_F11, 0, 0, 0)
-            windll.user32.keybd_event(win32con.VK_F11, 0, win32con.KEYEVENTF_KEYUP, 0)
+            self._keybd_event(win32con.VK_F11)
+            self._keybd_event(win32con.VK_F11, win32con.KEYEVENTF_KEYUP)
             return "FULLSCREEN_ENTER executed"
         else:
             return "FULLSCREEN_ENTER failed - no browser found"
@@ -601,15 +1257,17 @@ class PCController:
     def fullscreen_exit(self):
         """Exit fullscreen mode (Escape)"""
         print("Executing: Fullscreen Exit")
+        result = self._try_media_backend("FULLSCREEN_EXIT", 'fullscreen', False)
+        if result:
+            return result
         browser_windows = self.find_browser_windows()
         
         if browser_windows:
             hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
+            self._focus_for_keys(hwnd)
             # Escape key to exit fullscreen
-            windll.user32.keybd_event(win32con.VK_ESCAPE, 0, 0, 0)
-            windll.user32.keybd_event(win32con.VK_ESCAPE, 0, win32con.KEYEVENTF_KEYUP, 0)
+            self._keybd_event(win32con.VK_ESCAPE)
+            self._keybd_event(win32con.VK_ESCAPE, win32con.KEYEVENTF_KEYUP)
             return "FULLSCREEN_EXIT executed"
         else:
             return "FULLSCREEN_EXIT failed - no browser found"
@@ -617,15 +1275,17 @@ class PCController:
     def fullscreen_toggle(self):
         """Toggle fullscreen mode (F11)"""
         print("Executing: Fullscreen Toggle")
+        result = self._try_media_backend("FULLSCREEN_TOGGLE", 'fullscreen', None)
+        if result:
+            return result
         browser_windows = self.find_browser_windows()
         
         if browser_windows:
             hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
+            self._focus_for_keys(hwnd)
             # F11 key to toggle fullscreen
-            windll.user32.keybd_event(win32con.VK_F11, 0, 0, 0)
-            windll.user32.keybd_event(win32con.VK_F11, 0, win32con.KEYEVENTF_KEYUP, 0)
+            self._keybd_event(win32con.VK_F11)
+            self._keybd_event(win32con.VK_F11, win32con.KEYEVENTF_KEYUP)
             return "FULLSCREEN_TOGGLE executed"
         else:
             return "FULLSCREEN_TOGGLE failed - no browser found"
@@ -633,34 +1293,18 @@ class PCController:
     def theater_mode(self):
         """Enter theater mode (T key for YouTube)"""
         print("Executing: Theater Mode")
-        browser_windows = self.find_browser_windows()
-        
-        if browser_windows:
-            hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
-            # T key for YouTube theater mode
-            windll.user32.keybd_event(ord('T'), 0, 0, 0)
-            windll.user32.keybd_event(ord('T'), 0, win32con.KEYEVENTF_KEYUP, 0)
-            return "THEATER_MODE executed"
-        else:
-            return "THEATER_MODE failed - no browser found"
+        result = self._try_media_backend("THEATER_MODE", 'theater')
+        if result:
+            return result
+        return self._site_action("THEATER_MODE", 'theater')
     
     def theater_mode_exit(self):
         """Exit theater mode (T key again for YouTube)"""
         print("Executing: Theater Mode Exit")
-        browser_windows = self.find_browser_windows()
-        
-        if browser_windows:
-            hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
-            # T key to exit theater mode
-            windll.user32.keybd_event(ord('T'), 0, 0, 0)
-            windll.user32.keybd_event(ord('T'), 0, win32con.KEYEVENTF_KEYUP, 0)
-            return "THEATER_MODE_EXIT executed"
-        else:
-            return "THEATER_MODE_EXIT failed - no browser found"
+        result = self._try_media_backend("THEATER_MODE_EXIT", 'theater')
+        if result:
+            return result
+        return self._site_action("THEATER_MODE_EXIT", 'theater')
     
     def picture_in_picture_enter(self):
         """Enter picture-in-picture mode (browser-specific shortcuts)"""
@@ -669,13 +1313,12 @@ class PCController:
         
         if browser_windows:
             hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
+            self._focus_for_keys(hwnd)
             # Alt+P for picture-in-picture (works in most browsers)
-            windll.user32.keybd_event(win32con.VK_MENU, 0, 0, 0)  # Alt
-            windll.user32.keybd_event(ord('P'), 0, 0, 0)
-            windll.user32.keybd_event(ord('P'), 0, win32con.KEYEVENTF_KEYUP, 0)
-            windll.user32.keybd_event(win32con.VK_MENU, 0, win32con.KEYEVENTF_KEYUP, 0)
+            self._keybd_event(win32con.VK_MENU)  # Alt
+            self._keybd_event(ord('P'))
+            self._keybd_event(ord('P'), win32con.KEYEVENTF_KEYUP)
+            self._keybd_event(win32con.VK_MENU, win32con.KEYEVENTF_KEYUP)
             return "PICTURE_IN_PICTURE_ENTER executed"
         else:
             return "PICTURE_IN_PICTURE_ENTER failed - no browser found"
@@ -687,13 +1330,12 @@ class PCController:
         
         if browser_windows:
             hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
+            self._focus_for_keys(hwnd)
             # Alt+P again to exit picture-in-picture
-            windll.user32.keybd_event(win32con.VK_MENU, 0, 0, 0)  # Alt
-            windll.user32.keybd_event(ord('P'), 0, 0, 0)
-            windll.user32.keybd_event(ord('P'), 0, win32con.KEYEVENTF_KEYUP, 0)
-            windll.user32.keybd_event(win32con.VK_MENU, 0, win32con.KEYEVENTF_KEYUP, 0)
+            self._keybd_event(win32con.VK_MENU)  # Alt
+            self._keybd_event(ord('P'))
+            self._keybd_event(ord('P'), win32con.KEYEVENTF_KEYUP)
+            self._keybd_event(win32con.VK_MENU, win32con.KEYEVENTF_KEYUP)
             return "PICTURE_IN_PICTURE_EXIT executed"
         else:
             return "PICTURE_IN_PICTURE_EXIT failed - no browser found"
@@ -704,16 +1346,16 @@ class PCController:
         """Increase system volume"""
         print("Executing: Volume Up")
         # Volume Up key (0xAF)
-        windll.user32.keybd_event(0xAF, 0, 0, 0)
-        windll.user32.keybd_event(0xAF, 0, win32con.KEYEVENTF_KEYUP, 0)
+        self._keybd_event(0xAF)
+        self._keybd_event(0xAF, win32con.KEYEVENTF_KEYUP)
         return "VOLUME_UP executed"
     
     def volume_down(self):
         """Decrease system volume"""
         print("Executing: Volume Down")
         # Volume Down key (0xAE)
-        windll.user32.keybd_event(0xAE, 0, 0, 0)
-        windll.user32.keybd_event(0xAE, 0, win32con.KEYEVENTF_KEYUP, 0)
+        self._keybd_event(0xAE)
+        self._keybd_event(0xAE, win32con.KEYEVENTF_KEYUP)
         return "VOLUME_DOWN executed"
     
     def mute_audio(self):
@@ -723,8 +1365,8 @@ class PCController:
         Provided as separate method for semantic API clarity."""
         print("Executing: Mute Audio")
         # Mute key (0xAD)
-        windll.user32.keybd_event(0xAD, 0, 0, 0)
-        windll.user32.keybd_event(0xAD, 0, win32con.KEYEVENTF_KEYUP, 0)
+        self._keybd_event(0xAD)
+        self._keybd_event(0xAD, win32con.KEYEVENTF_KEYUP)
         return "MUTE_AUDIO executed"
     
     def unmute_audio(self):
@@ -734,8 +1376,8 @@ class PCController:
         Provided as separate method for semantic API clarity."""
         print("Executing: Unmute Audio")
         # Mute key (0xAD) - toggles mute/unmute
-        windll.user32.keybd_event(0xAD, 0, 0, 0)
-        windll.user32.keybd_event(0xAD, 0, win32con.KEYEVENTF_KEYUP, 0)
+        self._keybd_event(0xAD)
+        self._keybd_event(0xAD, win32con.KEYEVENTF_KEYUP)
         return "UNMUTE_AUDIO executed"
     
     def toggle_mute(self):
@@ -744,8 +1386,8 @@ class PCController:
         mute key is a toggle. All three methods provided for API clarity."""
         print("Executing: Toggle Mute")
         # Mute key (0xAD)
-        windll.user32.keybd_event(0xAD, 0, 0, 0)
-        windll.user32.keybd_event(0xAD, 0, win32con.KEYEVENTF_KEYUP, 0)
+        self._keybd_event(0xAD)
+        self._keybd_event(0xAD, win32con.KEYEVENTF_KEYUP)
         return "TOGGLE_MUTE executed"
     
     def volume_set(self, level):
@@ -753,84 +1395,93 @@ class PCController:
         print(f"Executing: Set Volume to {level}%")
         try:
             # First, mute to get a baseline
-            windll.user32.keybd_event(0xAD, 0, 0, 0)
-            windll.user32.keybd_event(0xAD, 0, win32con.KEYEVENTF_KEYUP, 0)
-            time.sleep(0.2)
+            self._keybd_event(0xAD)
+            self._keybd_event(0xAD, win32con.KEYEVENTF_KEYUP)
+            self._sleep(0.2)
             # Unmute
-            windll.user32.keybd_event(0xAD, 0, 0, 0)
-            windll.user32.keybd_event(0xAD, 0, win32con.KEYEVENTF_KEYUP, 0)
-            time.sleep(0.2)
+            self._keybd_event(0xAD)
+            self._keybd_event(0xAD, win32con.KEYEVENTF_KEYUP)
+            self._sleep(0.2)
             
             # Calculate number of volume down presses to reach 0
             # Then calculate up presses to reach target
             # Press volume down 50 times to ensure we're at 0
             for _ in range(50):
-                windll.user32.keybd_event(0xAE, 0, 0, 0)
-                windll.user32.keybd_event(0xAE, 0, win32con.KEYEVENTF_KEYUP, 0)
-                time.sleep(0.01)
+                self._keybd_event(0xAE)
+                self._keybd_event(0xAE, win32con.KEYEVENTF_KEYUP)
+                self._sleep(0.01)
             
             # Now press volume up to reach desired level
             # Each press is typically 2%, so level/2 presses
             presses = int(level / 2)
             for _ in range(presses):
-                windll.user32.keybd_event(0xAF, 0, 0, 0)
-                windll.user32.keybd_event(0xAF, 0, win32con.KEYEVENTF_KEYUP, 0)
-                time.sleep(0.01)
+                self._keybd_event(0xAF)
+                self._keybd_event(0xAF, win32con.KEYEVENTF_KEYUP)
+                self._sleep(0.01)
             
             return f"VOLUME_SET executed: {level}%"
+        except CommandCancelled:
+            raise
         except Exception as e:
             return f"VOLUME_SET failed: {str(e)}"
     
     def browser_tab_mute(self):
-        """Mute browser tab (M key in YouTube and other video players)"""
+        """Mute browser tab (CDP, else the browser's audio sessions, else the M key)"""
         print("Executing: Browser Tab Mute")
-        browser_windows = self.find_browser_windows()
-        
-        if browser_windows:
-            hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
-            # M key to mute video in most video players
-            windll.user32.keybd_event(ord('M'), 0, 0, 0)
-            windll.user32.keybd_event(ord('M'), 0, win32con.KEYEVENTF_KEYUP, 0)
-            return "BROWSER_TAB_MUTE executed"
-        else:
-            return "BROWSER_TAB_MUTE failed - no browser found"
+        result = (self._try_media_backend("BROWSER_TAB_MUTE", 'mute', True)
+                  or self._browser_audio("BROWSER_TAB_MUTE", lambda name: self.audio.set_mute(name, True)))
+        if result:
+            return result
+        if self.fan_out is not None:
+            return self._fan_out_unsupported("BROWSER_TAB_MUTE", "M only toggles - needs CDP or audio sessions")
+        return self._site_action("BROWSER_TAB_MUTE", 'mute')
     
     def browser_tab_unmute(self):
-        """Unmute browser tab (M key again)"""
+        """Unmute browser tab (CDP, else the browser's audio sessions, else the M key again)"""
         print("Executing: Browser Tab Unmute")
-        browser_windows = self.find_browser_windows()
-        
-        if browser_windows:
-            hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
-            # M key to unmute video
-            windll.user32.keybd_event(ord('M'), 0, 0, 0)
-            windll.user32.keybd_event(ord('M'), 0, win32con.KEYEVENTF_KEYUP, 0)
-            return "BROWSER_TAB_UNMUTE executed"
-        else:
-            return "BROWSER_TAB_UNMUTE failed - no browser found"
+        result = (self._try_media_backend("BROWSER_TAB_UNMUTE", 'mute', False)
+                  or self._browser_audio("BROWSER_TAB_UNMUTE", lambda name: self.audio.set_mute(name, False)))
+        if result:
+            return result
+        if self.fan_out is not None:
+            return self._fan_out_unsupported("BROWSER_TAB_UNMUTE", "M only toggles - needs CDP or audio sessions")
+        return self._site_action("BROWSER_TAB_UNMUTE", 'mute')
+    
+    def browser_volume_set(self, level):
+        """Set the browser's own volume (0-100) in the volume mixer"""
+        print(f"Executing: Browser Volume Set to {level}%")
+        if not 0 <= level <= 100:
+            return f"BROWSER_VOLUME_SET failed - level {level} not in 0-100"
+        if self.audio is None:
+            return "BROWSER_VOLUME_SET failed - audio session control unavailable (needs pycaw)"
+        result = self._browser_audio(f"BROWSER_VOLUME_SET {level}%",
+                                     lambda name: self.audio.set_volume(name, level / 100))
+        return result or "BROWSER_VOLUME_SET failed - no browser found"
     
     def system_mute_all(self):
         """Mute all system audio
-        Note: Windows mute key is system-wide and is a toggle. This is the same
-        implementation as mute_audio but provided for semantic clarity in API."""
+        With audio session control every app's session is muted (not a toggle).
+        Otherwise the Windows mute key is pressed, which is system-wide and a
+        toggle - the same as mute_audio."""
         print("Executing: System Mute All")
+        if self.audio is not None:
+            return f"SYSTEM_MUTE_ALL executed ({self.audio.mute_all()} audio sessions muted)"
         # Same as regular mute - Windows mute key affects all system audio
-        windll.user32.keybd_event(0xAD, 0, 0, 0)
-        windll.user32.keybd_event(0xAD, 0, win32con.KEYEVENTF_KEYUP, 0)
+        self._keybd_event(0xAD)
+        self._keybd_event(0xAD, win32con.KEYEVENTF_KEYUP)
         return "SYSTEM_MUTE_ALL executed"
     
     def system_audio_restore(self):
         """Restore system audio
-        Note: Windows mute key is system-wide and is a toggle. This is the same
-        implementation as unmute_audio but provided for semantic clarity in API."""
+        With audio session control the sessions SYSTEM_MUTE_ALL muted are
+        unmuted. Otherwise the Windows mute key is pressed, which is
+        system-wide and a toggle - the same as unmute_audio."""
         print("Executing: System Audio Restore")
+        if self.audio is not None:
+            return f"SYSTEM_AUDIO_RESTORE executed ({self.audio.restore()} audio sessions unmuted)"
         # Same as unmute - Windows mute key affects all system audio
-        windll.user32.keybd_event(0xAD, 0, 0, 0)
-        windll.user32.keybd_event(0xAD, 0, win32con.KEYEVENTF_KEYUP, 0)
+        self._keybd_event(0xAD)
+        self._keybd_event(0xAD, win32con.KEYEVENTF_KEYUP)
         return "SYSTEM_AUDIO_RESTORE executed"
     
     # Subtitles/Captions Control Methods
@@ -838,50 +1489,23 @@ class PCController:
     def captions_toggle_on(self):
         """Toggle captions on (C key for YouTube and many video players)"""
         print("Executing: Captions Toggle On")
-        browser_windows = self.find_browser_windows()
-        
-        if browser_windows:
-            hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
-            # C key to toggle captions
-            windll.user32.keybd_event(ord('C'), 0, 0, 0)
-            windll.user32.keybd_event(ord('C'), 0, win32con.KEYEVENTF_KEYUP, 0)
-            return "CAPTIONS_TOGGLE_ON executed"
-        else:
-            return "CAPTIONS_TOGGLE_ON failed - no browser found"
+        result = self._try_media_backend("CAPTIONS_TOGGLE_ON", 'captions', True)
+        if result:
+            return result
+        return self._site_action("CAPTIONS_TOGGLE_ON", 'captions')
     
     def captions_toggle_off(self):
         """Toggle captions off (C key again)"""
         print("Executing: Captions Toggle Off")
-        browser_windows = self.find_browser_windows()
-        
-        if browser_windows:
-            hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
-            # C key to toggle captions off
-            windll.user32.keybd_event(ord('C'), 0, 0, 0)
-            windll.user32.keybd_event(ord('C'), 0, win32con.KEYEVENTF_KEYUP, 0)
-            return "CAPTIONS_TOGGLE_OFF executed"
-        else:
-            return "CAPTIONS_TOGGLE_OFF failed - no browser found"
+        result = self._try_media_backend("CAPTIONS_TOGGLE_OFF", 'captions', False)
+        if result:
+            return result
+        return self._site_action("CAPTIONS_TOGGLE_OFF", 'captions')
     
     def captions_cycle_language(self):
         """Cycle caption languages (site dependent - opens settings on YouTube with O key)"""
         print("Executing: Captions Cycle Language")
-        browser_windows = self.find_browser_windows()
-        
-        if browser_windows:
-            hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
-            # O key opens settings menu in YouTube where captions can be changed
-            windll.user32.keybd_event(ord('O'), 0, 0, 0)
-            windll.user32.keybd_event(ord('O'), 0, win32con.KEYEVENTF_KEYUP, 0)
-            return "CAPTIONS_CYCLE_LANGUAGE executed (opened settings)"
-        else:
-            return "CAPTIONS_CYCLE_LANGUAGE failed - no browser found"
+        return self._site_action("CAPTIONS_CYCLE_LANGUAGE", 'captions_menu')
     
     def captions_size_increase(self):
         """Increase caption size using browser zoom (Ctrl++)
@@ -893,13 +1517,12 @@ class PCController:
         
         if browser_windows:
             hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
+            self._focus_for_keys(hwnd)
             # Ctrl++ to zoom in (increases all page content including caption size)
-            windll.user32.keybd_event(win32con.VK_CONTROL, 0, 0, 0)
-            windll.user32.keybd_event(0xBB, 0, 0, 0)  # VK_OEM_PLUS
-            windll.user32.keybd_event(0xBB, 0, win32con.KEYEVENTF_KEYUP, 0)
-            windll.user32.keybd_event(win32con.VK_CONTROL, 0, win32con.KEYEVENTF_KEYUP, 0)
+            self._keybd_event(win32con.VK_CONTROL)
+            self._keybd_event(0xBB)  # VK_OEM_PLUS
+            self._keybd_event(0xBB, win32con.KEYEVENTF_KEYUP)
+            self._keybd_event(win32con.VK_CONTROL, win32con.KEYEVENTF_KEYUP)
             return "CAPTIONS_SIZE_INCREASE executed"
         else:
             return "CAPTIONS_SIZE_INCREASE failed - no browser found"
@@ -914,13 +1537,12 @@ class PCController:
         
         if browser_windows:
             hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
+            self._focus_for_keys(hwnd)
             # Ctrl+- to zoom out (decreases all page content including caption size)
-            windll.user32.keybd_event(win32con.VK_CONTROL, 0, 0, 0)
-            windll.user32.keybd_event(0xBD, 0, 0, 0)  # VK_OEM_MINUS
-            windll.user32.keybd_event(0xBD, 0, win32con.KEYEVENTF_KEYUP, 0)
-            windll.user32.keybd_event(win32con.VK_CONTROL, 0, win32con.KEYEVENTF_KEYUP, 0)
+            self._keybd_event(win32con.VK_CONTROL)
+            self._keybd_event(0xBD)  # VK_OEM_MINUS
+            self._keybd_event(0xBD, win32con.KEYEVENTF_KEYUP)
+            self._keybd_event(win32con.VK_CONTROL, win32con.KEYEVENTF_KEYUP)
             return "CAPTIONS_SIZE_DECREASE executed"
         else:
             return "CAPTIONS_SIZE_DECREASE failed - no browser found"
@@ -934,10 +1556,9 @@ class PCController:
         
         if browser_windows:
             hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
-            windll.user32.keybd_event(win32con.VK_RETURN, 0, 0, 0)
-            windll.user32.keybd_event(win32con.VK_RETURN, 0, win32con.KEYEVENTF_KEYUP, 0)
+            self._focus_for_keys(hwnd)
+            self._keybd_event(win32con.VK_RETURN)
+            self._keybd_event(win32con.VK_RETURN, win32con.KEYEVENTF_KEYUP)
             return "NAV_SELECT_ELEMENT executed"
         else:
             return "NAV_SELECT_ELEMENT failed - no browser found"
@@ -949,12 +1570,11 @@ class PCController:
         
         if browser_windows:
             hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
-            windll.user32.keybd_event(win32con.VK_MENU, 0, 0, 0)  # Alt
-            windll.user32.keybd_event(win32con.VK_LEFT, 0, 0, 0)
-            windll.user32.keybd_event(win32con.VK_LEFT, 0, win32con.KEYEVENTF_KEYUP, 0)
-            windll.user32.keybd_event(win32con.VK_MENU, 0, win32con.KEYEVENTF_KEYUP, 0)
+            self._focus_for_keys(hwnd)
+            self._keybd_event(win32con.VK_MENU)  # Alt
+            self._keybd_event(win32con.VK_LEFT)
+            self._keybd_event(win32con.VK_LEFT, win32con.KEYEVENTF_KEYUP)
+            self._keybd_event(win32con.VK_MENU, win32con.KEYEVENTF_KEYUP)
             return "NAV_BACK executed"
         else:
             return "NAV_BACK failed - no browser found"
@@ -966,12 +1586,11 @@ class PCController:
         
         if browser_windows:
             hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
-            windll.user32.keybd_event(win32con.VK_MENU, 0, 0, 0)  # Alt
-            windll.user32.keybd_event(win32con.VK_RIGHT, 0, 0, 0)
-            windll.user32.keybd_event(win32con.VK_RIGHT, 0, win32con.KEYEVENTF_KEYUP, 0)
-            windll.user32.keybd_event(win32con.VK_MENU, 0, win32con.KEYEVENTF_KEYUP, 0)
+            self._focus_for_keys(hwnd)
+            self._keybd_event(win32con.VK_MENU)  # Alt
+            self._keybd_event(win32con.VK_RIGHT)
+            self._keybd_event(win32con.VK_RIGHT, win32con.KEYEVENTF_KEYUP)
+            self._keybd_event(win32con.VK_MENU, win32con.KEYEVENTF_KEYUP)
             return "NAV_FORWARD executed"
         else:
             return "NAV_FORWARD failed - no browser found"
@@ -983,10 +1602,9 @@ class PCController:
         
         if browser_windows:
             hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
-            windll.user32.keybd_event(win32con.VK_ESCAPE, 0, 0, 0)
-            windll.user32.keybd_event(win32con.VK_ESCAPE, 0, win32con.KEYEVENTF_KEYUP, 0)
+            self._focus_for_keys(hwnd)
+            self._keybd_event(win32con.VK_ESCAPE)
+            self._keybd_event(win32con.VK_ESCAPE, win32con.KEYEVENTF_KEYUP)
             return "NAV_EXIT_MENU executed"
         else:
             return "NAV_EXIT_MENU failed - no browser found"
@@ -998,10 +1616,9 @@ class PCController:
         
         if browser_windows:
             hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
-            windll.user32.keybd_event(win32con.VK_UP, 0, 0, 0)
-            windll.user32.keybd_event(win32con.VK_UP, 0, win32con.KEYEVENTF_KEYUP, 0)
+            self._focus_for_keys(hwnd)
+            self._keybd_event(win32con.VK_UP)
+            self._keybd_event(win32con.VK_UP, win32con.KEYEVENTF_KEYUP)
             return "NAV_SCROLL_UP executed"
         else:
             return "NAV_SCROLL_UP failed - no browser found"
@@ -1013,10 +1630,9 @@ class PCController:
         
         if browser_windows:
             hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
-            windll.user32.keybd_event(win32con.VK_DOWN, 0, 0, 0)
-            windll.user32.keybd_event(win32con.VK_DOWN, 0, win32con.KEYEVENTF_KEYUP, 0)
+            self._focus_for_keys(hwnd)
+            self._keybd_event(win32con.VK_DOWN)
+            self._keybd_event(win32con.VK_DOWN, win32con.KEYEVENTF_KEYUP)
             return "NAV_SCROLL_DOWN executed"
         else:
             return "NAV_SCROLL_DOWN failed - no browser found"
@@ -1028,10 +1644,9 @@ class PCController:
         
         if browser_windows:
             hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
-            windll.user32.keybd_event(win32con.VK_PRIOR, 0, 0, 0)  # VK_PRIOR = Page Up
-            windll.user32.keybd_event(win32con.VK_PRIOR, 0, win32con.KEYEVENTF_KEYUP, 0)
+            self._focus_for_keys(hwnd)
+            self._keybd_event(win32con.VK_PRIOR)  # VK_PRIOR = Page Up
+            self._keybd_event(win32con.VK_PRIOR, win32con.KEYEVENTF_KEYUP)
             return "NAV_PAGE_UP executed"
         else:
             return "NAV_PAGE_UP failed - no browser found"
@@ -1043,10 +1658,9 @@ class PCController:
         
         if browser_windows:
             hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
-            windll.user32.keybd_event(win32con.VK_NEXT, 0, 0, 0)  # VK_NEXT = Page Down
-            windll.user32.keybd_event(win32con.VK_NEXT, 0, win32con.KEYEVENTF_KEYUP, 0)
+            self._focus_for_keys(hwnd)
+            self._keybd_event(win32con.VK_NEXT)  # VK_NEXT = Page Down
+            self._keybd_event(win32con.VK_NEXT, win32con.KEYEVENTF_KEYUP)
             return "NAV_PAGE_DOWN executed"
         else:
             return "NAV_PAGE_DOWN failed - no browser found"
@@ -1058,12 +1672,11 @@ class PCController:
         
         if browser_windows:
             hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
-            windll.user32.keybd_event(win32con.VK_CONTROL, 0, 0, 0)
-            windll.user32.keybd_event(ord('L'), 0, 0, 0)
-            windll.user32.keybd_event(ord('L'), 0, win32con.KEYEVENTF_KEYUP, 0)
-            windll.user32.keybd_event(win32con.VK_CONTROL, 0, win32con.KEYEVENTF_KEYUP, 0)
+            self._focus_for_keys(hwnd)
+            self._keybd_event(win32con.VK_CONTROL)
+            self._keybd_event(ord('L'))
+            self._keybd_event(ord('L'), win32con.KEYEVENTF_KEYUP)
+            self._keybd_event(win32con.VK_CONTROL, win32con.KEYEVENTF_KEYUP)
             return "NAV_FOCUS_SEARCH executed"
         else:
             return "NAV_FOCUS_SEARCH failed - no browser found"
@@ -1075,17 +1688,16 @@ class PCController:
         
         if browser_windows:
             hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
+            self._focus_for_keys(hwnd)
             # Select all
-            windll.user32.keybd_event(win32con.VK_CONTROL, 0, 0, 0)
-            windll.user32.keybd_event(ord('A'), 0, 0, 0)
-            windll.user32.keybd_event(ord('A'), 0, win32con.KEYEVENTF_KEYUP, 0)
-            windll.user32.keybd_event(win32con.VK_CONTROL, 0, win32con.KEYEVENTF_KEYUP, 0)
-            time.sleep(0.05)
+            self._keybd_event(win32con.VK_CONTROL)
+            self._keybd_event(ord('A'))
+            self._keybd_event(ord('A'), win32con.KEYEVENTF_KEYUP)
+            self._keybd_event(win32con.VK_CONTROL, win32con.KEYEVENTF_KEYUP)
+            self._sleep(0.05)
             # Delete
-            windll.user32.keybd_event(win32con.VK_DELETE, 0, 0, 0)
-            windll.user32.keybd_event(win32con.VK_DELETE, 0, win32con.KEYEVENTF_KEYUP, 0)
+            self._keybd_event(win32con.VK_DELETE)
+            self._keybd_event(win32con.VK_DELETE, win32con.KEYEVENTF_KEYUP)
             return "NAV_CLEAR_SEARCH executed"
         else:
             return "NAV_CLEAR_SEARCH failed - no browser found"
@@ -1097,10 +1709,9 @@ class PCController:
         
         if browser_windows:
             hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
-            windll.user32.keybd_event(win32con.VK_RETURN, 0, 0, 0)
-            windll.user32.keybd_event(win32con.VK_RETURN, 0, win32con.KEYEVENTF_KEYUP, 0)
+            self._focus_for_keys(hwnd)
+            self._keybd_event(win32con.VK_RETURN)
+            self._keybd_event(win32con.VK_RETURN, win32con.KEYEVENTF_KEYUP)
             return "NAV_SUBMIT_SEARCH executed"
         else:
             return "NAV_SUBMIT_SEARCH failed - no browser found"
@@ -1112,10 +1723,9 @@ class PCController:
         
         if browser_windows:
             hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
-            windll.user32.keybd_event(win32con.VK_TAB, 0, 0, 0)
-            windll.user32.keybd_event(win32con.VK_TAB, 0, win32con.KEYEVENTF_KEYUP, 0)
+            self._focus_for_keys(hwnd)
+            self._keybd_event(win32con.VK_TAB)
+            self._keybd_event(win32con.VK_TAB, win32con.KEYEVENTF_KEYUP)
             return "NAV_TAB_FORWARD executed"
         else:
             return "NAV_TAB_FORWARD failed - no browser found"
@@ -1124,139 +1734,145 @@ class PCController:
     
     def search_youtube(self, query):
         """Search YouTube for query"""
-        print(f"Executing: Search YouTube: {query}")
-        encoded_query = query.replace(' ', '+')
-        url = f"https://www.youtube.com/results?search_query={encoded_query}"
-        return self.browser_open_url(url)
+        print(f"Executing: Search YouTube ({len(query)} characters)")
+        return self.browser_open_url(build_search_url('youtube', query), f"YouTube search ({len(query)} characters)")
     
     def search_hulu(self, query):
         """Search Hulu for query"""
-        print(f"Executing: Search Hulu: {query}")
-        encoded_query = query.replace(' ', '%20')
-        url = f"https://www.hulu.com/search?q={encoded_query}"
-        return self.browser_open_url(url)
-    
-    def search_current_site(self, query):
-        """Search current site using Ctrl+F"""
-        print(f"Executing: Search Current Site")
+        print(f"Executing: Search Hulu ({len(query)} characters)")
+        return self.browser_open_url(build_search_url('hulu', query), f"Hulu search ({len(query)} characters)")
+    
+    def search_netflix(self, query):
+        """Search Netflix for query"""
+        print(f"Executing: Search Netflix ({len(query)} characters)")
+        return self.browser_open_url(build_search_url('netflix', query), f"Netflix search ({len(query)} characters)")
+    
+    def search_current_site(self, query=None):
+        """Search current site using Ctrl+F, typing the query if there is one"""
+        print(f"Executing: Search Current Site ({len(query or '')} characters)")
         browser_windows = self.find_browser_windows()
         
         if browser_windows:
             hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
+            self._focus_for_keys(hwnd)
             # Open find dialog with Ctrl+F
-            windll.user32.keybd_event(win32con.VK_CONTROL, 0, 0, 0)
-            windll.user32.keybd_event(ord('F'), 0, 0, 0)
-            windll.user32.keybd_event(ord('F'), 0, win32con.KEYEVENTF_KEYUP, 0)
-            windll.user32.keybd_event(win32con.VK_CONTROL, 0, win32con.KEYEVENTF_KEYUP, 0)
-            return f"SEARCH_CURRENT_SITE executed (opened find dialog)"
+            self._keybd_event(win32con.VK_CONTROL)
+            self._keybd_event(ord('F'))
+            self._keybd_event(ord('F'), win32con.KEYEVENTF_KEYUP)
+            self._keybd_event(win32con.VK_CONTROL, win32con.KEYEVENTF_KEYUP)
+            if not query:
+                return "SEARCH_CURRENT_SITE executed (opened find dialog)"
+            self._sleep(FIND_BAR_SETTLE)
+            if self._type_text(query) < len(query):
+                return "SEARCH_CURRENT_SITE failed - input blocked"
+            return f"SEARCH_CURRENT_SITE executed (finding {len(query)} characters)"
         else:
             return "SEARCH_CURRENT_SITE failed - no browser found"
     
+    def type_text(self, text):
+        """Type Unicode text into the focused field of the browser"""
+        print(f"Executing: Type Text ({len(text)} characters)")
+        browser_windows = self.find_browser_windows()
+        
+        if browser_windows:
+            self._focus_for_keys(browser_windows[0][0])
+            typed = self._type_text(text)
+            if typed < len(text):
+                return f"TYPE_TEXT failed - input blocked after {typed} characters"
+            return f"TYPE_TEXT executed ({typed} characters)"
+        else:
+            return "TYPE_TEXT failed - no browser found"
+    
     def open_youtube_trending(self):
         """Open YouTube trending page"""
         print("Executing: Open YouTube Trending")
-        return self.browser_open_url("https://www.youtube.com/feed/trending")
+        return self.browser_open_url(provider_url('youtube', 'trending'))
     
     def open_youtube_subscriptions(self):
         """Open YouTube subscriptions"""
         print("Executing: Open YouTube Subscriptions")
-        return self.browser_open_url("https://www.youtube.com/feed/subscriptions")
+        return self.browser_open_url(provider_url('youtube', 'subscriptions'))
     
     def open_hulu_watchlist(self):
         """Open Hulu watchlist/My Stuff"""
         print("Executing: Open Hulu Watchlist")
-        return self.browser_open_url("https://www.hulu.com/my-stuff")
+        return self.browser_open_url(provider_url('hulu', 'watchlist'))
     
     def open_youtube_history(self):
         """Open YouTube history"""
         print("Executing: Open YouTube History")
-        return self.browser_open_url("https://www.youtube.com/feed/history")
+        return self.browser_open_url(provider_url('youtube', 'history'))
     
     def open_netflix_home(self):
         """Open Netflix home/browse"""
         print("Executing: Open Netflix")
-        return self.browser_open_url("https://www.netflix.com/browse")
+        return self.browser_open_url(provider_url('netflix'))
     
     # User Interaction Methods (site-specific)
     
     def youtube_like(self):
         """Like video on YouTube (Shift+L on some browsers, or manual click position)"""
         print("Executing: YouTube Like")
-        browser_windows = self.find_browser_windows()
-        
-        if browser_windows:
-            hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
-            # Try Shift+L (works on some configurations)
-            windll.user32.keybd_event(win32con.VK_SHIFT, 0, 0, 0)
-            windll.user32.keybd_event(ord('L'), 0, 0, 0)
-            windll.user32.keybd_event(ord('L'), 0, win32con.KEYEVENTF_KEYUP, 0)
-            windll.user32.keybd_event(win32con.VK_SHIFT, 0, win32con.KEYEVENTF_KEYUP, 0)
-            return "YOUTUBE_LIKE executed"
-        else:
-            return "YOUTUBE_LIKE failed - no browser found"
+        result = self._try_media_backend("YOUTUBE_LIKE", 'like')
+        if result:
+            return result
+        return self._site_action("YOUTUBE_LIKE", 'like')
     
     def youtube_dislike(self):
         """Dislike video on YouTube (Shift+D on some browsers)"""
         print("Executing: YouTube Dislike")
-        browser_windows = self.find_browser_windows()
-        
-        if browser_windows:
-            hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
-            # Try Shift+D
-            windll.user32.keybd_event(win32con.VK_SHIFT, 0, 0, 0)
-            windll.user32.keybd_event(ord('D'), 0, 0, 0)
-            windll.user32.keybd_event(ord('D'), 0, win32con.KEYEVENTF_KEYUP, 0)
-            windll.user32.keybd_event(win32con.VK_SHIFT, 0, win32con.KEYEVENTF_KEYUP, 0)
-            return "YOUTUBE_DISLIKE executed"
-        else:
-            return "YOUTUBE_DISLIKE failed - no browser found"
+        result = self._try_media_backend("YOUTUBE_DISLIKE", 'dislike')
+        if result:
+            return result
+        return self._site_action("YOUTUBE_DISLIKE", 'dislike')
     
     def youtube_subscribe(self):
         """Subscribe on YouTube (Shift+S on some browsers)"""
         print("Executing: YouTube Subscribe")
-        browser_windows = self.find_browser_windows()
-        
-        if browser_windows:
-            hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
-            # Try Shift+S
-            windll.user32.keybd_event(win32con.VK_SHIFT, 0, 0, 0)
-            windll.user32.keybd_event(ord('S'), 0, 0, 0)
-            windll.user32.keybd_event(ord('S'), 0, win32con.KEYEVENTF_KEYUP, 0)
-            windll.user32.keybd_event(win32con.VK_SHIFT, 0, win32con.KEYEVENTF_KEYUP, 0)
-            return "YOUTUBE_SUBSCRIBE executed"
-        else:
-            return "YOUTUBE_SUBSCRIBE failed - no browser found"
+        result = self._try_media_backend("YOUTUBE_SUBSCRIBE", 'subscribe')
+        if result:
+            return result
+        return self._site_action("YOUTUBE_SUBSCRIBE", 'subscribe')
     
     def skip_button_action(self):
-        """Generic skip action (Tab to button, then Enter) - works for Skip Ad, Skip Intro, Skip Recap
-        Note: This uses 3 tabs to navigate to common skip button positions. Different sites
-        may require different tab counts. Adjust if needed for specific platforms."""
+        """Skip Ad / Skip Intro / Skip Recap - S on Netflix, elsewhere Tab to the button and Enter
+        Note: The Tab route uses 3 tabs to reach common skip button positions. Different sites
+        may require different tab counts - adjust the site's profile in site_profiles.py."""
         print("Executing: Skip Button Action")
+        if self.skip_detector is not None:
+            result = self._skip_by_vision()
+            if result:
+                return result
+        return self._site_action("SKIP_BUTTON_ACTION", 'skip')
+    
+    def _skip_by_vision(self):
+        """Click the skip button if the detector finds it in the browser window (None if not)"""
         browser_windows = self.find_browser_windows()
-        
-        if browser_windows:
-            hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
-            # Press Tab to navigate to skip button (3 times for common button positions)
-            for _ in range(3):
-                windll.user32.keybd_event(win32con.VK_TAB, 0, 0, 0)
-                windll.user32.keybd_event(win32con.VK_TAB, 0, win32con.KEYEVENTF_KEYUP, 0)
-                time.sleep(0.05)
-            # Press Enter to click
-            windll.user32.keybd_event(win32con.VK_RETURN, 0, 0, 0)
-            windll.user32.keybd_event(win32con.VK_RETURN, 0, win32con.KEYEVENTF_KEYUP, 0)
-            return "SKIP_BUTTON_ACTION executed"
-        else:
-            return "SKIP_BUTTON_ACTION failed - no browser found"
+        if not browser_windows:
+            return None
+        hwnd, title, _ = browser_windows[0]
+        profile = self._site_profile(hwnd, title)
+        rect = win32gui.GetWindowRect(hwnd)
+        try:
+            match = self.skip_detector.find(profile.name.lower(), rect)
+        except Exception as e:
+            print(f"Skip button detection failed: {e}")
+            return None
+        if match is None:
+            return None
+        x, y = match.center
+        self._click(rect[0] + x, rect[1] + y)
+        return f"SKIP_BUTTON_ACTION executed (clicked button on {profile.name}, score {match.score:.2f})"
+    
+    def _click(self, x, y):
+        """Left-click at a screen position and put the cursor back"""
+        if self.context is not None:
+            self.context.check()
+        cursor = POINT()
+        windll.user32.GetCursorPos(byref(cursor))
+        windll.user32.SetCursorPos(x, y)
+        send_inputs(click_inputs())
+        windll.user32.SetCursorPos(cursor.x, cursor.y)
     
     # Multi-Monitor Control Methods
     
@@ -1375,16 +1991,15 @@ class PCController:
         
         if browser_windows:
             hwnd = browser_windows[0][0]
-            win32gui.SetForegroundWindow(hwnd)
-            time.sleep(0.1)
+            self._focus_for_keys(hwnd)
             # Pause
-            windll.user32.keybd_event(win32con.VK_SPACE, 0, 0, 0)
-            windll.user32.keybd_event(win32con.VK_SPACE, 0, win32con.KEYEVENTF_KEYUP, 0)
-            time.sleep(0.2)
+            self._keybd_event(win32con.VK_SPACE)
+            self._keybd_event(win32con.VK_SPACE, win32con.KEYEVENTF_KEYUP)
+            self._sleep(0.2)
             # Exit fullscreen
-            windll.user32.keybd_event(win32con.VK_ESCAPE, 0, 0, 0)
-            windll.user32.keybd_event(win32con.VK_ESCAPE, 0, win32con.KEYEVENTF_KEYUP, 0)
-            time.sleep(0.2)
+            self._keybd_event(win32con.VK_ESCAPE)
+            self._keybd_event(win32con.VK_ESCAPE, win32con.KEYEVENTF_KEYUP)
+            self._sleep(0.2)
             # Minimize window
             win32gui.ShowWindow(hwnd, win32con.SW_MINIMIZE)
             return "SMART_KILL_PLAYBACK executed"
@@ -1395,17 +2010,360 @@ class PCController:
         """Emergency mute - mute everything immediately"""
         print("Executing: Smart - Emergency Mute")
         # Mute system audio immediately
-        windll.user32.keybd_event(0xAD, 0, 0, 0)  # VK_VOLUME_MUTE
-        windll.user32.keybd_event(0xAD, 0, win32con.KEYEVENTF_KEYUP, 0)
+        self._keybd_event(0xAD)  # VK_VOLUME_MUTE
+        self._keybd_event(0xAD, win32con.KEYEVENTF_KEYUP)
         return "SMART_EMERGENCY_MUTE executed"
 
+
+# Queued by PROFILE_DUMP - the worker writes the profile when it gets to it
+_PROFILE_DUMP = object()
+
+
+class CommandExecutor:
+    """Runs dispatched commands one at a time on a worker thread.
+
+    Every command gets its own CommandContext whose deadline starts when the line
+    was received, so a command that sat in the queue for too long is dropped
+    instead of executed, and a running one stops at its next cancellation point.
+    
+    Freshness is checked again at dequeue time: commands whose ESP32 send
+    timestamp is older than their TTL (or max_age) are dropped, and for
+    COLLAPSIBLE_COMMANDS only the newest queued instance runs.
+    """
+
+    def __init__(self, controller, commands, param_commands, send_line, timeout=DEFAULT_COMMAND_TIMEOUT,
+                 max_age=DEFAULT_MAX_COMMAND_AGE):
+        self.controller = controller
+        self.commands = commands
+        self.param_commands = param_commands
+        self.send_line = send_line
+        self.timeout = timeout
+        self.max_age = max_age
+        self.timeouts = {}  # Per-command overrides of timeout (e.g. SCENE)
+        self.clock = OriginClock()
+        self.clocks = {None: self.clock}  # Per command source
+        # CommandProfiler armed by PROFILE_START (None = not profiling)
+        self.profiler = None
+        self.profile_reply = None  # send_line of the transport that asked for the profile
+        # CommandJournal every handled command is recorded to (None = off)
+        self.journal = None
+        # CommandPredictor whose prediction is prewarmed while idle (None = off)
+        self.predictor = None
+        self._warm_pending = False
+        self.metrics = dict.fromkeys(('received', 'executed', 'failed', 'cancelled',
+                                      'dropped_stale', 'dropped_expired', 'collapsed', 'held'), 0)
+        self._pending = {}  # Queued instances per collapsible command
+        self._queue = queue.Queue()
+        self._current = None
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='command-executor', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def submit(self, command, param=None, origin_ms=None, ttl=None, received_at=None,
+               source=None, reply=None, trace=None):
+        """Queue a command for execution and return its context"""
+        context = CommandContext(command, param, timeout=self.timeouts.get(command, self.timeout),
+                                 received_at=received_at, origin_ms=origin_ms, ttl=ttl,
+                                 source=source, reply=reply, trace=trace)
+        with self._lock:
+            self.metrics['received'] += 1
+            if origin_ms is not None:
+                clock = self.clocks.get(source)
+                if clock is None:
+                    clock = self.clocks[source] = OriginClock()
+                clock.observe(origin_ms, context.received_at)
+            if command in COLLAPSIBLE_COMMANDS:
+                self._pending[command] = self._pending.get(command, 0) + 1
+        self._queue.put(context)
+        return context
+
+    def _count(self, key):
+        with self._lock:
+            self.metrics[key] += 1
+
+    def metrics_line(self):
+        """Counters formatted for the METRICS status response"""
+        with self._lock:
+            return ' '.join(f"{key}={value}" for key, value in self.metrics.items())
+
+    def _drop_reason(self, context):
+        """Return why a dequeued command should not run (None if it should)"""
+        command = context.command
+        with self._lock:
+            if command in COLLAPSIBLE_COMMANDS:
+                self._pending[command] -= 1
+                if self._pending[command] > 0:
+                    self.metrics['collapsed'] += 1
+                    return "superseded by newer command"
+            if context.cancelled:
+                self.metrics['cancelled'] += 1
+                return context.cancel_reason
+            if context.origin_ms is not None:
+                age = self.clocks[context.source].age(context.origin_ms)
+                max_age = context.ttl if context.ttl is not None else self.max_age
+                if max_age is not None and age > max_age:
+                    self.metrics['dropped_stale'] += 1
+                    return f"stale, {age:.1f}s old"
+            if context.expired():
+                self.metrics['dropped_expired'] += 1
+                return "expired before execution"
+        return None
+
+    def cancel_all(self, reason="cancelled"):
+        """Cancel the running command and everything still queued.
+
+        Queued commands stay in the queue marked as cancelled, so execute()
+        still answers each of them and the pending counts stay right.
+        """
+        count = 0
+        with self._lock:
+            if self._current is not None:
+                self._current.cancel(reason)
+                count += 1
+        with self._queue.mutex:
+            for context in self._queue.queue:
+                if context is _PROFILE_DUMP:
+                    continue
+                context.cancel(reason)
+                count += 1
+        return count
+
+    def _hold_while_suspended(self, context):
+        """Wait (within the command deadline) while the PC suspends or resumes"""
+        power = self.controller.power
+        if power.awake or context.command in HOLD_EXEMPT_COMMANDS:
+            return
+        self._count('held')
+        print(f"Holding {context.command} until the PC is awake ({power.describe()})")
+        with self.controller._span('hold'):
+            awake = power.wait_until_awake(context.remaining())
+        if not awake:
+            raise CommandCancelled(f"PC not awake, {power.state}")
+        context.check()
+
+    def dispatch(self, context):
+        """Call the handler for a command (with its parameter, if it takes one)"""
+        if context.param and context.command in self.param_commands:
+            return self.param_commands[context.command](context.param)
+        if context.command not in self.commands:
+            raise ValueError("missing parameter")
+        return self.commands[context.command]()
+
+    def _respond(self, context, send_line, line, outcome):
+        """Send a command's response (closing the execute and reply stages when it is traced)"""
+        trace = context.trace
+        if trace is None:
+            send_line(line)
+            return
+        trace.stage('execute', outcome=outcome)
+        send_line(line)
+        trace.stage('reply')
+
+    def execute(self, context):
+        """Run one command under its context and send the response"""
+        command = context.command
+        send_line = context.reply or self.send_line
+        reason = self._drop_reason(context)
+        if context.trace is not None:
+            context.trace.stage('queue', dropped=reason)
+        if reason is not None:
+            print(f"Dropped {command}: {reason}")
+            send_line(f"ERROR:{command} - dropped ({reason})")
+            if self.journal is not None:
+                self.journal.record(time.time(), 0.0, command, context.param, 'dropped')
+            return
+        
+        with self._lock:
+            self._current = context
+        self.controller.context = context
+        self.controller.last_target = None
+        self.controller.lookups = 0
+        profiler = self.profiler
+        started = time.time()
+        start = time.perf_counter()
+        outcome = 'failed'
+        try:
+            self._hold_while_suspended(context)
+            if profiler is None:
+                result = self.dispatch(context)
+            else:
+                result = profiler.run(command, self.dispatch, context)
+            self._count('executed')
+            # Most handlers report failures in their result instead of raising
+            outcome = 'failed' if failed_result(result) else 'ok'
+            self._respond(context, send_line, f"STATUS:{result}", outcome)
+            print(f"Response sent: {result}")
+        except CommandCancelled as e:
+            outcome = 'cancelled'
+            self._count('cancelled')
+            print(f"Cancelled {command}: {e}")
+            self._respond(context, send_line, f"ERROR:{command} - cancelled ({e})", outcome)
+        except Exception as e:
+            self._count('failed')
+            self._respond(context, send_line, f"ERROR:{command} - {str(e)}", outcome)
+            print(f"Error executing {command}: {e}")
+        finally:
+            if self.journal is not None:
+                target = self.controller.last_target
+                self.journal.record(started, time.perf_counter() - start, command, context.param, outcome,
+                                    *((target[0], target[2]) if target else ()))
+            if self.predictor is not None:
+                self.predictor.observe(command, self.controller.lookups)
+                self._warm_pending = self.predictor.expected is not None
+            self.controller.context = None
+            self.controller.release_key_target()
+            with self._lock:
+                self._current = None
+            if profiler is not None:
+                self._finish_profile(profiler, profiler.pop_written())
+
+    def start_profile(self, count, directory, reply=None):
+        """Profile the next `count` commands (PROFILE_START); reply gets the PROFILE_DUMP line"""
+        self.profile_reply = reply
+        self.profiler = CommandProfiler(count, directory)
+
+    def dump_profile(self, reply=None):
+        """Write the active profile (PROFILE_DUMP); returns False when none is running.
+
+        Called on the transport loop, so it never waits for the profiler: a
+        command being profiled writes the profile when it finishes, and the
+        worker writes it when it gets to the queued dump request. Either way
+        reply gets the STATUS:PROFILE_DUMP line."""
+        profiler = self.profiler
+        if profiler is None or profiler.done:
+            return False
+        if reply is not None:
+            self.profile_reply = reply
+        profiler.request_dump()
+        self._queue.put(_PROFILE_DUMP)
+        return True
+
+    def _finish_profile(self, profiler, path):
+        if path is None:
+            return
+        if self.profiler is profiler:
+            self.profiler = None
+        print(f"Profile of {len(profiler.timings)} command(s) written to {path}")
+        send_line = self.profile_reply or self.send_line
+        send_line(f"STATUS:PROFILE_DUMP {len(profiler.timings)} command(s) written to {path}")
+
+    def prediction_line(self):
+        """Predictor counters for the METRICS status response"""
+        return (f"prediction={self.predictor.describe()},"
+                f"saved_ms:{self.controller.warm_saved * 1000:.0f}")
+
+    def _prewarm(self):
+        self._warm_pending = False
+        expected = self.predictor.expected
+        if expected is None:
+            return
+        try:
+            self.controller.prewarm(expected[2])
+        except Exception as e:
+            print(f"Prewarm for {expected[0]} failed: {e}")
+
+    def _run(self):
+        while True:
+            if self._warm_pending:
+                try:
+                    context = self._queue.get(timeout=WARM_DELAY)
+                except queue.Empty:
+                    self._prewarm()  # Idle - get ready for the predicted command
+                    continue
+            else:
+                context = self._queue.get()
+            if context is _PROFILE_DUMP:
+                profiler = self.profiler
+                try:
+                    if profiler is not None:
+                        self._finish_profile(profiler, profiler.dump())
+                except Exception as e:
+                    print(f"Profile dump failed: {e}")
+                    (self.profile_reply or self.send_line)(f"ERROR:PROFILE_DUMP - {e}")
+                continue
+            self.execute(context)
+
 def main():
     parser = argparse.ArgumentParser(description='PC Controller - Windows Companion Script')
-    parser.add_argument('--port', default='COM3', help='Serial port (default: COM3)')
+    parser.add_argument('--port', action='append',
+                        help='Serial port, may be repeated for several ESP32s (default: COM3 unless '
+                             'only socket/pipe transports are given)')
     parser.add_argument('--baud', type=int, default=115200, help='Baud rate (default: 115200)')
+    parser.add_argument('--tcp-port', type=int, default=None,
+                        help='Also accept commands on this localhost TCP port (newline-terminated lines)')
+    parser.add_argument('--unix-socket', default=None, help='Also accept commands on this Unix socket path')
+    parser.add_argument('--pipe', default=None,
+                        help=r'Also accept commands on this Windows named pipe (name or \\.\pipe\<name>)')
+    parser.add_argument('--command-timeout', type=float, default=DEFAULT_COMMAND_TIMEOUT,
+                        help=f'Seconds a command may wait + run before it is dropped (default: {DEFAULT_COMMAND_TIMEOUT})')
+    parser.add_argument('--max-command-age', type=float, default=DEFAULT_MAX_COMMAND_AGE,
+                        help=f'Drop timestamped commands older than this many seconds (default: {DEFAULT_MAX_COMMAND_AGE})')
+    parser.add_argument('--key-delivery', choices=KEY_DELIVERY_MODES, default='foreground',
+                        help='foreground: focus the browser and inject keys; background: post keys to '
+                             'the browser window without taking focus (Chromium browsers, default: foreground)')
+    parser.add_argument('--skip-detection', choices=SKIP_DETECTION_MODES, default='keys',
+                        help='vision: find and click the skip button on screen (needs numpy and skip '
+                             'button templates), falling back to keys (default: keys)')
+    parser.add_argument('--audio-control', choices=AUDIO_CONTROL_MODES, default='sessions',
+                        help='sessions: mute/set the volume of the browser and other apps through their '
+                             'audio sessions (needs pycaw), falling back to keys (default: sessions)')
+    parser.add_argument('--skip-templates', default=DEFAULT_TEMPLATES_DIR,
+                        help='Skip button templates, one directory per site '
+                             '(default: skip_templates next to this script)')
+    parser.add_argument('--profile-dir', default=DEFAULT_PROFILE_DIR,
+                        help='Where PROFILE_START/PROFILE_DUMP write .pstats files '
+                             '(default: profiles next to this script)')
+    parser.add_argument('--journal', default=None, metavar='PATH',
+                        help='Record every command to this binary journal (read it with command_journal.py)')
+    parser.add_argument('--journal-max-bytes', type=int, default=4 * 1024 * 1024,
+                        help='Rotate the journal at this size (default: 4 MiB, 5 old files kept)')
+    parser.add_argument('--no-predict', action='store_true',
+                        help="Don't prewarm window/monitor lookups for the predicted next command")
+    parser.add_argument('--scenes', default=None, metavar='PATH',
+                        help='JSON file with scenes to add to or replace the built-in ones (see scenes.py)')
+    parser.add_argument('--layouts', default=DEFAULT_LAYOUTS_PATH, metavar='PATH',
+                        help="File LAYOUT_SAVE snapshots are kept in, may also replace the built-in "
+                             "layouts ('' = don't persist, default: layouts.json next to this script)")
+    parser.add_argument('--trace', default=None, metavar='PATH',
+                        help='Write a span per command stage to PATH (Chrome trace event JSON, '
+                             'summarize with trace_view.py)')
+    parser.add_argument('--heartbeat', type=float, default=1.0, metavar='SECONDS',
+                        help='Probe serial links this often, reconnecting ones that stop answering '
+                             '(default: 1, 0 = off)')
+    parser.add_argument('--timers', default=DEFAULT_TIMERS_PATH, metavar='PATH',
+                        help="File SCHEDULE timers persist in across restarts, created with the first timer "
+                             "('' = don't persist, default: timers.jsonl next to this script)")
+    parser.add_argument('--cdp-port', type=int, default=None,
+                        help='Control media over the DevTools protocol of a browser started with '
+                             '--remote-debugging-port=<port> (default: disabled, use hotkeys)')
     args = parser.parse_args()
     
     controller = PCController()
+    controller.key_delivery = args.key_delivery
+    if args.skip_detection == 'vision':
+        try:
+            controller.skip_detector = SkipDetector(GdiCapture(), args.skip_templates)
+            print(f"Vision skip detection on, templates from {args.skip_templates}")
+        except (ImportError, RuntimeError) as e:
+            print(f"Vision skip detection unavailable ({e}) - using keys")
+    if args.audio_control == 'sessions':
+        try:
+            backend = open_backend(fake=FAKE_BACKEND)
+        except Exception as e:  # No output device, COM failure
+            print(f"Audio session control unavailable ({e}) - using keys")
+            backend = None
+        if backend is not None:
+            controller.audio = AudioSessionManager(backend)
+            controller.audio.start()
+            print("Mute and browser volume use per-app audio sessions")
+    if FAKE_BACKEND:
+        print("pywin32 not available - using the fake backend, input is recorded, not delivered")
+    if args.cdp_port:
+        controller.media_backend = CDPMediaBackend(port=args.cdp_port)
+        controller.launcher.cdp_port = args.cdp_port
+        print(f"Media commands use the DevTools protocol on port {args.cdp_port}")
     
     # Command mapping
     commands = {
@@ -1445,6 +2403,7 @@ def main():
         'PLAYBACK_JUMP_TO_END': controller.playback_jump_to_end,
         'PLAYBACK_NEXT_VIDEO': controller.playback_next_video,
         'PLAYBACK_PREVIOUS_VIDEO': controller.playback_previous_video,
+        'PLAYBACK_STATE': controller.playback_state,
         # Fullscreen & View Mode Commands
         'FULLSCREEN_ENTER': controller.fullscreen_enter,
         'FULLSCREEN_EXIT': controller.fullscreen_exit,
@@ -1511,58 +2470,207 @@ def main():
         'SMART_EMERGENCY_MUTE': controller.smart_emergency_mute,
     }
     
+    param_commands = {
+        'BROWSER_OPEN_URL': controller.browser_open_url,
+        'VOLUME_SET': lambda level: controller.volume_set(int(level)),
+        'BROWSER_VOLUME_SET': lambda level: controller.browser_volume_set(int(level)),
+        'PLAYBACK_RATE': lambda rate: controller.playback_rate(float(rate)),
+        'PLAYBACK_VOLUME_SET': lambda level: controller.playback_volume_set(int(level)),
+        'SEARCH_YOUTUBE': controller.search_youtube,
+        'SEARCH_HULU': controller.search_hulu,
+        'SEARCH_NETFLIX': controller.search_netflix,
+        'SEARCH_CURRENT_SITE': lambda query: controller.search_current_site(unescape_text(query)),
+        'TYPE_TEXT': lambda text: controller.type_text(unescape_text(text)),
+    }
+    
+    # LAYOUT:<name> places many windows in one batch, LAYOUT_SAVE:<name> snapshots them
+    layouts = LayoutManager(controller, args.layouts or None)
+    try:
+        if layouts.load():
+            print(f"Loaded {len(layouts.saved)} layout(s) from {args.layouts}")
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"Couldn't load layouts from {args.layouts}: {e}")
+        sys.exit(1)
+    param_commands['LAYOUT'] = layouts.apply
+    param_commands['LAYOUT_SAVE'] = layouts.save
+    param_commands['LAYOUT_DELETE'] = layouts.delete
+    commands['LAYOUT_LIST'] = layouts.list_layouts
+    
+    # ALL_WINDOWS:<command>[,process=..][,title=..] runs a playback or tab audio command on every browser window
+    param_commands['ALL_WINDOWS'] = FanOutRunner(controller, commands, param_commands).run
+    
+    # SCENE:<name> runs a whole sequence of the commands above, waiting on each step's effect
+    try:
+        scenes = load_scenes(args.scenes) if args.scenes else None
+        scene_runner = SceneRunner(controller, commands, param_commands, scenes)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Couldn't load scenes from {args.scenes}: {e}")
+        sys.exit(1)
+    param_commands['SCENE'] = scene_runner.run
+    
     print(f"PC Controller starting...")
-    print(f"Connecting to {args.port} at {args.baud} baud...")
+    
+    def handle_schedule(command, param):
+        """SCHEDULE, SCHEDULE_EVERY, SCHEDULE_CANCEL, SCHEDULE_LIST -> response line"""
+        if command == 'SCHEDULE_LIST':
+            now = time.time()
+            timers = scheduler.timers()
+            return f"STATUS:SCHEDULE_LIST {' | '.join(t.describe(now) for t in timers) if timers else 'none'}"
+        if command == 'SCHEDULE_CANCEL':
+            cancelled = scheduler.cancel((param or '').strip())
+            if not cancelled:
+                return f"ERROR:SCHEDULE_CANCEL - no timer {param}"
+            return f"STATUS:SCHEDULE_CANCEL executed ({cancelled} cancelled)"
+        try:
+            name, delay, timer_commands = parse_schedule(param)
+            for timer_command, timer_param in timer_commands:
+                handlers = param_commands if timer_param is not None else commands
+                if timer_command not in handlers:
+                    raise ValueError(f"unknown command {describe_commands([(timer_command, timer_param)])}")
+            interval = delay if command == 'SCHEDULE_EVERY' else None
+            timer = scheduler.schedule(delay, timer_commands, interval, name)
+        except ValueError as e:
+            return f"ERROR:{command} - {e}"
+        return f"STATUS:{command} set, timer {timer.describe(time.time())}"
+    
+    def fire_timer(timer, command, param):
+        print(f"Timer {timer.id} due: {describe_commands([(command, param)], TEXT_COMMANDS)}")
+        executor.submit(command, param, source='scheduler', reply=hub.broadcast)
+    
+    def handle_line(transport, line, read_at):
+        """Control commands are answered at once, everything else goes to the executor"""
+        command, param, origin_ms, ttl, trace_header = parse_command_line(line)
+        send_line = transport.send
+        if command in POINTER_COMMANDS:
+            # Streamed at up to 120 Hz - not logged, queued or answered unless malformed
+            try:
+                pointer.handle(command, param, read_at)
+            except ValueError as e:
+                send_line(f"ERROR:{command} - {e}")
+            return
+        if command == 'CLOCK':
+            # The ESP32 answering a heartbeat - not a command
+            if heartbeat is not None:
+                heartbeat.answer(transport, param, read_at)
+            return
+        if isinstance(transport, SerialTransport) and not COMMAND_NAME.match(command):
+            # Firmware log output on the same UART ("Executed command: ..."). Not answered -
+            # the firmware would log an "Unknown command" reply and send that back again
+            echoed = line.partition('Executed command: ')[2]
+            if echoed:
+                line = f"Executed command: {loggable_line(echoed, *parse_command_line(echoed)[:2])}"
+            print(f"{transport.name}: {line}")
+            return
+        print(f"\nReceived command from {transport.name}: {loggable_line(line, command, param)}")
+        
+        if command == 'CANCEL':
+            cancelled = executor.cancel_all()
+            send_line(f"STATUS:CANCEL executed ({cancelled} cancelled)")
+        elif command == 'PROFILE_START':
+            try:
+                count = int(param or 10)
+                executor.start_profile(count, args.profile_dir, send_line)
+                send_line(f"STATUS:PROFILE_START executed (next {count} command(s))")
+            except ValueError as e:
+                send_line(f"ERROR:PROFILE_START - {e}")
+        elif command == 'PROFILE_DUMP':
+            if not executor.dump_profile(send_line):
+                send_line("ERROR:PROFILE_DUMP - no profile running")
+        elif command == 'METRICS':
+            prediction = f" {executor.prediction_line()}" if executor.predictor is not None else ''
+            streamed = f" pointer={pointer.describe()}" if pointer.metrics.deltas or pointer.metrics.clicks else ''
+            audio = f" audio={controller.audio.describe()}" if controller.audio is not None else ''
+            traced = f" trace={tracer.describe()}" if tracer is not None else ''
+            send_line(f"STATUS:METRICS {executor.metrics_line()} {controller.power.describe()} "
+                      f"{hub.metrics_line()}{prediction}{streamed}{audio} timers={scheduler.describe()} "
+                      f"layout={layouts.describe()},{controller.topology.describe()}{traced}")
+        elif command in SCHEDULE_COMMANDS:
+            send_line(handle_schedule(command, param))
+        elif command == 'LINK':
+            links = heartbeat.describe() if heartbeat is not None else ''
+            send_line(f"STATUS:LINK {links or 'no heartbeat'}")
+        elif command in commands or command in param_commands:
+            trace = None
+            if tracer is not None:
+                trace = tracer.begin(trace_header, command, origin_ms, transport.name, read_at)
+            executor.submit(command, param, origin_ms=origin_ms, ttl=ttl,
+                            source=transport.name, reply=send_line, trace=trace)
+        else:
+            print(f"Unknown command: {line}")
+            send_line(f"ERROR:Unknown command {line}")
+    
+    pointer = PointerStream()  # Frame thread starts with the first PTR line
+    tracer = None
+    if args.trace:
+        tracer = Tracer(args.trace)
+        atexit.register(tracer.close)
+        print(f"Tracing commands to {args.trace}")
+    heartbeat = None
+    if args.heartbeat > 0:
+        # Round trips also keep the tracer's ESP32 clock offsets current
+        on_sample = (lambda transport, sent, read_at, millis:
+                     tracer.clock(transport.name).sample(sent, read_at, millis)) if tracer is not None else None
+        heartbeat = Heartbeat(args.heartbeat, on_sample)
+    scheduler = Scheduler(fire_timer, path=args.timers or None, private=TEXT_COMMANDS)
+    hub = TransportHub(handle_line)
+    serial_ports = args.port or ([] if args.tcp_port or args.unix_socket or args.pipe else ['COM3'])
     
     try:
-        ser = serial.Serial(args.port, args.baud, timeout=1)
-        time.sleep(2)  # Wait for serial connection to stabilize
-        print(f"Connected to {args.port}")
-        print("Waiting for commands...")
-        
-        while True:
-            if ser.in_waiting > 0:
-                line = ser.readline().decode('utf-8', errors='ignore').strip()
-                
-                if line:
-                    print(f"\nReceived command: {line}")
-                    
-                    # Check if command has parameters (format: COMMAND:param)
-                    parts = line.split(':', 1)
-                    command = parts[0]
-                    param = parts[1] if len(parts) > 1 else None
-                    
-                    if command in commands:
-                        try:
-                            # Handle commands with parameters
-                            if param and command == 'BROWSER_OPEN_URL':
-                                result = controller.browser_open_url(param)
-                            elif param and command == 'VOLUME_SET':
-                                result = controller.volume_set(int(param))
-                            elif param and command == 'SEARCH_YOUTUBE':
-                                result = controller.search_youtube(param)
-                            elif param and command == 'SEARCH_HULU':
-                                result = controller.search_hulu(param)
-                            else:
-                                result = commands[command]()
-                            
-                            response = f"STATUS:{result}\n"
-                            ser.write(response.encode('utf-8'))
-                            print(f"Response sent: {result}")
-                        except Exception as e:
-                            error_msg = f"ERROR:{command} - {str(e)}\n"
-                            ser.write(error_msg.encode('utf-8'))
-                            print(f"Error executing {command}: {e}")
-                    else:
-                        print(f"Unknown command: {line}")
-                        ser.write(f"ERROR:Unknown command {line}\n".encode('utf-8'))
-            
-            time.sleep(0.1)
-            
+        for port in serial_ports:
+            print(f"Connecting to {port} at {args.baud} baud...")
+            transport = hub.add_serial(port, args.baud)
+            if heartbeat is not None:
+                heartbeat.add(transport)
+            print(f"Connected to {port}")
     except serial.SerialException as e:
         print(f"Serial error: {e}")
-        print(f"Make sure {args.port} is correct and not in use by another program")
+        print(f"Make sure {port} is correct and not in use by another program")
         sys.exit(1)
+    if args.tcp_port:
+        hub.add_tcp(args.tcp_port)
+    if args.unix_socket:
+        hub.add_unix_socket(args.unix_socket)
+    if args.pipe:
+        hub.add_named_pipe(args.pipe)
+    
+    # Responses go back to the transport a command came from, everything else to all of them
+    executor = CommandExecutor(controller, commands, param_commands, hub.broadcast,
+                               timeout=args.command_timeout, max_age=args.max_command_age)
+    executor.timeouts['SCENE'] = max(scene_runner.max_duration(), args.command_timeout)
+    if not args.no_predict:
+        executor.predictor = CommandPredictor()
+        if args.journal and os.path.exists(args.journal):
+            # Start from the habits in the journal (before the writer rotates it)
+            try:
+                executor.predictor.train(record.command for record in read_journal(args.journal)
+                                         if record.outcome != 'dropped')
+                print(f"Predictor trained on {args.journal}")
+            except (OSError, ValueError) as e:
+                print(f"Couldn't train the predictor from {args.journal}: {e}")
+    if args.journal:
+        executor.journal = CommandJournal(args.journal, max_bytes=args.journal_max_bytes)
+        atexit.register(executor.journal.close)
+        print(f"Journaling commands to {args.journal}")
+    executor.start()
+    try:
+        pending = scheduler.load()
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Couldn't load timers from {args.timers}: {e}")
+        pending = 0
+    scheduler.start()
+    atexit.register(scheduler.close)
+    if pending:
+        print(f"{pending} timer(s) pending, next in {format_delay(scheduler.next_due() - time.time())}")
+    # Report real power/display changes (PC_ASLEEP, PC_AWAKE, DISPLAY_ON/OFF) to the ESP32
+    controller.power.on_change = lambda status: hub.broadcast(f"STATUS:{status}")
+    if controller.power.start():
+        print("Tracking power and display state from system notifications")
+    if heartbeat is not None:
+        heartbeat.start()
+    print("Waiting for commands...")
+    
+    try:
+        hub.run()
     except KeyboardInterrupt:
         print("\nShutting down...")
         sys.exit(0)
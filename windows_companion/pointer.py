@@ -0,0 +1,228 @@
+"""
+Pointer streaming
+
+Lets a phone or remote move the cursor on the TV. The sender streams relative
+motion as fast as it likes (typically 60-120 Hz):
+
+    PTR:<dx>,<dy>[,<wheel>]     move by dx/dy pixels, scroll by wheel (120 = one notch)
+    PTR_CLICK[:left|right|middle]
+
+PTR lines skip the command queue - they are handled the moment the transport
+reads them, so a slow command never stalls the pointer. Motion is not
+injected per line: deltas are added to a pending total and a frame thread
+injects it POINTER_RATE times a second, one SendInput call per frame for the
+move, the wheel and any clicks. Bursts of lines that arrive together (serial
+buffering, Wi-Fi aggregation) become one smooth frame instead of a jump
+followed by nothing.
+
+Motion is interpolated: the gap between input bursts is tracked, and pending
+motion is spread at constant speed over the frames until the next burst is
+due. Steady input at the frame rate goes out at once; input that arrives in
+clumps (a 60 Hz sender, serial buffering) still moves the pointer every frame
+instead of in jumps. A click first flushes all pending motion so it lands
+where the pointer was sent. Frames are scheduled on an absolute timeline, and
+the thread sleeps while no motion is pending.
+"""
+
+import math
+import sys
+import threading
+import time
+
+from input_injection import (MOUSE_BUTTONS, MOUSEEVENTF_MOVE, MOUSEEVENTF_WHEEL, mouse_input,
+                             send_inputs, windll)
+
+# Lines handled by PointerStream instead of the command queue
+POINTER_COMMANDS = ('PTR', 'PTR_CLICK')
+
+# Injection frames per second while the pointer moves
+POINTER_RATE = 120
+# Longest input gap motion is spread over (seconds) - longer gaps are pauses
+MAX_SPREAD = 0.1
+# Deltas closer together than this (seconds) belong to the same burst
+BURST_GAP = 0.001
+# Weight of the newest gap in the input gap average
+GAP_SMOOTHING = 0.2
+# Seconds without motion before the frame thread goes idle
+IDLE_AFTER = 0.5
+
+
+class PointerMetrics:
+    __slots__ = ('deltas', 'clicks', 'frames', 'events', 'latency_total', 'latency_max',
+                 'latency_count', 'jitter_total', 'jitter_max', 'jitter_count')
+
+    def __init__(self):
+        self.deltas = 0  # PTR lines received
+        self.clicks = 0
+        self.frames = 0  # Frames that injected something
+        self.events = 0  # INPUTs injected
+        # Seconds from a delta's arrival to the first frame that moved the pointer with it
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.latency_count = 0
+        # Seconds each frame ran off its scheduled time
+        self.jitter_total = 0.0
+        self.jitter_max = 0.0
+        self.jitter_count = 0
+
+    def describe(self):
+        latency = self.latency_total / self.latency_count * 1000 if self.latency_count else 0.0
+        jitter = self.jitter_total / self.jitter_count * 1000 if self.jitter_count else 0.0
+        return (f"deltas:{self.deltas},frames:{self.frames},events:{self.events},"
+                f"latency_ms:{latency:.1f}/{self.latency_max * 1000:.1f},"
+                f"jitter_ms:{jitter:.2f}/{self.jitter_max * 1000:.2f}")
+
+
+def _share(pending, frames):
+    """Whole pixels of pending motion for this frame, rounded away from zero"""
+    return int(math.copysign(math.ceil(abs(pending) / frames), pending))
+
+
+class PointerStream:
+    """Coalesces streamed pointer deltas and injects them in paced, smoothed frames"""
+
+    def __init__(self, inject=send_inputs, rate=POINTER_RATE, spread=MAX_SPREAD):
+        self.inject = inject
+        self.period = 1.0 / rate
+        self.spread = spread
+        self.metrics = PointerMetrics()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._dx = 0  # Pending motion, pixels
+        self._dy = 0
+        self._wheel = 0
+        self._clicks = []  # Button names, in order
+        self._oldest = None  # perf_counter() arrival of the oldest delta not yet moved
+        self._last_arrival = None
+        self._gap = None  # Average seconds between input bursts
+        self._due = 0.0  # perf_counter() the pending motion should be injected by
+        self._thread = None
+        self._stopping = False
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='pointer', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(1.0)
+            self._thread = None
+
+    def move(self, dx, dy, wheel=0, received_at=None):
+        """Add a delta (any thread); received_at is its perf_counter() arrival time"""
+        now = time.perf_counter() if received_at is None else received_at
+        with self._lock:
+            self._dx += dx
+            self._dy += dy
+            self._wheel += wheel
+            if self._oldest is None:
+                self._oldest = now
+            last, self._last_arrival = self._last_arrival, now
+            if last is None or now - last > BURST_GAP:
+                gap = None if last is None else now - last
+                if gap is None or gap > self.spread:
+                    self._gap = None  # Motion starts after a pause - no spreading
+                elif self._gap is None:
+                    self._gap = gap
+                else:
+                    self._gap += (gap - self._gap) * GAP_SMOOTHING
+                # Finish this burst when the next one should arrive
+                self._due = now + (self._gap or 0.0)
+            self.metrics.deltas += 1
+        self._wake.set()
+
+    def click(self, button='left'):
+        if button not in MOUSE_BUTTONS:
+            raise ValueError(f"unknown button {button}")
+        with self._lock:
+            self._clicks.append(button)
+            self.metrics.clicks += 1
+        self._wake.set()
+
+    def handle(self, command, param, received_at=None):
+        """Apply a PTR / PTR_CLICK line; raises ValueError on a malformed one"""
+        if command == 'PTR_CLICK':
+            self.click((param or 'left').lower())
+        else:
+            values = [int(value) for value in (param or '').split(',')]
+            if not 2 <= len(values) <= 3:
+                raise ValueError("expected PTR:<dx>,<dy>[,<wheel>]")
+            self.move(values[0], values[1], values[2] if len(values) == 3 else 0, received_at)
+        self.start()
+
+    def _has_pending(self):
+        return bool(self._dx or self._dy or self._wheel or self._clicks)
+
+    def _take_frame(self, now):
+        """INPUTs for one frame (empty when nothing is pending)"""
+        with self._lock:
+            if not self._has_pending():
+                return []
+            dx, dy, wheel, clicks = self._dx, self._dy, self._wheel, self._clicks
+            # Frames left before the next burst is due; every one of them moves the pointer
+            frames = 1 if clicks else max(1, math.ceil((self._due - now) / self.period))
+            step_x, step_y = _share(dx, frames), _share(dy, frames)
+            self._dx, self._dy = dx - step_x, dy - step_y
+            self._wheel = 0
+            self._clicks = []
+            oldest = self._oldest
+            if step_x or step_y:
+                self._oldest = None
+        inputs = []
+        if step_x or step_y:
+            inputs.append(mouse_input(step_x, step_y, 0, MOUSEEVENTF_MOVE))
+            if oldest is not None:
+                latency = now - oldest
+                self.metrics.latency_total += latency
+                self.metrics.latency_max = max(self.metrics.latency_max, latency)
+                self.metrics.latency_count += 1
+        if wheel:
+            inputs.append(mouse_input(0, 0, wheel, MOUSEEVENTF_WHEEL))
+        for button in clicks:
+            down, up = MOUSE_BUTTONS[button]
+            inputs.append(mouse_input(0, 0, 0, down))
+            inputs.append(mouse_input(0, 0, 0, up))
+        return inputs
+
+    def _pending(self):
+        with self._lock:
+            return self._has_pending()
+
+    def _run(self):
+        # Before 3.11 time.sleep on Windows has the 15.6 ms timer resolution unless raised
+        fine_timer = sys.platform == 'win32' and sys.version_info < (3, 11)
+        while not self._stopping:
+            self._wake.wait()
+            self._wake.clear()
+            if fine_timer:
+                windll.winmm.timeBeginPeriod(1)
+            next_frame = time.perf_counter()
+            last_motion = next_frame
+            while not self._stopping:
+                now = time.perf_counter()
+                if next_frame > now:
+                    time.sleep(next_frame - now)
+                    now = time.perf_counter()
+                late = now - next_frame
+                self.metrics.jitter_total += late
+                self.metrics.jitter_max = max(self.metrics.jitter_max, late)
+                self.metrics.jitter_count += 1
+                inputs = self._take_frame(now)
+                if inputs:
+                    self.inject(inputs)
+                    self.metrics.frames += 1
+                    self.metrics.events += len(inputs)
+                    last_motion = now
+                elif now - last_motion > IDLE_AFTER and not self._pending():
+                    break
+                next_frame += self.period
+                if now - next_frame > self.period:
+                    next_frame = now + self.period  # Fell behind (e.g. suspended) - don't burst
+            if fine_timer:
+                windll.winmm.timeEndPeriod(1)
+
+    def describe(self):
+        return self.metrics.describe()
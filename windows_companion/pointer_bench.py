@@ -0,0 +1,110 @@
+"""
+Pointer streaming rate and latency test
+
+Streams PTR deltas into PointerStream on the fake backend (SendInput is
+recorded, the cursor is simulated) and checks what comes out: every pixel of
+motion sent is injected, frames stay on the POINTER_RATE grid and deltas reach
+SendInput within about a frame. --burst delivers the deltas in clumps like a
+buffered serial or Wi-Fi link does, to show the output staying even anyway.
+Exits with 1 when motion is lost or the latency budget is exceeded.
+
+    python pointer_bench.py                         # 120 Hz for 5 s
+    python pointer_bench.py --rate 500 --burst 4 --seconds 10
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+os.environ['PC_CONTROLLER_FAKE_BACKEND'] = '1'  # Never move the real cursor
+
+import fake_backend  # noqa: E402 - needs the environment above
+from input_injection import MOUSEEVENTF_MOVE  # noqa: E402
+from pointer import POINTER_RATE, PointerStream  # noqa: E402
+
+# Mean delta-to-SendInput latency allowed, in frame periods
+MAX_MEAN_LATENCY_FRAMES = 1.5
+
+
+def interval_stats(times):
+    """(mean, stdev, p99) of the gaps between timestamps, in milliseconds"""
+    gaps = sorted((b - a) * 1000 for a, b in zip(times, times[1:]))
+    if len(gaps) < 2:
+        return 0.0, 0.0, 0.0
+    return statistics.mean(gaps), statistics.stdev(gaps), gaps[int(len(gaps) * 0.99)]
+
+
+def stream(pointer, rate, seconds, burst, seed):
+    """Feed deltas for `seconds`; returns (send times, total dx, total dy)"""
+    rng = random.Random(seed)
+    period = 1.0 / rate
+    sent = []
+    total_x = total_y = 0
+    start = next_send = time.perf_counter()
+    while next_send - start < seconds:
+        now = time.perf_counter()
+        if next_send > now:
+            time.sleep(next_send - now)
+        for _ in range(burst):
+            dx, dy = rng.randint(-12, 12), rng.randint(-12, 12)
+            total_x += dx
+            total_y += dy
+            pointer.handle('PTR', f"{dx},{dy}")
+            sent.append(time.perf_counter())
+        next_send += period * burst
+    return sent, total_x, total_y
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pointer streaming rate/latency test (fake backend)')
+    parser.add_argument('--rate', type=float, default=120, help='Deltas per second sent (default: 120)')
+    parser.add_argument('--seconds', type=float, default=5.0, help='Streaming time (default: 5)')
+    parser.add_argument('--burst', type=int, default=1, help='Deltas delivered together (default: 1)')
+    parser.add_argument('--frame-rate', type=float, default=POINTER_RATE,
+                        help=f'Injection frames per second (default: {POINTER_RATE})')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    desktop = fake_backend.desktop
+    desktop.events.clear()
+    pointer = PointerStream(rate=args.frame_rate)
+    sent, total_x, total_y = stream(pointer, args.rate, args.seconds, args.burst, args.seed)
+    time.sleep(0.5)  # Let the interpolation tail drain
+    pointer.stop()
+
+    moves = [event for event in desktop.events if event[1] == 'mouse' and event[5] & MOUSEEVENTF_MOVE]
+    moved_x = sum(event[2] for event in moves)
+    moved_y = sum(event[3] for event in moves)
+    frame_times = [event[0] / 1e9 for event in moves]
+    metrics = pointer.metrics
+    in_mean, in_stdev, in_p99 = interval_stats(sent)
+    out_mean, out_stdev, out_p99 = interval_stats(frame_times)
+    latency_mean = metrics.latency_total / max(metrics.latency_count, 1)
+
+    print(f"Sent      {len(sent):6} deltas  {len(sent) / args.seconds:7.1f}/s  "
+          f"interval mean {in_mean:5.2f} ms  stdev {in_stdev:5.2f} ms  p99 {in_p99:5.2f} ms")
+    print(f"Injected  {len(moves):6} frames  {len(moves) / args.seconds:7.1f}/s  "
+          f"interval mean {out_mean:5.2f} ms  stdev {out_stdev:5.2f} ms  p99 {out_p99:5.2f} ms")
+    print(f"Coalesced {len(sent) / max(len(moves), 1):.2f} deltas per frame, "
+          f"{metrics.events} INPUTs in {metrics.frames} SendInput calls")
+    print(f"Latency   mean {latency_mean * 1000:.2f} ms  max {metrics.latency_max * 1000:.2f} ms "
+          f"(delta arrival to SendInput)")
+    print(f"Schedule  late mean {metrics.jitter_total / max(metrics.jitter_count, 1) * 1000:.3f} ms  "
+          f"max {metrics.jitter_max * 1000:.3f} ms")
+
+    failed = False
+    if (moved_x, moved_y) != (total_x, total_y):
+        print(f"FAIL: sent ({total_x}, {total_y}) px but injected ({moved_x}, {moved_y})")
+        failed = True
+    budget = MAX_MEAN_LATENCY_FRAMES / args.frame_rate
+    if latency_mean > budget:
+        print(f"FAIL: mean latency {latency_mean * 1000:.2f} ms over {budget * 1000:.2f} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+"""
+Power and display management
+
+Display on/off and suspend without blocking the command worker:
+
+- Monitor power is requested by posting WM_SYSCOMMAND/SC_MONITORPOWER to our own
+  hidden window (DefWindowProc handles it). The old SendMessageW(HWND_BROADCAST)
+  waited on every top-level window and could hang on a single unresponsive app.
+- Suspend runs powrprof's SetSuspendState on a background thread - the call
+  only returns after the machine resumes.
+- The real power and display state comes from WM_POWERBROADCAST notifications
+  (suspend/resume and GUID_CONSOLE_DISPLAY_STATE), received by the same hidden
+  window on its own message-loop thread.
+- Display configuration changes (WM_DISPLAYCHANGE, work area changes) reach
+  the same window and invalidate the cached monitor topology (window_layouts.py).
+
+While the PC is suspending, suspended or still settling after a resume,
+wait_until_awake() holds commands instead of running them against a sleeping
+desktop.
+"""
+
+import os
+import threading
+import time
+from ctypes import Structure, c_ubyte, c_ulong, c_ushort
+
+try:
+    if os.environ.get('PC_CONTROLLER_FAKE_BACKEND'):
+        raise ImportError("fake backend requested")
+    import win32api
+    import win32gui
+    from ctypes import windll
+except ImportError:
+    from fake_backend import win32api, win32gui, windll
+
+# Window messages / power broadcast events
+WM_DESTROY = 0x0002
+WM_CLOSE = 0x0010
+WM_SETTINGCHANGE = 0x001A
+WM_DISPLAYCHANGE = 0x007E
+WM_SYSCOMMAND = 0x0112
+WM_POWERBROADCAST = 0x0218
+SC_MONITORPOWER = 0xF170
+HWND_BROADCAST = 0xFFFF
+PBT_APMSUSPEND = 0x0004
+PBT_APMRESUMESUSPEND = 0x0007
+PBT_APMRESUMEAUTOMATIC = 0x0012
+PBT_POWERSETTINGCHANGE = 0x8013
+DEVICE_NOTIFY_WINDOW_HANDLE = 0x0000
+SPI_SETWORKAREA = 0x002F
+
+# SC_MONITORPOWER lParam values
+MONITOR_ON = -1
+MONITOR_OFF = 2
+
+# Power states
+AWAKE = 'awake'
+SUSPENDING = 'suspending'
+SUSPENDED = 'suspended'
+RESUMING = 'resuming'
+
+# GUID_CONSOLE_DISPLAY_STATE data values
+DISPLAY_STATES = {0: 'off', 1: 'on', 2: 'dimmed'}
+
+# Seconds after a resume before input is sent again (desktop, USB and network settle)
+RESUME_SETTLE_SECONDS = 2.0
+
+
+class GUID(Structure):
+    _fields_ = [('Data1', c_ulong), ('Data2', c_ushort), ('Data3', c_ushort), ('Data4', c_ubyte * 8)]
+
+
+class POWERBROADCAST_SETTING(Structure):
+    _fields_ = [('PowerSetting', GUID), ('DataLength', c_ulong), ('Data', c_ubyte * 1)]
+
+
+# {6FE69556-704A-47A0-8F24-C28D936FDA47}
+GUID_CONSOLE_DISPLAY_STATE = GUID(0x6FE69556, 0x704A, 0x47A0,
+                                  (c_ubyte * 8)(0x8F, 0x24, 0xC2, 0x8D, 0x93, 0x6F, 0xDA, 0x47))
+
+
+class PowerManager:
+    """Tracks power/display state and switches them without blocking.
+
+    on_change(status) is called with 'PC_ASLEEP', 'PC_AWAKE', 'DISPLAY_ON' or
+    'DISPLAY_OFF' whenever the tracked state changes. on_display_change() is
+    called when monitors are added, removed or rearranged, or a work area
+    changes (the taskbar moved) - the cached monitor topology is stale.
+    """
+
+    def __init__(self, on_change=None, settle=RESUME_SETTLE_SECONDS):
+        self.on_change = on_change
+        self.on_display_change = None
+        self.settle = settle
+        self.state = AWAKE
+        self.display = 'unknown'
+        self.hwnd = None  # Hidden notification window (None = notifications unavailable)
+        self._awake = threading.Event()
+        self._awake.set()
+        self._lock = threading.Lock()
+        self._settle_timer = None
+        self._thread = None
+
+    # Notifications
+
+    def start(self, timeout=2.0):
+        """Create the notification window on its own thread; returns False if unavailable"""
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._message_loop, args=(ready,),
+                                        name='power-notifications', daemon=True)
+        self._thread.start()
+        ready.wait(timeout)
+        return self.hwnd is not None
+
+    def stop(self):
+        if self.hwnd is not None:
+            win32gui.PostMessage(self.hwnd, WM_CLOSE, 0, 0)
+
+    def _message_loop(self, ready):
+        try:
+            window_class = win32gui.WNDCLASS()
+            window_class.lpfnWndProc = {WM_POWERBROADCAST: self._on_power_broadcast,
+                                        WM_DISPLAYCHANGE: self._on_display_change,
+                                        WM_SETTINGCHANGE: self._on_display_change,
+                                        WM_DESTROY: self._on_destroy}
+            window_class.lpszClassName = 'PCControllerPowerWindow'
+            window_class.hInstance = win32api.GetModuleHandle(None)
+            atom = win32gui.RegisterClass(window_class)
+            # A real (hidden) top-level window: message-only windows get no broadcasts
+            hwnd = win32gui.CreateWindow(atom, 'PC Controller Power', 0, 0, 0, 0, 0,
+                                         0, 0, window_class.hInstance, None)
+            windll.user32.RegisterPowerSettingNotification(hwnd, GUID_CONSOLE_DISPLAY_STATE,
+                                                           DEVICE_NOTIFY_WINDOW_HANDLE)
+        except Exception as e:
+            print(f"Power notifications unavailable ({e}) - state is tracked from our own commands")
+            ready.set()
+            return
+        self.hwnd = hwnd
+        ready.set()
+        win32gui.PumpMessages()
+
+    def _on_destroy(self, hwnd, message, wparam, lparam):
+        self.hwnd = None
+        win32gui.PostQuitMessage(0)
+        return 0
+
+    def _on_display_change(self, hwnd, message, wparam, lparam):
+        if (message == WM_DISPLAYCHANGE or wparam == SPI_SETWORKAREA) and self.on_display_change is not None:
+            self.on_display_change()
+        return 0
+
+    def _on_power_broadcast(self, hwnd, message, wparam, lparam):
+        if wparam == PBT_APMSUSPEND:
+            self._set_state(SUSPENDED)
+        elif wparam in (PBT_APMRESUMEAUTOMATIC, PBT_APMRESUMESUSPEND):
+            self._resumed()
+        elif wparam == PBT_POWERSETTINGCHANGE and lparam:
+            setting = POWERBROADCAST_SETTING.from_address(lparam)
+            if bytes(setting.PowerSetting) == bytes(GUID_CONSOLE_DISPLAY_STATE):
+                self._set_display(DISPLAY_STATES.get(setting.Data[0], 'unknown'))
+        return 1
+
+    # State
+
+    def _notify(self, status):
+        if self.on_change is not None:
+            try:
+                self.on_change(status)
+            except Exception as e:
+                print(f"Power state notification failed: {e}")
+
+    def _set_state(self, state):
+        with self._lock:
+            previous, self.state = self.state, state
+            if state == AWAKE:
+                self._awake.set()
+            else:
+                self._awake.clear()
+            if self._settle_timer is not None and state != RESUMING:
+                self._settle_timer.cancel()
+                self._settle_timer = None
+        if state == SUSPENDED and previous != SUSPENDED:
+            self._notify('PC_ASLEEP')
+        elif state == AWAKE and previous != AWAKE:
+            self._notify('PC_AWAKE')
+
+    def _set_display(self, display):
+        with self._lock:
+            changed = display != self.display
+            self.display = display
+        if changed and display in ('on', 'off'):
+            self._notify(f"DISPLAY_{display.upper()}")
+
+    def _resumed(self):
+        """Resume seen - hold commands a little longer, then report awake"""
+        with self._lock:
+            if self.state == RESUMING:
+                return  # Automatic resume is followed by a user resume - one settle period
+        self._set_state(RESUMING)
+        timer = threading.Timer(self.settle, self._set_state, args=(AWAKE,))
+        timer.daemon = True
+        with self._lock:
+            self._settle_timer = timer
+        timer.start()
+
+    def wait_until_awake(self, timeout=None):
+        """Block until the PC is awake and settled; returns False on timeout"""
+        return self._awake.wait(timeout)
+
+    @property
+    def awake(self):
+        return self._awake.is_set()
+
+    def describe(self):
+        return f"power={self.state} display={self.display}"
+
+    # Actions
+
+    def set_display(self, on):
+        """Request monitor power on/off without waiting on other applications"""
+        value = MONITOR_ON if on else MONITOR_OFF
+        if self.hwnd is not None:
+            # DefWindowProc of our own window handles SC_MONITORPOWER
+            win32gui.PostMessage(self.hwnd, WM_SYSCOMMAND, SC_MONITORPOWER, value)
+        else:
+            # Posted broadcast is fire-and-forget, unlike SendMessageW
+            windll.user32.PostMessageW(HWND_BROADCAST, WM_SYSCOMMAND, SC_MONITORPOWER, value)
+            self._set_display('on' if on else 'off')  # No notification will tell us
+
+    def suspend(self):
+        """Start a suspend in the background; commands are held until resume"""
+        with self._lock:
+            if self.state != AWAKE:
+                return False
+        self._set_state(SUSPENDING)
+        threading.Thread(target=self._suspend, name='suspend', daemon=True).start()
+        return True
+
+    def _suspend(self):
+        started = time.monotonic()
+        try:
+            # SetSuspendState(hibernate, force, wake events disabled) returns after resume
+            ok = windll.powrprof.SetSuspendState(False, False, False)
+        except Exception as e:
+            print(f"Suspend failed: {e}")
+            ok = False
+        if not ok:
+            self._set_state(AWAKE)
+            return
+        print(f"Resumed after {time.monotonic() - started:.1f}s")
+        with self._lock:
+            missed_notifications = self.state in (SUSPENDING, SUSPENDED)
+        if missed_notifications:
+            self._resumed()
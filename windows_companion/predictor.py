@@ -0,0 +1,160 @@
+"""
+Next-command prediction
+
+Usage is sequential: BROWSER_OPEN_YOUTUBE is nearly always followed by
+BROWSER_MOVE_TV and FULLSCREEN_ENTER, DISPLAY_ON by BROWSER_FOCUS. A
+first-order Markov model over the command history predicts the next command,
+and the executor uses the prediction to warm what that command will need
+(browser window lookup, monitor geometry, focus) while the queue is idle.
+
+What a command needs is learned too: after each command the controller reports
+which lookups it did (LOOKUP_* flags in pc_controller), so nothing has to be
+declared per command.
+
+Replay a command journal to see how well it would have predicted:
+
+    python predictor.py journal.bin
+    python predictor.py journal.bin --warm-ms 12
+"""
+
+import time
+
+# Transitions out of a command seen before predicting after it
+MIN_SUPPORT = 3
+# Share of those transitions the predicted command must have
+MIN_CONFIDENCE = 0.5
+# Counts out of a command are halved past this, so changed habits take over
+MAX_TRANSITIONS = 1000
+
+
+class CommandPredictor:
+    """First-order Markov model of the command sequence"""
+
+    def __init__(self, min_support=MIN_SUPPORT, min_confidence=MIN_CONFIDENCE):
+        self.min_support = min_support
+        self.min_confidence = min_confidence
+        self.transitions = {}  # command -> {next command: count}
+        self.totals = {}  # command -> transitions counted out of it
+        self.needs = {}  # command -> LOOKUP_* flags it used last time
+        self.previous = None
+        self.expected = None  # (command, confidence, needs) predicted after the previous command
+        self.hits = 0
+        self.misses = 0
+
+    def observe(self, command, needs=None):
+        """Record that command ran next; returns whether it was predicted (None if nothing was)"""
+        hit = None
+        if self.expected is not None:
+            hit = command == self.expected[0]
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if needs is not None:
+            self.needs[command] = needs
+        previous = self.previous
+        if previous is not None:
+            counts = self.transitions.get(previous)
+            if counts is None:
+                counts = self.transitions[previous] = {}
+            counts[command] = counts.get(command, 0) + 1
+            total = self.totals[previous] = self.totals.get(previous, 0) + 1
+            if total > MAX_TRANSITIONS:
+                self._decay(previous)
+        self.previous = command
+        self.expected = self.predict(command)
+        return hit
+
+    def _decay(self, command):
+        counts = {following: count // 2 for following, count in self.transitions[command].items() if count > 1}
+        self.transitions[command] = counts
+        self.totals[command] = sum(counts.values())
+
+    def predict(self, command):
+        """(next command, confidence, needs) expected after command, or None"""
+        counts = self.transitions.get(command)
+        total = self.totals.get(command, 0)
+        if not counts or total < self.min_support:
+            return None
+        best = max(counts, key=counts.get)
+        confidence = counts[best] / total
+        if confidence < self.min_confidence:
+            return None
+        return best, confidence, self.needs.get(best, 0)
+
+    def train(self, commands):
+        """Learn from a past command sequence (hit counters are left untouched)"""
+        hits, misses = self.hits, self.misses
+        for command in commands:
+            self.observe(command)
+        self.hits, self.misses = hits, misses
+
+    def hit_rate(self):
+        predicted = self.hits + self.misses
+        return self.hits / predicted if predicted else 0.0
+
+    def describe(self):
+        return f"hits:{self.hits},misses:{self.misses},rate:{self.hit_rate():.0%}"
+
+
+def replay(records, predictor=None):
+    """Feed journal records through a predictor in order, online (predict before learning).
+
+    Returns (predictor, per-command {command: [hits, misses]}, hits that acted on
+    a browser window - the ones a window prewarm would have served)."""
+    predictor = predictor or CommandPredictor()
+    per_command = {}
+    window_hits = 0
+    for record in records:
+        if record.outcome == 'dropped':
+            continue  # Never ran
+        hit = predictor.observe(record.command)
+        if hit is None:
+            continue
+        stats = per_command.get(record.command)
+        if stats is None:
+            stats = per_command[record.command] = [0, 0]
+        stats[0 if hit else 1] += 1
+        if hit and record.hwnd:
+            window_hits += 1
+    return predictor, per_command, window_hits
+
+
+def measure_lookup_cost(repeat=50):
+    """Seconds one browser window + monitor lookup takes on this machine"""
+    import contextlib
+    import io
+
+    import pc_controller
+    controller = pc_controller.PCController()
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            controller.find_browser_windows()
+            controller.get_monitor_info()
+    return (time.perf_counter() - start) / repeat
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from command_journal import read_journal
+
+    parser = argparse.ArgumentParser(description='Replay a command journal through the predictor')
+    parser.add_argument('journal', help='Journal file (rotated .1, .2, ... files are included)')
+    parser.add_argument('--warm-ms', type=float, default=None,
+                        help='Lookup time a hit saves (default: measured on this machine)')
+    parser.add_argument('--min-confidence', type=float, default=MIN_CONFIDENCE,
+                        help=f'Least confidence to predict (default: {MIN_CONFIDENCE})')
+    args = parser.parse_args()
+
+    predictor, per_command, window_hits = replay(read_journal(args.journal),
+                                                 CommandPredictor(min_confidence=args.min_confidence))
+    warm = args.warm_ms / 1000 if args.warm_ms is not None else measure_lookup_cost()
+    print(f"Predictions: {predictor.hits + predictor.misses}  hits: {predictor.hits}  "
+          f"hit rate: {predictor.hit_rate():.1%}")
+    print(f"Estimated lookup time saved: {window_hits * warm:.2f}s "
+          f"({window_hits} window hits x {warm * 1000:.2f} ms)")
+    print("\nPer command:                  hits  misses")
+    for command, (hits, misses) in sorted(per_command.items(), key=lambda item: -sum(item[1])):
+        print(f"  {command:<28} {hits:6d} {misses:7d}")
@@ -0,0 +1,97 @@
+"""
+On-demand command profiling
+
+PROFILE_START:<n> arms a CommandProfiler that runs cProfile around the next n
+dispatched commands (on the command worker thread, so the serial reader is not
+included). When n commands have run, or on PROFILE_DUMP (once the command
+being profiled finishes - the transport loop never waits for it), it writes:
+
+- profile-<time>.pstats  - load with pstats, snakeviz or flameprof (flame graph)
+- profile-<time>.txt     - per-command wall times and the top functions
+
+When no profiler is armed the executor only checks one attribute per command.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+
+# Functions listed in the text summary
+SUMMARY_FUNCTIONS = 30
+
+
+class CommandProfiler:
+    """Profiles the next `count` commands and writes the result to `directory`"""
+
+    def __init__(self, count, directory='profiles'):
+        if count < 1:
+            raise ValueError("count must be at least 1")
+        self.count = count
+        self.directory = directory
+        self.timings = []  # (command, wall seconds, outcome)
+        self.done = False
+        self._profile = cProfile.Profile()
+        self._lock = threading.Lock()  # Held while a profiled command runs
+        self._written = None
+        self._dump_requested = False
+
+    def run(self, command, function, *args):
+        """Call function(*args) under the profiler"""
+        with self._lock:
+            if self.done:
+                return function(*args)
+            outcome = 'ok'
+            start = time.perf_counter()
+            self._profile.enable()
+            try:
+                return function(*args)
+            except BaseException as e:
+                outcome = type(e).__name__
+                raise
+            finally:
+                self._profile.disable()
+                self.timings.append((command, time.perf_counter() - start, outcome))
+                if len(self.timings) >= self.count or self._dump_requested:
+                    self._written = self._write()
+
+    def pop_written(self):
+        """Path written by the last run() (once), else None"""
+        path, self._written = self._written, None
+        return path
+
+    def request_dump(self):
+        """Have the command being profiled write the profile when it finishes.
+
+        Never blocks - safe from the transport loop while a long command runs."""
+        self._dump_requested = True
+
+    def dump(self):
+        """Write what was collected so far and return the path (None if already written).
+
+        Waits for a command that is being profiled to finish first (bounded by
+        its deadline) - call it from the command worker, not the transport loop."""
+        with self._lock:
+            return None if self.done else self._write()
+
+    def _write(self):
+        self.done = True
+        os.makedirs(self.directory, exist_ok=True)
+        now = time.time()
+        name = time.strftime('profile-%Y%m%d-%H%M%S', time.localtime(now)) + f"-{int(now * 1000) % 1000:03d}"
+        base = os.path.join(self.directory, name)
+        self._profile.dump_stats(f"{base}.pstats")
+
+        summary = io.StringIO()
+        summary.write(f"{len(self.timings)} command(s) profiled\n\n")
+        for command, seconds, outcome in self.timings:
+            summary.write(f"{seconds * 1000:9.1f} ms  {command}  {outcome}\n")
+        summary.write("\n")
+        if self.timings:  # pstats refuses a profile that never ran
+            stats = pstats.Stats(self._profile, stream=summary)
+            stats.sort_stats('cumulative').print_stats(SUMMARY_FUNCTIONS)
+        with open(f"{base}.txt", 'w', encoding='utf-8') as f:
+            f.write(summary.getvalue())
+        return f"{base}.pstats"
@@ -0,0 +1,256 @@
+"""
+Scenes - command sequences run on the companion
+
+Home Assistant automations like "Movie Mode" used to chain rest_commands with
+fixed delays between them: every step was its own HTTP request and serial
+line, and each delay was a guess at how long the previous step takes. A scene
+is the whole sequence as one command (SCENE:<name>). Each step runs the
+command's handler directly, then polls the desktop until the step's result is
+actually visible - the browser window in the foreground, on the TV, maximized,
+fullscreen - and moves on as soon as it is, or fails the scene when it isn't
+within the step's timeout.
+
+Built-in scenes mirror home_assistant/example_automations.yaml. A JSON file
+(--scenes) adds scenes or replaces built-in ones:
+
+    {"tv": [{"command": "BROWSER_FOCUS", "until": "foreground"},
+            {"command": "BROWSER_MOVE_TV", "until": "on_tv"},
+            {"command": "FULLSCREEN_ENTER", "until": "fullscreen", "timeout": 3}]}
+
+A step with "repeat": true runs its command again whenever the first browser
+window changes while it waits, so BROWSER_CLOSE (one window per run) closes
+every window. An "optional": true step that fails or times out is noted and
+the scene goes on - bedtime still sleeps when a window stays open behind a
+"close all tabs?" prompt, or when no browser was open.
+
+The response reports the total and per-step time, run + wait:
+
+    STATUS:SCENE movie executed in 0.43s (BROWSER_FOCUS 2+31ms, LAYOUT 4+12ms, ...)
+"""
+
+import json
+import os
+import re
+import time
+from collections import namedtuple
+
+try:
+    if os.environ.get('PC_CONTROLLER_FAKE_BACKEND'):
+        raise ImportError("fake backend requested")
+    import win32gui
+except ImportError:
+    from fake_backend import win32gui
+
+# Seconds between checks of a step's completion condition
+POLL_INTERVAL = 0.02
+# Default seconds a step may take to show its effect
+STEP_TIMEOUT = 5.0
+# Seconds a wake step may take (the automations waited 30 s after PC_WAKE)
+WAKE_TIMEOUT = 30.0
+
+GWL_STYLE = -16
+WS_CAPTION = 0x00C00000
+SW_SHOWMAXIMIZED = 3
+
+# A handler result that reports a failure: "<COMMAND> failed ..." or with one word
+# between ("SCENE movie failed at step 2", "ALL_WINDOWS PLAYBACK_PAUSE failed on all ...").
+# " failed" further in (a skipped optional step, one window of a fan-out) is not one
+_FAILED_RESULT = re.compile(r'[A-Z][A-Z0-9_]*(?: \S+)? failed\b')
+
+# until: name of a condition in CONDITIONS (None = done when the handler returns)
+# repeat: run the command again whenever the first browser window changes while waiting
+# optional: a failure or timeout doesn't stop the scene
+SceneStep = namedtuple('SceneStep', 'command param until timeout repeat optional')
+
+
+def step(command, until=None, param=None, timeout=STEP_TIMEOUT, repeat=False, optional=False):
+    return SceneStep(command, param, until, timeout, repeat, optional)
+
+
+def failed_result(result):
+    return _FAILED_RESULT.match(str(result)) is not None
+
+
+SCENES = {
+    'movie': (
+        step('BROWSER_FOCUS', 'foreground'),
+        step('LAYOUT', 'on_tv', param='tv'),  # Also parks the other windows on the TV (window_layouts.py)
+        step('FULLSCREEN_ENTER', 'fullscreen'),
+    ),
+    'presentation': (
+        step('BROWSER_FOCUS', 'foreground'),
+        step('BROWSER_MOVE_TV', 'on_tv'),
+        step('BROWSER_MAXIMIZE', 'maximized'),
+    ),
+    'work': (
+        step('PC_WAKE', 'awake', timeout=WAKE_TIMEOUT),
+        step('DISPLAY_ON', 'display_on', timeout=WAKE_TIMEOUT),
+        step('BROWSER_FOCUS', 'foreground'),
+        step('BROWSER_MAXIMIZE', 'maximized'),
+    ),
+    'meeting': (
+        step('BROWSER_FOCUS', 'foreground'),
+        step('BROWSER_MAXIMIZE', 'maximized'),
+    ),
+    'morning': (
+        step('PC_WAKE', 'awake', timeout=WAKE_TIMEOUT),
+        step('DISPLAY_ON', 'display_on', timeout=WAKE_TIMEOUT),
+        step('BROWSER_RESTORE', 'browser', timeout=15.0),
+    ),
+    'bedtime': (
+        step('BROWSER_CLOSE', 'no_browser', repeat=True, optional=True),
+        step('PC_SLEEP'),
+    ),
+}
+
+
+def _browser(controller):
+    windows = controller.find_browser_windows()
+    return windows[0][0] if windows else None
+
+
+def _monitor_rect(controller, index):
+    monitors = controller.get_monitor_info()
+    if index >= len(monitors):
+        return None
+    monitor = monitors[index]
+    return monitor['left'], monitor['top'], monitor['right'], monitor['bottom']
+
+
+def _covers(rect, monitor):
+    return (rect[0] <= monitor[0] and rect[1] <= monitor[1]
+            and rect[2] >= monitor[2] and rect[3] >= monitor[3])
+
+
+def _on_tv(controller):
+    hwnd = _browser(controller)
+    monitor = _monitor_rect(controller, controller.tv_monitor_index)
+    if hwnd is None or monitor is None:
+        return False
+    left, top, right, bottom = win32gui.GetWindowRect(hwnd)
+    center_x, center_y = (left + right) // 2, (top + bottom) // 2
+    return monitor[0] <= center_x < monitor[2] and monitor[1] <= center_y < monitor[3]
+
+
+def _maximized(controller):
+    hwnd = _browser(controller)
+    return hwnd is not None and win32gui.GetWindowPlacement(hwnd)[1] == SW_SHOWMAXIMIZED
+
+
+def _fullscreen(controller):
+    """Browser covers a whole monitor without a caption (a window moved to a
+    monitor's bounds covers it too, but keeps its caption)"""
+    hwnd = _browser(controller)
+    if hwnd is None or win32gui.GetWindowLong(hwnd, GWL_STYLE) & WS_CAPTION:
+        return False
+    rect = win32gui.GetWindowRect(hwnd)
+    return any(_covers(rect, (m['left'], m['top'], m['right'], m['bottom']))
+               for m in controller.get_monitor_info())
+
+
+# Completion conditions - each takes the PCController and returns whether the step is done
+CONDITIONS = {
+    'browser': lambda controller: _browser(controller) is not None,
+    'no_browser': lambda controller: _browser(controller) is None,
+    'foreground': lambda controller: (_browser(controller) or -1) == win32gui.GetForegroundWindow(),
+    'on_tv': _on_tv,
+    'maximized': _maximized,
+    'fullscreen': _fullscreen,
+    'awake': lambda controller: controller.power.awake,
+    # Display state is only known with power notifications - 'unknown' doesn't hold a scene
+    'display_on': lambda controller: controller.power.display != 'off',
+}
+
+
+def load_scenes(path):
+    """Built-in scenes updated with the scenes of a JSON file"""
+    scenes = dict(SCENES)
+    with open(path) as f:
+        data = json.load(f)
+    for name, steps in data.items():
+        parsed = []
+        for entry in steps:
+            until = entry.get('until')
+            if until is not None and until not in CONDITIONS:
+                raise ValueError(f"scene {name}: unknown condition {until!r}")
+            parsed.append(step(entry['command'].upper(), until, entry.get('param'),
+                               float(entry.get('timeout', STEP_TIMEOUT)),
+                               bool(entry.get('repeat', False)), bool(entry.get('optional', False))))
+        scenes[name.lower()] = tuple(parsed)
+    return scenes
+
+
+class SceneFailed(Exception):
+    """A step failed or its effect didn't show within the step timeout"""
+
+
+class SceneRunner:
+    """Runs scenes through the companion's command handlers"""
+
+    def __init__(self, controller, commands, param_commands, scenes=None):
+        self.controller = controller
+        self.commands = commands
+        self.param_commands = param_commands
+        self.scenes = SCENES if scenes is None else scenes
+        for name, steps in self.scenes.items():
+            for scene_step in steps:
+                handlers = param_commands if scene_step.param is not None else commands
+                if scene_step.command not in handlers:
+                    raise ValueError(f"scene {name}: unknown command {scene_step.command}")
+
+    def max_duration(self):
+        """Longest a scene may take - the SCENE command's deadline"""
+        return max((sum(s.timeout for s in steps) for steps in self.scenes.values()), default=0.0) + 1.0
+
+    def _run_step(self, scene_step):
+        if scene_step.param is not None:
+            result = self.param_commands[scene_step.command](scene_step.param)
+        else:
+            result = self.commands[scene_step.command]()
+        if failed_result(result):
+            raise SceneFailed(result)
+
+    def _wait(self, scene_step, browser):
+        condition = CONDITIONS[scene_step.until]
+        deadline = time.monotonic() + scene_step.timeout
+        while not condition(self.controller):
+            if time.monotonic() >= deadline:
+                raise SceneFailed(f"{scene_step.command} not {scene_step.until} "
+                                  f"after {scene_step.timeout:g}s")
+            self.controller._sleep(POLL_INTERVAL)  # Cancellation point
+            if scene_step.repeat:
+                current = _browser(self.controller)
+                if current is not None and current != browser:
+                    browser = current
+                    try:
+                        self._run_step(scene_step)
+                    except SceneFailed:
+                        pass  # The condition and timeout decide
+
+    def run(self, name):
+        """Run a scene; returns the status message with per-step timings"""
+        steps = self.scenes.get(name.lower())
+        if steps is None:
+            return f"SCENE failed - unknown scene {name} (known: {', '.join(sorted(self.scenes))})"
+        timings = []
+        start = time.perf_counter()
+        try:
+            for scene_step in steps:
+                step_start = ran = time.perf_counter()
+                skipped = ''
+                try:
+                    browser = _browser(self.controller) if scene_step.repeat else None
+                    self._run_step(scene_step)
+                    ran = time.perf_counter()
+                    if scene_step.until is not None:
+                        self._wait(scene_step, browser)
+                except SceneFailed as e:
+                    if not scene_step.optional:
+                        raise
+                    skipped = f" skipped - {e}"
+                timings.append(f"{scene_step.command} {(ran - step_start) * 1000:.0f}+"
+                               f"{(time.perf_counter() - ran) * 1000:.0f}ms{skipped}")
+        except SceneFailed as e:
+            done = f" (done: {', '.join(timings)})" if timings else ''
+            return f"SCENE {name} failed at step {len(timings) + 1} - {e}{done}"
+        return f"SCENE {name} executed in {time.perf_counter() - start:.2f}s ({', '.join(timings)})"
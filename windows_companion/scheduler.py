@@ -0,0 +1,362 @@
+"""
+Scheduled and delayed commands
+
+Sleep timers and "display off in 10 minutes" used to live in Home Assistant,
+which had to send PLAYBACK_PAUSE / PC_SLEEP itself later and lost the timers
+when it restarted. The companion keeps them instead:
+
+    SCHEDULE:45m,PLAYBACK_PAUSE;PC_SLEEP          once, in 45 minutes
+    SCHEDULE:sleep=1h30m,SCENE:bedtime            named - scheduling the name again replaces it
+    SCHEDULE_EVERY:30m,DISPLAY_OFF                every 30 minutes
+    SCHEDULE_CANCEL:3 | SCHEDULE_CANCEL:sleep | SCHEDULE_CANCEL:all
+    SCHEDULE_LIST
+
+Delays are seconds or h/m/s units (90, 10s, 45m, 1h30m). A timer runs its
+commands in order through the command queue, like any other command.
+
+Timers are a binary heap ordered by due time. Cancelling marks the timer and
+leaves its heap entry to be skipped when it comes up (the heap is rebuilt once
+most entries are dead), so scheduling and cancelling are O(log n) and O(1).
+One thread sleeps until the earliest timer is due and waits without a timeout
+while there are none - an idle scheduler costs nothing.
+
+Timers persist in an append-only JSON-lines file: one short line when a timer
+is added, cancelled or done (recurring timers don't write when they fire -
+their next due time follows from the first one). The file is created with the
+first timer, and compacted to the live timers on load and when dead lines
+outnumber them. Due times are wall
+clock, so timers survive restarts; a one-off timer missed by more than
+MISSED_GRACE (the companion was off or the PC asleep) is dropped instead of
+firing late, and a recurring one continues with its next slot after the
+restart. Timers running a private command (typed text, search queries) are
+kept in memory only - they don't survive a restart, the text never reaches
+the file - and their parameters are described by length.
+
+The clock is injectable, and run_due(now) does all the work without the
+thread, so scheduler_bench.py drives tens of thousands of timers through
+hours of virtual time in seconds.
+"""
+
+import heapq
+import json
+import os
+import re
+import threading
+import time
+
+# Seconds a one-off timer may be overdue and still fire (a sleep timer doesn't
+# put the PC to sleep the moment it resumes hours later)
+MISSED_GRACE = 300.0
+# Shortest interval of a recurring timer, seconds
+MIN_INTERVAL = 1.0
+# Longest the scheduler thread sleeps while timers are pending (notices wall clock changes)
+MAX_WAIT = 60.0
+# Compact the file when it has more than this many lines per live timer (plus COMPACT_SLACK)
+COMPACT_RATIO = 2
+COMPACT_SLACK = 64
+
+_DELAY_RE = re.compile(r'(?:(\d+(?:\.\d+)?)h)?(?:(\d+(?:\.\d+)?)m)?(?:(\d+(?:\.\d+)?)s?)?$')
+
+
+def parse_delay(text):
+    """Seconds in '90', '10s', '45m', '1h30m' (raises ValueError)"""
+    match = _DELAY_RE.match(text.strip().lower())
+    if not text.strip() or match is None or not any(match.groups()):
+        raise ValueError(f"bad delay {text!r} (use e.g. 90, 10s, 45m, 1h30m)")
+    hours, minutes, seconds = (float(value or 0) for value in match.groups())
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def format_delay(seconds):
+    seconds = max(int(round(seconds)), 0)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    text = (f"{hours}h" if hours else '') + (f"{minutes}m" if minutes else '') + (f"{seconds}s" if seconds else '')
+    return text or '0s'
+
+
+def parse_schedule(param):
+    """SCHEDULE parameter -> (name, delay seconds, [(command, param)])"""
+    when, _, rest = (param or '').partition(',')
+    name, _, delay = when.rpartition('=')
+    commands = []
+    for part in rest.split(';'):
+        command, _, command_param = part.strip().partition(':')
+        if command:
+            commands.append((command.upper(), command_param or None))
+    if not commands:
+        raise ValueError("expected <delay>,<COMMAND>[:param][;<COMMAND>...]")
+    return name.strip() or None, parse_delay(delay), commands
+
+
+def describe_commands(commands, private=()):
+    """COMMAND:param;... with the parameters of private commands replaced by their length"""
+    return ';'.join(command if param is None else
+                    f"{command}:({len(param)} chars)" if command in private else f"{command}:{param}"
+                    for command, param in commands)
+
+
+class Timer:
+    __slots__ = ('id', 'name', 'due', 'interval', 'commands', 'private', 'cancelled')
+
+    def __init__(self, timer_id, name, due, interval, commands, private=()):
+        self.id = timer_id
+        self.name = name
+        self.due = due  # Wall clock (time.time())
+        self.interval = interval  # Seconds between runs, None = once
+        self.commands = commands  # [(command, param)]
+        self.private = private  # Commands whose parameters are neither persisted nor described
+        self.cancelled = False
+
+    @property
+    def persisted(self):
+        return not any(command in self.private for command, _ in self.commands)
+
+    def record(self):
+        return {'op': 'add', 'id': self.id, 'name': self.name, 'due': self.due,
+                'interval': self.interval, 'commands': self.commands}
+
+    def describe(self, now):
+        label = f"{self.id}" + (f" ({self.name})" if self.name else '')
+        every = f" every {format_delay(self.interval)}" if self.interval else ''
+        return f"{label} in {format_delay(self.due - now)}{every}: {describe_commands(self.commands, self.private)}"
+
+
+class Scheduler:
+    """Delayed and recurring commands on a heap, persisted to an append-only file.
+
+    fire(timer, command, param) is called for each command of a due timer, on
+    the scheduler thread (or the caller of run_due). Timers running one of the
+    `private` commands are not persisted."""
+
+    def __init__(self, fire, path=None, clock=time.time, grace=MISSED_GRACE, private=()):
+        self.fire = fire
+        self.path = path
+        self.clock = clock
+        self.grace = grace
+        self.private = frozenset(private)
+        self._cond = threading.Condition()
+        self._heap = []  # (due, id, timer) - stale when the timer was cancelled or rescheduled
+        self._timers = {}  # id -> live Timer
+        self._names = {}  # name -> id
+        self._next_id = 1
+        self._file = None
+        self._lines = 0  # Lines in the file
+        self._thread = None
+        self._stopping = False
+        self.metrics = {'scheduled': 0, 'cancelled': 0, 'fired': 0, 'missed': 0}
+
+    # Persistence
+
+    def load(self):
+        """Read the timers file (if any), drop what was missed, compact it and open it for appending"""
+        timers = {}
+        exists = bool(self.path) and os.path.exists(self.path)
+        if exists:
+            with open(self.path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # Torn last line after a crash
+                    if record.get('op') == 'add':
+                        timers[record['id']] = record
+                    else:
+                        timers.pop(record.get('id'), None)
+        now = self.clock()
+        with self._cond:
+            for record in timers.values():
+                timer = Timer(record['id'], record.get('name'), record['due'], record.get('interval'),
+                              [tuple(command) for command in record['commands']], self.private)
+                self._next_id = max(self._next_id, timer.id + 1)
+                if timer.interval and timer.due <= now:
+                    # The file has the first due time - runs since then already happened or were missed
+                    timer.due = self._next_slot(timer, now)
+                elif timer.due < now - self.grace:
+                    self.metrics['missed'] += 1
+                    continue
+                self._add(timer)
+            if exists:
+                self._compact()
+            self._cond.notify()
+        return len(self._timers)
+
+    def _write(self, record):
+        if self._file is None:
+            if not self.path:
+                return
+            self._open()  # First timer - no file yet
+        self._file.write(json.dumps(record, separators=(',', ':')) + '\n')
+        self._file.flush()
+        self._lines += 1
+        if self._lines > COMPACT_RATIO * len(self._timers) + COMPACT_SLACK:
+            self._compact()
+
+    def _compact(self):
+        """Rewrite the file with only the live timers (atomically)"""
+        if self._file is not None:
+            self._file.close()
+        temporary = self.path + '.tmp'
+        self._make_directory()
+        persisted = [timer for timer in self._timers.values() if timer.persisted]
+        with open(temporary, 'w', encoding='utf-8') as f:
+            for timer in persisted:
+                f.write(json.dumps(timer.record(), separators=(',', ':')) + '\n')
+        os.replace(temporary, self.path)
+        self._lines = len(persisted)
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def _open(self):
+        self._make_directory()
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._lines = 0
+
+    def _make_directory(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def close(self):
+        self.stop()
+        with self._cond:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    # Timers
+
+    def _add(self, timer):
+        self._timers[timer.id] = timer
+        if timer.name:
+            self._names[timer.name] = timer.id
+        heapq.heappush(self._heap, (timer.due, timer.id, timer))
+
+    def _remove(self, timer):
+        timer.cancelled = True
+        del self._timers[timer.id]
+        if timer.name and self._names.get(timer.name) == timer.id:
+            del self._names[timer.name]
+        # Dead entries are skipped when popped - rebuild once they are most of the heap
+        if len(self._heap) > 2 * len(self._timers) + COMPACT_SLACK:
+            self._heap = [entry for entry in self._heap if not entry[2].cancelled and entry[0] == entry[2].due]
+            heapq.heapify(self._heap)
+
+    def schedule(self, delay, commands, interval=None, name=None):
+        """Add a timer due in `delay` seconds (then every `interval`); a named timer replaces its namesake"""
+        if interval is not None and interval < MIN_INTERVAL:
+            raise ValueError(f"interval under {MIN_INTERVAL:g}s")
+        with self._cond:
+            if name and name in self._names:
+                self._cancel(self._timers[self._names[name]])
+            timer = Timer(self._next_id, name, self.clock() + delay, interval, list(commands), self.private)
+            self._next_id += 1
+            self._add(timer)
+            if timer.persisted:
+                self._write(timer.record())
+            self.metrics['scheduled'] += 1
+            if self._heap[0][2] is timer:
+                self._cond.notify()  # New earliest timer - the thread's wait is too long now
+        return timer
+
+    def _cancel(self, timer):
+        self._remove(timer)
+        if timer.persisted:
+            self._write({'op': 'cancel', 'id': timer.id})
+        self.metrics['cancelled'] += 1
+
+    def cancel(self, key):
+        """Cancel a timer by id or name, or every timer with 'all'; returns how many were cancelled"""
+        with self._cond:
+            if key == 'all':
+                timers = list(self._timers.values())
+            else:
+                timer_id = self._names.get(key)
+                if timer_id is None and str(key).isdigit():
+                    timer_id = int(key)
+                timers = [self._timers[timer_id]] if timer_id in self._timers else []
+            for timer in timers:
+                self._cancel(timer)
+        return len(timers)
+
+    def timers(self):
+        """Live timers, soonest first"""
+        with self._cond:
+            return sorted(self._timers.values(), key=lambda timer: (timer.due, timer.id))
+
+    def next_due(self):
+        with self._cond:
+            return self._next_due()
+
+    def _next_due(self):
+        while self._heap and (self._heap[0][2].cancelled or self._heap[0][0] != self._heap[0][2].due):
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def _next_slot(self, timer, now):
+        """First run of a recurring timer after now (runs missed meanwhile are skipped)"""
+        missed = int((now - timer.due) // timer.interval) + 1
+        return timer.due + missed * timer.interval
+
+    def run_due(self, now=None):
+        """Fire every timer due at `now` (default: the clock); returns how many fired"""
+        now = self.clock() if now is None else now
+        due = []
+        with self._cond:
+            while self._next_due() is not None and self._heap[0][0] <= now:
+                _, _, timer = heapq.heappop(self._heap)
+                if timer.interval:
+                    late = now - timer.due > self.grace
+                    timer.due = self._next_slot(timer, now)
+                    heapq.heappush(self._heap, (timer.due, timer.id, timer))
+                    if late:
+                        self.metrics['missed'] += 1
+                        continue
+                else:
+                    self._remove(timer)
+                    if timer.persisted:
+                        self._write({'op': 'done', 'id': timer.id})
+                    if now - timer.due > self.grace:
+                        self.metrics['missed'] += 1
+                        continue
+                due.append(timer)
+            self.metrics['fired'] += len(due)
+        for timer in due:
+            for command, param in timer.commands:
+                self.fire(timer, command, param)
+        return len(due)
+
+    # Thread
+
+    def start(self):
+        if self._thread is None:
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(1.0)
+            self._thread = None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._stopping:
+                    return
+                due = self._next_due()
+                if due is None:
+                    self._cond.wait()  # Idle until a timer is scheduled
+                    continue
+                wait = due - self.clock()
+                if wait > 0:
+                    self._cond.wait(min(wait, MAX_WAIT))
+                    continue
+            self.run_due()
+
+    def describe(self):
+        with self._cond:
+            return (f"timers:{len(self._timers)}," +
+                    ','.join(f"{key}:{value}" for key, value in self.metrics.items()))
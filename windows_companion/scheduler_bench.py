@@ -0,0 +1,157 @@
+"""
+Scheduler test on a virtual clock
+
+Drives tens of thousands of one-off and recurring timers through hours of
+virtual time: random delays, named timers replacing each other, a share
+cancelled, and a restart half way (the scheduler is closed and a new one loads
+the timers file). Checks that every timer fires exactly as often as it should,
+never early and never more than one clock step late, and that the restart
+keeps exactly the live timers. Exits with 1 on any mismatch.
+
+    python scheduler_bench.py                       # 50,000 timers over 6 h
+    python scheduler_bench.py --timers 200000 --hours 24 --step 5
+"""
+
+import argparse
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from scheduler import Scheduler
+
+# Commands the timers "run" - only recorded here
+COMMANDS = ('PLAYBACK_PAUSE', 'PC_SLEEP', 'DISPLAY_OFF', 'VOLUME_DOWN')
+
+
+class VirtualClock:
+    def __init__(self, start=1_000_000.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scheduler test on a virtual clock')
+    parser.add_argument('--timers', type=int, default=50000, help='Timers scheduled (default: 50000)')
+    parser.add_argument('--hours', type=float, default=6.0, help='Virtual time covered (default: 6)')
+    parser.add_argument('--step', type=float, default=1.0, help='Virtual seconds per tick (default: 1)')
+    parser.add_argument('--recurring', type=float, default=0.1, help='Share of recurring timers (default: 0.1)')
+    parser.add_argument('--cancel', type=float, default=0.2, help='Share cancelled (default: 0.2)')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    clock = VirtualClock()
+    start = clock.now
+    end = start + args.hours * 3600
+    fired = {}  # timer id -> [virtual fire times]
+    late = []  # (id, seconds late) beyond one step, or early
+
+    def fire(timer, command, param):
+        runs = fired.setdefault(timer.id, [])
+        if not runs or runs[-1] != clock.now:  # Once per run, not per command
+            runs.append(clock.now)
+
+    directory = tempfile.mkdtemp(prefix='scheduler-bench-')
+    path = os.path.join(directory, 'timers.jsonl')
+    scheduler = Scheduler(fire, path=path, clock=clock)
+    scheduler.load()
+
+    # Schedule - spread over the first half, named timers replace each other
+    expected = {}  # id -> (first due, interval)
+    named = {}  # name -> id of its live timer
+    perf = time.perf_counter()
+    for index in range(args.timers):
+        delay = rng.uniform(1, args.hours * 3600 * 1.1)
+        interval = rng.uniform(60, 3600) if rng.random() < args.recurring else None
+        name = f"named{rng.randrange(args.timers // 50 or 1)}" if rng.random() < 0.05 else None
+        commands = [(rng.choice(COMMANDS), None)]
+        if rng.random() < 0.3:
+            commands.append((COMMANDS[0], None))
+        timer = scheduler.schedule(delay, commands, interval, name)
+        if name in named:
+            expected.pop(named[name], None)
+        if name:
+            named[name] = timer.id
+        expected[timer.id] = (timer.due, interval)
+    schedule_us = (time.perf_counter() - perf) / args.timers * 1e6
+
+    perf = time.perf_counter()
+    cancel_ids = rng.sample(sorted(expected), int(len(expected) * args.cancel))
+    for timer_id in cancel_ids:
+        scheduler.cancel(str(timer_id))
+        del expected[timer_id]
+    cancel_us = (time.perf_counter() - perf) / max(len(cancel_ids), 1) * 1e6
+
+    # Run the clock, restarting half way
+    ticks = 0
+    perf = time.perf_counter()
+    restarted = False
+    restart_ok = True
+    while clock.now < end:
+        clock.now = min(clock.now + args.step, end)
+        scheduler.run_due()
+        ticks += 1
+        if not restarted and clock.now >= start + (end - start) / 2:
+            restarted = True
+            before = {timer.id: timer.due for timer in scheduler.timers()}
+            scheduler.close()
+            scheduler = Scheduler(fire, path=path, clock=clock)
+            scheduler.load()
+            after = {timer.id: timer.due for timer in scheduler.timers()}
+            restart_ok = before.keys() == after.keys() and all(abs(before[key] - after[key]) < 1e-6 for key in before)
+    run_seconds = time.perf_counter() - perf
+    with open(path) as f:
+        file_lines = sum(1 for _ in f)
+    file_bytes = os.path.getsize(path)
+    scheduler.close()
+    shutil.rmtree(directory)
+
+    # Compare with what should have fired
+    mismatched = 0
+    total_fires = 0
+    for timer_id, (due, interval) in expected.items():
+        if due > end:
+            runs = []
+        elif interval is None:
+            runs = [due]
+        else:
+            runs = [due + k * interval for k in range(int(math.floor((end - due) / interval)) + 1)]
+        got = fired.get(timer_id, [])
+        total_fires += len(got)
+        if len(got) != len(runs):
+            mismatched += 1
+            continue
+        for when, should in zip(got, runs):
+            if when < should or when - should > args.step + 1e-6:
+                late.append((timer_id, when - should))
+    stray = set(fired) - set(expected)
+
+    print(f"Timers    {args.timers} scheduled ({schedule_us:.1f} us each), {len(cancel_ids)} cancelled "
+          f"({cancel_us:.1f} us each), {len(expected)} live")
+    print(f"Clock     {args.hours:g} h virtual in {ticks} ticks, {run_seconds:.2f} s real "
+          f"({run_seconds / ticks * 1e6:.1f} us per tick), {total_fires} fires")
+    print(f"File      {file_lines} lines after the run ({file_bytes} bytes)")
+    failed = False
+    if mismatched:
+        print(f"FAIL: {mismatched} timers fired the wrong number of times")
+        failed = True
+    if late:
+        print(f"FAIL: {len(late)} fires early or more than a step late (first: {late[0]})")
+        failed = True
+    if stray:
+        print(f"FAIL: {len(stray)} cancelled or replaced timers fired")
+        failed = True
+    if not restart_ok:
+        print("FAIL: the restart didn't restore the live timers")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Search and content URLs for the streaming sites the controller knows about
+
+Each provider has a home page, a search URL template and named pages (trending,
+watchlist, ...). Queries are percent-encoded properly, so '&', '#', '+' and
+non-ASCII text survive, and recently built search URLs are kept in a small LRU
+because voice assistants send the same popular queries over and over.
+"""
+
+from collections import namedtuple
+from functools import lru_cache
+from urllib.parse import quote, quote_plus
+
+# search: template with a {query} placeholder; plus_spaces: encode spaces as '+'
+SearchProvider = namedtuple('SearchProvider', 'home search plus_spaces pages')
+
+SEARCH_PROVIDERS = {
+    'youtube': SearchProvider(
+        home='https://www.youtube.com',
+        search='https://www.youtube.com/results?search_query={query}',
+        plus_spaces=True,
+        pages={
+            'trending': 'https://www.youtube.com/feed/trending',
+            'subscriptions': 'https://www.youtube.com/feed/subscriptions',
+            'history': 'https://www.youtube.com/feed/history',
+        }),
+    'hulu': SearchProvider(
+        home='https://www.hulu.com',
+        search='https://www.hulu.com/search?q={query}',
+        plus_spaces=False,
+        pages={
+            'watchlist': 'https://www.hulu.com/my-stuff',
+        }),
+    'netflix': SearchProvider(
+        home='https://www.netflix.com/browse',
+        search='https://www.netflix.com/search?q={query}',
+        plus_spaces=False,
+        pages={}),
+}
+
+# Number of recently built search URLs kept
+SEARCH_CACHE_SIZE = 128
+
+
+def normalize_query(query):
+    """Collapse runs of whitespace so equivalent voice queries share a cache entry"""
+    return ' '.join(query.split())
+
+
+@lru_cache(maxsize=SEARCH_CACHE_SIZE)
+def _build_search_url(provider, query):
+    entry = SEARCH_PROVIDERS[provider]
+    encoded = quote_plus(query, safe='') if entry.plus_spaces else quote(query, safe='')
+    return entry.search.format(query=encoded)
+
+
+def build_search_url(provider, query):
+    """Search URL for a query on a provider (KeyError for unknown providers)"""
+    if provider not in SEARCH_PROVIDERS:
+        raise KeyError(f"unknown search provider {provider}")
+    return _build_search_url(provider, normalize_query(query))
+
+
+def provider_url(provider, page=None):
+    """Home page of a provider, or one of its named pages"""
+    entry = SEARCH_PROVIDERS[provider]
+    return entry.home if page is None else entry.pages[page]
+
+
+def search_cache_info():
+    """Hit/miss statistics of the search URL cache"""
+    return _build_search_url.cache_info()
@@ -0,0 +1,108 @@
+"""
+Per-site keyboard profiles
+
+Every streaming site binds its own player shortcuts: YouTube seeks 10 seconds
+with J/L and toggles captions with C, Netflix and Hulu seek 10 seconds with
+the arrow keys and ignore most letters, Netflix skips intros with S. A
+SiteProfile maps each logical action the controller knows to the key
+sequence for one site, so a command does the same thing wherever it lands.
+
+The profile is chosen from the browser window title ("<video> - YouTube -
+Google Chrome", "Hulu | Home - Microsoft Edge"): the site is the last
+separator-delimited part of the title that is a known site name. The match is
+cached per (hwnd, title) so repeated commands on the same page skip it.
+
+An action's sequence is a tuple of steps: a chord (tuple of virtual-key codes
+pressed in order and released in reverse) or a float (seconds to wait). An
+action a site has no shortcut for is absent from its profile, and the command
+reports that instead of sending keys that do something else.
+"""
+
+import re
+from collections import namedtuple
+
+# Virtual-key codes used by the profiles (winuser.h)
+VK_TAB = 0x09
+VK_RETURN = 0x0D
+VK_SHIFT = 0x10
+VK_SPACE = 0x20
+VK_END = 0x23
+VK_HOME = 0x24
+VK_LEFT = 0x25
+VK_RIGHT = 0x27
+
+# Separators between the page title, the site name and the browser name
+TITLE_SEPARATORS = re.compile(r'\s+[-|\u2013\u2014]\s+')
+
+# sites: lowercase title parts that select the profile
+SiteProfile = namedtuple('SiteProfile', 'name sites actions')
+
+
+def _key(vk):
+    return ((vk,),)
+
+
+def _shift(vk):
+    return ((VK_SHIFT, vk),)
+
+
+# Tab to the on-screen skip button (Skip Ad / Skip Intro), then press it
+_TAB_TO_SKIP = ((VK_TAB,), 0.05, (VK_TAB,), 0.05, (VK_TAB,), 0.05, (VK_RETURN,))
+
+# Shortcuts of the HTML5 players most sites use - also the fallback for unknown sites
+GENERIC_ACTIONS = {
+    'play_pause': _key(VK_SPACE),
+    'restart': _key(VK_HOME),
+    'jump_to_end': _key(VK_END),
+    'seek_forward_small': _key(VK_RIGHT),
+    'seek_backward_small': _key(VK_LEFT),
+    'seek_forward_large': _key(ord('L')),
+    'seek_backward_large': _key(ord('J')),
+    'next_video': _shift(ord('N')),
+    'previous_video': _shift(ord('P')),
+    'theater': _key(ord('T')),
+    'mute': _key(ord('M')),
+    'captions': _key(ord('C')),
+    'captions_menu': _key(ord('O')),
+    'skip': _TAB_TO_SKIP,
+}
+
+SITE_PROFILES = (
+    SiteProfile('YouTube', ('youtube',), dict(GENERIC_ACTIONS, **{
+        'like': _shift(ord('L')),
+        'dislike': _shift(ord('D')),
+        'subscribe': _shift(ord('S')),
+    })),
+    # Netflix: arrows seek 10 s (no 5 s step), S skips intros and recaps
+    SiteProfile('Netflix', ('netflix',), {
+        'play_pause': _key(VK_SPACE),
+        'seek_forward_small': _key(VK_RIGHT),
+        'seek_backward_small': _key(VK_LEFT),
+        'seek_forward_large': _key(VK_RIGHT),
+        'seek_backward_large': _key(VK_LEFT),
+        'mute': _key(ord('M')),
+        'skip': _key(ord('S')),
+    }),
+    # Hulu: arrows seek 10 s, the skip button takes keyboard focus like a link
+    SiteProfile('Hulu', ('hulu',), {
+        'play_pause': _key(VK_SPACE),
+        'seek_forward_small': _key(VK_RIGHT),
+        'seek_backward_small': _key(VK_LEFT),
+        'seek_forward_large': _key(VK_RIGHT),
+        'seek_backward_large': _key(VK_LEFT),
+        'mute': _key(ord('M')),
+        'skip': _TAB_TO_SKIP,
+    }),
+)
+
+GENERIC_PROFILE = SiteProfile('generic', (), GENERIC_ACTIONS)
+_PROFILES_BY_SITE = {site: profile for profile in SITE_PROFILES for site in profile.sites}
+
+
+def match_profile(title):
+    """The SiteProfile for a window title (GENERIC_PROFILE if no site matches)"""
+    for part in reversed(TITLE_SEPARATORS.split(title.lower())):
+        profile = _PROFILES_BY_SITE.get(part.strip())
+        if profile is not None:
+            return profile
+    return GENERIC_PROFILE
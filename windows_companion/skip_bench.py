@@ -0,0 +1,97 @@
+"""
+Skip button detection check on the stored sample
+
+Loads skip_samples/intro.npy (a 320x180 frame with a "Skip Intro" button over
+video) and the generic template cropped from it, then moves the frame by 0 to
+3 pixels in each direction and looks for the button through ArrayCapture,
+once over the whole window and once in the last-match region. The template's
+file name carries where it was cut out (<image>-<x>-<y>.npy, as
+skip_detector.py --save-template names it), so every shift has a known
+answer.
+
+Prints score, position error and time per shift. Exits with 1 when a shift
+misses the button (scores below the detector's threshold) or finds it more
+than MAX_ERROR pixels away.
+
+    python skip_bench.py
+    python skip_bench.py --samples my_samples --site netflix --max-shift 7
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from skip_detector import ArrayCapture, SkipDetector, load_image
+
+# Pixels a found button may be away from where it is
+MAX_ERROR = 1
+
+
+def expected_positions(templates_dir, site):
+    """{template name: (x, y)} from the positions in the template file names"""
+    positions = {}
+    for name in sorted(os.listdir(os.path.join(templates_dir, site))):
+        stem, extension = os.path.splitext(name)
+        parts = stem.rsplit('-', 2)
+        if extension in ('.npy', '.png') and len(parts) == 3 and parts[1].isdigit() and parts[2].isdigit():
+            positions[f"{site}/{name}"] = (int(parts[1]), int(parts[2]))
+    return positions
+
+
+def main():
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description='Skip button detection check on stored samples')
+    parser.add_argument('--samples', default=os.path.join(here, 'skip_samples'),
+                        help='Directory with the frame and templates/ (default: skip_samples)')
+    parser.add_argument('--frame', default='intro.npy', help='Frame in the samples directory (default: intro.npy)')
+    parser.add_argument('--site', default='generic', help='Site whose templates are used (default: generic)')
+    parser.add_argument('--max-shift', type=int, default=3, help='Largest shift in pixels (default: 3)')
+    args = parser.parse_args()
+
+    templates_dir = os.path.join(args.samples, 'templates')
+    positions = expected_positions(templates_dir, args.site)
+    if not positions:
+        raise SystemExit(f"No <image>-<x>-<y> templates in {os.path.join(templates_dir, args.site)}")
+    frame = load_image(os.path.join(args.samples, args.frame))
+    rect = (0, 0, frame.shape[1], frame.shape[0])
+
+    print(f"{args.frame} {frame.shape[1]}x{frame.shape[0]}, {len(positions)} {args.site} template(s)")
+    print(f"{'shift':>7}  {'score':>5}  {'error':>5}  {'full':>8}  {'region':>8}  template")
+    failures = []
+    for dy in range(args.max_shift + 1):
+        for dx in range(args.max_shift + 1):
+            capture = ArrayCapture(np.roll(frame, (dy, dx), axis=(0, 1)))
+            detector = SkipDetector(capture, templates_dir)
+            detector.templates(args.site)  # Load outside the timing
+            timings = []
+            for _ in ('full', 'region'):
+                started = time.perf_counter()
+                match = detector.find(args.site, rect)
+                timings.append((time.perf_counter() - started) * 1000)
+                if match is None:
+                    break
+            label = f"{dx},{dy}"
+            if match is None:
+                print(f"{label:>7}  {'-':>5}  {'-':>5}  {timings[0]:>6.1f}ms  {'-':>8}  not found")
+                failures.append(f"shift {label}: not found")
+                continue
+            x, y = positions.get(match.template, (None, None))
+            if x is None:
+                failures.append(f"shift {label}: matched {match.template}, which has no position")
+                continue
+            error = max(abs(match.x - x - dx), abs(match.y - y - dy))
+            print(f"{label:>7}  {match.score:>5.2f}  {error:>5}  {timings[0]:>6.1f}ms  {timings[1]:>6.1f}ms  "
+                  f"{match.template}")
+            if error > MAX_ERROR:
+                failures.append(f"shift {label}: found {error} px away")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
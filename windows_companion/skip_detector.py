@@ -0,0 +1,322 @@
+"""
+Vision-based skip button detection
+
+The key route for SKIP_BUTTON_ACTION tabs to where "Skip Ad" / "Skip Intro"
+usually is, which lands on the wrong element whenever a page has a different
+number of focusable controls. With --skip-detection vision the companion
+instead captures the browser window, finds the button by template matching and
+clicks it:
+
+- Capture goes through a backend with grab(rect) -> RGB array, so benchmarks
+  and tests feed stored screenshots (ArrayCapture) instead of the screen
+  (GdiCapture). Only the window - or only the region the button was last seen
+  in - is grabbed.
+- Frames and templates are reduced to a downsampled edge map, which keeps the
+  button outline and text and drops most of the video behind it. A template
+  keeps one edge map per downsampling phase (its crop shifted by 0 to
+  DOWNSAMPLE - 1 pixels in each axis), so a button is found wherever it lands
+  relative to the frame's pixel blocks.
+- Matching is normalized cross-correlation computed with NumPy FFTs plus
+  integral images, for all templates of the site at once per frame.
+- Templates are loaded once per site from <templates>/<site>/*.npy|*.png.
+
+Requires numpy (and Pillow for .png files).
+
+    python skip_detector.py --capture frame.npy                  # grab the browser window
+    python skip_detector.py --save-template netflix frame.npy 1500 900 180 56
+    python skip_detector.py --benchmark samples/ --site netflix
+    python skip_detector.py --benchmark skip_samples --templates skip_samples/templates
+"""
+
+import os
+import time
+from collections import namedtuple
+
+try:
+    import numpy as np
+except ImportError:  # Vision mode unavailable - SKIP_BUTTON_ACTION keeps using keys
+    np = None
+
+# Frames and templates are shrunk by this factor before matching
+DOWNSAMPLE = 2
+# Lowest normalized correlation accepted as the button
+MATCH_THRESHOLD = 0.6
+# Template sizes of margin around the last match searched before the whole window
+REGION_MARGIN = 1.0
+# Cached template FFTs (one per template and search shape)
+FFT_CACHE_SIZE = 64
+# Template directory by default - next to this script, not in whatever directory it was started from
+DEFAULT_TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'skip_templates')
+
+
+class SkipMatch(namedtuple('SkipMatch', 'x y width height score template')):
+    """A found button, position in window pixels (full resolution)"""
+    __slots__ = ()
+
+    @property
+    def center(self):
+        return self.x + self.width // 2, self.y + self.height // 2
+
+
+def edge_map(frame):
+    """Downsampled gradient magnitude of an RGB (or gray) uint8 frame, as float32"""
+    if frame.ndim == 3:
+        gray = frame[..., :3] @ np.array([0.299, 0.587, 0.114], np.float32)
+    else:
+        gray = frame.astype(np.float32)
+    height = gray.shape[0] // DOWNSAMPLE * DOWNSAMPLE
+    width = gray.shape[1] // DOWNSAMPLE * DOWNSAMPLE
+    small = gray[:height, :width].reshape(height // DOWNSAMPLE, DOWNSAMPLE,
+                                          width // DOWNSAMPLE, DOWNSAMPLE).mean(axis=(1, 3))
+    edges = np.zeros(small.shape, np.float32)
+    edges[:, 1:] = np.abs(np.diff(small, axis=1))
+    edges[1:, :] += np.abs(np.diff(small, axis=0))
+    return edges
+
+
+def _window_sums(values, height, width):
+    """Sum of every height x width window (valid positions) through an integral image"""
+    integral = np.zeros((values.shape[0] + 1, values.shape[1] + 1), np.float64)
+    np.cumsum(np.cumsum(values, axis=0), axis=1, out=integral[1:, 1:])
+    return (integral[height:, width:] - integral[:-height, width:]
+            - integral[height:, :-width] + integral[:-height, :-width])
+
+
+class TemplatePhase(namedtuple('TemplatePhase', 'dy dx centered norm')):
+    """Zero-mean edge map of a template cropped by (dy, dx) pixels"""
+    __slots__ = ()
+
+
+class Template:
+    """A preprocessed skip button image"""
+
+    def __init__(self, name, image):
+        self.name = name
+        self.height, self.width = image.shape[:2]  # Full resolution
+        # A button at frame pixel x lines up with the frame's blocks once its
+        # first (-x % DOWNSAMPLE) columns are dropped, so keep every phase
+        self.phases = []
+        for dy in range(DOWNSAMPLE):
+            for dx in range(DOWNSAMPLE):
+                edges = edge_map(image[dy:, dx:])
+                if edges.size:
+                    centered = edges - edges.mean()
+                    self.phases.append(TemplatePhase(dy, dx, centered, float(np.sqrt((centered ** 2).sum()))))
+
+
+class ArrayCapture:
+    """Capture backend over a stored screenshot of the window at origin (left, top)"""
+
+    def __init__(self, frame, origin=(0, 0)):
+        self.frame = frame
+        self.origin = origin
+
+    def grab(self, rect):
+        left, top, right, bottom = rect
+        x, y = left - self.origin[0], top - self.origin[1]
+        return self.frame[max(y, 0):bottom - self.origin[1], max(x, 0):right - self.origin[0], :3]
+
+
+class GdiCapture:
+    """Capture backend copying a screen rectangle with GDI (pywin32)"""
+
+    def __init__(self):
+        import win32con
+        import win32gui
+        import win32ui
+        self._win32con = win32con
+        self._win32gui = win32gui
+        self._win32ui = win32ui
+
+    def grab(self, rect):
+        win32gui, win32ui = self._win32gui, self._win32ui
+        left, top, right, bottom = rect
+        width, height = right - left, bottom - top
+        screen_dc = win32gui.GetWindowDC(0)
+        source = win32ui.CreateDCFromHandle(screen_dc)
+        memory = source.CreateCompatibleDC()
+        bitmap = win32ui.CreateBitmap()
+        try:
+            bitmap.CreateCompatibleBitmap(source, width, height)
+            memory.SelectObject(bitmap)
+            memory.BitBlt((0, 0), (width, height), source, (left, top), self._win32con.SRCCOPY)
+            bgra = np.frombuffer(bitmap.GetBitmapBits(True), np.uint8).reshape(height, width, 4)
+            return bgra[..., 2::-1]
+        finally:
+            win32gui.DeleteObject(bitmap.GetHandle())
+            memory.DeleteDC()
+            source.DeleteDC()
+            win32gui.ReleaseDC(0, screen_dc)
+
+
+def load_image(path):
+    """RGB uint8 array from a .npy or (with Pillow) image file"""
+    if path.endswith('.npy'):
+        return np.load(path)
+    from PIL import Image
+    with Image.open(path) as image:
+        return np.asarray(image.convert('RGB'))
+
+
+def save_image(path, image):
+    if path.endswith('.npy'):
+        np.save(path, image)
+    else:
+        from PIL import Image
+        Image.fromarray(image).save(path)
+
+
+class SkipDetector:
+    """Finds a site's skip button in the browser window"""
+
+    def __init__(self, capture, templates_dir=DEFAULT_TEMPLATES_DIR, threshold=MATCH_THRESHOLD):
+        if np is None:
+            raise RuntimeError("vision skip detection needs numpy")
+        self.capture = capture
+        self.templates_dir = templates_dir
+        self.threshold = threshold
+        self.last_regions = {}  # site -> (x, y, width, height) of the last match, window pixels
+        self._templates = {}  # site -> [Template]
+        self._ffts = {}  # (template name, phase, shape) -> conjugated template FFT
+
+    def templates(self, site):
+        """Templates of a site, loaded and preprocessed on first use"""
+        templates = self._templates.get(site)
+        if templates is None:
+            templates = []
+            directory = os.path.join(self.templates_dir, site)
+            if os.path.isdir(directory):
+                for name in sorted(os.listdir(directory)):
+                    if name.endswith(('.npy', '.png')):
+                        templates.append(Template(f"{site}/{name}", load_image(os.path.join(directory, name))))
+            self._templates[site] = templates
+        return templates
+
+    def _template_fft(self, template, phase, shape):
+        key = (template.name, phase.dy, phase.dx, shape)
+        spectrum = self._ffts.get(key)
+        if spectrum is None:
+            if len(self._ffts) >= FFT_CACHE_SIZE:
+                self._ffts.clear()
+            spectrum = self._ffts[key] = np.conj(np.fft.rfft2(phase.centered, s=shape))
+        return spectrum
+
+    def match(self, frame, templates):
+        """Best (score, template, x, y) over the templates in a frame, x/y in frame pixels"""
+        edges = edge_map(frame)
+        shape = edges.shape
+        spectrum = np.fft.rfft2(edges)
+        best = None
+        windows = {}  # (height, width) -> (variance, standard deviation), shared by same-sized phases
+        for template in templates:
+            for phase in template.phases:
+                height, width = phase.centered.shape
+                if height > shape[0] or width > shape[1] or phase.norm == 0:
+                    continue
+                # Correlation with the zero-mean template; valid positions only (no wrap-around)
+                correlation = np.fft.irfft2(spectrum * self._template_fft(template, phase, shape), s=shape)
+                correlation = correlation[:shape[0] - height + 1, :shape[1] - width + 1]
+                stats = windows.get((height, width))
+                if stats is None:
+                    sums = _window_sums(edges, height, width)
+                    variance = _window_sums(edges * edges, height, width) - sums * sums / (height * width)
+                    stats = windows[(height, width)] = (variance, np.sqrt(np.maximum(variance, 1e-6)))
+                variance, deviation = stats
+                scores = correlation / (deviation * phase.norm)
+                scores[variance < 1e-3] = 0  # Flat areas
+                index = int(np.argmax(scores))
+                y, x = divmod(index, scores.shape[1])
+                score = float(scores[y, x])
+                if best is None or score > best[0]:
+                    best = (score, template, max(x * DOWNSAMPLE - phase.dx, 0), max(y * DOWNSAMPLE - phase.dy, 0))
+        return best
+
+    def _search(self, rect, region, templates):
+        left, top = rect[0] + region[0], rect[1] + region[1]
+        frame = self.capture.grab((left, top, left + region[2], top + region[3]))
+        if frame is None or frame.size == 0:
+            return None
+        found = self.match(frame, templates)
+        if found is None or found[0] < self.threshold:
+            return None
+        score, template, x, y = found
+        return SkipMatch(region[0] + x, region[1] + y, template.width, template.height, score, template.name)
+
+    def find(self, site, rect):
+        """SkipMatch for site's button in the window at rect (screen left, top, right, bottom), or None"""
+        templates = self.templates(site)
+        if not templates:
+            return None
+        width, height = rect[2] - rect[0], rect[3] - rect[1]
+        match = None
+        last = self.last_regions.get(site)
+        if last is not None:
+            margin_x = int(last[2] * REGION_MARGIN)
+            margin_y = int(last[3] * REGION_MARGIN)
+            x, y = max(last[0] - margin_x, 0), max(last[1] - margin_y, 0)
+            region = (x, y, min(last[2] + 2 * margin_x, width - x), min(last[3] + 2 * margin_y, height - y))
+            match = self._search(rect, region, templates)
+        if match is None:
+            match = self._search(rect, (0, 0, width, height), templates)
+        if match is not None:
+            self.last_regions[site] = (match.x, match.y, match.width, match.height)
+        return match
+
+
+def benchmark(samples_dir, site, templates_dir, repeat):
+    """Detection time per frame over stored screenshots, full-frame and last-region search"""
+    samples = sorted(name for name in os.listdir(samples_dir) if name.endswith(('.npy', '.png')))
+    for name in samples:
+        frame = load_image(os.path.join(samples_dir, name))
+        capture = ArrayCapture(frame)
+        detector = SkipDetector(capture, templates_dir)
+        rect = (0, 0, frame.shape[1], frame.shape[0])
+        detector.find(site, rect)  # Load templates
+        timings = {}
+        for mode in ('full', 'region'):
+            started = time.perf_counter()
+            for _ in range(repeat):
+                if mode == 'full':
+                    detector.last_regions.clear()
+                match = detector.find(site, rect)
+            timings[mode] = (time.perf_counter() - started) / repeat * 1000
+        found = f"at {match.center} score {match.score:.2f} ({match.template})" if match else "not found"
+        print(f"{name:<32} {frame.shape[1]}x{frame.shape[0]}  full {timings['full']:7.1f} ms  "
+              f"region {timings['region']:6.1f} ms  {found}")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Skip button detection tools')
+    parser.add_argument('--templates', default=DEFAULT_TEMPLATES_DIR,
+                        help='Template directory (default: skip_templates next to this script)')
+    parser.add_argument('--capture', metavar='OUT', help='Save the foremost browser window (.npy or .png)')
+    parser.add_argument('--save-template', nargs=6, metavar=('SITE', 'IMAGE', 'X', 'Y', 'WIDTH', 'HEIGHT'),
+                        help='Crop a button out of a screenshot into the site\'s templates')
+    parser.add_argument('--benchmark', metavar='SAMPLES', help='Time detection on stored screenshots')
+    parser.add_argument('--site', default='generic', help='Site whose templates are used (default: generic)')
+    parser.add_argument('--repeat', type=int, default=20, help='Detections per sample and mode (default: 20)')
+    args = parser.parse_args()
+
+    if args.capture:
+        import pc_controller
+        controller = pc_controller.PCController()
+        windows = controller.find_browser_windows()
+        if not windows:
+            raise SystemExit("No browser window found")
+        rect = pc_controller.win32gui.GetWindowRect(windows[0][0])
+        save_image(args.capture, GdiCapture().grab(rect))
+        print(f"Saved {windows[0][1]} ({rect[2] - rect[0]}x{rect[3] - rect[1]}) to {args.capture}")
+    elif args.save_template:
+        site, image_path, x, y, width, height = args.save_template
+        x, y, width, height = int(x), int(y), int(width), int(height)
+        directory = os.path.join(args.templates, site)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{os.path.splitext(os.path.basename(image_path))[0]}-{x}-{y}.npy")
+        np.save(path, load_image(image_path)[y:y + height, x:x + width])
+        print(f"Saved template {path}")
+    elif args.benchmark:
+        benchmark(args.benchmark, args.site, args.templates, args.repeat)
+    else:
+        parser.print_help()
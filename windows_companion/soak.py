@@ -0,0 +1,185 @@
+"""
+Soak test for the command dispatch path
+
+Drives synthetic commands through CommandExecutor and PCController in-process
+on the fake backend (no serial port, input is recorded, not delivered) and
+watches memory: RSS plus tracemalloc snapshots. After a warm-up period the
+steady state must stay flat - the run fails (exit code 1) when traced memory
+or live allocated blocks grow by more than the allowed budget.
+
+    python soak.py                          # 1,000,000 commands
+    python soak.py --commands 5000000 --interval 500000 --no-tracemalloc
+"""
+
+import argparse
+import contextlib
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+os.environ['PC_CONTROLLER_FAKE_BACKEND'] = '1'  # Never drive the real desktop
+
+import pc_controller  # noqa: E402 - needs the environment above
+
+# Commands that need no real sleeps with background key delivery on the fake desktop
+SOAK_COMMANDS = [
+    ('PLAYBACK_PLAY_PAUSE', None),
+    ('NAV_SCROLL_DOWN', None),
+    ('CAPTIONS_TOGGLE_ON', None),
+    ('VOLUME_UP', None),
+    ('BROWSER_FOCUS', None),
+    ('BROWSER_MOVE_TV', None),
+    ('PLAYBACK_SEEK_FORWARD_SMALL', None),
+    ('FULLSCREEN_TOGGLE', None),
+    ('SEARCH_YOUTUBE', 'soak test'),
+]
+
+# Allowed steady-state growth after warm-up
+MAX_TRACED_GROWTH = 64 * 1024  # bytes
+MAX_BLOCKS_PER_COMMAND = 0.001  # live blocks retained per command
+# Most memory a single command may have allocated at once while it runs
+MAX_TRANSIENT_BYTES = 4 * 1024
+
+
+class _NullWriter:
+    """stdout replacement - the handlers print a line per command"""
+
+    def write(self, text):
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def current_rss():
+    """Resident set size in bytes (None if it can't be read)"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except Exception:
+        return None
+
+
+def build_executor():
+    controller = pc_controller.PCController()
+    controller.key_delivery = 'background'  # Posted keys - no focus sleeps
+    controller.launcher.open_url = lambda url, reuse_tab=True: 'devtools'  # Don't spawn browsers
+    responses = []
+
+    def send_line(text):
+        responses.append(text)
+        if len(responses) > 1000:
+            responses.clear()
+
+    commands = {name: getattr(controller, method) for name, method in (
+        ('PLAYBACK_PLAY_PAUSE', 'playback_play_pause'),
+        ('NAV_SCROLL_DOWN', 'nav_scroll_down'),
+        ('CAPTIONS_TOGGLE_ON', 'captions_toggle_on'),
+        ('VOLUME_UP', 'volume_up'),
+        ('BROWSER_FOCUS', 'browser_focus'),
+        ('BROWSER_MOVE_TV', 'browser_move_tv'),
+        ('PLAYBACK_SEEK_FORWARD_SMALL', 'playback_seek_forward_small'),
+        ('FULLSCREEN_TOGGLE', 'fullscreen_toggle'),
+    )}
+    param_commands = {'SEARCH_YOUTUBE': controller.search_youtube}
+    return pc_controller.CommandExecutor(controller, commands, param_commands, send_line,
+                                         timeout=None, max_age=None)
+
+
+def run(executor, count):
+    """Submit and execute count commands synchronously on this thread"""
+    mix = SOAK_COMMANDS
+    size = len(mix)
+    submit = executor.submit
+    execute = executor.execute
+    get = executor._queue.get_nowait
+    for index in range(count):
+        command, param = mix[index % size]
+        submit(command, param)
+        execute(get())
+
+
+def transient_allocations(executor, repeat=50):
+    """Peak bytes allocated while running each command once (tracemalloc must be on)"""
+    result = {}
+    with contextlib.redirect_stdout(_NullWriter()):
+        for command, param in SOAK_COMMANDS:
+            worst = 0
+            for _ in range(repeat):
+                before = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+                executor.submit(command, param)
+                executor.execute(executor._queue.get_nowait())
+                worst = max(worst, tracemalloc.get_traced_memory()[1] - before)
+            result[command] = worst
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Dispatch path soak test (fake backend)')
+    parser.add_argument('--commands', type=int, default=1000000, help='Commands to run (default: 1000000)')
+    parser.add_argument('--interval', type=int, default=100000, help='Commands between reports (default: 100000)')
+    parser.add_argument('--warmup', type=int, default=20000, help='Commands before the baseline (default: 20000)')
+    parser.add_argument('--no-tracemalloc', action='store_true', help='Only track RSS (much faster)')
+    args = parser.parse_args()
+
+    executor = build_executor()
+    trace = not args.no_tracemalloc
+    if trace:
+        tracemalloc.start()
+
+    with contextlib.redirect_stdout(_NullWriter()):
+        run(executor, args.warmup)
+    gc.collect()
+    baseline_traced = tracemalloc.get_traced_memory()[0] if trace else 0
+    baseline_snapshot = tracemalloc.take_snapshot() if trace else None
+    baseline_blocks = sys.getallocatedblocks()
+    baseline_rss = current_rss()
+    print(f"Warm-up: {args.warmup} commands, RSS {baseline_rss or 0:,} bytes")
+
+    done = 0
+    started = time.perf_counter()
+    while done < args.commands:
+        step = min(args.interval, args.commands - done)
+        with contextlib.redirect_stdout(_NullWriter()):
+            run(executor, step)
+        done += step
+        gc.collect()
+        elapsed = time.perf_counter() - started
+        traced = tracemalloc.get_traced_memory()[0] - baseline_traced if trace else 0
+        blocks = sys.getallocatedblocks() - baseline_blocks
+        rss = current_rss()
+        print(f"{done:>10,} commands  {done / elapsed:8.0f}/s  "
+              f"RSS {rss or 0:>12,}  traced {traced:+10,} B  blocks {blocks:+8,}")
+
+    failed = False
+    blocks_per_command = (sys.getallocatedblocks() - baseline_blocks) / max(done, 1)
+    if blocks_per_command > MAX_BLOCKS_PER_COMMAND:
+        print(f"FAIL: {blocks_per_command:.4f} live blocks retained per command")
+        failed = True
+    if trace:
+        growth = tracemalloc.get_traced_memory()[0] - baseline_traced
+        if growth > MAX_TRACED_GROWTH:
+            print(f"FAIL: traced memory grew by {growth:,} bytes")
+            failed = True
+        print("\nPeak transient allocation per command:")
+        for command, peak in transient_allocations(executor).items():
+            flag = '' if peak <= MAX_TRANSIENT_BYTES else '  (over budget)'
+            failed = failed or bool(flag)
+            print(f"  {command:<28} {peak:>7,} B{flag}")
+        print("\nTop growth since warm-up:")
+        for stat in tracemalloc.take_snapshot().compare_to(baseline_snapshot, 'lineno')[:10]:
+            print(f"  {stat}")
+    print(f"\nMetrics: {executor.metrics_line()}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""
+Command trace summary
+
+Reads the span file written by pc_controller.py --trace (see tracing.py) and
+shows where the latency of commands goes: per stage of the critical path from
+Home Assistant to the response, the time to the first injected key, the steps
+inside the handler (self time - a focus step's settle sleep counts as sleep,
+not focus) and the slowest traces with their breakdown.
+
+    python trace_view.py trace.json
+    python trace_view.py trace.json --command PLAYBACK_PLAY_PAUSE --slowest 10
+"""
+
+import argparse
+import json
+import sys
+
+from tracing import STAGES
+
+
+def read_events(path):
+    """Complete events of the span file, one JSON object per line (a torn last line is skipped)"""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip().rstrip(',')
+            if not line.startswith('{'):
+                continue  # The array's brackets
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            if event.get('ph') == 'X':
+                yield event
+
+
+class TraceSummary:
+    """Stage and step times of one command"""
+
+    __slots__ = ('id', 'command', 'start', 'end', 'stages', 'steps', 'first_key', '_spans')
+
+    def __init__(self, trace_id, command):
+        self.id = trace_id
+        self.command = command
+        self.start = None
+        self.end = None
+        self.stages = {}  # Stage -> ms
+        self.steps = {}  # Step -> self time ms
+        self.first_key = None  # ms from the start to the first key step
+        self._spans = []
+
+    def add(self, event):
+        start, dur = event['ts'] / 1000.0, event['dur'] / 1000.0
+        if event.get('cat') == 'stage':
+            self.stages[event['name']] = self.stages.get(event['name'], 0.0) + dur
+            self.start = start if self.start is None else min(self.start, start)
+            self.end = start + dur if self.end is None else max(self.end, start + dur)
+        else:
+            self._spans.append((start, dur, event['name']))
+
+    def finish(self):
+        """Self time per step from how the step spans nest"""
+        stack = []  # [end, name, children ms, ms]
+        for start, dur, name in sorted(self._spans, key=lambda span: (span[0], -span[1])):
+            while stack and start >= stack[-1][0]:
+                self._close(stack.pop(), stack)
+            stack.append([start + dur, name, 0.0, dur])
+            if name == 'keys' and self.start is not None:
+                offset = start - self.start
+                self.first_key = offset if self.first_key is None else min(self.first_key, offset)
+        while stack:
+            self._close(stack.pop(), stack)
+        self._spans = None
+
+    def _close(self, span, stack):
+        _, name, children, dur = span
+        self.steps[name] = self.steps.get(name, 0.0) + max(dur - children, 0.0)
+        if stack:
+            stack[-1][2] += dur
+
+    @property
+    def total(self):
+        return (self.end - self.start) if self.start is not None else 0.0
+
+
+def load_traces(path, command=None):
+    traces = {}
+    for event in read_events(path):
+        args = event.get('args', {})
+        if command is not None and args.get('command') != command:
+            continue
+        key = args.get('trace'), event.get('tid')
+        trace = traces.get(key)
+        if trace is None:
+            trace = traces[key] = TraceSummary(args.get('trace'), args.get('command'))
+        trace.add(event)
+    for trace in traces.values():
+        trace.finish()
+    return [trace for trace in traces.values() if trace.stages]
+
+
+def _pick(samples, q):
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def _row(label, samples, whole=None):
+    """Statistics line; share is the samples' part of whole (summed ms)"""
+    samples = sorted(samples)
+    mean = sum(samples) / len(samples)
+    share = f"{sum(samples) / whole * 100:6.1f}%" if whole else ''
+    return (f"  {label:<14}{len(samples):>7}{mean:>9.1f}{_pick(samples, 0.5):>9.1f}"
+            f"{_pick(samples, 0.95):>9.1f}{samples[-1]:>9.1f}  {share}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarize command traces by stage')
+    parser.add_argument('path', help='Span file written by pc_controller.py --trace')
+    parser.add_argument('--command', default=None, help='Only traces of this command')
+    parser.add_argument('--slowest', type=int, default=5, help='Slowest traces listed (default: 5)')
+    args = parser.parse_args()
+
+    try:
+        traces = load_traces(args.path, args.command)
+    except OSError as e:
+        print(f"Couldn't read {args.path}: {e}")
+        sys.exit(1)
+    if not traces:
+        print("No traces")
+        return
+    commands = {}
+    for trace in traces:
+        commands[trace.command] = commands.get(trace.command, 0) + 1
+    top = sorted(commands.items(), key=lambda item: -item[1])[:5]
+    print(f"{len(traces)} traces: " + ', '.join(f"{name} {count}" for name, count in top)
+          + (', ...' if len(commands) > len(top) else ''))
+
+    header = f"  {'':<14}{'count':>7}{'mean':>9}{'p50':>9}{'p95':>9}{'max':>9}  share   (ms)"
+    whole = sum(trace.total for trace in traces)
+    print("\nCritical path (share of all end-to-end time)")
+    print(header)
+    for stage in STAGES:
+        samples = [trace.stages[stage] for trace in traces if stage in trace.stages]
+        if samples:
+            print(_row(stage, samples, whole))
+    print(_row('end to end', [trace.total for trace in traces]))
+    first_keys = [trace.first_key for trace in traces if trace.first_key is not None]
+    if first_keys:
+        print(_row('to first key', first_keys))
+
+    steps = sorted({name for trace in traces for name in trace.steps})
+    if steps:
+        executed = sum(trace.stages.get('execute', 0.0) for trace in traces)
+        print("\nInside execute (self time, share of all execute time)")
+        print(header)
+        for name in steps:
+            print(_row(name, [trace.steps[name] for trace in traces if name in trace.steps], executed))
+
+    if args.slowest > 0:
+        print(f"\nSlowest {min(args.slowest, len(traces))}")
+        for trace in sorted(traces, key=lambda trace: -trace.total)[:args.slowest]:
+            parts = ' '.join(f"{stage} {trace.stages[stage]:.1f}" for stage in STAGES if stage in trace.stages)
+            steps = ' '.join(f"{name} {ms:.1f}" for name, ms in sorted(trace.steps.items(), key=lambda s: -s[1])[:3])
+            print(f"  {trace.total:8.1f} ms  {trace.command} {trace.id}: {parts}" + (f" ({steps})" if steps else ''))
+
+
+if __name__ == '__main__':
+    main()
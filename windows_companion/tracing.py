@@ -0,0 +1,235 @@
+"""
+End-to-end command tracing
+
+When a button feels laggy the time can go to Home Assistant, the ESP32's web
+server, the serial line, the companion's event loop and queue, or the handler
+itself (window lookups, focus settling, key injection). A trace follows one
+command through all of them:
+
+- Home Assistant puts a trace id and its send time (epoch ms) on the command;
+  the ESP32 forwards both in the serial frame header next to its millis()
+  stamp: "@<millis>[/<ttl_ms>][#<trace_id>[,<sent_ms>]]|COMMAND[:param]".
+  Commands that arrive without an id get one here.
+- The companion records a span per stage on one timeline:
+
+      ha       HA send -> ESP32 frame        (both clocks mapped, see below)
+      serial   ESP32 frame -> line read by the companion
+      loop     line read -> handled on the event loop thread
+      queue    submitted -> picked up by the command worker
+      execute  handler, with nested steps: hold, lookup, monitors, focus, sleep, keys, cdp
+      reply    response line sent
+
+  Without an ESP32 timestamp (TCP clients) "ha" runs from the send time to the
+  read; without a send time it is left out.
+
+Clocks: spans are perf_counter() times shifted to the epoch, so the send time
+from Home Assistant (an NTP-synced wall clock) lands on the same axis. The
+ESP32's millis() is mapped with ClockSync: the link heartbeat (link_health.py)
+sends CLOCK_SYNC:<seq> every second, the firmware answers CLOCK:<seq>,<millis>
+at once, and the offset is taken from the midpoint of the round trip with the
+smallest error bound (half the round trip, plus drift since it was measured) -
+NTP's filter. Until the first answer (or with --heartbeat 0) the offset falls
+back to the least delayed frame seen (as OriginClock does).
+
+Spans are written by a background thread in the Chrome trace event format (a
+JSON array of complete "X" events; the closing bracket may be missing, which
+the format allows) - open the file in ui.perfetto.dev or chrome://tracing,
+one row per command, or summarize it with trace_view.py:
+
+    python pc_controller.py --port COM3 --trace trace.json
+    python trace_view.py trace.json
+"""
+
+import contextlib
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+# Round trips kept per link - the one with the smallest error bound is used
+SYNC_SAMPLES = 8
+# Crystal drift allowed for when ageing a round trip (100 ppm)
+MAX_DRIFT = 1e-4
+# Events written per batch before the writer thread flushes
+WRITE_BATCH = 256
+
+# Stages on the critical path, in order (see the module docstring)
+STAGES = ('ha', 'serial', 'loop', 'queue', 'execute', 'reply')
+
+
+def parse_trace_header(text):
+    """'<trace_id>[,<sent_ms>]' from the frame header -> (trace_id, sent_ms or None)"""
+    trace_id, _, sent = text.partition(',')
+    try:
+        sent_ms = int(sent) if sent else None
+    except ValueError:
+        sent_ms = None
+    return trace_id or None, sent_ms
+
+
+class ClockSync:
+    """ESP32 millis() -> perf_counter() offset of one serial link"""
+
+    __slots__ = ('_samples', '_last_millis', '_fallback', '_fallback_at')
+
+    def __init__(self):
+        self._samples = deque(maxlen=SYNC_SAMPLES)  # (round trip, offset, measured at)
+        self._last_millis = None
+        self._fallback = None  # Least delayed frame's offset (upper bound)
+        self._fallback_at = None
+
+    def sample(self, sent, read_at, millis):
+        """A probe sent at sent (perf_counter) was answered with millis, read at read_at"""
+        self._restart_check(millis)
+        self._samples.append((read_at - sent, (sent + read_at) / 2 - millis / 1000.0, read_at))
+
+    def observe(self, origin_ms, read_at):
+        """A command frame stamped origin_ms was read at read_at (fallback estimate)"""
+        self._restart_check(origin_ms)
+        offset = read_at - origin_ms / 1000.0
+        if self._fallback is None:
+            self._fallback = offset
+        else:
+            drift = (read_at - self._fallback_at) * MAX_DRIFT
+            self._fallback = min(offset, self._fallback + drift)
+        self._fallback_at = read_at
+
+    def _restart_check(self, millis):
+        if self._last_millis is not None and millis < self._last_millis:
+            # ESP32 rebooted or millis() wrapped - nothing measured so far holds
+            self._samples.clear()
+            self._fallback = None
+        self._last_millis = millis
+
+    def offset(self, now=None):
+        """(offset in seconds, error bound in seconds or None for the fallback)"""
+        if self._samples:
+            now = time.perf_counter() if now is None else now
+            rtt, offset, at = min(self._samples, key=lambda s: s[0] / 2 + (now - s[2]) * MAX_DRIFT)
+            return offset, rtt / 2 + (now - at) * MAX_DRIFT
+        return self._fallback, None
+
+    def describe(self):
+        offset, error = self.offset()
+        if error is None:
+            return "unsynced"
+        return f"error:{error * 1000:.1f}ms,samples:{len(self._samples)}"
+
+
+class Trace:
+    """One traced command; stage() closes a critical-path stage, span() times a step"""
+
+    __slots__ = ('tracer', 'id', 'lane', 'command', 'mark')
+
+    def __init__(self, tracer, trace_id, lane, command, mark):
+        self.tracer = tracer
+        self.id = trace_id
+        self.lane = lane  # Row in the trace viewer
+        self.command = command
+        self.mark = mark  # perf_counter() where the current stage began
+
+    def stage(self, name, **args):
+        """End the current stage now and start the next one"""
+        now = time.perf_counter()
+        self.tracer.emit(self, name, 'stage', self.mark, now,
+                         {key: value for key, value in args.items() if value is not None})
+        self.mark = now
+
+    @contextlib.contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.tracer.emit(self, name, 'step', start, time.perf_counter())
+
+
+class Tracer:
+    """Writes command spans to a Chrome trace event file on a background thread"""
+
+    def __init__(self, path):
+        self.path = path
+        self.epoch = time.time() - time.perf_counter()  # perf_counter() -> epoch seconds
+        self.clocks = {}  # Transport name -> ClockSync
+        self.traces = 0
+        self._lanes = itertools.count(1)
+        self._queue = queue.SimpleQueue()
+        self._pid = os.getpid()
+        # Spans from earlier runs are kept - a new run appends to the array
+        fresh = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, 'a', encoding='utf-8')
+        if fresh:
+            self._file.write('[\n')
+            self._write({'name': 'process_name', 'ph': 'M', 'pid': self._pid,
+                         'args': {'name': 'pc_controller'}})
+        self._thread = threading.Thread(target=self._run, name='tracer', daemon=True)
+        self._thread.start()
+
+    def clock(self, source):
+        sync = self.clocks.get(source)
+        if sync is None:
+            sync = self.clocks[source] = ClockSync()
+        return sync
+
+    def begin(self, header, command, origin_ms, source, read_at):
+        """Start the trace of a command handled now; emits its stages up to here.
+
+        header is the frame's '<trace_id>[,<sent_ms>]' (None: a new id, no send time)."""
+        trace_id, sent_ms = parse_trace_header(header) if header else (None, None)
+        trace = Trace(self, trace_id or os.urandom(8).hex(), next(self._lanes), command, read_at)
+        self.traces += 1
+        self._queue.put({'name': 'thread_name', 'ph': 'M', 'pid': self._pid, 'tid': trace.lane,
+                         'args': {'name': f"{command} {trace.id}"}})
+        sent = None if sent_ms is None else sent_ms / 1000.0 - self.epoch
+        if origin_ms is not None:
+            sync = self.clock(source)
+            sync.observe(origin_ms, read_at)
+            offset, error = sync.offset(read_at)
+            origin = min(origin_ms / 1000.0 + offset, read_at)
+            if sent is not None:
+                # Wall clocks a few ms apart can put the send after the frame
+                self.emit(trace, 'ha', 'stage', min(sent, origin), origin, {'skew': sent > origin})
+            self.emit(trace, 'serial', 'stage', origin, read_at,
+                      {'clock': 'fallback'} if error is None else {'clock_error_ms': round(error * 1000, 2)})
+        elif sent is not None:
+            self.emit(trace, 'ha', 'stage', min(sent, read_at), read_at, {})
+        trace.stage('loop')
+        return trace
+
+    def emit(self, trace, name, kind, start, end, args=None):
+        event = {'name': name, 'cat': kind, 'ph': 'X', 'ts': round((start + self.epoch) * 1e6),
+                 'dur': round((end - start) * 1e6), 'pid': self._pid, 'tid': trace.lane,
+                 'args': dict(args or (), trace=trace.id, command=trace.command)}
+        self._queue.put(event)
+
+    def _write(self, event):
+        self._file.write(json.dumps(event, separators=(',', ':')) + ',\n')
+
+    def _run(self):
+        while True:
+            event = self._queue.get()
+            if event is None:
+                break
+            self._write(event)
+            for _ in range(WRITE_BATCH):
+                try:
+                    event = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if event is None:
+                    self._file.flush()
+                    return
+                self._write(event)
+            self._file.flush()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join(2.0)
+        self._file.close()
+
+    def describe(self):
+        clocks = ','.join(f"{name}:{sync.describe()}" for name, sync in self.clocks.items())
+        return f"traces:{self.traces}" + (f",{clocks}" if clocks else '')
@@ -0,0 +1,304 @@
+"""
+Command transports
+
+One asyncio event loop multiplexes every command source into the same
+command pipeline, so a second ESP32, a Stream Deck script or a local tool can
+drive the single PCController without a second process fighting over focus:
+
+- Serial ports (any number) - read on a thread per port and handed to the loop
+- Localhost TCP             - newline-terminated lines, one transport per client
+- Unix socket (POSIX)       - same line protocol
+- Named pipe (Windows)      - same line protocol, \\\\.\\pipe\\<name>
+
+Every line is passed to on_line(transport, line, read_at) on the loop thread in
+arrival order, read_at being the perf_counter() time it was read (before the
+hop to the loop thread, for tracing and pointer latency). Responses go back to the transport the command came from
+(transport.send), unsolicited status lines go to all of them (broadcast).
+"""
+
+import asyncio
+import sys
+import threading
+import time
+
+import serial
+
+# Seconds between attempts to reopen a serial port that went away
+SERIAL_REOPEN_INTERVAL = 2.0
+
+
+class TransportMetrics:
+    __slots__ = ('lines_in', 'lines_out', 'bytes_in', 'bytes_out', 'errors')
+
+    def __init__(self):
+        self.lines_in = 0
+        self.lines_out = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.errors = 0
+
+    def describe(self):
+        return f"in:{self.lines_in},out:{self.lines_out},err:{self.errors}"
+
+
+class Transport:
+    """A connected command source; send() may be called from any thread"""
+
+    def __init__(self, name):
+        self.name = name
+        self.metrics = TransportMetrics()
+        self.connected = True
+
+    def send(self, text):
+        raise NotImplementedError
+
+    def close(self):
+        self.connected = False
+
+
+class SerialTransport(Transport):
+    """A serial port read on its own thread (pyserial has no asyncio support)"""
+
+    def __init__(self, port, baud):
+        super().__init__(f"serial:{port}")
+        self.port = port
+        self.baud = baud
+        self._serial = None
+        self._write_lock = threading.Lock()
+        self._thread = None
+
+    def open(self):
+        """Open the port (raises serial.SerialException)"""
+        self._serial = serial.Serial(self.port, self.baud, timeout=1)
+        time.sleep(2)  # Wait for serial connection to stabilize
+        self.connected = True
+
+    def start(self, deliver):
+        self._thread = threading.Thread(target=self._read_loop, args=(deliver,),
+                                        name=self.name, daemon=True)
+        self._thread.start()
+
+    def _read_loop(self, deliver):
+        partial = b''
+        while True:
+            try:
+                raw = self._serial.readline()  # Returns as soon as a line is complete
+            except (serial.SerialException, OSError, TypeError, AttributeError) as e:
+                if self.connected:  # Not closed on purpose by reconnect()
+                    self.metrics.errors += 1
+                    print(f"Serial error on {self.port}: {e} - reopening")
+                self.connected = False
+                self._reopen()
+                partial = b''
+                continue
+            if not raw:
+                continue
+            read_at = time.perf_counter()
+            self.metrics.bytes_in += len(raw)
+            if not raw.endswith(b'\n'):
+                partial += raw  # Read timed out mid-line
+                continue
+            line = (partial + raw).decode('utf-8', errors='ignore').strip()
+            partial = b''
+            if line:
+                deliver(self, line, read_at)
+
+    def _reopen(self):
+        while True:
+            try:
+                self._serial.close()
+            except Exception:
+                pass
+            time.sleep(SERIAL_REOPEN_INTERVAL)
+            try:
+                self.open()
+                print(f"Reconnected to {self.port}")
+                return
+            except (serial.SerialException, OSError):
+                pass
+
+    def reconnect(self):
+        """Close the port so the reader reopens it (the link stopped answering heartbeats)"""
+        self.connected = False
+        try:
+            self._serial.close()  # The blocked readline() fails and the reader reopens
+        except Exception:
+            pass
+
+    def send(self, text):
+        data = f"{text}\n".encode('utf-8')
+        try:
+            with self._write_lock:
+                self._serial.write(data)
+        except (serial.SerialException, OSError) as e:
+            self.metrics.errors += 1
+            print(f"Serial write to {self.port} failed: {e}")
+            return
+        self.metrics.lines_out += 1
+        self.metrics.bytes_out += len(data)
+
+    def close(self):
+        super().close()
+        if self._serial is not None:
+            self._serial.close()
+
+
+class StreamTransport(Transport):
+    """One client of a TCP / Unix socket / named pipe server"""
+
+    def __init__(self, name, loop, transport):
+        super().__init__(name)
+        self._loop = loop
+        self._transport = transport
+
+    def send(self, text):
+        if not self.connected:
+            return
+        data = f"{text}\n".encode('utf-8')
+        self.metrics.lines_out += 1
+        self.metrics.bytes_out += len(data)
+        self._loop.call_soon_threadsafe(self._write, data)
+
+    def _write(self, data):
+        if self.connected and not self._transport.is_closing():
+            self._transport.write(data)
+
+    def close(self):
+        super().close()
+        self._transport.close()
+
+
+class _LineProtocol(asyncio.Protocol):
+    """Splits a byte stream into lines for the hub"""
+
+    def __init__(self, hub, kind):
+        self.hub = hub
+        self.kind = kind
+        self.transport = None
+        self._buffer = b''
+
+    def connection_made(self, transport):
+        peer = transport.get_extra_info('peername')
+        if isinstance(peer, tuple):
+            peer = f"{peer[0]}:{peer[1]}"
+        name = f"{self.kind}:{peer or self.hub.next_client_id(self.kind)}"
+        self.transport = StreamTransport(name, self.hub.loop, transport)
+        self.hub.attach(self.transport)
+
+    def data_received(self, data):
+        read_at = time.perf_counter()
+        self.transport.metrics.bytes_in += len(data)
+        self._buffer += data
+        if len(self._buffer) > 65536 and b'\n' not in self._buffer:
+            self.transport.metrics.errors += 1
+            self._buffer = b''  # Garbage without line breaks - drop it
+            return
+        while b'\n' in self._buffer:
+            raw, self._buffer = self._buffer.split(b'\n', 1)
+            line = raw.decode('utf-8', errors='ignore').strip()
+            if line:
+                self.hub.deliver(self.transport, line, read_at)
+
+    def connection_lost(self, exc):
+        self.hub.detach(self.transport)
+
+
+class TransportHub:
+    """Runs the event loop and feeds lines from all transports to on_line"""
+
+    def __init__(self, on_line):
+        self.on_line = on_line
+        self.loop = None
+        self.transports = []
+        self.retired = {}  # Metrics of disconnected clients, summed per kind
+        self._serial = []
+        self._servers = []  # (name, start coroutine) run by run()
+        self._listening = []  # Started servers (kept referenced while the loop runs)
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    # Setup (before run)
+
+    def add_serial(self, port, baud):
+        """Open a serial port now (raises serial.SerialException); read once run() starts"""
+        transport = SerialTransport(port, baud)
+        transport.open()
+        self._serial.append(transport)
+        self.attach(transport)
+        return transport
+
+    def add_tcp(self, port, host='127.0.0.1'):
+        self._servers.append((f"tcp:{host}:{port}", lambda factory: self.loop.create_server(factory, host, port)))
+
+    def add_unix_socket(self, path):
+        self._servers.append((f"unix:{path}", lambda factory: self.loop.create_unix_server(factory, path)))
+
+    def add_named_pipe(self, name):
+        address = name if name.startswith('\\\\') else f"\\\\.\\pipe\\{name}"
+
+        async def serve(factory):
+            # Only the Windows proactor loop can serve named pipes
+            return await self.loop.start_serving_pipe(factory, address)
+        self._servers.append((f"pipe:{address}", serve))
+
+    # Transport bookkeeping
+
+    def attach(self, transport):
+        with self._lock:
+            self.transports.append(transport)
+
+    def detach(self, transport):
+        transport.connected = False
+        kind = transport.name.split(':', 1)[0]
+        with self._lock:
+            if transport in self.transports:
+                self.transports.remove(transport)
+            total = self.retired.setdefault(kind, TransportMetrics())
+            for field in TransportMetrics.__slots__:
+                setattr(total, field, getattr(total, field) + getattr(transport.metrics, field))
+
+    def next_client_id(self, kind):
+        """Sequence number for clients without a peer address (Unix sockets, pipes)"""
+        self._clients[kind] = self._clients.get(kind, 0) + 1
+        return self._clients[kind]
+
+    def deliver(self, transport, line, read_at=None):
+        """Hand a received line to on_line (on the loop thread)"""
+        transport.metrics.lines_in += 1
+        try:
+            self.on_line(transport, line, time.perf_counter() if read_at is None else read_at)
+        except Exception as e:
+            transport.metrics.errors += 1
+            print(f"Error handling line from {transport.name}: {e}")
+
+    def broadcast(self, text):
+        """Send an unsolicited line to every connected transport"""
+        with self._lock:
+            targets = list(self.transports)
+        for transport in targets:
+            transport.send(text)
+
+    def metrics_line(self):
+        """Per-transport counters for the METRICS response"""
+        with self._lock:
+            parts = [f"{t.name}={t.metrics.describe()}" for t in self.transports]
+            parts += [f"{kind}-closed={m.describe()}" for kind, m in self.retired.items()]
+        return ' '.join(parts)
+
+    # Event loop
+
+    def run(self):
+        """Run until interrupted"""
+        if sys.platform == 'win32' and any(kind.startswith('pipe:') for kind, _ in self._servers):
+            asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+        asyncio.run(self._main())
+
+    async def _main(self):
+        self.loop = asyncio.get_running_loop()
+        for transport in self._serial:
+            transport.start(lambda t, line, read_at: self.loop.call_soon_threadsafe(self.deliver, t, line, read_at))
+        for kind, start in self._servers:
+            server = await start(lambda kind=kind: _LineProtocol(self, kind.split(':', 1)[0]))
+            self._listening.append(server)
+            print(f"Listening on {kind}")
+        await asyncio.Event().wait()  # Forever - KeyboardInterrupt ends asyncio.run()
@@ -0,0 +1,457 @@
+"""
+Window layout presets
+
+Setting up "TV mode" used to take a command per window - BROWSER_MOVE_TV, then
+moving whatever else sat on the TV - and every move was its own SetWindowPos
+against monitor geometry enumerated again for that command, so the windows
+jumped one after the other. A layout places many windows at once:
+
+    LAYOUT:tv                 browser covers the TV, other windows on the TV move to monitor 1
+    LAYOUT:desk               every window on monitor 1, browser maximized
+    LAYOUT_SAVE:evening       snapshot of where every window is now
+    LAYOUT_DELETE:evening
+    LAYOUT_LIST
+
+Applying a layout computes every target rectangle up front from MonitorTopology
+(monitors and work areas enumerated once, reused until the display
+configuration changes), leaves windows that are already in place alone and
+moves the rest in one BeginDeferWindowPos/DeferWindowPos/EndDeferWindowPos
+batch - Windows repositions them in a single pass, one repaint instead of one
+per window. A window whose show state changes (maximized, minimized, or
+restored to be moved) gets one SetWindowPlacement, which moves it and changes
+its state in a single step. When the batch is refused (a window of an elevated
+process can't be moved) the windows are moved one at a time and the ones that
+can't be are reported.
+
+Entries are matched to windows in order, each window at most once:
+
+    {"window": "browser", "monitor": "tv", "state": "cover"}      the window BROWSER_MOVE_TV moves
+    {"process": "Spotify.exe", "title": "Spotify", "monitor": 0, "rect": [0.5, 0, 1, 1]}
+    {"window": "*", "monitor": 0}                                  every window not matched yet
+    {"window": "*", "from_monitor": "tv", "monitor": 0}            ... of those, the ones on the TV
+
+- monitor: index, or "tv" for the controller's TV monitor
+- from_monitor: only match windows that are on this monitor now (index or "tv")
+- rect: share of the monitor's work area (left, top, right, bottom) - snapshots
+  use it so they survive resolution changes. Without one a window keeps its
+  size and relative place, moved to the target monitor.
+- state: normal, maximized, minimized, cover (the whole monitor, in front), or
+  left out to keep the window's current one.
+- A process entry takes the window with the same title, else the first window
+  of the process (titles of browsers and players change).
+
+Snapshots are kept in a JSON file (--layouts), which may also hold hand-written
+presets replacing the built-in ones. The response tells what was done:
+
+    STATUS:LAYOUT tv applied in 9ms (2 moved in one batch, 1 placed, 3 already in place)
+"""
+
+import json
+import os
+import time
+from collections import namedtuple
+from ctypes import byref, c_int
+
+try:
+    if os.environ.get('PC_CONTROLLER_FAKE_BACKEND'):
+        raise ImportError("fake backend requested")
+    import win32api
+    import win32gui
+    import win32process
+    from ctypes import windll, c_uint, c_void_p
+    # HDWP is a pointer - the default int result would truncate it on 64-bit Python
+    windll.user32.BeginDeferWindowPos.restype = c_void_p
+    windll.user32.BeginDeferWindowPos.argtypes = (c_int,)
+    windll.user32.DeferWindowPos.restype = c_void_p
+    windll.user32.DeferWindowPos.argtypes = (c_void_p, c_void_p, c_void_p, c_int, c_int, c_int, c_int, c_uint)
+    windll.user32.EndDeferWindowPos.argtypes = (c_void_p,)
+except ImportError:
+    from fake_backend import win32api, win32gui, win32process, windll
+
+# Seconds the cached monitor topology is trusted before it is enumerated again
+# (changes are also caught by display change notifications and the virtual screen size)
+TOPOLOGY_TTL = 30.0
+
+GWL_EXSTYLE = -20
+WS_EX_TOOLWINDOW = 0x00000080
+DWMWA_CLOAKED = 14
+MONITORINFOF_PRIMARY = 1
+SM_XVIRTUALSCREEN, SM_YVIRTUALSCREEN, SM_CXVIRTUALSCREEN, SM_CYVIRTUALSCREEN, SM_CMONITORS = 76, 77, 78, 79, 80
+
+SW_SHOWNORMAL = 1
+SW_SHOWMINIMIZED = 2
+SW_SHOWMAXIMIZED = 3
+SW_SHOWNOACTIVATE = 4
+SW_SHOWMINNOACTIVE = 7
+HWND_TOP = 0
+SWP_NOZORDER = 0x0004
+SWP_NOACTIVATE = 0x0010
+SWP_NOOWNERZORDER = 0x0200
+
+# Show state of a layout entry -> (GetWindowPlacement state it ends in, SetWindowPlacement command)
+STATES = {
+    'normal': (SW_SHOWNORMAL, SW_SHOWNOACTIVATE),
+    'cover': (SW_SHOWNORMAL, SW_SHOWNOACTIVATE),
+    'maximized': (SW_SHOWMAXIMIZED, SW_SHOWMAXIMIZED),
+    'minimized': (SW_SHOWMINIMIZED, SW_SHOWMINNOACTIVE),
+}
+STATE_NAMES = {SW_SHOWMINIMIZED: 'minimized', SW_SHOWMAXIMIZED: 'maximized'}
+
+LAYOUTS = {
+    'tv': (
+        {'window': 'browser', 'monitor': 'tv', 'state': 'cover'},
+        {'window': '*', 'from_monitor': 'tv', 'monitor': 0},
+    ),
+    'desk': (
+        {'window': 'browser', 'monitor': 0, 'state': 'maximized'},
+        {'window': '*', 'monitor': 0},
+    ),
+}
+
+# A top-level window as a layout sees it; rect is its normal (restored) rectangle in screen coordinates
+LayoutWindow = namedtuple('LayoutWindow', 'hwnd title process show rect')
+# A window's target: rect in screen coordinates, state from STATES
+Move = namedtuple('Move', 'window rect state')
+
+
+class MonitorTopology:
+    """Monitors and their work areas, enumerated once and reused until the display configuration changes.
+
+    Each lookup only compares the monitor count and virtual screen bounds (five
+    GetSystemMetrics calls) with the cached ones; invalidate() is called on
+    WM_DISPLAYCHANGE and work area changes when power notifications run."""
+
+    def __init__(self, ttl=TOPOLOGY_TTL):
+        self.ttl = ttl
+        self.enumerations = 0
+        self._monitors = []
+        self._fingerprint = None
+        self._expires = 0.0
+
+    def invalidate(self):
+        self._expires = 0.0
+
+    def monitors(self):
+        """[{'handle', 'left', 'top', 'right', 'bottom', 'work', 'primary'}] in enumeration order"""
+        fingerprint = tuple(win32api.GetSystemMetrics(index) for index in (
+            SM_CMONITORS, SM_XVIRTUALSCREEN, SM_YVIRTUALSCREEN, SM_CXVIRTUALSCREEN, SM_CYVIRTUALSCREEN))
+        now = time.monotonic()
+        if fingerprint != self._fingerprint or now >= self._expires:
+            self._monitors = self._enumerate()
+            self._fingerprint = fingerprint
+            self._expires = now + self.ttl
+        return self._monitors
+
+    def _enumerate(self):
+        self.enumerations += 1
+        monitors = []
+        for handle, _, rect in win32api.EnumDisplayMonitors(None, None):
+            info = win32api.GetMonitorInfo(handle)
+            monitors.append({
+                'handle': handle,
+                'left': rect[0],
+                'top': rect[1],
+                'right': rect[2],
+                'bottom': rect[3],
+                'work': tuple(info['Work']),
+                'primary': bool(info['Flags'] & MONITORINFOF_PRIMARY),
+            })
+        return monitors
+
+    def index_at(self, rect):
+        """Monitor holding the center of rect (the primary one when it is off screen)"""
+        monitors = self.monitors()
+        x, y = (rect[0] + rect[2]) // 2, (rect[1] + rect[3]) // 2
+        for index, monitor in enumerate(monitors):
+            if monitor['left'] <= x < monitor['right'] and monitor['top'] <= y < monitor['bottom']:
+                return index
+        return next((index for index, monitor in enumerate(monitors) if monitor['primary']), 0)
+
+    def workspace_offset(self):
+        """Screen minus workspace coordinates (Get/SetWindowPlacement's rectangles are
+        relative to the primary monitor's work area, not the screen)"""
+        for monitor in self.monitors():
+            if monitor['primary']:
+                return monitor['work'][0] - monitor['left'], monitor['work'][1] - monitor['top']
+        return 0, 0
+
+    def describe(self):
+        return f"monitors:{len(self._monitors)},enumerations:{self.enumerations}"
+
+
+def _check_entry(name, entry):
+    if entry.get('window') not in ('browser', '*') and not entry.get('process'):
+        raise ValueError(f"layout {name}: an entry needs \"window\": \"browser\" or \"*\", or a process")
+    for key in ('monitor', 'from_monitor'):
+        monitor = entry.get(key, 0)
+        if monitor != 'tv' and not (isinstance(monitor, int) and monitor >= 0):
+            raise ValueError(f"layout {name}: {key} must be an index or \"tv\", not {monitor!r}")
+    state = entry.get('state')
+    if state is not None and state not in STATES:
+        raise ValueError(f"layout {name}: unknown state {state!r} (use {', '.join(STATES)})")
+    rect = entry.get('rect')
+    if rect is not None and not (len(rect) == 4 and rect[0] < rect[2] and rect[1] < rect[3]):
+        raise ValueError(f"layout {name}: rect must be [left, top, right, bottom] shares of the work area")
+    return entry
+
+
+def _share(rect, work):
+    """rect as shares of a work area (beyond 0-1 for a window over the taskbar or its invisible borders)"""
+    width, height = work[2] - work[0], work[3] - work[1]
+    return [round((rect[0] - work[0]) / width, 5), round((rect[1] - work[1]) / height, 5),
+            round((rect[2] - work[0]) / width, 5), round((rect[3] - work[1]) / height, 5)]
+
+
+def _scale(share, work):
+    width, height = work[2] - work[0], work[3] - work[1]
+    return (work[0] + round(share[0] * width), work[1] + round(share[1] * height),
+            work[0] + round(share[2] * width), work[1] + round(share[3] * height))
+
+
+def _remap(rect, source, target):
+    """Keep a window's size (shrunk to fit) and move it to the same relative place in another work area"""
+    width = min(rect[2] - rect[0], target[2] - target[0])
+    height = min(rect[3] - rect[1], target[3] - target[1])
+    left = target[0] + round((rect[0] - source[0]) * (target[2] - target[0]) / max(source[2] - source[0], 1))
+    top = target[1] + round((rect[1] - source[1]) * (target[3] - target[1]) / max(source[3] - source[1], 1))
+    left = min(max(left, target[0]), target[2] - width)
+    top = min(max(top, target[1]), target[3] - height)
+    return left, top, left + width, top + height
+
+
+class LayoutManager:
+    """Applies, snapshots and stores window layouts for the companion's command handlers"""
+
+    def __init__(self, controller, path=None):
+        self.controller = controller
+        self.path = path
+        self.layouts = dict(LAYOUTS)
+        self.saved = {}  # Layouts from the file (written back on save/delete)
+        self.batches = 0
+        self.fallbacks = 0  # Batches refused and done one window at a time
+
+    def load(self):
+        """Read the layouts file (missing is fine); returns the number of layouts in it"""
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        with open(self.path, encoding='utf-8') as f:
+            data = json.load(f)
+        for name, entries in data.items():
+            self.saved[name.lower()] = tuple(_check_entry(name, dict(entry)) for entry in entries)
+        self.layouts.update(self.saved)
+        return len(self.saved)
+
+    def _write(self):
+        if not self.path:
+            return
+        # One window per line, so the file stays easy to edit by hand
+        layouts = [f"  {json.dumps(name)}: [\n" + ',\n'.join(f"    {json.dumps(entry)}" for entry in entries) + "\n  ]"
+                   for name, entries in self.saved.items()]
+        temporary = f"{self.path}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as f:
+            f.write("{\n" + ',\n'.join(layouts) + "\n}\n")
+        os.replace(temporary, self.path)
+
+    # Windows
+
+    def _layout_window(self, hwnd, windows, offset):
+        """EnumWindows callback - visible, titled application windows"""
+        if not win32gui.IsWindowVisible(hwnd) or win32gui.GetWindowLong(hwnd, GWL_EXSTYLE) & WS_EX_TOOLWINDOW:
+            return True
+        title = win32gui.GetWindowText(hwnd)
+        if not title or title == 'Program Manager':
+            return True
+        cloaked = c_int(0)
+        # Suspended store apps and windows on other virtual desktops are "visible" but cloaked
+        if windll.dwmapi.DwmGetWindowAttribute(hwnd, DWMWA_CLOAKED, byref(cloaked), 4) == 0 and cloaked.value:
+            return True
+        _, pid = win32process.GetWindowThreadProcessId(hwnd)
+        process = self.controller._process_name(hwnd, pid)
+        if process is None:
+            return True
+        placement = win32gui.GetWindowPlacement(hwnd)
+        show = placement[1] if placement[1] in (SW_SHOWMINIMIZED, SW_SHOWMAXIMIZED) else SW_SHOWNORMAL
+        if show == SW_SHOWNORMAL:
+            rect = tuple(win32gui.GetWindowRect(hwnd))
+        else:
+            normal = placement[4]
+            rect = (normal[0] + offset[0], normal[1] + offset[1], normal[2] + offset[0], normal[3] + offset[1])
+        windows.append(LayoutWindow(hwnd, title, process, show, rect))
+        return True
+
+    def windows(self):
+        """Application windows in z-order, front first"""
+        windows = []
+        win32gui.EnumWindows(lambda hwnd, offset: self._layout_window(hwnd, windows, offset),
+                             self.controller.topology.workspace_offset())
+        return windows
+
+    # Planning
+
+    def _monitor_index(self, monitor):
+        return self.controller.tv_monitor_index if monitor == 'tv' else monitor
+
+    def _match(self, entries, windows):
+        """[(window, entry)] in entry order, and the number of entries that found no window"""
+        browsers = self.controller.find_browser_windows()
+        browser = browsers[0][0] if browsers else None
+        claimed = set()
+        matched = []
+        missing = 0
+        for entry in entries:
+            free = [window for window in windows if window.hwnd not in claimed]
+            if entry.get('from_monitor') is not None:
+                source = self._monitor_index(entry['from_monitor'])
+                topology = self.controller.topology
+                free = [window for window in free if topology.index_at(window.rect) == source]
+            if entry.get('window') == '*':
+                found = free
+            elif entry.get('window') == 'browser':
+                found = [window for window in free if window.hwnd == browser]
+            else:
+                process = entry['process'].lower()
+                candidates = [window for window in free if window.process.lower() == process]
+                found = ([window for window in candidates if window.title == entry.get('title')] or candidates)[:1]
+            if not found and entry.get('window') != '*':
+                missing += 1
+            for window in found:
+                claimed.add(window.hwnd)
+                matched.append((window, entry))
+        return matched, missing
+
+    def _target(self, window, entry, monitors):
+        """Move for a matched window, or None when its monitor isn't connected"""
+        index = self._monitor_index(entry.get('monitor', 0))
+        if index >= len(monitors):
+            return None
+        monitor = monitors[index]
+        state = entry.get('state') or STATE_NAMES.get(window.show, 'normal')
+        if state == 'cover':
+            rect = (monitor['left'], monitor['top'], monitor['right'], monitor['bottom'])
+        elif entry.get('rect'):
+            rect = _scale(entry['rect'], monitor['work'])
+        else:
+            source = monitors[self.controller.topology.index_at(window.rect)]
+            rect = window.rect if source is monitor else _remap(window.rect, source['work'], monitor['work'])
+        return Move(window, rect, state)
+
+    def plan(self, entries):
+        """(moves of windows not in place yet, windows in place, entries or monitors not found)"""
+        monitors = self.controller.topology.monitors()
+        matched, missing = self._match(entries, self.windows())
+        moves = []
+        in_place = 0
+        for window, entry in matched:
+            move = self._target(window, entry, monitors)
+            if move is None:
+                missing += 1
+            elif (window.rect, window.show) != (move.rect, STATES[move.state][0]):
+                moves.append(move)
+            else:
+                in_place += 1
+        return moves, in_place, missing
+
+    # Applying
+
+    def _place(self, move, offset):
+        """SetWindowPlacement - moves the window and changes its show state in one step"""
+        rect = move.rect
+        normal = (rect[0] - offset[0], rect[1] - offset[1], rect[2] - offset[0], rect[3] - offset[1])
+        win32gui.SetWindowPlacement(move.window.hwnd, (0, STATES[move.state][1], (-1, -1), (-1, -1), normal))
+
+    def _defer(self, moves):
+        """Position normal windows in one batch; returns the windows that couldn't be moved"""
+        user32 = windll.user32
+        batch = user32.BeginDeferWindowPos(len(moves))
+        for move in moves:
+            if not batch:
+                break
+            left, top, right, bottom = move.rect
+            flags = SWP_NOACTIVATE | SWP_NOOWNERZORDER | (0 if move.state == 'cover' else SWP_NOZORDER)
+            batch = user32.DeferWindowPos(batch, move.window.hwnd, HWND_TOP,
+                                          left, top, right - left, bottom - top, flags)
+        self.batches += 1
+        if batch and user32.EndDeferWindowPos(batch):
+            return []
+        # The whole batch was dropped - move the windows one at a time
+        self.fallbacks += 1
+        failed = []
+        for move in moves:
+            left, top, right, bottom = move.rect
+            flags = SWP_NOACTIVATE | SWP_NOOWNERZORDER | (0 if move.state == 'cover' else SWP_NOZORDER)
+            try:
+                win32gui.SetWindowPos(move.window.hwnd, HWND_TOP, left, top, right - left, bottom - top, flags)
+            except win32gui.error:
+                failed.append(move.window)
+        return failed
+
+    def apply(self, name):
+        """Apply a layout; returns the status message"""
+        entries = self.layouts.get(name.lower())
+        if entries is None:
+            return f"LAYOUT failed - unknown layout {name} (known: {', '.join(sorted(self.layouts))})"
+        start = time.perf_counter()
+        moves, in_place, missing = self.plan(entries)
+        if not moves and not in_place:
+            return f"LAYOUT {name} failed - no matching windows"
+        # Normal windows that stay normal go in the batch, state changes are placed first
+        batched = [move for move in moves if move.window.show == SW_SHOWNORMAL == STATES[move.state][0]]
+        placed = [move for move in moves if move not in batched]
+        offset = self.controller.topology.workspace_offset()
+        counts = len(batched), len(placed)
+        failed = []
+        for move in placed:
+            try:
+                self._place(move, offset)
+            except win32gui.error:
+                failed.append(move.window)
+                continue
+            if move.state == 'cover':
+                batched.append(Move(move.window, move.rect, 'cover'))  # Then brought to the front in the batch
+        if batched:
+            failed += self._defer(batched)
+        parts = [f"{counts[0]} moved in one batch" if counts[0] else None,
+                 f"{counts[1]} placed" if counts[1] else None,
+                 f"{in_place} already in place" if in_place else None,
+                 f"{missing} not found" if missing else None,
+                 f"couldn't move {', '.join(window.process for window in failed)}" if failed else None]
+        return (f"LAYOUT {name} applied in {(time.perf_counter() - start) * 1000:.0f}ms "
+                f"({', '.join(part for part in parts if part)})")
+
+    def save(self, name):
+        """Snapshot every application window's monitor, place and state as a layout"""
+        name = name.strip().lower()
+        if not name:
+            return "LAYOUT_SAVE failed - missing name"
+        topology = self.controller.topology
+        monitors = topology.monitors()
+        entries = []
+        for window in self.windows():
+            index = topology.index_at(window.rect)
+            entries.append({'process': window.process, 'title': window.title, 'monitor': index,
+                            'rect': _share(window.rect, monitors[index]['work']),
+                            'state': STATE_NAMES.get(window.show, 'normal')})
+        if not entries:
+            return "LAYOUT_SAVE failed - no windows"
+        self.saved[name] = self.layouts[name] = tuple(entries)
+        self._write()
+        return f"LAYOUT_SAVE executed - {name} ({len(entries)} windows)"
+
+    def delete(self, name):
+        name = name.strip().lower()
+        if name not in self.saved:
+            return f"LAYOUT_DELETE failed - no saved layout {name}"
+        del self.saved[name]
+        if name in LAYOUTS:
+            self.layouts[name] = LAYOUTS[name]  # The built-in one it replaced
+        else:
+            del self.layouts[name]
+        self._write()
+        return f"LAYOUT_DELETE executed - {name}"
+
+    def list_layouts(self):
+        names = ', '.join(f"{name} ({len(entries)})" for name, entries in sorted(self.layouts.items()))
+        return f"LAYOUT_LIST {names}"
+
+    def describe(self):
+        return f"layouts:{len(self.layouts)},batches:{self.batches},fallbacks:{self.fallbacks}"